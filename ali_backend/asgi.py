@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ali_backend.settings')
+# Servido por ASGI (uvicorn): las urls registran las vistas async (ali_ia/vistas_async.py)
+os.environ.setdefault('ALI_ASGI', '1')
 
 application = get_asgi_application()
@@ -62,6 +62,7 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'test_grado9',
     'test_grado_10_11',
+    'ali_ia',
     'django_extensions',
     'corsheaders'
 ]
@@ -149,6 +150,24 @@ DATABASES = {
 }
 
 
+# Cache
+# "default" es local por proceso. Si hay REDIS_URL se agrega "compartida", que usan
+# las capas de cache que deben verse desde todos los workers
+# (p. ej. ALI_CACHE_PREDICCIONES_ALIAS=compartida).
+REDIS_URL = config('REDIS_URL', default='')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+if REDIS_URL:
+    CACHES['compartida'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
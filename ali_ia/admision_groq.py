@@ -0,0 +1,316 @@
+# ali_ia/admision_groq.py
+# -*- coding: utf-8 -*-
+"""
+Control de admisión delante de Groq: cupos por minuto y concurrencia por worker.
+
+Cuando un salón entero finaliza a la vez, todas las explicaciones llegan juntas a
+Groq, que responde 429 al pasar los límites de la cuenta. Aquí cada llamada que
+no sale del cache pide cupo antes de ir a la red:
+
+- RPM / TPM: cubetas de tokens por proceso (capacidad = el presupuesto de un
+  minuto, se rellenan de forma continua). Los tokens de una llamada son los del
+  prompt (ali_ia.prompts) más max_tokens, como los cuenta Groq.
+- Entre workers: se reservan además contadores por minuto en el cache de Django
+  "compartida" (Redis, existe si hay REDIS_URL), así el presupuesto es de toda la
+  cuenta y no de cada proceso. ALI_GROQ_ADMISION_ALIAS elige otro alias o, vacío,
+  lo desactiva. Sin ese cache (o si falla) se sigue solo con las cubetas locales:
+  con N workers el límite efectivo es N veces el de la cuenta.
+- Concurrencia: como máximo ALI_GROQ_CONCURRENTES llamadas en vuelo por proceso.
+
+Lo que no tiene cupo espera en cola (FIFO aproximado) hasta ALI_GROQ_ESPERA_MAX_S;
+si se vence, SinCupo (un CircuitoAbierto): el worker y el endpoint SSE la devuelven
+a la cola sin gastar el intento; la finalización síncrona (ALI_EXPLICACIONES=sincrona,
+sin worker que la retome) guarda la explicación local. Métricas (profundidad de la cola, espera
+p50/p95): estadisticas(). RPM/TPM en 0 desactivan ese límite.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from ali_ia.groq_client import CircuitoAbierto, GroqError
+from ali_ia.metricas import resumen
+
+logger = logging.getLogger(__name__)
+
+# Defaults del plan gratuito de Groq para llama-3.1-8b-instant; súbelos según la cuenta
+RPM_DEFAULT = int(os.environ.get("ALI_GROQ_RPM", "30"))
+TPM_DEFAULT = int(os.environ.get("ALI_GROQ_TPM", "6000"))
+CONCURRENTES_DEFAULT = int(os.environ.get("ALI_GROQ_CONCURRENTES", "4"))
+ESPERA_MAX_DEFAULT = float(os.environ.get("ALI_GROQ_ESPERA_MAX_S", "10"))
+# None: "compartida" si está en settings.CACHES; "" lo desactiva
+ALIAS_DEFAULT = os.environ.get("ALI_GROQ_ADMISION_ALIAS")
+ALIAS_AUTOMATICO = "compartida"
+
+SONDEO_S = 0.05  # espera mínima entre intentos de reservar
+
+
+class SinCupo(CircuitoAbierto):
+    """No hubo cupo en Groq (RPM/TPM o concurrencia) dentro de la espera máxima."""
+
+
+def es_saturacion(error) -> bool:
+    """Errores por falta de cupo en Groq (propio o 429): la explicación debe esperar, no fallar."""
+    return isinstance(error, SinCupo) or (isinstance(error, GroqError) and error.status == 429)
+
+
+class CubetaTokens:
+    """Token bucket: `por_minuto` de capacidad y de reposición por minuto. No es thread-safe (usa el lock de quien la tiene)."""
+
+    def __init__(self, por_minuto: int):
+        self.capacidad = float(por_minuto)
+        self.tasa = por_minuto / 60.0
+        self.nivel = self.capacidad
+        self._t = time.monotonic()
+
+    def _rellenar(self):
+        ahora = time.monotonic()
+        self.nivel = min(self.capacidad, self.nivel + (ahora - self._t) * self.tasa)
+        self._t = ahora
+
+    def tomar(self, n: float) -> float:
+        """Toma n tokens (0 si los tomó) o devuelve los segundos que faltan para tenerlos."""
+        n = min(n, self.capacidad)  # una llamada más grande que el minuto entero espera a la cubeta llena
+        self._rellenar()
+        if self.nivel >= n:
+            self.nivel -= n
+            return 0.0
+        return (n - self.nivel) / self.tasa
+
+    def devolver(self, n: float):
+        self.nivel = min(self.capacidad, self.nivel + min(n, self.capacidad))
+
+
+class ControlAdmision:
+    def __init__(self, rpm: int = RPM_DEFAULT, tpm: int = TPM_DEFAULT, max_concurrentes: int = CONCURRENTES_DEFAULT,
+                 espera_max_s: float = ESPERA_MAX_DEFAULT, alias_compartido=ALIAS_DEFAULT):
+        self.rpm, self.tpm = int(rpm), int(tpm)
+        self.max_concurrentes = int(max_concurrentes)
+        self.espera_max_s = float(espera_max_s)
+        self.alias_compartido = alias_compartido
+        # (cubeta, cuenta tokens): RPM descuenta 1 por llamada, TPM los tokens de la llamada
+        self._cubetas = []
+        if self.rpm > 0:
+            self._cubetas.append((CubetaTokens(self.rpm), False))
+        if self.tpm > 0:
+            self._cubetas.append((CubetaTokens(self.tpm), True))
+        self._semaforo = threading.BoundedSemaphore(self.max_concurrentes) if self.max_concurrentes > 0 else None
+        self._lock = threading.Lock()
+        self._compartido = None
+        # métricas
+        self._esperas = deque(maxlen=2000)
+        self.en_cola = 0
+        self.max_en_cola = 0
+        self.en_curso = 0
+        self.admitidas = 0
+        self.sin_cupo = 0
+        self.rechazos_compartido = 0
+
+    @property
+    def activo(self) -> bool:
+        return bool(self._cubetas or self._semaforo or self._alias())
+
+    # ---------- cupo entre workers (Django cache) ----------
+    def _alias(self) -> str:
+        """Alias del cache compartido; sin configurar, "compartida" si existe en settings.CACHES."""
+        if self.alias_compartido is None:
+            try:
+                from django.conf import settings
+                self.alias_compartido = ALIAS_AUTOMATICO if ALIAS_AUTOMATICO in settings.CACHES else ""
+            except Exception:  # Django sin configurar (scripts sueltos)
+                return ""
+            if not self.alias_compartido:
+                logger.warning("Admisión a Groq sin cache compartido: cada proceso tiene su propio cupo "
+                               "(define REDIS_URL o ALI_GROQ_ADMISION_ALIAS).")
+        return self.alias_compartido
+
+    def _backend(self):
+        if not self._alias():
+            return None
+        if self._compartido is None:
+            try:
+                from django.core.cache import caches
+                self._compartido = caches[self.alias_compartido]
+            except Exception as e:
+                logger.warning("Cache de admisión '%s' no disponible: %s", self.alias_compartido, e)
+                self.alias_compartido = ""
+                return None
+        return self._compartido
+
+    def _reservar_compartido(self, tokens: int) -> float:
+        """Contadores por minuto de toda la cuenta; 0 si reservó, o segundos hasta el próximo minuto."""
+        backend = self._backend()
+        if backend is None:
+            return 0.0
+        ahora = time.time()
+        minuto = int(ahora // 60)
+        pedidos = [(f"ali:groq:rpm:{minuto}", 1, self.rpm), (f"ali:groq:tpm:{minuto}", tokens, self.tpm)]
+        pedidos = [p for p in pedidos if p[2] > 0]
+        try:
+            hechos = []
+            for clave, n, limite in pedidos:
+                backend.add(clave, 0, 120)
+                hechos.append((clave, n))
+                if backend.incr(clave, n) > limite:
+                    for c, m in hechos:
+                        backend.decr(c, m)
+                    with self._lock:
+                        self.rechazos_compartido += 1
+                    # al próximo minuto, con jitter para que los workers no despierten juntos
+                    return 60 - ahora % 60 + random.uniform(0, 0.5)
+        except Exception as e:
+            logger.warning("Cupo compartido de Groq no disponible, se usa solo el local: %s", e)
+        return 0.0
+
+    # ---------- reserva ----------
+    def _reservar(self, tokens: int) -> float:
+        """Intenta reservar cupo local y compartido; 0 si lo tiene, si no los segundos a esperar."""
+        with self._lock:
+            esperas = []
+            tomadas = []
+            for cubeta, por_tokens in self._cubetas:
+                n = tokens if por_tokens else 1
+                espera = cubeta.tomar(n)
+                if espera:
+                    esperas.append(espera)
+                else:
+                    tomadas.append((cubeta, n))
+            if esperas:
+                for cubeta, n in tomadas:
+                    cubeta.devolver(n)
+                return max(esperas)
+        espera = self._reservar_compartido(tokens)
+        if espera:
+            with self._lock:
+                for cubeta, n in tomadas:
+                    cubeta.devolver(n)
+        return espera
+
+    def _entrar_cola(self):
+        with self._lock:
+            self.en_cola += 1
+            self.max_en_cola = max(self.max_en_cola, self.en_cola)
+
+    def _salir_cola(self, t0: float, admitida: bool):
+        espera = time.monotonic() - t0
+        with self._lock:
+            self.en_cola -= 1
+            self._esperas.append(espera)
+            if admitida:
+                self.admitidas += 1
+                self.en_curso += 1
+            else:
+                self.sin_cupo += 1
+        if not admitida:
+            logger.warning("Groq: sin cupo tras %.1f s en cola (%s en cola)", espera, self.en_cola)
+
+    def _terminar(self):
+        with self._lock:
+            self.en_curso -= 1
+        if self._semaforo:
+            self._semaforo.release()
+
+    def _sin_cupo(self):
+        return SinCupo("Sin cupo en Groq por ahora (límite de la cuenta o de concurrencia).")
+
+    @contextmanager
+    def admitir(self, tokens: int, limite=None):
+        """
+        Espera cupo para una llamada de `tokens` tokens; SinCupo si no lo hay dentro
+        de espera_max_s (o antes de `limite`, el plazo total de la llamada).
+        """
+        if not self.activo:
+            yield
+            return
+        t0 = time.monotonic()
+        limite = t0 + self.espera_max_s if limite is None else min(limite, t0 + self.espera_max_s)
+        self._entrar_cola()
+        admitida = False
+        try:
+            if self._semaforo and not self._semaforo.acquire(timeout=max(0.0, limite - time.monotonic())):
+                raise self._sin_cupo()
+            try:
+                while True:
+                    espera = self._reservar(tokens)
+                    if not espera:
+                        break
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise self._sin_cupo()
+                    time.sleep(min(max(espera, SONDEO_S), restante))
+            except BaseException:
+                if self._semaforo:
+                    self._semaforo.release()
+                raise
+            admitida = True
+        finally:
+            self._salir_cola(t0, admitida)
+        try:
+            yield
+        finally:
+            self._terminar()
+
+    @asynccontextmanager
+    async def aadmitir(self, tokens: int, limite=None):
+        """Versión asíncrona de admitir: la espera no bloquea el event loop."""
+        if not self.activo:
+            yield
+            return
+        t0 = time.monotonic()
+        limite = t0 + self.espera_max_s if limite is None else min(limite, t0 + self.espera_max_s)
+        self._entrar_cola()
+        admitida = False
+        try:
+            if self._semaforo:
+                while not self._semaforo.acquire(blocking=False):
+                    if time.monotonic() >= limite:
+                        raise self._sin_cupo()
+                    await asyncio.sleep(SONDEO_S)
+            try:
+                while True:
+                    # la reserva compartida hace I/O a Redis: en un hilo
+                    espera = (await asyncio.to_thread(self._reservar, tokens) if self._alias()
+                              else self._reservar(tokens))
+                    if not espera:
+                        break
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        raise self._sin_cupo()
+                    await asyncio.sleep(min(max(espera, SONDEO_S), restante))
+            except BaseException:
+                if self._semaforo:
+                    self._semaforo.release()
+                raise
+            admitida = True
+        finally:
+            self._salir_cola(t0, admitida)
+        try:
+            yield
+        finally:
+            self._terminar()
+
+    # ---------- métricas ----------
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "max_concurrentes": self.max_concurrentes,
+                "compartido": self._alias() or None,
+                "en_cola": self.en_cola,
+                "max_en_cola": self.max_en_cola,
+                "en_curso": self.en_curso,
+                "admitidas": self.admitidas,
+                "sin_cupo": self.sin_cupo,
+                "rechazos_compartido": self.rechazos_compartido,
+                **resumen(self._esperas, prefijo="espera_", maximo=True),
+            }
+
+
+# Instancia compartida por los groq_service de 9° y 10/11 (presupuesto de la cuenta con "compartida")
+ADMISION = ControlAdmision()
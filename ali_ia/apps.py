@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class AliIaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'ali_ia'
+    verbose_name = 'ALI - Inferencia y explicaciones'
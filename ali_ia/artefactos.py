@@ -0,0 +1,171 @@
+# ali_ia/artefactos.py
+# -*- coding: utf-8 -*-
+"""
+Carga perezosa de los artefactos de los modelos de 9° y 10/11.
+
+Importar las vistas ya no carga joblib/sklearn ni lee CSVs: el modelo se carga
+en la primera predicción o con un precargar() explícito (warmup). Si falta un
+artefacto, el error aparece en esa predicción y no al arrancar el proceso.
+
+Los CSV auxiliares (_xcols, _id_to_nombre, _tecnicos_orden) son de una o dos
+columnas y se leen con el módulo csv, sin pandas.
+"""
+
+import csv
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+from ali_ia.bosque_plano import BosquePlano
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto se revisa si cambió la versión activa del registro
+INTERVALO_REVISION_S = float(os.environ.get("ALI_REGISTRO_INTERVALO_S", "5"))
+
+
+def leer_columna_csv(ruta, columna: int = 0):
+    """Devuelve los valores (str, sin espacios) de una columna de un CSV sin encabezado."""
+    valores = []
+    with open(ruta, newline="", encoding="utf-8") as f:
+        for fila in csv.reader(f):
+            if len(fila) > columna:
+                valores.append(fila[columna].strip())
+    return valores
+
+
+def leer_mapa_csv(ruta):
+    """CSV de dos columnas (id, nombre) -> dict {int: str}; ignora filas no numéricas."""
+    mapa = {}
+    with open(ruta, newline="", encoding="utf-8") as f:
+        for fila in csv.reader(f):
+            if len(fila) < 2 or not fila[1].strip():
+                continue
+            try:
+                mapa[int(float(fila[0]))] = fila[1].strip()
+            except ValueError:
+                continue
+    return mapa
+
+
+def compilar_bosque(modelo):
+    """BosquePlano del modelo, o None si no es un RandomForest compatible."""
+    try:
+        return BosquePlano.desde_sklearn(modelo)
+    except (AttributeError, ValueError):
+        return None
+
+
+@dataclass
+class ArtefactosModelo:
+    """Todo lo que necesita una predicción, ya cargado y compilado."""
+    modelo: object
+    xcols: list
+    nombres_clases: list          # nombre de cada columna de predict_proba
+    plan: object                  # PlanFeatures
+    bosque: object = None         # BosquePlano o None
+    version: str = ""
+    extra: dict = field(default_factory=dict)
+
+
+class ModeloPerezoso:
+    """
+    Envuelve una función `cargador() -> ArtefactosModelo` y la ejecuta una sola vez,
+    de forma segura entre hilos, la primera vez que alguien pide el modelo.
+
+    Con `version_deseada` (p. ej. RegistroModelos.version_activa) se revisa cada
+    `intervalo_s` segundos si la versión cambió; en ese caso se carga la nueva en
+    un hilo aparte y se reemplaza la referencia de una sola vez. Las predicciones
+    en curso terminan con los artefactos que ya tenían y nadie espera la carga.
+    """
+
+    def __init__(self, nombre: str, cargador, version_deseada=None,
+                 intervalo_s: float = INTERVALO_REVISION_S):
+        self.nombre = nombre
+        self._cargador = cargador
+        self._version_deseada = version_deseada
+        self.intervalo_s = intervalo_s
+        self._artefactos = None
+        self._lock = threading.Lock()
+        self._lock_recarga = threading.Lock()
+        self._proxima_revision = 0.0
+        self.segundos_carga = None
+        self.recargas = 0
+        self.fallos_recarga = 0
+
+    @property
+    def cargado(self) -> bool:
+        return self._artefactos is not None
+
+    def obtener(self) -> ArtefactosModelo:
+        art = self._artefactos
+        if art is not None:
+            if self._version_deseada is not None and time.monotonic() >= self._proxima_revision:
+                self._revisar_version(art)
+            return art
+        with self._lock:
+            if self._artefactos is None:
+                t0 = time.perf_counter()
+                self._artefactos = self._cargador()
+                self.segundos_carga = time.perf_counter() - t0
+                self._proxima_revision = time.monotonic() + self.intervalo_s
+            return self._artefactos
+
+    def _revisar_version(self, art):
+        if not self._lock_recarga.acquire(blocking=False):
+            return  # otro hilo ya está revisando/recargando
+        lanzado = False
+        try:
+            self._proxima_revision = time.monotonic() + self.intervalo_s
+            deseada = self._version_deseada()
+            if deseada and deseada != art.version:
+                threading.Thread(target=self._recargar_y_soltar, name=f"recarga-{self.nombre}",
+                                 daemon=True).start()
+                lanzado = True
+        except Exception:
+            logger.exception("%s: no se pudo revisar la versión activa", self.nombre)
+        finally:
+            if not lanzado:
+                self._lock_recarga.release()
+
+    def _recargar_y_soltar(self):
+        try:
+            self._recargar()
+        finally:
+            self._lock_recarga.release()
+
+    def _recargar(self):
+        anterior = self._artefactos
+        t0 = time.perf_counter()
+        try:
+            nuevo = self._cargador()
+        except Exception:
+            self.fallos_recarga += 1
+            logger.exception("No se pudo cargar la nueva versión de %s; se sigue con la anterior", self.nombre)
+            return False
+        self._artefactos = nuevo  # asignación atómica: nadie ve un estado intermedio
+        self.segundos_carga = time.perf_counter() - t0
+        self.recargas += 1
+        logger.info("%s: versión %s -> %s (%.0f ms)", self.nombre,
+                    getattr(anterior, "version", None), nuevo.version, self.segundos_carga * 1000)
+        return True
+
+    def recargar(self) -> bool:
+        """Recarga sincrónica (warmup tras activar una versión). True si se cargó."""
+        with self._lock_recarga:
+            self._proxima_revision = time.monotonic() + self.intervalo_s
+            return self._recargar()
+
+    def precargar(self) -> float:
+        """Warmup explícito; devuelve los segundos que tomó la carga (0 si ya estaba)."""
+        if self.cargado:
+            return 0.0
+        self.obtener()
+        return self.segundos_carga or 0.0
+
+    def descargar(self):
+        with self._lock:
+            self._artefactos = None
+            self.segundos_carga = None
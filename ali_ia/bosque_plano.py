@@ -0,0 +1,103 @@
+# ali_ia/bosque_plano.py
+# -*- coding: utf-8 -*-
+"""
+Evaluador de RandomForestClassifier sobre arreglos planos de NumPy.
+
+sklearn.predict_proba tiene un costo fijo alto por llamada (validación de entrada,
+despacho a hilos con n_jobs=-1 y una llamada Python por árbol). Aquí se aplanan los
+`tree_` de todos los árboles en buffers contiguos y se recorren todos a la vez,
+nivel por nivel, para una fila o un lote pequeño.
+
+Reproduce la aritmética de sklearn (normalización por hoja en float64, suma
+secuencial en el orden de estimators_ y división final por n_estimators), por lo
+que el resultado coincide con predict_proba ejecutado con n_jobs=1.
+"""
+
+import numpy as np
+
+
+class BosquePlano:
+    """
+    Buffers (todos indexados por nodo global):
+      - izquierda / derecha: hijo izquierdo/derecho (las hojas apuntan a sí mismas)
+      - feature / umbral: columna y umbral de cada split (hojas: 0 / +inf)
+      - hoja_proba: (n_nodos, n_clases) probabilidad normalizada de cada nodo
+      - raices: nodo raíz de cada árbol
+    """
+
+    def __init__(self, izquierda, derecha, feature, umbral, hoja_proba, raices,
+                 profundidad, n_features, classes):
+        self.izquierda = izquierda
+        self.derecha = derecha
+        self.feature = feature
+        self.umbral = umbral
+        self.hoja_proba = hoja_proba
+        self.raices = raices
+        self.profundidad = int(profundidad)
+        self.n_features = int(n_features)
+        self.classes_ = np.asarray(classes)
+        self.n_arboles = int(len(raices))
+
+    @classmethod
+    def desde_sklearn(cls, modelo):
+        """Aplana un RandomForestClassifier (una sola salida) ya entrenado."""
+        estimadores = getattr(modelo, "estimators_", None)
+        if not estimadores or int(getattr(modelo, "n_outputs_", 1)) != 1:
+            raise ValueError("BosquePlano solo soporta RandomForestClassifier de una salida.")
+
+        n_clases = int(modelo.n_classes_)
+        izq, der, feat, umb, proba, raices = [], [], [], [], [], []
+        offset = 0
+        profundidad = 0
+        for est in estimadores:
+            t = est.tree_
+            n = int(t.node_count)
+            ids = np.arange(n, dtype=np.int64)
+            hoja = t.children_left == -1
+
+            izq.append(np.where(hoja, ids, t.children_left).astype(np.int64) + offset)
+            der.append(np.where(hoja, ids, t.children_right).astype(np.int64) + offset)
+            feat.append(np.where(hoja, 0, t.feature).astype(np.int64))
+            umb.append(np.where(hoja, np.inf, t.threshold).astype(np.float64))
+
+            # Igual que DecisionTreeClassifier.predict_proba: normaliza cada fila de value
+            v = np.array(t.value[:, 0, :n_clases], dtype=np.float64)
+            normalizador = v.sum(axis=1)[:, np.newaxis]
+            normalizador[normalizador == 0.0] = 1.0
+            v /= normalizador
+            proba.append(v)
+
+            raices.append(offset)
+            profundidad = max(profundidad, int(t.max_depth))
+            offset += n
+
+        return cls(
+            izquierda=np.concatenate(izq),
+            derecha=np.concatenate(der),
+            feature=np.concatenate(feat),
+            umbral=np.concatenate(umb),
+            hoja_proba=np.ascontiguousarray(np.concatenate(proba)),
+            raices=np.asarray(raices, dtype=np.int64),
+            profundidad=profundidad,
+            n_features=int(modelo.n_features_in_),
+            classes=modelo.classes_,
+        )
+
+    def apply(self, X):
+        """Devuelve (N, n_arboles) con el nodo hoja global de cada fila en cada árbol."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Se esperaba una matriz (N, {self.n_features}).")
+        nodos = np.repeat(self.raices[np.newaxis, :], X.shape[0], axis=0)
+        filas = np.arange(X.shape[0])[:, np.newaxis]
+        for _ in range(self.profundidad):
+            # float32 <= float64, igual que el recorrido en Cython de sklearn
+            ir_izq = X[filas, self.feature[nodos]] <= self.umbral[nodos]
+            nodos = np.where(ir_izq, self.izquierda[nodos], self.derecha[nodos])
+        return nodos
+
+    def predict_proba(self, X):
+        """Probabilidades (N, n_clases) promediadas sobre todos los árboles."""
+        P = self.hoja_proba[self.apply(X)]  # (N, n_arboles, n_clases)
+        # cumsum acumula en el orden de los árboles, como `out += prediction` en sklearn
+        return np.cumsum(P, axis=1)[:, -1, :] / self.n_arboles
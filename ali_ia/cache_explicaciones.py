@@ -0,0 +1,252 @@
+# ali_ia/cache_explicaciones.py
+# -*- coding: utf-8 -*-
+"""
+Cache de explicaciones de Groq.
+
+Estudiantes con la misma salida del modelo (modalidad / carrera) y un perfil de
+respuestas parecido reciben explicaciones casi iguales. La clave es:
+
+    sha256(modelo | contexto | objetivo | perfil)
+
+- contexto: huella del prompt y del modelo de Groq (si cambia el prompt, no se
+  sirven explicaciones viejas),
+- perfil: los bloques dominantes según el promedio de respuestas de cada bloque
+  (p. ej. "Robótica>Diseño Gráfico|alto"), ver perfil_por_bloques().
+
+Capas:
+  - LRU en memoria por proceso (acotada, con TTL),
+  - tabla ExplicacionCacheada (compartida por web y worker), con TTL
+    (ALI_CACHE_EXPLICACIONES_TTL_S) y desalojo por tamaño (ALI_CACHE_EXPLICACIONES_MAX_FILAS,
+    se borran las de uso más antiguo). Las pregeneradas (`manage.py
+    pregenerar_explicaciones`, perfiles frecuentes) solo vencen por TTL.
+Si la tabla no está disponible, el cache solo registra el error y sigue (no bloquea a Groq).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+
+from ali_ia.prompts import medias_por_bloque, nivel
+
+logger = logging.getLogger(__name__)
+
+TTL_DEFAULT = int(os.environ.get("ALI_CACHE_EXPLICACIONES_TTL_S", str(30 * 24 * 3600)))
+MAX_MEMORIA_DEFAULT = int(os.environ.get("ALI_CACHE_EXPLICACIONES_MAX_MEMORIA", "512"))
+MAX_FILAS_DEFAULT = int(os.environ.get("ALI_CACHE_EXPLICACIONES_MAX_FILAS", "20000"))
+PODA_CADA = 100  # escrituras entre podas de la tabla
+
+
+def perfil_por_bloques(respuestas: dict, bloques_por_nombre: dict, top: int = 2):
+    """
+    {"pregunta_i": 3/2/1} -> "BloqueA>BloqueB|nivel" con los `top` bloques de mayor
+    promedio (empates por orden de los bloques). None si las respuestas no son códigos.
+    Mismas medias que el resumen del prompt (ali_ia.prompts.medias_por_bloque).
+    """
+    medias = medias_por_bloque(respuestas, bloques_por_nombre)
+    if medias is None:
+        return None
+    return ">".join(nombre for nombre, _ in medias[:top]) + f"|{nivel(medias[0][1])}"
+
+
+def huella(*partes) -> str:
+    return hashlib.sha256("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+
+
+class CacheExplicaciones:
+    def __init__(self, nombre: str, ttl_s: int = TTL_DEFAULT, max_memoria: int = MAX_MEMORIA_DEFAULT,
+                 max_filas: int = MAX_FILAS_DEFAULT, persistente: bool = True):
+        self.nombre = nombre
+        self.ttl_s = ttl_s
+        self.max_memoria = max_memoria
+        self.max_filas = max_filas
+        self.persistente = persistente
+        self._memoria = OrderedDict()  # clave -> (texto, vence_monotonic)
+        self._lock = threading.Lock()
+        self._escrituras = 0
+        self.hits_memoria = 0
+        self.hits_bd = 0
+        self.misses = 0
+        self.desalojos_memoria = 0
+        self.errores_bd = 0
+
+    def clave(self, contexto: str, objetivo: str, perfil: str) -> str:
+        return huella(self.nombre, contexto, objetivo, perfil)
+
+    # ---------- memoria ----------
+    def _de_memoria(self, clave):
+        with self._lock:
+            item = self._memoria.get(clave)
+            if item is None:
+                return None
+            texto, vence = item
+            if time.monotonic() >= vence:
+                del self._memoria[clave]
+                return None
+            self._memoria.move_to_end(clave)
+            return texto
+
+    def _a_memoria(self, clave, texto, restante_s):
+        if self.max_memoria <= 0:
+            return
+        with self._lock:
+            self._memoria[clave] = (texto, time.monotonic() + restante_s)
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.max_memoria:
+                self._memoria.popitem(last=False)
+                self.desalojos_memoria += 1
+
+    # ---------- tabla ----------
+    def _de_bd(self, clave):
+        from ali_ia.models import ExplicacionCacheada
+
+        ahora = timezone.now()
+        fila = (ExplicacionCacheada.objects
+                .filter(clave=clave, creada__gte=ahora - timedelta(seconds=self.ttl_s))
+                .values_list("texto", "creada").first())
+        if fila is None:
+            return None, 0
+        ExplicacionCacheada.objects.filter(clave=clave).update(usos=F("usos") + 1, ultimo_uso=ahora)
+        texto, creada = fila
+        return texto, self.ttl_s - (ahora - creada).total_seconds()
+
+    def _a_bd(self, clave, objetivo, perfil, texto, pregenerada=False):
+        from ali_ia.models import ExplicacionCacheada
+
+        ahora = timezone.now()
+        ExplicacionCacheada.objects.update_or_create(
+            clave=clave,
+            defaults={"modelo": self.nombre, "objetivo": objetivo[:120], "perfil": perfil[:200],
+                      "texto": texto, "creada": ahora, "ultimo_uso": ahora, "pregenerada": pregenerada,
+                      "pregenerada_en": ahora if pregenerada else None},
+        )
+        with self._lock:
+            self._escrituras += 1
+            podar = self._escrituras % PODA_CADA == 0
+        if podar:
+            self.podar()
+
+    def podar(self) -> int:
+        """Borra filas vencidas y, si sobran, las de uso más antiguo. Devuelve cuántas borró."""
+        from ali_ia.models import ExplicacionCacheada
+
+        qs = ExplicacionCacheada.objects.filter(modelo=self.nombre)
+        borradas, _ = qs.filter(creada__lt=timezone.now() - timedelta(seconds=self.ttl_s)).delete()
+        sobran = qs.count() - self.max_filas
+        if sobran > 0:
+            ids = list(qs.filter(pregenerada=False).order_by("ultimo_uso").values_list("id", flat=True)[:sobran])
+            borradas += ExplicacionCacheada.objects.filter(id__in=ids).delete()[0]
+        return borradas
+
+    # ---------- API ----------
+    def obtener(self, contexto: str, objetivo: str, perfil: str):
+        clave = self.clave(contexto, objetivo, perfil)
+        texto = self._de_memoria(clave)
+        if texto is not None:
+            with self._lock:
+                self.hits_memoria += 1
+            return texto
+        if self.persistente:
+            try:
+                texto, restante = self._de_bd(clave)
+            except DatabaseError as e:
+                texto = None
+                with self._lock:
+                    self.errores_bd += 1
+                logger.warning("Cache de explicaciones '%s': error leyendo la tabla: %s", self.nombre, e)
+            if texto is not None:
+                self._a_memoria(clave, texto, restante)
+                with self._lock:
+                    self.hits_bd += 1
+                return texto
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def guardar(self, contexto: str, objetivo: str, perfil: str, texto: str, pregenerada: bool = False):
+        clave = self.clave(contexto, objetivo, perfil)
+        self._a_memoria(clave, texto, self.ttl_s)
+        if self.persistente:
+            try:
+                self._a_bd(clave, objetivo, perfil, texto, pregenerada)
+            except DatabaseError as e:
+                with self._lock:
+                    self.errores_bd += 1
+                logger.warning("Cache de explicaciones '%s': error escribiendo la tabla: %s", self.nombre, e)
+
+    def obtener_o_generar(self, contexto: str, objetivo: str, perfil, generar):
+        """Devuelve la explicación cacheada o llama `generar()` y la guarda. Sin perfil no cachea."""
+        if perfil is None:
+            return generar()
+        texto = self.obtener(contexto, objetivo, perfil)
+        if texto is None:
+            texto = generar()  # si falla (GroqError) no se guarda nada
+            self.guardar(contexto, objetivo, perfil, texto)
+        return texto
+
+    def obtener_o_transmitir(self, contexto: str, objetivo: str, perfil, transmitir):
+        """
+        Versión en stream de obtener_o_generar: si está cacheada entrega el texto en un
+        solo fragmento; si no, reenvía los fragmentos de `transmitir()` y al terminar
+        guarda el texto completo (un stream cortado no se guarda).
+        """
+        texto = self.obtener(contexto, objetivo, perfil) if perfil is not None else None
+        if texto is not None:
+            yield texto
+            return
+        partes = []
+        for fragmento in transmitir():
+            partes.append(fragmento)
+            yield fragmento
+        if perfil is not None:
+            self.guardar(contexto, objetivo, perfil, "".join(partes).strip())
+
+    # ---------- API asíncrona (modo ASGI): la tabla se consulta en un hilo ----------
+    async def aobtener_o_generar(self, contexto: str, objetivo: str, perfil, agenerar):
+        if perfil is None:
+            return await agenerar()
+        texto = await sync_to_async(self.obtener)(contexto, objetivo, perfil)
+        if texto is None:
+            texto = await agenerar()
+            await sync_to_async(self.guardar)(contexto, objetivo, perfil, texto)
+        return texto
+
+    async def aobtener_o_transmitir(self, contexto: str, objetivo: str, perfil, atransmitir):
+        texto = None
+        if perfil is not None:
+            texto = await sync_to_async(self.obtener)(contexto, objetivo, perfil)
+        if texto is not None:
+            yield texto
+            return
+        partes = []
+        async for fragmento in atransmitir():
+            partes.append(fragmento)
+            yield fragmento
+        if perfil is not None:
+            await sync_to_async(self.guardar)(contexto, objetivo, perfil, "".join(partes).strip())
+
+    def limpiar_memoria(self):
+        with self._lock:
+            self._memoria.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.hits_memoria + self.hits_bd + self.misses
+            return {
+                "nombre": self.nombre,
+                "hits_memoria": self.hits_memoria,
+                "hits_bd": self.hits_bd,
+                "misses": self.misses,
+                "hit_rate": round((self.hits_memoria + self.hits_bd) / consultas, 4) if consultas else 0.0,
+                "items_memoria": len(self._memoria),
+                "desalojos_memoria": self.desalojos_memoria,
+                "errores_bd": self.errores_bd,
+            }
@@ -0,0 +1,180 @@
+# ali_ia/cache_predicciones.py
+# -*- coding: utf-8 -*-
+"""
+Memoización de predicciones para los modelos de 9° y 10/11.
+
+Muchos estudiantes envían hojas idénticas (todo "Me encanta", patrones repetidos
+del mismo salón). La clave es la hoja empaquetada a 2 bits por respuesta
+(57/60 respuestas -> 15 bytes) más la huella de los artefactos del modelo, así
+que un modelo nuevo nunca sirve probabilidades del anterior.
+
+Capas:
+  - LRU local acotada (por proceso), con contadores hit/miss/eviction.
+  - Opcional: un cache de Django compartido (p. ej. Redis) para que todos los
+    workers de gunicorn se beneficien. Se activa con ALI_CACHE_PREDICCIONES_ALIAS.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAX_ITEMS_DEFAULT = int(os.environ.get("ALI_CACHE_PREDICCIONES_MAX", "4096"))
+ALIAS_COMPARTIDO = os.environ.get("ALI_CACHE_PREDICCIONES_ALIAS", "")
+TTL_COMPARTIDO = int(os.environ.get("ALI_CACHE_PREDICCIONES_TTL", str(7 * 24 * 3600)))
+
+
+def empaquetar_respuestas(codigos) -> bytes:
+    """Codigos uint8 3/2/1 -> bytes con 4 respuestas por byte (2 bits cada una)."""
+    a = np.asarray(codigos, dtype=np.uint8) & 0b11
+    resto = (-a.size) % 4
+    if resto:
+        a = np.concatenate([a, np.zeros(resto, dtype=np.uint8)])
+    a = a.reshape(-1, 4)
+    return (a[:, 0] | (a[:, 1] << 2) | (a[:, 2] << 4) | (a[:, 3] << 6)).astype(np.uint8).tobytes()
+
+
+def huella_artefactos(*rutas) -> str:
+    """sha1 (12 hex) del contenido de los artefactos; cambia si cambia cualquiera."""
+    h = hashlib.sha1()
+    for ruta in rutas:
+        h.update(os.path.basename(ruta).encode("utf-8"))
+        try:
+            with open(ruta, "rb") as f:
+                for bloque in iter(lambda: f.read(1 << 20), b""):
+                    h.update(bloque)
+        except OSError:
+            h.update(b"<ausente>")
+    return h.hexdigest()[:12]
+
+
+class CachePredicciones:
+    """LRU de vectores de probabilidad, indexada por (versión del modelo, hoja empaquetada)."""
+
+    def __init__(self, nombre: str, max_items: int = MAX_ITEMS_DEFAULT,
+                 alias_compartido: str = ALIAS_COMPARTIDO, ttl_compartido: int = TTL_COMPARTIDO):
+        self.nombre = nombre
+        self.max_items = int(max_items)
+        self.alias_compartido = alias_compartido
+        self.ttl_compartido = ttl_compartido
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._compartido = None
+        self.hits = 0
+        self.hits_compartido = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidaciones = 0
+
+    @property
+    def activa(self) -> bool:
+        return self.max_items > 0
+
+    # ---------- capa compartida (Django cache) ----------
+    def _backend(self):
+        if not self.alias_compartido:
+            return None
+        if self._compartido is None:
+            try:
+                from django.core.cache import caches
+                self._compartido = caches[self.alias_compartido]
+            except Exception as e:
+                logger.warning("Cache compartido '%s' no disponible: %s", self.alias_compartido, e)
+                self.alias_compartido = ""
+                return None
+        return self._compartido
+
+    def _clave_compartida(self, clave):
+        version, empaquetada = clave
+        return f"ali:pred:{self.nombre}:{version}:{empaquetada.hex()}"
+
+    # ---------- API ----------
+    def _verificar_version(self, version):
+        # Llamar con el lock tomado: si cambió el modelo, se descarta todo lo local
+        if version != self._version:
+            if self._datos:
+                self.invalidaciones += 1
+            self._datos.clear()
+            self._version = version
+
+    def obtener(self, version, codigos):
+        """Devuelve el vector de probabilidades cacheado o None."""
+        if not self.activa:
+            return None
+        clave = (version, empaquetar_respuestas(codigos))
+        with self._lock:
+            self._verificar_version(version)
+            proba = self._datos.get(clave)
+            if proba is not None:
+                self._datos.move_to_end(clave)
+                self.hits += 1
+                return proba
+
+        backend = self._backend()
+        if backend is not None:
+            try:
+                crudo = backend.get(self._clave_compartida(clave))
+            except Exception as e:
+                logger.warning("Error leyendo cache compartido: %s", e)
+                crudo = None
+            if crudo is not None:
+                proba = np.frombuffer(crudo, dtype=np.float64)
+                with self._lock:
+                    self.hits_compartido += 1
+                    self._insertar(clave, proba)
+                return proba
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def guardar(self, version, codigos, proba):
+        if not self.activa:
+            return
+        clave = (version, empaquetar_respuestas(codigos))
+        proba = np.array(proba, dtype=np.float64)
+        proba.setflags(write=False)
+        with self._lock:
+            self._verificar_version(version)
+            self._insertar(clave, proba)
+
+        backend = self._backend()
+        if backend is not None:
+            try:
+                backend.set(self._clave_compartida(clave), proba.tobytes(), self.ttl_compartido)
+            except Exception as e:
+                logger.warning("Error escribiendo cache compartido: %s", e)
+
+    def _insertar(self, clave, proba):
+        self._datos[clave] = proba
+        self._datos.move_to_end(clave)
+        while len(self._datos) > self.max_items:
+            self._datos.popitem(last=False)
+            self.evictions += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.hits_compartido + self.misses
+            return {
+                "nombre": self.nombre,
+                "version": self._version,
+                "tamano": len(self._datos),
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "hits_compartido": self.hits_compartido,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidaciones": self.invalidaciones,
+                "hit_rate": round((self.hits + self.hits_compartido) / consultas, 4) if consultas else 0.0,
+                "compartido": self.alias_compartido or None,
+            }
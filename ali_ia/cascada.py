@@ -0,0 +1,152 @@
+# ali_ia/cascada.py
+# -*- coding: utf-8 -*-
+"""
+Cascada opcional (ALI_CASCADA=1) delante del bosque.
+
+Primera etapa: promedio de respuestas (3/2/1) de cada bloque de preguntas
+(suma_<tecnico> / suma_<carrera> dividido por el tamaño del bloque). Si el mejor
+bloque le gana al segundo por al menos ALI_CASCADA_MARGEN puntos, la hoja no es
+ambigua y se responde con esa etapa: la clase del bloque ganador y
+probabilidades softmax de los promedios. Solo las hojas ambiguas van al bosque.
+
+Métricas (estadisticas()):
+- hit_rate: fracción de filas resueltas sin el bosque,
+- ms_ahorrados_est: filas resueltas x costo medio por fila del bosque (medido),
+- concordancia: en una muestra ALI_CASCADA_SOMBRA de las filas resueltas se
+  evalúa también el bosque (modo sombra) y se compara la clase top-1.
+
+Las filas resueltas sin el bosque llevan modelo_version "<versión>+cascada"
+(version_fila): sus probabilidades salen como ProbaCascada, un ndarray marcado
+que sobrevive a micro-lotes y al sidecar.
+
+`manage.py bench_cascada` mide hit rate / concordancia / latencia por margen
+sobre hojas sintéticas, para elegir ALI_CASCADA_MARGEN.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+ACTIVO_DEFAULT = os.environ.get("ALI_CASCADA", "0") == "1"
+MARGEN_DEFAULT = float(os.environ.get("ALI_CASCADA_MARGEN", "1.0"))
+SOMBRA_DEFAULT = float(os.environ.get("ALI_CASCADA_SOMBRA", "0.02"))
+# Escala del softmax de la primera etapa (promedios en 1..3)
+TEMPERATURA = 4.0
+SUFIJO_VERSION = "+cascada"
+
+
+class ProbaCascada(np.ndarray):
+    """Vector de probabilidades respondido por la primera etapa (sin evaluar el bosque)."""
+
+
+def marcar(proba) -> ProbaCascada:
+    return np.asarray(proba).view(ProbaCascada)
+
+
+def version_fila(version: str, proba) -> str:
+    """Versión del modelo de una fila, con SUFIJO_VERSION si la respondió la cascada."""
+    return f"{version}{SUFIJO_VERSION}" if isinstance(proba, ProbaCascada) else version
+
+
+class Cascada:
+    def __init__(self, nombre: str, total_preguntas: int, bloques_por_nombre: dict,
+                 activo: bool = ACTIVO_DEFAULT, margen: float = MARGEN_DEFAULT,
+                 sombra: float = SOMBRA_DEFAULT, seed=None):
+        self.nombre = nombre
+        self.activo = activo
+        self.margen = float(margen)
+        self.sombra = float(sombra)
+        self.nombres_bloques = list(bloques_por_nombre)
+        self.pesos = np.zeros((int(total_preguntas), len(self.nombres_bloques)), dtype=np.float32)
+        for j, qs in enumerate(bloques_por_nombre.values()):
+            for q in qs:
+                self.pesos[int(q) - 1, j] = 1.0 / len(qs)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._mapeo = (None, None)  # (versión, columna de proba de cada bloque o None)
+        self.filas = 0
+        self.resueltas = 0
+        self.sombra_filas = 0
+        self.sombra_coinciden = 0
+        self._bosque_filas = 0
+        self._bosque_segundos = 0.0
+
+    def configurar(self, activo=None, margen=None, sombra=None):
+        if activo is not None:
+            self.activo = bool(activo)
+        if margen is not None:
+            self.margen = float(margen)
+        if sombra is not None:
+            self.sombra = float(sombra)
+
+    def _columnas(self, art):
+        """Columna de predict_proba de cada bloque (por nombre de clase); None si no cuadran."""
+        version, columnas = self._mapeo
+        if version != art.version:
+            idx = {n: i for i, n in enumerate(art.nombres_clases)}
+            columnas = None
+            if all(n in idx for n in self.nombres_bloques):
+                columnas = np.array([idx[n] for n in self.nombres_bloques], dtype=np.intp)
+            self._mapeo = (art.version, columnas)
+        return columnas
+
+    def separar(self, art, A):
+        """
+        A: uint8 (N, total_preguntas). Devuelve (resueltas, probas, sombra):
+          - resueltas: índices de filas que responde la primera etapa,
+          - probas: vector de probabilidades (n_clases) de cada fila resuelta,
+          - sombra: subconjunto de `resueltas` que además debe evaluar el bosque.
+        Si la cascada está apagada o las clases no corresponden a los bloques, no resuelve nada.
+        """
+        vacio = np.empty(0, dtype=np.intp)
+        columnas = self._columnas(art) if self.activo else None
+        if columnas is None or not len(A):
+            return vacio, [], vacio
+
+        medias = np.asarray(A, dtype=np.float32) @ self.pesos
+        orden = np.sort(medias, axis=1)
+        resueltas = np.flatnonzero(orden[:, -1] - orden[:, -2] >= self.margen)
+
+        probas = []
+        if resueltas.size:
+            z = np.exp(TEMPERATURA * (medias[resueltas] - orden[resueltas, -1:]))
+            z /= z.sum(axis=1, keepdims=True)
+            P = np.zeros((resueltas.size, len(art.nombres_clases)), dtype=np.float64)
+            P[:, columnas] = z
+            probas = [marcar(p) for p in P]
+
+        with self._lock:
+            self.filas += len(A)
+            self.resueltas += int(resueltas.size)
+            sombra = resueltas[self._rng.random(resueltas.size) < self.sombra] if self.sombra > 0 else vacio
+        return resueltas, probas, sombra
+
+    def registrar_bosque(self, n_filas: int, segundos: float):
+        """Costo real del bosque (para estimar lo ahorrado por cada fila resuelta)."""
+        with self._lock:
+            self._bosque_filas += n_filas
+            self._bosque_segundos += segundos
+
+    def registrar_sombra(self, proba_cascada, proba_bosque):
+        with self._lock:
+            self.sombra_filas += 1
+            self.sombra_coinciden += int(np.argmax(proba_cascada) == np.argmax(proba_bosque))
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            ms_fila = 1000 * self._bosque_segundos / self._bosque_filas if self._bosque_filas else 0.0
+            return {
+                "nombre": self.nombre,
+                "activo": self.activo,
+                "margen": self.margen,
+                "filas": self.filas,
+                "resueltas": self.resueltas,
+                "hit_rate": round(self.resueltas / self.filas, 4) if self.filas else 0.0,
+                "ms_bosque_por_fila": round(ms_fila, 4),
+                "ms_ahorrados_est": round(self.resueltas * ms_fila, 1),
+                "sombra_filas": self.sombra_filas,
+                "concordancia": (round(self.sombra_coinciden / self.sombra_filas, 4)
+                                 if self.sombra_filas else None),
+            }
+
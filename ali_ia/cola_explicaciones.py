@@ -0,0 +1,186 @@
+# ali_ia/cola_explicaciones.py
+# -*- coding: utf-8 -*-
+"""
+Cola de explicaciones en la base de datos (sin broker).
+
+Al finalizar un test, la vista guarda la predicción de inmediato con
+`explicacion_estado=PENDIENTE` y el texto TEXTO_PENDIENTE en lugar de la
+explicación; `manage.py procesar_explicaciones` (proceso `worker` del Procfile)
+toma los pendientes, llama a Groq fuera del request y completa `resultado`.
+
+La fila del test es la tarea:
+- PENDIENTE:  en cola; `explicacion_proximo_intento` = desde cuándo puede tomarse,
+- PROCESANDO: tomada por un worker hasta `explicacion_proximo_intento`
+              (si el worker muere, otro la retoma al vencer ese plazo),
+- LISTA:      explicación guardada,
+- ERROR:      se agotaron los intentos; `resultado` lleva la explicación local
+              (ali_ia.explicacion_local) o, si tampoco se pudo, TEXTO_FALLBACK
+              (el circuito abierto y la falta de cupo en Groq no gastan intentos),
+- "" (vacío): sin cola (tests anteriores o ALI_EXPLICACIONES=sincrona).
+
+En Postgres varios workers se reparten filas con SELECT ... FOR UPDATE SKIP LOCKED.
+ALI_EXPLICACIONES=sincrona vuelve al comportamiento anterior (Groq dentro del request).
+"""
+
+import logging
+import os
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from ali_ia.admision_groq import es_saturacion
+from ali_ia.groq_client import GROQ, CircuitoAbierto
+
+logger = logging.getLogger(__name__)
+
+EN_COLA = os.environ.get("ALI_EXPLICACIONES", "cola") != "sincrona"
+MAX_INTENTOS = int(os.environ.get("ALI_EXPLICACIONES_INTENTOS", "3"))
+PLAZO_S = 120       # tiempo que un worker retiene una tarea tomada
+ESPERA_BASE_S = 15  # reintentos: 15 s, 30 s, 60 s, ...
+
+PENDIENTE = "PENDIENTE"
+PROCESANDO = "PROCESANDO"
+LISTA = "LISTA"
+ERROR = "ERROR"
+ESTADOS = [
+    (PENDIENTE, "Pendiente"),
+    (PROCESANDO, "Procesando"),
+    (LISTA, "Lista"),
+    (ERROR, "Error"),
+]
+
+SEPARADOR = "Explicación: "
+TEXTO_PENDIENTE = "Estamos preparando tu explicación; vuelve a consultar en unos segundos."
+TEXTO_FALLBACK = "No fue posible generar la explicación automática en este momento."
+
+CAMPOS = ["explicacion_estado", "explicacion_intentos", "explicacion_proximo_intento"]
+
+
+def reemplazar_explicacion(resultado: str, explicacion: str) -> str:
+    """Cambia la parte 'Explicación: ...' de `resultado` (lo demás queda igual)."""
+    resultado = resultado or ""
+    if SEPARADOR in resultado:
+        return resultado.split(SEPARADOR, 1)[0] + SEPARADOR + explicacion
+    return f"{resultado}\n\n{SEPARADOR}{explicacion}" if resultado else f"{SEPARADOR}{explicacion}"
+
+
+def extraer_explicacion(resultado):
+    if resultado and SEPARADOR in resultado:
+        return resultado.split(SEPARADOR, 1)[1]
+    return None
+
+
+def espera_reintento(intentos: int) -> float:
+    return ESPERA_BASE_S * 2 ** max(0, intentos - 1)
+
+
+def tomar(Modelo, lote: int, plazo_s: float = PLAZO_S) -> list:
+    """Marca hasta `lote` tests como PROCESANDO (con plazo) y los devuelve."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        tests = list(
+            Modelo.objects.select_for_update(skip_locked=True)
+            .filter(explicacion_estado__in=[PENDIENTE, PROCESANDO])
+            .filter(Q(explicacion_proximo_intento__isnull=True) | Q(explicacion_proximo_intento__lte=ahora))
+            .order_by("id")[:lote]
+        )
+        for t in tests:
+            t.explicacion_estado = PROCESANDO
+            t.explicacion_intentos += 1
+            t.explicacion_proximo_intento = ahora + timedelta(seconds=plazo_s)
+        if tests:
+            Modelo.objects.bulk_update(tests, CAMPOS)
+    return tests
+
+
+def tomar_uno(Modelo, pk, plazo_s: float = PLAZO_S):
+    """
+    Toma un test concreto (el que pide el endpoint SSE) si está PENDIENTE, aunque
+    esté esperando un reintento, o si venció el plazo de quien lo tenía. None si no.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        t = (Modelo.objects.select_for_update(skip_locked=True)
+             .filter(pk=pk)
+             .filter(Q(explicacion_estado=PENDIENTE)
+                     | Q(explicacion_estado=PROCESANDO, explicacion_proximo_intento__lte=ahora))
+             .first())
+        if t is None:
+            return None
+        t.explicacion_estado = PROCESANDO
+        t.explicacion_intentos += 1
+        t.explicacion_proximo_intento = ahora + timedelta(seconds=plazo_s)
+        t.save(update_fields=CAMPOS)
+    return t
+
+
+def completar(Modelo, pk, explicacion: str, estado: str = LISTA) -> bool:
+    """Guarda la explicación. False si la tarea ya no es de este worker (p. ej. se venció el plazo)."""
+    with transaction.atomic():
+        t = Modelo.objects.select_for_update().get(pk=pk)
+        if t.explicacion_estado != PROCESANDO:
+            return False
+        t.resultado = reemplazar_explicacion(t.resultado, explicacion)
+        t.explicacion_estado = estado
+        t.explicacion_proximo_intento = None
+        t.save(update_fields=["resultado"] + CAMPOS)
+    return True
+
+
+def texto_respaldo(test, respaldo=None) -> str:
+    """Explicación final cuando Groq no la dio: `respaldo(test)` (la local) o TEXTO_FALLBACK."""
+    if respaldo is not None:
+        try:
+            return respaldo(test)
+        except Exception as e:
+            logger.warning("%s %s: sin explicación local de respaldo: %s", type(test).__name__, test.pk, e)
+    return TEXTO_FALLBACK
+
+
+def reintentar_o_fallar(Modelo, pk, max_intentos: int = MAX_INTENTOS, respaldo=None) -> str:
+    """
+    Tras un fallo: vuelve a PENDIENTE con espera exponencial, o ERROR si ya no quedan
+    intentos (guarda texto_respaldo(test, respaldo)).
+    """
+    with transaction.atomic():
+        t = Modelo.objects.select_for_update().get(pk=pk)
+        if t.explicacion_estado != PROCESANDO:
+            return t.explicacion_estado
+        if t.explicacion_intentos >= max_intentos:
+            t.resultado = reemplazar_explicacion(t.resultado, texto_respaldo(t, respaldo))
+            t.explicacion_estado = ERROR
+            t.explicacion_proximo_intento = None
+            t.save(update_fields=["resultado"] + CAMPOS)
+        else:
+            t.explicacion_estado = PENDIENTE
+            t.explicacion_proximo_intento = timezone.now() + timedelta(seconds=espera_reintento(t.explicacion_intentos))
+            t.save(update_fields=CAMPOS)
+        return t.explicacion_estado
+
+
+def devolver(Modelo, pk, espera_s: float) -> str:
+    """Vuelve a PENDIENTE sin gastar el intento (p. ej. circuito de Groq abierto)."""
+    with transaction.atomic():
+        t = Modelo.objects.select_for_update().get(pk=pk)
+        if t.explicacion_estado == PROCESANDO:
+            t.explicacion_estado = PENDIENTE
+            t.explicacion_intentos = max(0, t.explicacion_intentos - 1)
+            t.explicacion_proximo_intento = timezone.now() + timedelta(seconds=espera_s)
+            t.save(update_fields=CAMPOS)
+        return t.explicacion_estado
+
+
+def procesar_uno(Modelo, test, explicar, max_intentos: int = MAX_INTENTOS, respaldo=None) -> str:
+    """Genera y guarda la explicación de un test tomado. Devuelve el estado final."""
+    try:
+        texto = explicar(test)
+    except Exception as e:
+        if isinstance(e, CircuitoAbierto) or es_saturacion(e):
+            # Groq caído o sin cupo (SinCupo / 429): vuelve a la cola sin gastar el intento
+            return devolver(Modelo, test.pk, GROQ.enfriamiento_s)
+        logger.warning("%s %s: fallo generando la explicación (intento %s): %s",
+                       Modelo.__name__, test.pk, test.explicacion_intentos, e)
+        return reintentar_o_fallar(Modelo, test.pk, max_intentos, respaldo)
+    return LISTA if completar(Modelo, test.pk, texto) else "DESCARTADA"
@@ -0,0 +1,151 @@
+# ali_ia/destilado.py
+# -*- coding: utf-8 -*-
+"""
+Modelo destilado para el cliente (Flutter): un JSON pequeño que imita al bosque
+usando solo el promedio de respuestas de cada bloque de preguntas.
+
+Sirve para mostrar resultados provisionales sin ir al servidor en cada
+respuesta; el `resultado` oficial lo sigue calculando el bosque en
+_finalizar_y_predecir.
+
+Evaluación en el cliente (igual que `evaluar` abajo):
+  1. x_b = promedio de `valores[respuesta]` de las preguntas respondidas del
+     bloque b (en el orden de `bloques`); `sin_responder` si no hay ninguna.
+  2. tipo "lineal": z_c = sesgo[c] + sum_b pesos[c][b] * x_b ; p = softmax(z)
+     tipo "arbol":   nodo = 0; mientras izquierda[nodo] != -1:
+                       nodo = izquierda[nodo] si x[rasgo[nodo]] <= umbral[nodo] si no derecha[nodo]
+                     p = valor[nodo]
+  3. top-3 = las clases con mayor p.
+
+El JSON incluye `fidelidad`: concordancia con el bosque sobre hojas sintéticas
+(ali_ia/sinteticos.py), completas y con parte de las preguntas sin responder.
+"""
+
+import numpy as np
+
+FORMATO = 1
+TIPOS = ("lineal", "arbol")
+SIN_RESPONDER = 2.0   # promedio neutro de un bloque sin respuestas
+DECIMALES = 6
+VALORES = {"Me encanta": 3, "Me interesa": 2, "No me gusta": 1, "A": 3, "B": 2, "C": 1}
+
+
+def rasgos_bloques(A, bloques) -> np.ndarray:
+    """
+    A: códigos (N, total) con 3/2/1 y 0 = sin responder. `bloques` es la lista de
+    listas de preguntas (1-based). Devuelve (N, n_bloques) con el promedio de lo respondido.
+    """
+    A = np.asarray(A, dtype=np.float64)
+    F = np.full((len(A), len(bloques)), SIN_RESPONDER)
+    for j, qs in enumerate(bloques):
+        sub = A[:, np.asarray(qs) - 1]
+        n = (sub > 0).sum(axis=1)
+        con = n > 0
+        F[con, j] = sub[con].sum(axis=1) / n[con]
+    return F
+
+
+def _redondear(arr):
+    return np.round(np.asarray(arr, dtype=np.float64), DECIMALES).tolist()
+
+
+def destilar(nombre: str, version: str, nombres_clases, bloques_por_nombre: dict, total_preguntas: int,
+             A, P, tipo: str = "lineal", profundidad: int = 5) -> dict:
+    """
+    Ajusta el modelo destilado a las probabilidades P (N, n_clases) del bosque sobre
+    las hojas A. "lineal": regresión logística multinomial con etiquetas suaves (P);
+    "arbol": árbol de regresión poco profundo sobre P (cada hoja guarda el P promedio).
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo desconocido: {tipo}. Opciones: {TIPOS}")
+    from sklearn.linear_model import LogisticRegression  # solo al exportar
+    from sklearn.tree import DecisionTreeRegressor
+
+    bloques = list(bloques_por_nombre.values())
+    F = rasgos_bloques(A, bloques)
+    P = np.asarray(P, dtype=np.float64)
+    modelo = {
+        "formato": FORMATO,
+        "tipo": tipo,
+        "modelo": nombre,
+        "version_modelo": version,
+        "total_preguntas": int(total_preguntas),
+        "valores": VALORES,
+        "sin_responder": SIN_RESPONDER,
+        "bloques": [{"nombre": n, "preguntas": [int(q) for q in qs]} for n, qs in bloques_por_nombre.items()],
+        "clases": [str(c) for c in nombres_clases],
+    }
+
+    if tipo == "lineal":
+        # Etiquetas suaves: cada hoja aparece una vez por clase con peso P[i, c]
+        # (entropía cruzada contra las probabilidades del bosque, no solo su top-1)
+        n, k = P.shape
+        reg = LogisticRegression(max_iter=2000).fit(
+            np.repeat(F, k, axis=0), np.tile(np.arange(k), n), sample_weight=P.ravel()
+        )
+        pesos = np.zeros((k, F.shape[1]))
+        sesgo = np.full(k, -30.0)  # clases sin probabilidad en ninguna hoja
+        pesos[reg.classes_], sesgo[reg.classes_] = reg.coef_, reg.intercept_
+        modelo["lineal"] = {"pesos": _redondear(pesos), "sesgo": _redondear(sesgo)}
+    else:
+        arbol = DecisionTreeRegressor(max_depth=profundidad, min_samples_leaf=20, random_state=0).fit(F, P)
+        t = arbol.tree_
+        hoja = t.children_left == -1
+        modelo["arbol"] = {
+            "izquierda": t.children_left.tolist(),
+            "derecha": t.children_right.tolist(),
+            "rasgo": np.where(hoja, -1, t.feature).tolist(),
+            "umbral": _redondear(np.where(hoja, 0.0, t.threshold)),
+            "valor": _redondear(t.value[:, :, 0]),
+        }
+    return modelo
+
+
+def evaluar(modelo: dict, A) -> np.ndarray:
+    """Evalúa el JSON destilado (ya redondeado) igual que el cliente. Devuelve (N, n_clases)."""
+    F = rasgos_bloques(A, [b["preguntas"] for b in modelo["bloques"]])
+    if modelo["tipo"] == "lineal":
+        z = F @ np.asarray(modelo["lineal"]["pesos"]).T + np.asarray(modelo["lineal"]["sesgo"])
+        z = np.exp(z - z.max(axis=1, keepdims=True))
+        return z / z.sum(axis=1, keepdims=True)
+
+    a = modelo["arbol"]
+    izq, der = np.asarray(a["izquierda"]), np.asarray(a["derecha"])
+    rasgo, umbral, valor = np.asarray(a["rasgo"]), np.asarray(a["umbral"]), np.asarray(a["valor"])
+    nodo = np.zeros(len(F), dtype=np.intp)
+    filas = np.arange(len(F))
+    while True:
+        activos = izq[nodo] != -1
+        if not activos.any():
+            return valor[nodo]
+        f = filas[activos]
+        n = nodo[activos]
+        nodo[activos] = np.where(F[f, rasgo[n]] <= umbral[n], izq[n], der[n])
+
+
+def fidelidad(modelo: dict, A, P, A_parcial=None) -> dict:
+    """
+    Compara el destilado con el bosque (P sobre las hojas completas A):
+    concordancia top-1, top-1 del bosque dentro del top-3 destilado, solapamiento
+    de top-3 y error absoluto medio de las probabilidades. Con A_parcial (las mismas
+    hojas con preguntas en 0 = sin responder) mide qué tan bien anticipa el resultado final.
+    """
+    P = np.asarray(P)
+    top_bosque = P.argmax(axis=1)
+    top3_bosque = np.argsort(-P, axis=1)[:, :3]
+
+    def _comparar(Q):
+        top3 = np.argsort(-Q, axis=1)[:, :3]
+        solape = [len(set(a) & set(b)) / 3 for a, b in zip(top3.tolist(), top3_bosque.tolist())]
+        return {
+            "concordancia_top1": round(float((top3[:, 0] == top_bosque).mean()), 4),
+            "top1_en_top3": round(float((top3 == top_bosque[:, None]).any(axis=1).mean()), 4),
+            "solape_top3": round(float(np.mean(solape)), 4),
+            "error_abs_medio": round(float(np.abs(Q - P).mean()), 5),
+        }
+
+    reporte = {"filas": int(len(P)), "completas": _comparar(evaluar(modelo, A))}
+    if A_parcial is not None:
+        respondidas = float((np.asarray(A_parcial) > 0).mean())
+        reporte["parciales"] = {"prop_respondidas": round(respondidas, 3), **_comparar(evaluar(modelo, A_parcial))}
+    return reporte
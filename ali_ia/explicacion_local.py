@@ -0,0 +1,113 @@
+# ali_ia/explicacion_local.py
+# -*- coding: utf-8 -*-
+"""
+Explicaciones locales: plantillas deterministas, sin red.
+
+Arma el mismo formato que se le pide a Groq ("Por qué te lo sugerimos / Qué
+aprenderás / Siguientes pasos") con el técnico o la carrera predicha, el interés
+promedio por bloque del test (ali_ia.prompts.medias_por_bloque) y el texto de
+cada app (perfil de egresado en 9°, enfoque de la carrera en 10/11). Tarda
+microsegundos, así que:
+
+- ALI_EXPLICACIONES_MOTOR=local la usa como motor principal: los groq_service no
+  llaman a Groq y la finalización guarda la explicación en el mismo request
+  (también con ALI_EXPLICACIONES=cola).
+- Con el motor groq (default) es el respaldo: en lugar de TEXTO_FALLBACK se guarda
+  esta explicación cuando Groq falla, no hay cupo o tarda más de
+  ALI_EXPLICACION_PLAZO_S en la finalización síncrona, o cuando el worker agota
+  los intentos.
+
+En el worker y el SSE la falta de cupo en Groq (SinCupo / 429) deja la explicación
+en la cola sin gastar intentos: ahí todavía se espera el texto de Groq. Tiempos y usos por motivo: METRICAS_LOCAL.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from ali_ia.metricas import resumen
+from ali_ia.prompts import medias_por_bloque, nivel
+
+MOTOR = os.environ.get("ALI_EXPLICACIONES_MOTOR", "groq")
+LOCAL = MOTOR == "local"
+# Finalización síncrona: plazo total (cupo + intentos + esperas entre intentos) antes de
+# caer a la explicación local; el cache y la plantilla suman milisegundos
+PLAZO_S = float(os.environ.get("ALI_EXPLICACION_PLAZO_S", "8"))
+
+PRINCIPAL = "principal"  # motor local elegido
+RESPALDO = "respaldo"    # Groq falló o tardó demasiado
+
+
+def _lista(nombres) -> str:
+    return nombres[0] if len(nombres) == 1 else ", ".join(nombres[:-1]) + f" y {nombres[-1]}"
+
+
+def _por_que(objetivo: str, medias) -> str:
+    if not medias:
+        return (f"tus respuestas se parecen a las de estudiantes a quienes {objetivo} les resultó una buena "
+                f"elección, y el modelo de ALI la ubicó como tu opción más fuerte.")
+    altas = [nombre for nombre, media in medias[:3] if media >= 2.0] or [medias[0][0]]
+    propia = dict(medias).get(objetivo)
+    if medias[0][0] == objetivo:
+        inicio = f"{objetivo} es el área del test que más te atrae"
+    elif propia is not None:
+        inicio = f"mostraste un interés {nivel(propia)} por {objetivo}"
+    else:
+        inicio = f"tu perfil de intereses encaja con {objetivo}"
+    otras = [nombre for nombre in altas if nombre != objetivo]
+    if otras:
+        return f"{inicio}, y también destacan {_lista(otras)}, áreas que se conectan con lo que harías allí."
+    return f"{inicio}; tus respuestas en esa área fueron las más consistentes del test."
+
+
+def redactar(objetivo: str, respuestas, bloques_por_nombre: dict, que_aprenderas: str, siguientes_pasos: str,
+             motivo: str = PRINCIPAL) -> str:
+    """
+    Explicación local para `objetivo` (técnico o carrera). `respuestas` con códigos
+    3/2/1 por pregunta; si no lo son, se redacta sin mencionar áreas.
+    """
+    t0 = time.perf_counter()
+    medias = medias_por_bloque(respuestas, bloques_por_nombre) if isinstance(respuestas, dict) else None
+    pasos = siguientes_pasos
+    segunda = next((nombre for nombre, media in (medias or [])[:2] if nombre != objetivo and media >= 2.0), None)
+    if segunda:
+        pasos += f" Si también te llama {segunda}, compárala con {objetivo} antes de decidir."
+    texto = (
+        f"Por qué te lo sugerimos: {_por_que(objetivo, medias)}\n"
+        f"Qué aprenderás: {que_aprenderas}\n"
+        f"Siguientes pasos: {pasos}"
+    )
+    METRICAS_LOCAL.registrar(motivo, time.perf_counter() - t0)
+    return texto
+
+
+class MetricasLocal:
+    """Explicaciones locales generadas por motivo y su tiempo (ventana acotada)."""
+
+    def __init__(self, ventana: int = 2000):
+        self._tiempos = deque(maxlen=ventana)
+        self._usos = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, motivo: str, segundos: float):
+        with self._lock:
+            self._tiempos.append(segundos)
+            self._usos[motivo] = self._usos.get(motivo, 0) + 1
+
+    def reiniciar(self):
+        with self._lock:
+            self._tiempos.clear()
+            self._usos.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "motor": MOTOR,
+                "usos": dict(self._usos),
+                **resumen(self._tiempos, escala=1e6, unidad="us", maximo=True),
+            }
+
+
+# Instancia compartida por los groq_service de 9° y 10/11
+METRICAS_LOCAL = MetricasLocal()
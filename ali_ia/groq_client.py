@@ -0,0 +1,496 @@
+# ali_ia/groq_client.py
+# -*- coding: utf-8 -*-
+"""
+Cliente HTTP compartido para Groq (chat completions, API compatible con OpenAI).
+
+- requests.Session persistente por proceso (keep-alive + pool de conexiones);
+  se recrea después de un fork (gunicorn preload / pool de procesos).
+- Reintentos acotados con espera exponencial y jitter ante 429/5xx, timeouts y
+  errores de conexión (respeta Retry-After, con tope).
+- Circuit breaker: tras ALI_GROQ_UMBRAL_FALLOS llamadas fallidas seguidas, las
+  siguientes fallan de inmediato (CircuitoAbierto) durante ALI_GROQ_ENFRIAMIENTO_S;
+  luego deja pasar una llamada de prueba y, si responde, se vuelve a cerrar.
+- Métricas por llamada (latencia p50/p95/p99, reintentos, códigos HTTP): estadisticas().
+- completar_stream(): `stream=true`, entrega los fragmentos de texto según llegan
+  (SSE de Groq) y mide el tiempo al primer token (ttft).
+- acompletar() / acompletar_stream(): mismas llamadas con httpx.AsyncClient para el
+  modo ASGI (un proceso con muchas llamadas en vuelo). Comparten circuit breaker y
+  métricas con las síncronas; httpx solo se importa al usarlas.
+
+`limite` (instante de time.monotonic(), ver plazo_a_limite) acota la llamada entera:
+el timeout de cada intento se recorta a lo que queda y no se reintenta si la
+espera ya no cabe. La usa la finalización síncrona (ALI_EXPLICACION_PLAZO_S).
+
+ALI_GROQ_URL permite apuntar a un servidor local (pruebas, stub de carga).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ali_ia.metricas import resumen
+
+logger = logging.getLogger(__name__)
+
+URL_DEFAULT = os.environ.get("ALI_GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+REINTENTOS_DEFAULT = int(os.environ.get("ALI_GROQ_REINTENTOS", "2"))
+TIMEOUT_DEFAULT = float(os.environ.get("ALI_GROQ_TIMEOUT", "30"))
+TIMEOUT_CONEXION = 3.05
+UMBRAL_FALLOS_DEFAULT = int(os.environ.get("ALI_GROQ_UMBRAL_FALLOS", "5"))
+ENFRIAMIENTO_DEFAULT = float(os.environ.get("ALI_GROQ_ENFRIAMIENTO_S", "30"))
+POOL_DEFAULT = int(os.environ.get("ALI_GROQ_POOL", "10"))
+POOL_ASYNC_DEFAULT = int(os.environ.get("ALI_GROQ_POOL_ASYNC", "100"))
+
+REINTENTABLES = {429, 500, 502, 503, 504}
+CERRADO, ABIERTO, SEMIABIERTO = "cerrado", "abierto", "semiabierto"
+
+
+def plazo_a_limite(plazo_s):
+    """Segundos desde ahora -> instante límite en time.monotonic() (None: sin plazo)."""
+    return time.monotonic() + plazo_s if plazo_s else None
+
+
+class GroqError(Exception):
+    """La llamada a Groq no produjo una respuesta utilizable."""
+
+    def __init__(self, mensaje, status=None):
+        super().__init__(mensaje)
+        self.status = status
+
+
+class CircuitoAbierto(GroqError):
+    """Groq falló repetidamente; no se intenta la llamada hasta que pase el enfriamiento."""
+
+
+FIN_STREAM = object()
+
+
+def _fragmento_sse(linea):
+    """Línea del stream de Groq -> texto del fragmento, FIN_STREAM o None (línea sin contenido)."""
+    if not linea or not linea.startswith("data:"):
+        return None  # líneas vacías / comentarios keep-alive del SSE
+    dato = linea[len("data:"):].strip()
+    if dato == "[DONE]":
+        return FIN_STREAM
+    try:
+        return json.loads(dato)["choices"][0].get("delta", {}).get("content") or None
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+        raise GroqError("Fragmento del stream de Groq no válido.")
+
+
+class ClienteGroq:
+    def __init__(self, url: str = URL_DEFAULT, api_key=None, timeout: float = TIMEOUT_DEFAULT,
+                 reintentos: int = REINTENTOS_DEFAULT, espera_base: float = 0.5, espera_max: float = 8.0,
+                 umbral_fallos: int = UMBRAL_FALLOS_DEFAULT, enfriamiento_s: float = ENFRIAMIENTO_DEFAULT,
+                 pool: int = POOL_DEFAULT, pool_async: int = POOL_ASYNC_DEFAULT):
+        self.url = url
+        self._api_key = api_key
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self.espera_base = espera_base
+        self.espera_max = espera_max
+        self.umbral_fallos = umbral_fallos
+        self.enfriamiento_s = enfriamiento_s
+        self.pool = pool
+        self.pool_async = pool_async
+        self._lock = threading.Lock()
+        self._sesion = None
+        self._pid = None
+        self._cliente_async = None
+        self._loop = None
+        # circuit breaker
+        self._estado = CERRADO
+        self._fallos_seguidos = 0
+        self._abierto_hasta = 0.0
+        self._prueba_en_curso = False
+        # métricas
+        self._latencias = deque(maxlen=2000)
+        self._ttft = deque(maxlen=2000)
+        self.llamadas = 0
+        self.exitos = 0
+        self.fallos = 0
+        self.reintentos_hechos = 0
+        self.rechazadas = 0
+        self.por_status = {}
+
+    @property
+    def api_key(self):
+        if self._api_key is None:
+            from django.conf import settings  # solo al llamar: el módulo no exige Django configurado
+            return getattr(settings, "GROQ_API_KEY", "")
+        return self._api_key
+
+    # ---------- sesión ----------
+    def sesion(self) -> requests.Session:
+        pid = os.getpid()
+        with self._lock:
+            if self._sesion is None or self._pid != pid:
+                # Después de un fork los sockets del padre no se comparten: sesión nueva
+                sesion = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool, max_retries=0)
+                sesion.mount("http://", adaptador)
+                sesion.mount("https://", adaptador)
+                self._sesion, self._pid = sesion, pid
+            return self._sesion
+
+    def cliente_async(self):
+        """httpx.AsyncClient del event loop actual (uno por loop: no se comparte entre loops)."""
+        import httpx  # solo en modo ASGI
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._cliente_async is None or self._loop is not loop:
+                limites = httpx.Limits(max_connections=self.pool_async, max_keepalive_connections=self.pool_async)
+                self._cliente_async, self._loop = httpx.AsyncClient(limits=limites), loop
+            return self._cliente_async
+
+    def cerrar(self):
+        with self._lock:
+            if self._sesion is not None:
+                self._sesion.close()
+            self._sesion = None
+
+    async def acerrar(self):
+        with self._lock:
+            cliente, self._cliente_async, self._loop = self._cliente_async, None, None
+        if cliente is not None:
+            await cliente.aclose()
+
+    # ---------- circuit breaker ----------
+    def estado_circuito(self) -> str:
+        with self._lock:
+            if self._estado == ABIERTO and time.monotonic() >= self._abierto_hasta:
+                return SEMIABIERTO
+            return self._estado
+
+    def _permitir(self):
+        with self._lock:
+            if self._estado == CERRADO:
+                return
+            if time.monotonic() < self._abierto_hasta or self._prueba_en_curso:
+                self.rechazadas += 1
+                raise CircuitoAbierto("Groq no disponible (circuito abierto).")
+            # enfriamiento cumplido: una sola llamada de prueba
+            self._estado = SEMIABIERTO
+            self._prueba_en_curso = True
+
+    def _registrar_resultado(self, ok: bool, latencia: float, contar_fallo: bool = True):
+        with self._lock:
+            self._latencias.append(latencia)
+            self._prueba_en_curso = False
+            if ok:
+                self.exitos += 1
+                self._fallos_seguidos = 0
+                self._estado = CERRADO
+                return
+            self.fallos += 1
+            if not contar_fallo:
+                return
+            self._fallos_seguidos += 1
+            if self._estado == SEMIABIERTO or self._fallos_seguidos >= self.umbral_fallos:
+                if self._estado != ABIERTO:
+                    logger.warning("Groq: circuito abierto tras %s fallos seguidos", self._fallos_seguidos)
+                self._estado = ABIERTO
+                self._abierto_hasta = time.monotonic() + self.enfriamiento_s
+
+    # ---------- llamadas ----------
+    def _espera(self, intento: int, respuesta=None) -> float:
+        if respuesta is not None:
+            retry_after = respuesta.headers.get("Retry-After")
+            try:
+                if retry_after is not None:
+                    return min(float(retry_after), self.espera_max)
+            except ValueError:
+                pass
+        # full jitter: uniforme entre 0 y la espera exponencial
+        return random.uniform(0, min(self.espera_max, self.espera_base * 2 ** intento))
+
+    def _timeout_intento(self, timeout, limite):
+        """Timeout del intento recortado al plazo total; None si el plazo ya venció."""
+        timeout = timeout or self.timeout
+        if limite is None:
+            return timeout
+        restante = limite - time.monotonic()
+        return min(timeout, restante) if restante > 0 else None
+
+    def _cabe_espera(self, espera: float, limite) -> bool:
+        return limite is None or time.monotonic() + espera < limite
+
+    def chat(self, payload: dict, timeout=None, limite=None) -> dict:
+        """POST del payload; devuelve el JSON de la respuesta o lanza GroqError / CircuitoAbierto."""
+        self._permitir()
+        t0 = time.perf_counter()
+        with self._lock:
+            self.llamadas += 1
+        try:
+            datos, error = self._intentar(payload, timeout, limite=limite)
+        except BaseException:
+            # 4xx del cliente (clave, payload) u otro error local: no indica caída de Groq
+            self._registrar_resultado(False, time.perf_counter() - t0, contar_fallo=False)
+            raise
+        if error is None:
+            self._registrar_resultado(True, time.perf_counter() - t0)
+            return datos
+        self._registrar_resultado(False, time.perf_counter() - t0)
+        logger.warning("Groq: llamada fallida tras %s intentos: %s", self.reintentos + 1, error)
+        raise error
+
+    def _intentar(self, payload, timeout, stream=False, limite=None):
+        """
+        (datos, None) si responde; (None, último error) si se agotan los reintentos o el plazo.
+        Con stream=True `datos` es la respuesta HTTP abierta (el cuerpo aún no se leyó).
+        """
+        cabeceras = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        error = None
+        for intento in range(self.reintentos + 1):
+            respuesta = None
+            lectura = self._timeout_intento(timeout, limite)
+            if lectura is None:
+                return None, error or GroqError("Se agotó el plazo para la llamada a Groq.")
+            try:
+                respuesta = self.sesion().post(self.url, headers=cabeceras, json=payload, stream=stream,
+                                               timeout=(min(TIMEOUT_CONEXION, lectura), lectura))
+            except requests.RequestException as e:
+                error = GroqError(f"Error al conectar con Groq: {e}")
+            else:
+                with self._lock:
+                    self.por_status[respuesta.status_code] = self.por_status.get(respuesta.status_code, 0) + 1
+                if respuesta.status_code == 200 and stream:
+                    return respuesta, None
+                if respuesta.status_code == 200:
+                    try:
+                        return respuesta.json(), None
+                    except ValueError:
+                        error = GroqError("Respuesta de Groq no es JSON.", respuesta.status_code)
+                else:
+                    error = GroqError(f"Groq respondió {respuesta.status_code}: {respuesta.text[:300]}",
+                                      respuesta.status_code)
+                    if respuesta.status_code not in REINTENTABLES:
+                        raise error  # reintentar no ayuda
+            if intento < self.reintentos:
+                espera = self._espera(intento, respuesta)
+                if not self._cabe_espera(espera, limite):
+                    break
+                with self._lock:
+                    self.reintentos_hechos += 1
+                time.sleep(espera)
+        return None, error
+
+    def completar(self, mensajes, modelo: str, temperature: float = 0.7, max_tokens: int = 300,
+                  timeout=None, limite=None) -> str:
+        """Chat completion; devuelve el texto del primer `choice`."""
+        datos = self.chat({
+            "model": modelo,
+            "messages": mensajes,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }, timeout=timeout, limite=limite)
+        try:
+            return datos["choices"][0]["message"]["content"].strip()
+        except (KeyError, IndexError, TypeError, AttributeError):
+            raise GroqError("Respuesta de Groq sin contenido.")
+
+    def completar_stream(self, mensajes, modelo: str, temperature: float = 0.7, max_tokens: int = 300,
+                         timeout=None, limite=None):
+        """
+        Chat completion con `stream=true`: generador de fragmentos de texto.
+        Los reintentos (y `limite`) solo aplican antes del primer byte; un corte a
+        mitad del stream lanza GroqError (lo ya entregado no se repite).
+        """
+        payload = {"model": modelo, "messages": mensajes, "temperature": temperature,
+                   "max_tokens": max_tokens, "stream": True}
+        self._permitir()
+        t0 = time.perf_counter()
+        with self._lock:
+            self.llamadas += 1
+        try:
+            respuesta, error = self._intentar(payload, timeout, stream=True, limite=limite)
+        except BaseException:
+            self._registrar_resultado(False, time.perf_counter() - t0, contar_fallo=False)
+            raise
+        if error is not None:
+            self._registrar_resultado(False, time.perf_counter() - t0)
+            logger.warning("Groq: stream fallido tras %s intentos: %s", self.reintentos + 1, error)
+            raise error
+
+        respuesta.encoding = "utf-8"  # text/event-stream sin charset: requests asumiría latin-1
+        primero = True
+        try:
+            for linea in respuesta.iter_lines(decode_unicode=True):
+                fragmento = _fragmento_sse(linea)
+                if fragmento is FIN_STREAM:
+                    break
+                if fragmento:
+                    if primero:
+                        primero = False
+                        with self._lock:
+                            self._ttft.append(time.perf_counter() - t0)
+                    yield fragmento
+        except GeneratorExit:
+            # el consumidor dejó de leer (p. ej. el cliente cerró el SSE): Groq sí respondió
+            self._registrar_resultado(True, time.perf_counter() - t0)
+            raise
+        except requests.RequestException as e:
+            self._registrar_resultado(False, time.perf_counter() - t0)
+            raise GroqError(f"Stream de Groq interrumpido: {e}")
+        except GroqError:
+            self._registrar_resultado(False, time.perf_counter() - t0)
+            raise
+        else:
+            self._registrar_resultado(True, time.perf_counter() - t0)
+        finally:
+            respuesta.close()
+
+    # ---------- llamadas asíncronas (modo ASGI) ----------
+    async def achat(self, payload: dict, timeout=None, limite=None) -> dict:
+        """Igual que chat() sin bloquear el event loop."""
+        self._permitir()
+        t0 = time.perf_counter()
+        with self._lock:
+            self.llamadas += 1
+        try:
+            datos, error = await self._aintentar(payload, timeout, limite=limite)
+        except BaseException:
+            # 4xx, cancelación del request u otro error local: no indica caída de Groq
+            self._registrar_resultado(False, time.perf_counter() - t0, contar_fallo=False)
+            raise
+        if error is None:
+            self._registrar_resultado(True, time.perf_counter() - t0)
+            return datos
+        self._registrar_resultado(False, time.perf_counter() - t0)
+        logger.warning("Groq: llamada fallida tras %s intentos: %s", self.reintentos + 1, error)
+        raise error
+
+    async def _aintentar(self, payload, timeout, stream=False, limite=None):
+        """Versión asíncrona de _intentar (con stream=True devuelve la respuesta httpx abierta)."""
+        import httpx
+
+        cliente = self.cliente_async()
+        cabeceras = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        error = None
+        for intento in range(self.reintentos + 1):
+            respuesta = None
+            lectura = self._timeout_intento(timeout, limite)
+            if lectura is None:
+                return None, error or GroqError("Se agotó el plazo para la llamada a Groq.")
+            limites = httpx.Timeout(lectura, connect=min(TIMEOUT_CONEXION, lectura))
+            try:
+                peticion = cliente.build_request("POST", self.url, headers=cabeceras, json=payload, timeout=limites)
+                respuesta = await cliente.send(peticion, stream=stream)
+            except httpx.HTTPError as e:
+                error = GroqError(f"Error al conectar con Groq: {e}")
+            else:
+                with self._lock:
+                    self.por_status[respuesta.status_code] = self.por_status.get(respuesta.status_code, 0) + 1
+                if respuesta.status_code == 200 and stream:
+                    return respuesta, None
+                if stream:
+                    await respuesta.aread()
+                    await respuesta.aclose()
+                if respuesta.status_code == 200:
+                    try:
+                        return respuesta.json(), None
+                    except ValueError:
+                        error = GroqError("Respuesta de Groq no es JSON.", respuesta.status_code)
+                else:
+                    error = GroqError(f"Groq respondió {respuesta.status_code}: {respuesta.text[:300]}",
+                                      respuesta.status_code)
+                    if respuesta.status_code not in REINTENTABLES:
+                        raise error
+            if intento < self.reintentos:
+                espera = self._espera(intento, respuesta)
+                if not self._cabe_espera(espera, limite):
+                    break
+                with self._lock:
+                    self.reintentos_hechos += 1
+                await asyncio.sleep(espera)
+        return None, error
+
+    async def acompletar(self, mensajes, modelo: str, temperature: float = 0.7, max_tokens: int = 300,
+                         timeout=None, limite=None) -> str:
+        datos = await self.achat({
+            "model": modelo,
+            "messages": mensajes,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }, timeout=timeout, limite=limite)
+        try:
+            return datos["choices"][0]["message"]["content"].strip()
+        except (KeyError, IndexError, TypeError, AttributeError):
+            raise GroqError("Respuesta de Groq sin contenido.")
+
+    async def acompletar_stream(self, mensajes, modelo: str, temperature: float = 0.7, max_tokens: int = 300,
+                                timeout=None, limite=None):
+        """Versión asíncrona de completar_stream (generador asíncrono de fragmentos)."""
+        import httpx
+
+        payload = {"model": modelo, "messages": mensajes, "temperature": temperature,
+                   "max_tokens": max_tokens, "stream": True}
+        self._permitir()
+        t0 = time.perf_counter()
+        with self._lock:
+            self.llamadas += 1
+        try:
+            respuesta, error = await self._aintentar(payload, timeout, stream=True, limite=limite)
+        except BaseException:
+            self._registrar_resultado(False, time.perf_counter() - t0, contar_fallo=False)
+            raise
+        if error is not None:
+            self._registrar_resultado(False, time.perf_counter() - t0)
+            logger.warning("Groq: stream fallido tras %s intentos: %s", self.reintentos + 1, error)
+            raise error
+
+        primero = True
+        try:
+            async for linea in respuesta.aiter_lines():
+                fragmento = _fragmento_sse(linea)
+                if fragmento is FIN_STREAM:
+                    break
+                if fragmento:
+                    if primero:
+                        primero = False
+                        with self._lock:
+                            self._ttft.append(time.perf_counter() - t0)
+                    yield fragmento
+        except (GeneratorExit, asyncio.CancelledError):
+            self._registrar_resultado(True, time.perf_counter() - t0)
+            raise
+        except httpx.HTTPError as e:
+            self._registrar_resultado(False, time.perf_counter() - t0)
+            raise GroqError(f"Stream de Groq interrumpido: {e}")
+        except GroqError:
+            self._registrar_resultado(False, time.perf_counter() - t0)
+            raise
+        else:
+            self._registrar_resultado(True, time.perf_counter() - t0)
+        finally:
+            await respuesta.aclose()
+
+    # ---------- métricas ----------
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "url": self.url,
+                "llamadas": self.llamadas,
+                "exitos": self.exitos,
+                "fallos": self.fallos,
+                "reintentos": self.reintentos_hechos,
+                "rechazadas_circuito": self.rechazadas,
+                "por_status": dict(self.por_status),
+                "circuito": (SEMIABIERTO if self._estado == ABIERTO and time.monotonic() >= self._abierto_hasta
+                             else self._estado),
+                **resumen(self._latencias, (50, 95, 99)),
+                **resumen(self._ttft, prefijo="ttft_"),
+            }
+
+
+# Instancia compartida por los groq_service de 9° y 10/11
+GROQ = ClienteGroq()
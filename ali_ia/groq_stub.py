@@ -0,0 +1,208 @@
+# ali_ia/groq_stub.py
+# -*- coding: utf-8 -*-
+"""
+Groq local para pruebas de carga: mismo contrato que /openai/v1/chat/completions.
+
+- latencia_s (+ jitter_s uniforme) antes de responder; en stream es el tiempo al
+  primer token y luego `ms_por_token` entre fragmentos (`stream=true`, SSE con
+  `data: {...chat.completion.chunk...}` y `data: [DONE]`, como Groq).
+- tasa_error: fracción de llamadas que responden 500.
+- Ráfagas de 429: cada `rafaga_429_cada_s` segundos, durante `rafaga_429_dura_s`,
+  todas las llamadas responden 429 con Retry-After (lo que hace Groq al pasar el
+  límite de la cuenta).
+- `usage` con tokens estimados (ali_ia.prompts) para probar presupuestos de tokens.
+
+Se levanta con `manage.py groq_stub` (y ALI_GROQ_URL apuntando a él) o en proceso
+(`ServidorGroqStub(...).iniciar()`), como hacen carga_finalizacion y bench_concurrencia_groq.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ali_ia.prompts import estimar_tokens, tokens_mensajes
+
+RUTA = "/openai/v1/chat/completions"
+
+TEXTO_DEFAULT = (
+    "Por qué te lo sugerimos: tus respuestas muestran mucho interés en las actividades de esta área. "
+    "Qué aprenderás: conceptos básicos, prácticas guiadas y proyectos con casos reales. "
+    "Siguientes pasos: conversa con tu orientador y explora un proyecto pequeño este mes."
+)
+
+
+def _payload_valido(payload) -> bool:
+    mensajes = payload.get("messages") if isinstance(payload, dict) else None
+    return (bool(payload and payload.get("model")) and isinstance(mensajes, list)
+            and all(isinstance(m, dict) and isinstance(m.get("content"), str) for m in mensajes))
+
+
+class _ManejadorGroq(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como la API real
+
+    def do_POST(self):
+        servidor = self.server
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            payload = None
+        if self.path.split("?")[0] != RUTA:
+            self._json(404, {"error": {"message": f"Unknown request URL: POST {self.path}", "type": "invalid_request_error"}})
+            return
+        if not _payload_valido(payload):
+            self._json(400, {"error": {"message": "'model' y 'messages' son obligatorios.", "type": "invalid_request_error"}})
+            return
+
+        servidor._entrar()
+        try:
+            status = servidor._decidir()
+            if status == 429:
+                self._json(429, {"error": {"message": "Rate limit reached. Please try again in 1s.",
+                                           "type": "tokens", "code": "rate_limit_exceeded"}},
+                           {"Retry-After": str(servidor.retry_after_s)})
+                return
+            time.sleep(servidor._latencia())
+            if status != 200:
+                self._json(status, {"error": {"message": "Internal Server Error", "type": "internal_server_error"}})
+            elif payload.get("stream"):
+                self._stream(payload)
+            else:
+                self._json(200, servidor._completion(payload))
+        finally:
+            servidor._salir()
+
+    def _json(self, status, datos, cabeceras=None):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for clave, valor in (cabeceras or {}).items():
+            self.send_header(clave, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _stream(self, payload):
+        servidor = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": payload["model"]}
+        palabras = servidor.texto.split(" ")
+        try:
+            for i, palabra in enumerate(palabras):
+                if i:
+                    time.sleep(servidor.ms_por_token / 1000)
+                fragmento = palabra if i == len(palabras) - 1 else palabra + " "
+                self._trozo({**base, "choices": [{"index": 0, "delta": {"content": fragmento}, "finish_reason": None}]})
+            self._trozo("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # el cliente cortó el stream
+
+    def _trozo(self, datos):
+        linea = f"data: {datos if isinstance(datos, str) else json.dumps(datos, ensure_ascii=False)}\n\n"
+        cuerpo = linea.encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(cuerpo), cuerpo))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+class ServidorGroqStub(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # el default (5) rechaza conexiones con muchas llamadas a la vez
+
+    def __init__(self, host: str = "127.0.0.1", puerto: int = 0, latencia_s: float = 0.5, jitter_s: float = 0.0,
+                 tasa_error: float = 0.0, rafaga_429_cada_s: float = 0.0, rafaga_429_dura_s: float = 0.0,
+                 ms_por_token: float = 20.0, retry_after_s: int = 1, texto: str = TEXTO_DEFAULT, seed=None):
+        super().__init__((host, puerto), _ManejadorGroq)
+        self.latencia_s, self.jitter_s, self.tasa_error = latencia_s, jitter_s, tasa_error
+        self.rafaga_429_cada_s, self.rafaga_429_dura_s = rafaga_429_cada_s, rafaga_429_dura_s
+        self.ms_por_token, self.retry_after_s, self.texto = ms_por_token, retry_after_s, texto
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._hilo = None
+        self.reiniciar_metricas()
+
+    @property
+    def url(self) -> str:
+        host, puerto = self.server_address[:2]
+        return f"http://{host}:{puerto}{RUTA}"
+
+    def iniciar(self):
+        """Atiende en un hilo daemon; devuelve self."""
+        self._hilo = threading.Thread(target=self.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self.shutdown()
+        self.server_close()
+
+    def reiniciar_metricas(self):
+        with self._lock:
+            self.t0 = time.monotonic()
+            self.peticiones = 0
+            self.por_status = {}
+            self.en_vuelo = 0
+            self.max_en_vuelo = 0
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "peticiones": self.peticiones,
+                "por_status": dict(sorted(self.por_status.items())),
+                "max_en_vuelo": self.max_en_vuelo,
+            }
+
+    # ---------- usados por el manejador ----------
+    def _en_rafaga_429(self) -> bool:
+        if self.rafaga_429_cada_s <= 0 or self.rafaga_429_dura_s <= 0:
+            return False
+        # los últimos `dura` segundos de cada período (el arranque no empieza en ráfaga)
+        fase = (time.monotonic() - self.t0) % self.rafaga_429_cada_s
+        return fase >= self.rafaga_429_cada_s - self.rafaga_429_dura_s
+
+    def _decidir(self) -> int:
+        if self._en_rafaga_429():
+            status = 429
+        else:
+            with self._lock:
+                status = 500 if self._rng.random() < self.tasa_error else 200
+        with self._lock:
+            self.por_status[status] = self.por_status.get(status, 0) + 1
+        return status
+
+    def _latencia(self) -> float:
+        if self.jitter_s <= 0:
+            return self.latencia_s
+        with self._lock:
+            return max(0.0, self.latencia_s + self._rng.uniform(-self.jitter_s, self.jitter_s))
+
+    def _entrar(self):
+        with self._lock:
+            self.peticiones += 1
+            self.en_vuelo += 1
+            self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+
+    def _salir(self):
+        with self._lock:
+            self.en_vuelo -= 1
+
+    def _completion(self, payload) -> dict:
+        entrada = tokens_mensajes(payload["messages"])
+        salida = estimar_tokens(self.texto)
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": self.texto},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": entrada, "completion_tokens": salida, "total_tokens": entrada + salida},
+        }
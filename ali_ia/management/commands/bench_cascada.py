@@ -0,0 +1,115 @@
+# ali_ia/management/commands/bench_cascada.py
+"""
+Evalúa la cascada por bloques (ali_ia/cascada.py) sobre hojas sintéticas.
+
+Por cada margen: fracción de hojas que resuelve sin el bosque (hit rate),
+concordancia de la clase top-1 con el bosque en esas hojas, concordancia total
+(hojas resueltas por la cascada + el resto por el bosque) y la latencia media de
+`predecir` / `predecir_carrera` por fila con la cascada activa vs. apagada.
+"""
+import importlib
+import json
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ali_ia.cascada import Cascada
+from ali_ia.sinteticos import codigos_a_texto, generar_codigos
+
+MODELOS = {
+    "9": ("test_grado9.ml_model.model9", "PREGUNTAS_POR_TECNICO", 57, "predecir"),
+    "10_11": ("test_grado_10_11.ml_model.model_10y11", "PREGUNTAS_CLAVE_POR_CARRERA", 60, "predecir_carrera"),
+}
+
+
+def _media_ms(fn, hojas):
+    t0 = time.perf_counter()
+    for h in hojas:
+        fn(h)
+    return round((time.perf_counter() - t0) * 1000 / len(hojas), 4)
+
+
+class Command(BaseCommand):
+    help = "Hit rate, concordancia con el bosque y latencia de la cascada por bloques para varios márgenes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=["9", "10_11", "todos"], default="todos")
+        parser.add_argument("--margenes", default="0.5,0.75,1.0,1.25,1.5")
+        parser.add_argument("--n", type=int, default=5000, help="Hojas sintéticas.")
+        parser.add_argument("--n-latencia", type=int, default=300, help="Hojas para medir latencia de una fila.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        try:
+            margenes = [float(x) for x in opts["margenes"].split(",") if x.strip()]
+        except ValueError:
+            raise CommandError(f"--margenes inválido: {opts['margenes']}")
+        claves = ["9", "10_11"] if opts["modelo"] == "todos" else [opts["modelo"]]
+        reporte = [self._medir(clave, margenes, opts) for clave in claves]
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+            return
+        for r in reporte:
+            self.stdout.write(f"[{r['modelo']}] bosque {r['ms_bosque_por_fila']:.4f} ms/fila en lote, "
+                              f"predecir sin cascada {r['media_sin_cascada_ms']:.3f} ms")
+            for m in r["margenes"]:
+                self.stdout.write(
+                    f"  margen {m['margen']:4.2f}: hit {m['hit_rate']:.1%}  "
+                    f"concordancia {m['concordancia'] if m['concordancia'] is not None else '-'}  "
+                    f"total {m['concordancia_total']:.1%}  media {m['media_con_cascada_ms']:.3f} ms"
+                )
+
+    def _medir(self, clave, margenes, opts):
+        modulo, bloques_attr, total, fn_uno = MODELOS[clave]
+        mod = importlib.import_module(modulo)
+        art = mod.MODELO.obtener()
+        bloques = getattr(mod, bloques_attr)
+
+        A = generar_codigos(opts["n"], total, bloques, seed=opts["seed"])
+        t0 = time.perf_counter()
+        P = np.asarray(mod._predict_proba(art.plan.vectorizar(A), art))
+        t_bosque = time.perf_counter() - t0
+        top_bosque = P.argmax(axis=1)
+
+        hojas = codigos_a_texto(A[:opts["n_latencia"]])
+        uno = getattr(mod, fn_uno)
+        original, max_cache = mod.CASCADA, mod.CACHE.max_items
+        mod.CACHE.max_items = 0  # cada fila llega a la cascada / el bosque
+        try:
+            mod.CASCADA = Cascada(clave, total, bloques, activo=False)
+            media_sin = _media_ms(uno, hojas)
+
+            resultados = []
+            for margen in margenes:
+                cascada = Cascada(clave, total, bloques, activo=True, margen=margen, sombra=0.0)
+                t0 = time.perf_counter()
+                resueltas, probas, _ = cascada.separar(art, A)
+                t_cascada = time.perf_counter() - t0
+                if not len(resueltas) and cascada._columnas(art) is None:
+                    raise CommandError(f"[{clave}] Las clases del modelo no coinciden con los bloques.")
+                top_cascada = np.array([np.argmax(p) for p in probas], dtype=np.intp)
+                coinciden = int((top_cascada == top_bosque[resueltas]).sum())
+
+                mod.CASCADA = Cascada(clave, total, bloques, activo=True, margen=margen, sombra=0.0)
+                resultados.append({
+                    "margen": margen,
+                    "hit_rate": round(len(resueltas) / len(A), 4),
+                    "concordancia": round(coinciden / len(resueltas), 4) if len(resueltas) else None,
+                    "concordancia_total": round((len(A) - len(resueltas) + coinciden) / len(A), 4),
+                    "ms_cascada_por_fila": round(1000 * t_cascada / len(A), 5),
+                    "media_con_cascada_ms": _media_ms(uno, hojas),
+                })
+        finally:
+            mod.CASCADA = original
+            mod.CACHE.max_items = max_cache
+        return {
+            "modelo": clave,
+            "version_modelo": art.version,
+            "filas": len(A),
+            "ms_bosque_por_fila": round(1000 * t_bosque / len(A), 5),
+            "media_sin_cascada_ms": media_sin,
+            "margenes": resultados,
+        }
@@ -0,0 +1,103 @@
+# ali_ia/management/commands/bench_concurrencia_groq.py
+"""
+Cuántas finalizaciones con explicación atiende UN worker en cada modo de despliegue.
+
+    manage.py bench_concurrencia_groq --n 200 --latencia 0.8
+
+Levanta un Groq local que tarda `--latencia` s por respuesta y lanza `--n`
+finalizaciones a la vez contra un solo worker:
+  - wsgi-sync:    gunicorn sync, una petición a la vez (la llamada a Groq bloquea el worker),
+  - wsgi-gthread: gunicorn gthread con `--hilos` hilos (GUNICORN_THREADS),
+  - asgi:         un event loop (worker uvicorn) con ClienteGroq.acompletar.
+Reporta finalizaciones/s, máximo de llamadas en vuelo que vio el servidor y la
+latencia p50/p95 que percibe el estudiante (incluye la espera por un worker libre).
+No toca la BD: el prompt es el real (construir_mensajes) y la predicción se omite.
+"""
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ali_ia.groq_client import ClienteGroq
+from ali_ia.groq_stub import ServidorGroqStub
+from ali_ia.metricas import resumen
+
+MODOS = ("wsgi-sync", "wsgi-gthread", "asgi")
+
+
+class Command(BaseCommand):
+    help = "Finalizaciones concurrentes por worker: WSGI (sync / gthread) vs ASGI con Groq asíncrono."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--n", type=int, default=100, help="Finalizaciones lanzadas a la vez.")
+        parser.add_argument("--latencia", type=float, default=0.5, help="Segundos que tarda el Groq local.")
+        parser.add_argument("--hilos", type=int, default=4, help="Hilos del worker gthread.")
+        parser.add_argument("--modos", default=",".join(MODOS))
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        modos = [m.strip() for m in opts["modos"].split(",") if m.strip()]
+        if any(m not in MODOS for m in modos):
+            raise CommandError(f"--modos inválido: {opts['modos']}. Opciones: {', '.join(MODOS)}")
+        if opts["n"] < 1 or opts["hilos"] < 1:
+            raise CommandError("--n y --hilos deben ser >= 1")
+        from test_grado_10_11.groq_service import construir_mensajes
+
+        respuestas = {f"pregunta_{i}": 3 if i <= 6 else 1 for i in range(1, 61)}
+        self.mensajes = construir_mensajes("Medicina", respuestas)
+
+        servidor = ServidorGroqStub(latencia_s=opts["latencia"]).iniciar()
+        try:
+            reporte = []
+            for modo in modos:
+                servidor.reiniciar_metricas()
+                cliente = ClienteGroq(url=servidor.url, api_key="bench", reintentos=0, pool=opts["n"], pool_async=opts["n"])
+                total_s, latencias = self._medir(modo, cliente, opts)
+                cliente.cerrar()
+                reporte.append({
+                    "modo": modo,
+                    "n": opts["n"],
+                    "total_s": round(total_s, 3),
+                    "finalizaciones_por_s": round(opts["n"] / total_s, 2),
+                    "max_en_vuelo": servidor.max_en_vuelo,
+                    **resumen(latencias),
+                })
+        finally:
+            servidor.detener()
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(reporte, indent=2))
+            return
+        self.stdout.write(f"Groq local: {opts['latencia']} s por respuesta; {opts['n']} finalizaciones a la vez")
+        for r in reporte:
+            self.stdout.write(
+                f"  {r['modo']:<13} {r['finalizaciones_por_s']:8.2f} fin/s  en vuelo máx. {r['max_en_vuelo']:4d}  "
+                f"p50 {r['p50_ms']:9.1f} ms  p95 {r['p95_ms']:9.1f} ms  (total {r['total_s']} s)"
+            )
+
+    def _medir(self, modo, cliente, opts):
+        n, t0 = opts["n"], time.perf_counter()
+
+        def finalizar(_):
+            cliente.completar(self.mensajes, modelo="bench")
+            return time.perf_counter() - t0  # desde que llegaron todas: incluye la espera en cola
+
+        if modo == "asgi":
+            async def afinalizar():
+                await cliente.acompletar(self.mensajes, modelo="bench")
+                return time.perf_counter() - t0
+
+            async def todas():
+                try:
+                    return await asyncio.gather(*(afinalizar() for _ in range(n)))
+                finally:
+                    await cliente.acerrar()
+
+            latencias = asyncio.run(todas())
+        else:
+            hilos = 1 if modo == "wsgi-sync" else opts["hilos"]
+            with ThreadPoolExecutor(max_workers=hilos) as pool:
+                latencias = list(pool.map(finalizar, range(n)))
+        return time.perf_counter() - t0, latencias
@@ -0,0 +1,197 @@
+# ali_ia/management/commands/bench_inferencia.py
+"""
+Benchmark de inferencia de los modelos vocacionales (sin red, sin BD).
+
+Por modelo y motor mide:
+- latencia de una fila con `predecir` / `predecir_carrera` (p50/p95/p99),
+- throughput de `predecir_batch` / `predecir_carrera_batch` por tamaño de lote,
+- `_vectorizar` por separado de la evaluación del bosque (`_predict_proba`),
+- lo que suma la vista alrededor (normalizar el dict + componer `resultado`, sin Groq).
+
+La CACHE de predicciones se apaga mientras se mide (salvo --con-cache) para
+que cada fila evalúe el bosque. La salida JSON sirve para comparar versiones
+del modelo y motores en el tiempo (--salida archivo.json).
+"""
+import importlib
+import json
+import os
+import platform
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ali_ia.metricas import resumen
+from ali_ia.sinteticos import codigos_a_texto, como_dict, generar_codigos
+
+CONFIG = {
+    "9": {
+        "ml": "test_grado9.ml_model.model9",
+        "views": "test_grado9.views",
+        "uno": "predecir",
+        "lote": "predecir_batch",
+        "bloques": "PREGUNTAS_POR_TECNICO",
+        "total": 57,
+    },
+    "10_11": {
+        "ml": "test_grado_10_11.ml_model.model_10y11",
+        "views": "test_grado_10_11.views",
+        "uno": "predecir_carrera",
+        "lote": "predecir_carrera_batch",
+        "bloques": "PREGUNTAS_CLAVE_POR_CARRERA",
+        "total": 60,
+    },
+}
+
+
+def _resumen_ms(segundos):
+    ms = np.asarray(segundos) * 1000
+    return {
+        "n": int(len(ms)),
+        "media_ms": round(float(ms.mean()), 4),
+        **resumen(segundos, (50, 95, 99), decimales=4),
+    }
+
+
+def _cronometrar(fn, entradas):
+    tiempos = []
+    for x in entradas:
+        t0 = time.perf_counter()
+        fn(x)
+        tiempos.append(time.perf_counter() - t0)
+    return tiempos
+
+
+def _versiones():
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "cpus": os.cpu_count(),
+        "maquina": platform.machine(),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark de latencia/throughput de los modelos vocacionales con hojas sintéticas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=["9", "10_11", "todos"], default="todos")
+        parser.add_argument("--motor", default="todos", help="plano, sklearn o todos.")
+        parser.add_argument("--n", type=int, default=500, help="Hojas para las mediciones de una fila.")
+        parser.add_argument("--lotes", default="1,32,256,1024", help="Tamaños de lote separados por coma.")
+        parser.add_argument("--filas-lote", type=int, default=4096, help="Filas totales por tamaño de lote.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--con-cache", action="store_true", help="No apagar la CACHE de predicciones.")
+        parser.add_argument("--salida", help="Escribe el JSON en este archivo.")
+        parser.add_argument("--json", action="store_true", help="Imprime el JSON completo.")
+
+    def handle(self, *args, **opts):
+        try:
+            lotes = [int(x) for x in opts["lotes"].split(",") if x.strip()]
+        except ValueError:
+            raise CommandError(f"--lotes inválido: {opts['lotes']}")
+        claves = ["9", "10_11"] if opts["modelo"] == "todos" else [opts["modelo"]]
+
+        reporte = {
+            "fecha": timezone.now().isoformat(),
+            "entorno": _versiones(),
+            "parametros": {k: opts[k] for k in ("n", "filas_lote", "seed", "con_cache")} | {"lotes": lotes},
+            "modelos": [],
+        }
+        for clave in claves:
+            reporte["modelos"].extend(self._medir_modelo(clave, lotes, opts))
+
+        texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+        if opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8") as f:
+                f.write(texto)
+        if opts["json"]:
+            self.stdout.write(texto)
+            return
+        for r in reporte["modelos"]:
+            u, v, b = r["una_fila"], r["etapas"], r["vista"]
+            self.stdout.write(
+                f"[{r['modelo']}/{r['motor']}] una fila p50 {u['p50_ms']:.3f} p95 {u['p95_ms']:.3f} "
+                f"p99 {u['p99_ms']:.3f} ms | vectorizar p50 {v['vectorizar']['p50_ms']:.3f} ms, "
+                f"bosque p50 {v['bosque']['p50_ms']:.3f} ms | vista +{b['sobrecosto_p50_ms']:.3f} ms"
+            )
+            for lote in r["lotes"]:
+                self.stdout.write(f"    lote {lote['lote']:5}: {lote['filas_por_s']:10.1f} filas/s")
+
+    def _medir_modelo(self, clave, lotes, opts):
+        cfg = CONFIG[clave]
+        mod = importlib.import_module(cfg["ml"])
+        views = importlib.import_module(cfg["views"])
+        segundos_carga = mod.precargar()
+        motores = list(mod.MOTORES) if opts["motor"] == "todos" else [opts["motor"]]
+        for motor in motores:
+            if motor not in mod.MOTORES:
+                raise CommandError(f"Motor desconocido: {motor}. Opciones: {mod.MOTORES}")
+
+        bloques = getattr(mod, cfg["bloques"])
+        n_total = opts["n"] + opts["filas_lote"]
+        A = generar_codigos(n_total, cfg["total"], bloques, seed=opts["seed"])
+        hojas = codigos_a_texto(A, prop_letras=0.2, seed=opts["seed"])
+        unas, para_lotes = hojas[:opts["n"]], hojas[opts["n"]:]
+        dicts = [como_dict(h) for h in unas]
+        uno, lote_fn = getattr(mod, cfg["uno"]), getattr(mod, cfg["lote"])
+
+        motor_original, max_cache = mod.MOTOR_INFERENCIA, mod.CACHE.max_items
+        resultados = []
+        try:
+            if not opts["con_cache"]:
+                mod.CACHE.max_items = 0
+            for motor in motores:
+                mod.usar_motor(motor)
+                mod.CACHE.limpiar()
+                uno(unas[0])  # calentamiento
+
+                una_fila = _cronometrar(uno, unas)
+
+                vectores = []
+                t_vec = _cronometrar(lambda h: vectores.append(mod._vectorizar(h)), unas)
+                t_bosque = _cronometrar(mod._predict_proba, vectores)
+
+                def vista(d):
+                    norm = views._normalizar_respuestas(d)
+                    views._componer_resultado(uno(norm), "")
+
+                t_vista = _cronometrar(vista, dicts)
+
+                por_lote = []
+                for tam in lotes:
+                    mod.CACHE.limpiar()
+                    trozos = [para_lotes[i:i + tam] for i in range(0, len(para_lotes), tam)]
+                    t0 = time.perf_counter()
+                    for trozo in trozos:
+                        lote_fn(trozo)
+                    dt = time.perf_counter() - t0
+                    por_lote.append({
+                        "lote": tam,
+                        "filas": len(para_lotes),
+                        "filas_por_s": round(len(para_lotes) / dt, 1),
+                        "ms_por_lote": round(dt * 1000 / len(trozos), 4),
+                    })
+
+                r_uno, r_vista = _resumen_ms(una_fila), _resumen_ms(t_vista)
+                resultados.append({
+                    "modelo": clave,
+                    "motor": motor,
+                    "version_modelo": mod.MODEL_VERSION,
+                    "carga_s": round(segundos_carga, 3),
+                    "microlotes": mod.MICROLOTES.activo,
+                    "sidecar": mod.SIDECAR.configurado,
+                    "una_fila": r_uno,
+                    "etapas": {"vectorizar": _resumen_ms(t_vec), "bosque": _resumen_ms(t_bosque)},
+                    "vista": r_vista | {"sobrecosto_p50_ms": round(r_vista["p50_ms"] - r_uno["p50_ms"], 4)},
+                    "lotes": por_lote,
+                })
+        finally:
+            mod.usar_motor(motor_original)
+            mod.CACHE.max_items = max_cache
+            mod.CACHE.limpiar()
+        return resultados
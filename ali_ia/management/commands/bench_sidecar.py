@@ -0,0 +1,98 @@
+# ali_ia/management/commands/bench_sidecar.py
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ali_ia.metricas import resumen
+from ali_ia.sidecar import GRADO9, GRADO10_11, MODULOS, ClienteSidecar
+
+N_PREGUNTAS = {GRADO9: 57, GRADO10_11: 60}
+
+
+def _correr(fn, lotes, hilos):
+    latencias = []
+
+    def uno(A):
+        t0 = time.perf_counter()
+        fn(A)
+        latencias.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as ex:
+        list(ex.map(uno, lotes))
+    total = time.perf_counter() - t0
+    filas = sum(len(A) for A in lotes)
+    return {
+        "filas_por_s": round(filas / total, 1),
+        **resumen(latencias, (50, 99), decimales=3, vacio=0.0),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compara throughput/latencia de la inferencia en proceso vs. el sidecar por socket Unix."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=["9", "10_11"], default="10_11")
+        parser.add_argument("--n", type=int, default=2000, help="Filas totales.")
+        parser.add_argument("--lote", type=int, default=1, help="Filas por llamada.")
+        parser.add_argument("--hilos", type=int, default=4, help="Llamadas concurrentes.")
+        parser.add_argument("--socket", help="Usar un sidecar ya levantado en este socket.")
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        import importlib
+
+        modelo = GRADO9 if opts["modelo"] == "9" else GRADO10_11
+        mod = importlib.import_module(MODULOS[modelo])
+        rng = np.random.default_rng(0)
+        A = rng.integers(1, 4, size=(opts["n"], N_PREGUNTAS[modelo])).astype(np.uint8)
+        lotes = [A[i:i + opts["lote"]] for i in range(0, len(A), opts["lote"])]
+
+        proceso, ruta = None, opts["socket"]
+        if not ruta:
+            ruta = os.path.join(tempfile.mkdtemp(), "ali-bench.sock")
+            proceso = subprocess.Popen(
+                [sys.executable, "manage.py", "servidor_inferencia", "--socket", ruta],
+                cwd=str(settings.BASE_DIR), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            )
+            limite = time.monotonic() + 60
+            while not os.path.exists(ruta):
+                if proceso.poll() is not None or time.monotonic() > limite:
+                    raise CommandError(f"El sidecar no arrancó: {proceso.stderr.read().decode()[-500:]}")
+                time.sleep(0.1)
+
+        try:
+            mod.precargar()
+            mod.CACHE.limpiar()
+            en_proceso = _correr(mod._proba_local, lotes, opts["hilos"])
+            mod.CACHE.limpiar()
+
+            cliente = ClienteSidecar(ruta)
+            cliente.info(modelo)
+            # Segunda pasada: las mismas hojas ya quedan en el CACHE del sidecar; se usan otras
+            A2 = rng.integers(1, 4, size=A.shape).astype(np.uint8)
+            lotes2 = [A2[i:i + opts["lote"]] for i in range(0, len(A2), opts["lote"])]
+            por_sidecar = _correr(lambda X: cliente.proba(modelo, X), lotes2, opts["hilos"])
+        finally:
+            if proceso is not None:
+                proceso.terminate()
+                proceso.wait(timeout=10)
+
+        resultado = {
+            "modelo": MODULOS[modelo], "filas": opts["n"], "lote": opts["lote"], "hilos": opts["hilos"],
+            "en_proceso": en_proceso, "sidecar": por_sidecar,
+        }
+        if opts["json"]:
+            self.stdout.write(json.dumps(resultado, indent=2))
+            return
+        for nombre in ("en_proceso", "sidecar"):
+            r = resultado[nombre]
+            self.stdout.write(f"{nombre:11} {r['filas_por_s']:10.1f} filas/s  p50 {r['p50_ms']:.3f} ms  p99 {r['p99_ms']:.3f} ms")
@@ -0,0 +1,308 @@
+# ali_ia/management/commands/carga_finalizacion.py
+"""
+Prueba de carga de punta a punta de la finalización, contra un Groq local.
+
+    manage.py carga_finalizacion --sesiones 50 --concurrencia 20 --latencia 0.8 --tasa-error 0.05
+    manage.py carga_finalizacion --url http://127.0.0.1:8000 --sesiones 50   # servidor ya levantado
+
+Cada sesión es un estudiante sintético (ali_ia.sinteticos) que recorre la API
+como el front: POST iniciar, un PATCH progreso por respuesta (57 en 9°, 60 en
+10/11) y, con la cola de explicaciones, el stream de la explicación. El PATCH
+con la última respuesta es el que finaliza (predicción + Groq en modo sincrono):
+se reporta como `finalizar`. Reporta p50/p95 y tasa de error por endpoint.
+
+Sin --url las peticiones pasan por el stack de Django en proceso (middleware,
+JWT, DRF, ORM) con un django.test.Client por sesión, y Groq es un
+ServidorGroqStub en proceso (o --groq-url). Con --url el servidor debe tener
+ALI_GROQ_URL apuntando a un `manage.py groq_stub` y compartir BD y SECRET_KEY
+con este comando (los JWT se firman aquí).
+
+Los usuarios `carga-<corrida>-<n>` y sus tests se borran al terminar (--conservar
+para dejarlos). Durante la corrida en proceso no se usa el cache persistente de
+explicaciones, para no guardar textos del stub; --cache-explicaciones lo deja
+activo (p. ej. para ver finalizaciones servidas por pregenerar_explicaciones).
+"""
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test import Client
+
+from ali_ia import cola_explicaciones as cola
+from ali_ia.admision_groq import ADMISION
+from ali_ia.explicacion_local import METRICAS_LOCAL
+from ali_ia.groq_client import GROQ
+from ali_ia.groq_stub import ServidorGroqStub
+from ali_ia.management.commands.groq_stub import agregar_argumentos_stub, opciones_stub
+from ali_ia.metricas import resumen
+from ali_ia.sinteticos import codigos_a_texto, generar_codigos
+
+GRADOS = {
+    "9": SimpleNamespace(ruta="/Alipsicoorientadora/tests-grado9/", total=57,
+                         servicio="test_grado9.groq_service", bloques="PREGUNTAS_POR_TECNICO"),
+    "10_11": SimpleNamespace(ruta="/Alipsicoorientadora/tests-grado10-11/", total=60,
+                             servicio="test_grado_10_11.groq_service", bloques="PREGUNTAS_CLAVE_POR_CARRERA"),
+}
+ENDPOINTS = ("iniciar", "progreso", "finalizar", "explicacion_stream")
+
+
+class _ClienteLocal:
+    """Peticiones por el stack de Django en proceso (WSGIHandler del test client)."""
+
+    def __init__(self, token):
+        self.cliente = Client(HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def pedir(self, metodo, ruta, datos=None):
+        cuerpo = json.dumps(datos) if datos is not None else ""
+        r = self.cliente.generic(metodo, ruta, cuerpo, content_type="application/json")
+        contenido = b"".join(r.streaming_content) if r.streaming else r.content
+        return r.status_code, contenido.decode("utf-8", "replace")
+
+
+class _ClienteHTTP:
+    """Peticiones HTTP a un servidor ya levantado (gunicorn / uvicorn)."""
+
+    def __init__(self, base, token):
+        self.base = base.rstrip("/")
+        self.sesion = requests.Session()
+        self.sesion.headers["Authorization"] = f"Bearer {token}"
+
+    def pedir(self, metodo, ruta, datos=None):
+        r = self.sesion.request(metodo, self.base + ruta, json=datos, timeout=120)
+        return r.status_code, r.text
+
+
+def _json(texto):
+    try:
+        return json.loads(texto)
+    except ValueError:
+        return {}
+
+
+class _Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {e: [] for e in ENDPOINTS}
+        self.errores = {e: 0 for e in ENDPOINTS}
+        self.muestras = []
+
+    def registrar(self, endpoint, segundos, ok, detalle=""):
+        with self._lock:
+            self.latencias[endpoint].append(segundos)
+            if not ok:
+                self.errores[endpoint] += 1
+                if len(self.muestras) < 5:
+                    self.muestras.append(f"{endpoint}: {detalle[:200]}")
+
+    def reporte(self) -> dict:
+        reporte = {}
+        for endpoint, lat in self.latencias.items():
+            if not lat:
+                continue
+            reporte[endpoint] = {
+                "peticiones": len(lat),
+                **resumen(lat, maximo=True),
+                "tasa_error": round(self.errores[endpoint] / len(lat), 4),
+            }
+        return reporte
+
+
+class Command(BaseCommand):
+    help = "Carga de punta a punta: iniciar -> 57/60 PATCH progreso -> finalizar (y stream) contra un Groq local."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grado", choices=["9", "10_11", "ambos"], default="ambos")
+        parser.add_argument("--sesiones", type=int, default=20, help="Estudiantes por grado.")
+        parser.add_argument("--concurrencia", type=int, default=10, help="Sesiones simultáneas.")
+        parser.add_argument("--por-patch", type=int, default=1, help="Respuestas por PATCH de progreso.")
+        parser.add_argument("--pausa-ms", type=float, default=0.0, help="Pausa entre PATCHes de una sesión.")
+        parser.add_argument("--explicaciones", choices=["cola", "sincrona"], default=None,
+                            help="Modo de explicaciones en proceso (default: ALI_EXPLICACIONES).")
+        parser.add_argument("--sin-stream", action="store_true",
+                            help="No pedir explicacion/stream tras finalizar (modo cola).")
+        parser.add_argument("--url", help="Servidor ya levantado (en lugar del stack en proceso).")
+        parser.add_argument("--groq-url", help="Groq local ya levantado (manage.py groq_stub).")
+        parser.add_argument("--conservar", action="store_true", help="No borrar usuarios ni tests de la corrida.")
+        parser.add_argument("--cache-explicaciones", action="store_true",
+                            help="Usar el cache persistente de explicaciones (y las pregeneradas) en proceso.")
+        parser.add_argument("--json", action="store_true")
+        agregar_argumentos_stub(parser)
+
+    def handle(self, *args, **opts):
+        if min(opts["sesiones"], opts["concurrencia"], opts["por_patch"]) < 1:
+            raise CommandError("--sesiones, --concurrencia y --por-patch deben ser >= 1")
+        if opts["groq_url"] and "api.groq.com" in opts["groq_url"]:
+            raise CommandError("--groq-url debe ser un Groq local, no la API real.")
+        if opts["url"] and (opts["groq_url"] or opts["explicaciones"]):
+            raise CommandError("Con --url, Groq y el modo de explicaciones los configura el servidor.")
+        claves = ["9", "10_11"] if opts["grado"] == "ambos" else [opts["grado"]]
+        self.corrida = uuid.uuid4().hex[:8]
+
+        stub = None
+        if not opts["url"] and not opts["groq_url"]:
+            stub = ServidorGroqStub(**opciones_stub(opts)).iniciar()
+        restaurar = self._preparar_en_proceso(opts, stub.url if stub else opts["groq_url"]) if not opts["url"] else None
+        en_cola = cola.EN_COLA if not opts["url"] else True
+        self.stream = en_cola and not opts["sin_stream"]
+        try:
+            reporte = {clave: self._correr(clave, opts) for clave in claves}
+        finally:
+            if restaurar:
+                restaurar()
+            if stub:
+                reporte_stub = stub.estadisticas()
+                stub.detener()
+            if not opts["conservar"]:
+                self._limpiar()
+        extra = {"groq_local": reporte_stub} if stub else {}
+        if not opts["url"]:
+            extra["circuito_groq"] = GROQ.estado_circuito()
+            extra["admision_groq"] = ADMISION.estadisticas()
+            extra["explicacion_local"] = METRICAS_LOCAL.estadisticas()
+
+        if opts["json"]:
+            self.stdout.write(json.dumps({"grados": reporte, **extra}, indent=2, ensure_ascii=False))
+            return
+        for clave, r in reporte.items():
+            self.stdout.write(
+                f"[{clave}] {r['sesiones']} sesiones, concurrencia {opts['concurrencia']}: {r['total_s']} s, "
+                f"{r['sesiones_ok']} completas, {r['explicaciones_respaldo']} con explicación de respaldo"
+            )
+            for endpoint, e in r["endpoints"].items():
+                self.stdout.write(
+                    f"  {endpoint:<19} {e['peticiones']:6d} pet.  p50 {e['p50_ms']:8.1f} ms  "
+                    f"p95 {e['p95_ms']:8.1f} ms  máx. {e['max_ms']:8.1f} ms  error {e['tasa_error']:.1%}"
+                )
+            for muestra in r["muestras_error"]:
+                self.stdout.write(f"    ! {muestra}")
+        for nombre, valor in extra.items():
+            self.stdout.write(f"{nombre}: {valor}")
+
+    # ---------- preparación ----------
+    def _preparar_en_proceso(self, opts, groq_url):
+        """Apunta GROQ al stub, fija el modo de explicaciones y apaga el cache persistente; devuelve cómo deshacerlo."""
+        import importlib
+
+        antes = {"url": GROQ.url, "api_key": GROQ._api_key, "en_cola": cola.EN_COLA}
+        GROQ.url, GROQ._api_key = groq_url, "stub"
+        if opts["explicaciones"]:
+            cola.EN_COLA = opts["explicaciones"] == "cola"
+        caches = [importlib.import_module(g.servicio).CACHE for g in GRADOS.values()]
+        if opts["cache_explicaciones"]:
+            caches = []
+        persistentes = [c.persistente for c in caches]
+        for c in caches:
+            c.persistente = False
+            c.limpiar_memoria()
+
+        def restaurar():
+            GROQ.url, GROQ._api_key, cola.EN_COLA = antes["url"], antes["api_key"], antes["en_cola"]
+            for c, persistente in zip(caches, persistentes):
+                c.persistente = persistente
+                c.limpiar_memoria()  # sin textos del stub
+
+        return restaurar
+
+    def _usuarios(self, clave, n):
+        from rest_framework_simplejwt.tokens import AccessToken
+        from Usuario.models import Usuario
+
+        tokens = []
+        for i in range(n):
+            nombre = f"carga-{self.corrida}-{clave}-{i}"
+            usuario = Usuario.objects.create_user(email=f"{nombre}@carga.local", username=nombre)
+            tokens.append(str(AccessToken.for_user(usuario)))
+        return tokens
+
+    def _limpiar(self):
+        from Usuario.models import Usuario
+
+        Usuario.objects.filter(username__startswith=f"carga-{self.corrida}-").delete()  # CASCADE: sus tests
+
+    # ---------- corrida ----------
+    def _correr(self, clave, opts):
+        import importlib
+
+        grado = GRADOS[clave]
+        bloques = getattr(importlib.import_module(grado.servicio), grado.bloques)
+        hojas = codigos_a_texto(generar_codigos(opts["sesiones"], grado.total, bloques, seed=opts["seed"] or 0),
+                                prop_letras=0.2, seed=opts["seed"] or 0)
+        tokens = self._usuarios(clave, opts["sesiones"])
+        metricas = _Metricas()
+
+        def sesion(i):
+            cliente = _ClienteHTTP(opts["url"], tokens[i]) if opts["url"] else _ClienteLocal(tokens[i])
+            try:
+                return self._sesion(grado, cliente, hojas[i], metricas, opts)
+            finally:
+                connection.close()  # conexión del hilo del pool
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=opts["concurrencia"]) as pool:
+            completas = sum(pool.map(sesion, range(opts["sesiones"])))
+        total_s = time.perf_counter() - t0
+
+        return {
+            "sesiones": opts["sesiones"],
+            "sesiones_ok": completas,
+            "total_s": round(total_s, 2),
+            "explicaciones_respaldo": self._respaldos(clave),
+            "endpoints": metricas.reporte(),
+            "muestras_error": metricas.muestras,
+        }
+
+    def _medir(self, metricas, endpoint, cliente, metodo, ruta, datos=None, ok=None):
+        t0 = time.perf_counter()
+        try:
+            status, texto = cliente.pedir(metodo, ruta, datos)
+        except Exception as e:
+            metricas.registrar(endpoint, time.perf_counter() - t0, False, f"{type(e).__name__}: {e}")
+            return None
+        bien = 200 <= status < 300 and (ok is None or ok(texto))
+        metricas.registrar(endpoint, time.perf_counter() - t0, bien, f"{status} {texto}")
+        return texto if bien else None
+
+    def _sesion(self, grado, cliente, hoja, metricas, opts) -> bool:
+        """Una sesión completa; True si terminó finalizada (y con la explicación, si se pidió el stream)."""
+        texto = self._medir(metricas, "iniciar", cliente, "POST", grado.ruta + "iniciar/")
+        if texto is None:
+            return False
+        pk = _json(texto).get("id")
+        for inicio in range(0, grado.total, opts["por_patch"]):
+            fin = min(inicio + opts["por_patch"], grado.total)
+            ultimo = fin == grado.total
+            datos = {"respuestas": {f"pregunta_{n}": hoja[n - 1] for n in range(inicio + 1, fin + 1)},
+                     "ultima_pregunta": fin}
+            finalizado = (lambda t: _json(t).get("estado") == "FINALIZADO") if ultimo else None
+            if self._medir(metricas, "finalizar" if ultimo else "progreso", cliente, "PATCH",
+                           f"{grado.ruta}{pk}/progreso/", datos, ok=finalizado) is None:
+                return False
+            if opts["pausa_ms"] and not ultimo:
+                time.sleep(opts["pausa_ms"] / 1000)
+        if not self.stream:
+            return True
+        lista = lambda t: '"explicacion_estado": "LISTA"' in t.rsplit("event: fin", 1)[-1]
+        return self._medir(metricas, "explicacion_stream", cliente, "GET",
+                           f"{grado.ruta}{pk}/explicacion/stream/", ok=lista) is not None
+
+    def _respaldos(self, clave) -> int:
+        """
+        Tests de la corrida que se quedaron sin explicación de Groq por agotar los
+        intentos (ERROR) o con TEXTO_FALLBACK. Los respaldos locales de la finalización
+        síncrona quedan LISTA: se cuentan en `explicacion_local` (solo en proceso).
+        """
+        from test_grado9.models import TestGrado9
+        from test_grado_10_11.models import TestGrado10_11
+
+        Modelo = TestGrado9 if clave == "9" else TestGrado10_11
+        return (Modelo.objects
+                .filter(usuario__username__startswith=f"carga-{self.corrida}-{clave}-")
+                .filter(Q(explicacion_estado=cola.ERROR) | Q(resultado__contains=cola.TEXTO_FALLBACK))
+                .count())
@@ -0,0 +1,111 @@
+# ali_ia/management/commands/exportar_destilado.py
+"""
+Destila los bosques en un modelo JSON para el cliente (ver ali_ia/destilado.py)
+y reporta su fidelidad contra el modelo real.
+
+    manage.py exportar_destilado --modelo 10_11 --tipo arbol --profundidad 5
+
+Escribe `<salida>/<nombre>-<version>-<tipo>.json` (atómico). El entrenamiento y la
+prueba usan hojas sintéticas distintas (semillas distintas); las hojas "parciales"
+son las de prueba con --prop-sin-responder de las preguntas en blanco.
+"""
+import importlib
+import json
+import os
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ali_ia.destilado import TIPOS, destilar, fidelidad
+from ali_ia.sinteticos import generar_codigos
+
+MODELOS = {
+    "9": ("grado9", "test_grado9.ml_model.model9", "PREGUNTAS_POR_TECNICO", 57),
+    "10_11": ("grado10_11", "test_grado_10_11.ml_model.model_10y11", "PREGUNTAS_CLAVE_POR_CARRERA", 60),
+}
+
+
+def _guardar_json(ruta, datos):
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".destilado-", dir=directorio)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False, separators=(",", ":"))
+        os.chmod(tmp, 0o644)  # mkstemp crea 0600
+        os.replace(tmp, ruta)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Command(BaseCommand):
+    help = "Exporta un modelo destilado (JSON) de los bosques para resultados provisionales en el cliente."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=["9", "10_11", "todos"], default="todos")
+        parser.add_argument("--tipo", choices=TIPOS, default="lineal")
+        parser.add_argument("--profundidad", type=int, default=5, help="Solo --tipo arbol.")
+        parser.add_argument("--n", type=int, default=20000, help="Hojas sintéticas de entrenamiento.")
+        parser.add_argument("--n-prueba", type=int, default=5000, help="Hojas sintéticas para la fidelidad.")
+        parser.add_argument("--prop-sin-responder", type=float, default=0.5)
+        parser.add_argument("--min-concordancia", type=float, default=0.0,
+                            help="Falla (sin escribir) si la concordancia top-1 queda por debajo.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--salida", default=os.path.join(str(settings.BASE_DIR), "destilados"))
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        claves = ["9", "10_11"] if opts["modelo"] == "todos" else [opts["modelo"]]
+        reporte = [self._exportar(clave, opts) for clave in claves]
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+            return
+        for r in reporte:
+            c, p = r["fidelidad"]["completas"], r["fidelidad"]["parciales"]
+            self.stdout.write(self.style.SUCCESS(f"{r['modelo']}: {r['ruta']} ({r['kb']} KB)"))
+            self.stdout.write(
+                f"  completas: top-1 {c['concordancia_top1']:.1%}, top-1 en top-3 {c['top1_en_top3']:.1%}, "
+                f"solape top-3 {c['solape_top3']:.1%}, error abs. medio {c['error_abs_medio']}"
+            )
+            self.stdout.write(
+                f"  parciales ({p['prop_respondidas']:.0%} respondidas): top-1 {p['concordancia_top1']:.1%}, "
+                f"top-1 en top-3 {p['top1_en_top3']:.1%}"
+            )
+
+    def _exportar(self, clave, opts):
+        nombre, modulo, bloques_attr, total = MODELOS[clave]
+        mod = importlib.import_module(modulo)
+        art = mod.MODELO.obtener()
+        bloques = getattr(mod, bloques_attr)
+
+        def _proba(A):
+            return np.asarray(mod._predict_proba(art.plan.vectorizar(A), art))
+
+        A = generar_codigos(opts["n"], total, bloques, seed=opts["seed"])
+        modelo = destilar(nombre, art.version, art.nombres_clases, bloques, total, A, _proba(A),
+                          tipo=opts["tipo"], profundidad=opts["profundidad"])
+
+        prueba = generar_codigos(opts["n_prueba"], total, bloques, seed=opts["seed"] + 1)
+        rng = np.random.default_rng(opts["seed"] + 2)
+        parcial = np.where(rng.random(prueba.shape) < opts["prop_sin_responder"], 0, prueba).astype(np.uint8)
+        modelo["fidelidad"] = fidelidad(modelo, prueba, _proba(prueba), parcial)
+
+        concordancia = modelo["fidelidad"]["completas"]["concordancia_top1"]
+        if concordancia < opts["min_concordancia"]:
+            raise CommandError(
+                f"{nombre}: concordancia top-1 {concordancia:.1%} < --min-concordancia {opts['min_concordancia']:.1%}"
+            )
+
+        ruta = os.path.join(opts["salida"], f"{nombre}-{art.version}-{opts['tipo']}.json")
+        _guardar_json(ruta, modelo)
+        return {
+            "modelo": nombre,
+            "ruta": ruta,
+            "kb": round(os.path.getsize(ruta) / 1024, 1),
+            "fidelidad": modelo["fidelidad"],
+        }
@@ -0,0 +1,83 @@
+# ali_ia/management/commands/exportar_paquete.py
+"""
+Exporta los modelos (pickle/joblib + CSVs) a paquetes memory-map
+(`<salida>/<nombre>-<version>/`, ver ali_ia/paquete_modelo.py).
+
+Para servir desde el paquete:
+    ALI_PAQUETE_GRADO9=<ruta>  ALI_PAQUETE_GRADO10_11=<ruta>
+"""
+import importlib
+import json
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ali_ia.paquete_modelo import PaqueteInvalido, cargar_paquete, exportar_paquete
+from ali_ia.sinteticos import generar_codigos
+
+MODELOS = {
+    "9": ("grado9", "test_grado9.ml_model.model9", "PREGUNTAS_POR_TECNICO", 57),
+    "10_11": ("grado10_11", "test_grado_10_11.ml_model.model_10y11", "PREGUNTAS_CLAVE_POR_CARRERA", 60),
+}
+
+
+class Command(BaseCommand):
+    help = "Exporta los modelos a paquetes .npy + manifest.json que se cargan con memory-map."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=["9", "10_11", "todos"], default="todos")
+        parser.add_argument("--salida", default=os.path.join(str(settings.BASE_DIR), "paquetes_modelo"))
+        parser.add_argument("--comprobar", type=int, default=1000,
+                            help="Hojas sintéticas para comparar paquete vs. pickle (0 = no comparar).")
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        claves = ["9", "10_11"] if opts["modelo"] == "todos" else [opts["modelo"]]
+        reporte = []
+        for clave in claves:
+            nombre, modulo, bloques, total = MODELOS[clave]
+            mod = importlib.import_module(modulo)
+
+            t0 = time.perf_counter()
+            art = mod._cargar_desde_pickle()
+            carga_pickle = time.perf_counter() - t0
+            try:
+                ruta = exportar_paquete(opts["salida"], nombre, art)
+            except PaqueteInvalido as e:
+                raise CommandError(str(e))
+
+            t0 = time.perf_counter()
+            bosque, manifiesto = cargar_paquete(ruta, verificar=True)
+            carga_paquete = time.perf_counter() - t0
+
+            distintas = None
+            if opts["comprobar"]:
+                A = generar_codigos(opts["comprobar"], total, getattr(mod, bloques), seed=0)
+                X = art.plan.vectorizar(A)
+                distintas = int((~np.all(bosque.predict_proba(X) == art.bosque.predict_proba(X), axis=1)).sum())
+                if distintas:
+                    raise CommandError(f"{nombre}: {distintas} filas difieren entre paquete y pickle.")
+
+            bytes_total = sum(os.path.getsize(os.path.join(ruta, a)) for a in manifiesto["archivos"])
+            reporte.append({
+                "modelo": nombre,
+                "ruta": ruta,
+                "version": manifiesto["version"],
+                "mb": round(bytes_total / 1e6, 3),
+                "carga_pickle_ms": round(carga_pickle * 1000, 1),
+                "carga_paquete_ms": round(carga_paquete * 1000, 1),
+                "filas_comparadas": opts["comprobar"],
+                "filas_distintas": distintas,
+            })
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+            return
+        for r in reporte:
+            self.stdout.write(self.style.SUCCESS(
+                f"{r['modelo']}: {r['ruta']} ({r['mb']} MB, versión {r['version']}) — "
+                f"carga pickle {r['carga_pickle_ms']} ms vs paquete {r['carga_paquete_ms']} ms"
+            ))
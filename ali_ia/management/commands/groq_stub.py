@@ -0,0 +1,73 @@
+# ali_ia/management/commands/groq_stub.py
+"""
+Groq local (ali_ia/groq_stub.py) para pruebas de carga sin llamar a la API real.
+
+    manage.py groq_stub --puerto 8765 --latencia 0.8 --jitter 0.3 --tasa-error 0.02 \\
+        --rafaga-429-cada 60 --rafaga-429-dura 5
+
+Luego se arranca el backend (o el worker) con
+    ALI_GROQ_URL=http://127.0.0.1:8765/openai/v1/chat/completions GROQ_API_KEY=stub
+"""
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ali_ia.groq_stub import ServidorGroqStub
+
+
+def agregar_argumentos_stub(parser):
+    """Opciones del stub; las comparten groq_stub y carga_finalizacion."""
+    parser.add_argument("--latencia", type=float, default=0.5,
+                        help="Segundos antes de responder (en stream: hasta el primer token).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± segundos aleatorios sobre la latencia.")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Fracción de llamadas que responden 500.")
+    parser.add_argument("--rafaga-429-cada", type=float, default=0.0,
+                        help="Período (s) de las ráfagas de 429; 0 = sin ráfagas.")
+    parser.add_argument("--rafaga-429-dura", type=float, default=0.0, help="Duración (s) de cada ráfaga de 429.")
+    parser.add_argument("--ms-por-token", type=float, default=20.0, help="Pausa entre fragmentos en stream.")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def opciones_stub(opts) -> dict:
+    if not 0 <= opts["tasa_error"] <= 1:
+        raise CommandError("--tasa-error debe estar entre 0 y 1")
+    if min(opts["latencia"], opts["jitter"], opts["rafaga_429_cada"], opts["rafaga_429_dura"], opts["ms_por_token"]) < 0:
+        raise CommandError("Latencias, jitter y ráfagas no pueden ser negativos")
+    return {
+        "latencia_s": opts["latencia"],
+        "jitter_s": opts["jitter"],
+        "tasa_error": opts["tasa_error"],
+        "rafaga_429_cada_s": opts["rafaga_429_cada"],
+        "rafaga_429_dura_s": opts["rafaga_429_dura"],
+        "ms_por_token": opts["ms_por_token"],
+        "seed": opts["seed"],
+    }
+
+
+class Command(BaseCommand):
+    help = "Servidor local compatible con /openai/v1/chat/completions de Groq (latencia, errores, 429, stream)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--puerto", type=int, default=8765)
+        agregar_argumentos_stub(parser)
+
+    def handle(self, *args, **opts):
+        try:
+            servidor = ServidorGroqStub(host=opts["host"], puerto=opts["puerto"], **opciones_stub(opts))
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir {opts['host']}:{opts['puerto']}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Groq local en {servidor.url}"))
+        self.stdout.write(f"  ALI_GROQ_URL={servidor.url} GROQ_API_KEY=stub")
+
+        def _terminar(signum, frame):
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGTERM, _terminar)
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+            self.stdout.write(f"Groq local detenido: {servidor.estadisticas()}")
@@ -0,0 +1,114 @@
+# ali_ia/management/commands/medir_memoria_workers.py
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+CAMPOS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def _leer_smaps(pid: int) -> dict:
+    """kB por campo desde /proc/<pid>/smaps_rollup (Linux)."""
+    datos = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) >= 2 and partes[0].rstrip(":") in CAMPOS:
+                datos[partes[0].rstrip(":")] = int(partes[1])
+    datos["Uss"] = datos.get("Private_Clean", 0) + datos.get("Private_Dirty", 0)
+    return datos
+
+
+def _cmdline(pid: int) -> str:
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        return f.read().replace(b"\0", b" ").decode(errors="ignore").strip()
+
+
+def _hijos(pid: int) -> list:
+    hijos = []
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entrada}/stat") as f:
+                # el nombre puede tener espacios: el ppid va después del último ')'
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            hijos.append(int(entrada))
+    return sorted(hijos)
+
+
+def _buscar_maestro() -> int:
+    candidatos = []
+    for entrada in os.listdir("/proc"):
+        if not entrada.isdigit():
+            continue
+        try:
+            cmd = _cmdline(int(entrada))
+        except OSError:
+            continue
+        # el ejecutable (o el script si es "python .../gunicorn") debe ser gunicorn
+        programa = [os.path.basename(t) for t in cmd.split()[:2]]
+        if any(t.startswith("gunicorn") for t in programa) and "ali_backend" in cmd:
+            candidatos.append(int(entrada))
+    # el maestro es el candidato cuyo padre no es otro candidato
+    for pid in candidatos:
+        if not any(pid in _hijos(otro) for otro in candidatos if otro != pid):
+            return pid
+    raise CommandError("No se encontró un maestro de gunicorn para ali_backend; usa --pid.")
+
+
+class Command(BaseCommand):
+    help = ("Mide la memoria única (USS) y proporcional (PSS) del maestro y cada worker de gunicorn "
+            "para decidir cuántos workers caben en la instancia (medir con tráfico real: "
+            "los workers recién forkeados aún no han copiado páginas).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pid", type=int, help="PID del maestro de gunicorn (por defecto se busca).")
+        parser.add_argument("--memoria-mb", type=int,
+                            help="Memoria disponible de la instancia; estima cuántos workers caben.")
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        if not os.path.exists("/proc/self/smaps_rollup"):
+            raise CommandError("Requiere Linux con /proc/<pid>/smaps_rollup.")
+
+        maestro = opts["pid"] or _buscar_maestro()
+        procesos = [("maestro", maestro)] + [("worker", pid) for pid in _hijos(maestro)]
+        filas = []
+        for rol, pid in procesos:
+            try:
+                filas.append({"rol": rol, "pid": pid, **_leer_smaps(pid)})
+            except OSError as e:
+                self.stderr.write(f"pid {pid}: {e}")
+
+        workers = [f for f in filas if f["rol"] == "worker"]
+        resumen = {
+            "workers": len(workers),
+            "uss_promedio_worker_kb": round(sum(w["Uss"] for w in workers) / len(workers)) if workers else 0,
+            "pss_total_kb": sum(f.get("Pss", 0) for f in filas),
+        }
+        if opts["memoria_mb"] and workers:
+            maestro_kb = next((f["Rss"] for f in filas if f["rol"] == "maestro"), 0)
+            libre_kb = opts["memoria_mb"] * 1024 - maestro_kb
+            resumen["workers_que_caben"] = max(0, int(libre_kb // max(1, resumen["uss_promedio_worker_kb"])))
+
+        if opts["json"]:
+            self.stdout.write(json.dumps({"procesos": filas, "resumen": resumen}, indent=2))
+            return
+
+        self.stdout.write(f"{'rol':8} {'pid':>7} {'RSS MB':>8} {'PSS MB':>8} {'USS MB':>8} {'compartida MB':>14}")
+        for f in filas:
+            compartida = f.get("Shared_Clean", 0) + f.get("Shared_Dirty", 0)
+            self.stdout.write(
+                f"{f['rol']:8} {f['pid']:>7} {f.get('Rss', 0) / 1024:8.1f} {f.get('Pss', 0) / 1024:8.1f} "
+                f"{f['Uss'] / 1024:8.1f} {compartida / 1024:14.1f}"
+            )
+        self.stdout.write(
+            f"\n{resumen['workers']} workers, USS promedio {resumen['uss_promedio_worker_kb'] / 1024:.1f} MB, "
+            f"PSS total {resumen['pss_total_kb'] / 1024:.1f} MB"
+        )
+        if "workers_que_caben" in resumen:
+            self.stdout.write(f"Con {opts['memoria_mb']} MB caben ~{resumen['workers_que_caben']} workers.")
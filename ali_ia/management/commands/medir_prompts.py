@@ -0,0 +1,92 @@
+# ali_ia/management/commands/medir_prompts.py
+"""
+Tamaño (tokens estimados) de los prompts de explicación, sin llamar a Groq.
+
+    manage.py medir_prompts                     # 9° y 10/11
+    manage.py medir_prompts --max-tokens 450    # falla si el p95 pasa el presupuesto (CI)
+
+Arma los mensajes con `construir_mensajes` de cada groq_service sobre hojas
+sintéticas (objetivo = bloque de mayor interés) y reporta media / p95 / máx. de
+tokens por prompt, junto con lo que ocuparían las respuestas crudas `pregunta_i`
+frente al resumen por bloque.
+"""
+import importlib
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ali_ia.prompts import MetricasPrompts, estimar_tokens, medias_por_bloque, resumir_respuestas
+from ali_ia.sinteticos import generar_codigos
+
+MODELOS = {
+    "9": ("test_grado9.groq_service", "PREGUNTAS_POR_TECNICO", 57),
+    "10_11": ("test_grado_10_11.groq_service", "PREGUNTAS_CLAVE_POR_CARRERA", 60),
+}
+
+
+def _mensajes_9(servicio, objetivo, respuestas):
+    from test_grado9.views import MODALIDAD_POR_TECNICO
+
+    return servicio.construir_mensajes(MODALIDAD_POR_TECNICO[objetivo], respuestas, tecnico=objetivo)
+
+
+def _mensajes_10_11(servicio, objetivo, respuestas):
+    return servicio.construir_mensajes(objetivo, respuestas)
+
+
+CONSTRUIR = {"9": _mensajes_9, "10_11": _mensajes_10_11}
+
+
+class Command(BaseCommand):
+    help = "Tokens estimados por prompt de explicación (9° y 10/11) sobre hojas sintéticas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=["9", "10_11", "todos"], default="todos")
+        parser.add_argument("--n", type=int, default=200, help="Hojas sintéticas por modelo.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--max-tokens", type=int, default=None,
+                            help="Presupuesto: error si el p95 de algún modelo lo supera.")
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        if opts["n"] < 1:
+            raise CommandError("--n debe ser >= 1")
+        claves = ["9", "10_11"] if opts["modelo"] == "todos" else [opts["modelo"]]
+        reporte = [self._medir(clave, opts) for clave in claves]
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+        else:
+            for r in reporte:
+                self.stdout.write(
+                    f"[{r['modelo']}] {r['prompts']} prompts: media {r['tokens_media']} tokens, "
+                    f"p95 {r['tokens_p95']}, máx. {r['tokens_max']}; respuestas crudas "
+                    f"~{r['tokens_respuestas_crudas']} tokens vs resumen ~{r['tokens_resumen']}"
+                )
+
+        excedidos = [r["modelo"] for r in reporte
+                     if opts["max_tokens"] is not None and r["tokens_p95"] > opts["max_tokens"]]
+        if excedidos:
+            raise CommandError(f"p95 de tokens por encima de {opts['max_tokens']} en: {', '.join(excedidos)}")
+
+    def _medir(self, clave, opts):
+        modulo, atributo, total = MODELOS[clave]
+        servicio = importlib.import_module(modulo)
+        bloques = getattr(servicio, atributo)
+        A = generar_codigos(opts["n"], total, bloques, seed=opts["seed"])
+
+        metricas = MetricasPrompts()
+        crudas = resumen = 0
+        for fila in A.tolist():
+            respuestas = {f"pregunta_{i}": int(c) for i, c in enumerate(fila, start=1)}
+            objetivo = medias_por_bloque(respuestas, bloques)[0][0]
+            metricas.registrar(clave, CONSTRUIR[clave](servicio, objetivo, respuestas))
+            crudas += estimar_tokens(json.dumps(respuestas, ensure_ascii=False))
+            resumen += estimar_tokens(resumir_respuestas(respuestas, bloques))
+
+        return {
+            "modelo": clave,
+            **metricas.estadisticas()[clave],
+            "tokens_respuestas_crudas": round(crudas / len(A), 1),
+            "tokens_resumen": round(resumen / len(A), 1),
+        }
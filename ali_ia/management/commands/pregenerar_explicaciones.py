@@ -0,0 +1,249 @@
+# ali_ia/management/commands/pregenerar_explicaciones.py
+"""
+Explicaciones de Groq pregeneradas para los perfiles de resultado más comunes.
+
+    manage.py pregenerar_explicaciones --top 100 --hilos 4    # diario (cron), fuera de horario
+    manage.py pregenerar_explicaciones --solo-cobertura       # solo el reporte
+
+Un perfil es (técnico / carrera predicha, bloques dominantes del test), la misma
+clave del cache de explicaciones (ali_ia/cache_explicaciones.py). Son pocos y
+unos cuantos cubren a casi todos los estudiantes. El comando:
+
+1. cuenta los perfiles de los tests finalizados en los últimos --dias;
+2. para los --top más frecuentes (con al menos --min-tests) genera la explicación
+   con Groq en --hilos hilos, pidiendo cupo a ADMISION (ALI_GROQ_RPM/TPM; con el
+   cache "compartida" el presupuesto se comparte con web y worker), y la
+   guarda marcada como pregenerada (no se desaloja por tamaño, vence por TTL).
+   Si el perfil ya tenía explicación vigente en el cache solo se marca; --forzar
+   la regenera. El prompt usa las respuestas del test más reciente del perfil;
+3. reporta cobertura sobre las finalizaciones de los últimos --dias-cobertura:
+   cuántas recibieron el texto pregenerado (finalizadas después de pregenerarlo:
+   no cuentan el estudiante que esperó a Groq para crear la fila ni los tests
+   anteriores a marcarla) y cuántas tienen perfil pregenerado.
+
+En modo cola, _finalizar_y_predecir sirve la explicación guardada al instante (el
+test queda LISTA sin pasar por el worker); en modo síncrono ya la servía el cache.
+"""
+import importlib
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from ali_ia import cola_explicaciones as cola
+from ali_ia import explicacion_local
+from ali_ia.admision_groq import ADMISION, es_saturacion
+from ali_ia.groq_client import GROQ
+
+CONFIG = {
+    "9": (("test_grado9.models", "TestGrado9"), "test_grado9.views", "test_grado9.groq_service"),
+    "10_11": (("test_grado_10_11.models", "TestGrado10_11"), "test_grado_10_11.views",
+              "test_grado_10_11.groq_service"),
+}
+TROZO = 500  # claves por consulta `clave__in`
+
+
+def perfiles_frecuentes(perfiles, top: int, min_tests: int = 1) -> list:
+    """
+    [(clave, datos), ...] del test más reciente al más antiguo -> [(clave, n, datos)]
+    de los `top` perfiles más frecuentes con al menos `min_tests`; datos del más reciente.
+    """
+    conteo, ejemplo = Counter(), {}
+    for clave, datos in perfiles:
+        conteo[clave] += 1
+        ejemplo.setdefault(clave, datos)
+    return [(clave, n, ejemplo[clave]) for clave, n in conteo.most_common(top) if n >= min_tests]
+
+
+def contar_cobertura(recientes, pregeneradas) -> tuple:
+    """
+    [(clave, texto, fecha_realizacion), ...] y {clave: (texto, pregenerada_en)} ->
+    (servidas, con_perfil): servidas llevan el texto pregenerado y se finalizaron
+    después de pregenerarlo; con_perfil, todas las de un perfil pregenerado.
+    """
+    servidas = con_perfil = 0
+    for clave, texto, fecha in recientes:
+        if clave not in pregeneradas:
+            continue
+        con_perfil += 1
+        pregenerado, desde = pregeneradas[clave]
+        if desde is not None and fecha is not None and fecha >= desde \
+                and (texto or "").strip() == pregenerado.strip():
+            servidas += 1
+    return servidas, con_perfil
+
+
+def _en_hilo(fn, *args):
+    try:
+        return fn(*args)
+    finally:
+        connection.close()
+
+
+def _pregeneradas(cache, claves) -> dict:
+    """{clave: (texto, pregenerada_en)} de las filas pregeneradas vigentes entre `claves`."""
+    from ali_ia.models import ExplicacionCacheada
+
+    claves, textos = list(claves), {}
+    vigentes = timezone.now() - timedelta(seconds=cache.ttl_s)
+    for i in range(0, len(claves), TROZO):
+        filas = (ExplicacionCacheada.objects
+                 .filter(modelo=cache.nombre, pregenerada=True, creada__gte=vigentes, clave__in=claves[i:i + TROZO])
+                 .values_list("clave", "texto", "pregenerada_en"))
+        textos.update((clave, (texto, desde)) for clave, texto, desde in filas)
+    return textos
+
+
+class Command(BaseCommand):
+    help = "Pregenera con Groq las explicaciones de los perfiles de resultado más comunes y reporta su cobertura."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=["9", "10_11", "todos"], default="todos")
+        parser.add_argument("--dias", type=int, default=90, help="Ventana de tests finalizados para contar perfiles.")
+        parser.add_argument("--top", type=int, default=100, help="Perfiles más frecuentes a pregenerar por modelo.")
+        parser.add_argument("--min-tests", type=int, default=2, help="Tests mínimos para pregenerar un perfil.")
+        parser.add_argument("--hilos", type=int, default=4, help="Llamadas a Groq en paralelo (dentro del cupo).")
+        parser.add_argument("--espera-max", type=float, default=120.0,
+                            help="Segundos que una llamada espera cupo en Groq antes de darse por perdida.")
+        parser.add_argument("--forzar", action="store_true", help="Regenera aunque el perfil ya esté en el cache.")
+        parser.add_argument("--dias-cobertura", type=int, default=7, help="Ventana del reporte de cobertura.")
+        parser.add_argument("--solo-cobertura", action="store_true")
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        if min(opts["dias"], opts["top"], opts["min_tests"], opts["hilos"], opts["dias_cobertura"]) < 1:
+            raise CommandError("--dias, --top, --min-tests, --hilos y --dias-cobertura deben ser >= 1")
+        if explicacion_local.LOCAL and not opts["solo_cobertura"]:
+            raise CommandError("ALI_EXPLICACIONES_MOTOR=local: no se usa Groq, no hay explicaciones que pregenerar.")
+        ADMISION.espera_max_s = opts["espera_max"]
+
+        claves = ["9", "10_11"] if opts["modelo"] == "todos" else [opts["modelo"]]
+        reporte = {}
+        for clave in claves:
+            (modulo, clase), vistas, servicio = CONFIG[clave]
+            Modelo = getattr(importlib.import_module(modulo), clase)
+            vistas = importlib.import_module(vistas)
+            cache = importlib.import_module(servicio).CACHE
+            r = {} if opts["solo_cobertura"] else self._pregenerar(Modelo, vistas, cache, opts)
+            r["cobertura"] = self._cobertura(Modelo, vistas, cache, opts["dias_cobertura"])
+            reporte[clave] = r
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(reporte, indent=2, ensure_ascii=False))
+            return
+        for clave, r in reporte.items():
+            if "perfiles" in r:
+                self.stdout.write(
+                    f"[{clave}] {r['tests']} tests en {opts['dias']} días, {r['perfiles']} perfiles; top "
+                    f"{r['elegidos']} cubren {r['cobertura_esperada']:.1%}: {r['ya_en_cache']} ya en cache "
+                    f"({r['marcadas']} marcadas), {r['generadas']} generadas, {r['sin_cupo']} sin cupo, "
+                    f"{r['fallidas']} fallidas; {r['pregeneradas']} pregeneradas vigentes ({r['total_s']} s)"
+                )
+            c = r["cobertura"]
+            if c["finalizaciones"]:
+                self.stdout.write(
+                    f"[{clave}] cobertura {opts['dias_cobertura']} días: {c['finalizaciones']} finalizaciones, "
+                    f"{c['servidas_pregeneradas']} con texto pregenerado ({c['cobertura_servida']:.1%}), "
+                    f"{c['con_perfil_pregenerado']} con perfil pregenerado ({c['cobertura_perfiles']:.1%})"
+                )
+            else:
+                self.stdout.write(f"[{clave}] sin finalizaciones en los últimos {opts['dias_cobertura']} días")
+        if not opts["solo_cobertura"]:
+            self.stdout.write(f"Groq: {GROQ.estadisticas()}")
+            self.stdout.write(f"Admisión a Groq: {ADMISION.estadisticas()}")
+
+    # ---------- perfiles de los tests finalizados ----------
+    def _perfiles(self, Modelo, vistas, cache, dias):
+        """
+        (clave, (objetivo, respuestas_norm), test) por test finalizado, de más reciente
+        a más antiguo (del test se usan `resultado` y `fecha_realizacion`).
+        """
+        tests = (Modelo.objects
+                 .filter(estado=Modelo.ESTADO_FINALIZADO,
+                         fecha_realizacion__gte=timezone.now() - timedelta(days=dias))
+                 .order_by("-fecha_realizacion", "-id")
+                 .only("respuestas", "resultado", "fecha_realizacion"))
+        for test in tests.iterator(chunk_size=500):
+            try:
+                objetivo, respuestas_norm = vistas._datos_pendiente(test)
+            except ValueError:
+                continue  # sin predicción guardada (p. ej. "Error interno")
+            contexto, objetivo, perfil = vistas._clave_explicacion(objetivo, respuestas_norm)
+            if perfil is not None:
+                yield cache.clave(contexto, objetivo, perfil), (objetivo, respuestas_norm), test
+
+    # ---------- pregeneración ----------
+    def _pregenerar(self, Modelo, vistas, cache, opts) -> dict:
+        from ali_ia.models import ExplicacionCacheada
+
+        perfiles = [(clave, datos) for clave, datos, _ in self._perfiles(Modelo, vistas, cache, opts["dias"])]
+        elegidos = perfiles_frecuentes(perfiles, opts["top"], opts["min_tests"])
+
+        marcadas = 0
+        pendientes = elegidos
+        todas = [clave for clave, _, _ in elegidos]
+        if not opts["forzar"]:
+            # Ya generada por Groq para otro estudiante y vigente: basta con marcarla
+            # (pregenerada_en = ahora: la cobertura no cuenta a ese estudiante ni a los anteriores)
+            vigentes = timezone.now() - timedelta(seconds=cache.ttl_s)
+            en_cache = set()
+            for i in range(0, len(todas), TROZO):
+                qs = ExplicacionCacheada.objects.filter(clave__in=todas[i:i + TROZO], creada__gte=vigentes)
+                en_cache.update(qs.values_list("clave", flat=True))
+                marcadas += qs.filter(pregenerada=False).update(pregenerada=True, pregenerada_en=timezone.now())
+            pendientes = [p for p in elegidos if p[0] not in en_cache]
+
+        t0 = time.perf_counter()
+        generadas = sin_cupo = fallidas = 0
+        with ThreadPoolExecutor(max_workers=opts["hilos"]) as pool:
+            futuros = [(datos, pool.submit(_en_hilo, vistas._pregenerar, *datos)) for _, _, datos in pendientes]
+            for (objetivo, _), futuro in futuros:
+                try:
+                    futuro.result()
+                    generadas += 1
+                except Exception as e:
+                    if es_saturacion(e):
+                        sin_cupo += 1
+                    else:
+                        fallidas += 1
+                        self.stderr.write(f"{Modelo.__name__} {objetivo}: {e}")
+
+        return {
+            "tests": len(perfiles),
+            "perfiles": len({clave for clave, _ in perfiles}),
+            "elegidos": len(elegidos),
+            "cobertura_esperada": round(sum(n for _, n, _ in elegidos) / len(perfiles), 4) if perfiles else 0.0,
+            "ya_en_cache": len(elegidos) - len(pendientes),
+            "marcadas": marcadas,
+            "generadas": generadas,
+            # el cache no falla si no puede escribir la tabla: lo que de verdad quedó guardado
+            "pregeneradas": len(_pregeneradas(cache, todas)),
+            "sin_cupo": sin_cupo,
+            "fallidas": fallidas,
+            "total_s": round(time.perf_counter() - t0, 2),
+        }
+
+    # ---------- cobertura ----------
+    def _cobertura(self, Modelo, vistas, cache, dias) -> dict:
+        """
+        De las finalizaciones recientes: cuántas llevan exactamente el texto pregenerado
+        de su perfil y se finalizaron después de pregenerarlo (servidas sin esperar a
+        Groq) y cuántas tienen perfil pregenerado (ver contar_cobertura). Un perfil
+        regenerado después con --forzar ya no cuenta para los tests anteriores.
+        """
+        recientes = [(clave, cola.extraer_explicacion(test.resultado), test.fecha_realizacion)
+                     for clave, _, test in self._perfiles(Modelo, vistas, cache, dias)]
+        servidas, con_perfil = contar_cobertura(recientes, _pregeneradas(cache, {r[0] for r in recientes}))
+        total = len(recientes)
+        return {
+            "finalizaciones": total,
+            "servidas_pregeneradas": servidas,
+            "cobertura_servida": round(servidas / total, 4) if total else None,
+            "con_perfil_pregenerado": con_perfil,
+            "cobertura_perfiles": round(con_perfil / total, 4) if total else None,
+        }
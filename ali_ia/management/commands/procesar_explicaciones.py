@@ -0,0 +1,101 @@
+# ali_ia/management/commands/procesar_explicaciones.py
+"""
+Worker de la cola de explicaciones (ali_ia/cola_explicaciones.py).
+
+    manage.py procesar_explicaciones                 # ciclo continuo (Procfile: worker)
+    manage.py procesar_explicaciones --una-vez       # vacía la cola y termina
+
+Toma lotes de tests con explicacion_estado PENDIENTE, llama a Groq en `--hilos`
+hilos (la llamada es I/O) y guarda la explicación en `resultado` (la local, de
+plantillas, si se agotan los intentos). Se pueden correr varios workers: en
+Postgres se reparten las filas con SKIP LOCKED.
+"""
+import importlib
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from ali_ia import cola_explicaciones as cola
+from ali_ia.admision_groq import ADMISION
+from ali_ia.explicacion_local import METRICAS_LOCAL
+from ali_ia.groq_client import GROQ
+from ali_ia.prompts import METRICAS_PROMPTS
+
+CONFIG = {
+    "9": (("test_grado9.models", "TestGrado9"), "test_grado9.views", "test_grado9.groq_service"),
+    "10_11": (("test_grado_10_11.models", "TestGrado10_11"), "test_grado_10_11.views",
+              "test_grado_10_11.groq_service"),
+}
+
+
+def _en_hilo(fn, *args):
+    # Cada hilo usa su propia conexión a la BD; se cierra al terminar la tarea
+    try:
+        return fn(*args)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Genera en segundo plano las explicaciones (Groq) de los tests finalizados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=["9", "10_11", "todos"], default="todos")
+        parser.add_argument("--lote", type=int, default=8, help="Tests tomados por vuelta y modelo.")
+        parser.add_argument("--hilos", type=int, default=4, help="Llamadas a Groq en paralelo.")
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Espera (s) cuando la cola está vacía.")
+        parser.add_argument("--max-intentos", type=int, default=cola.MAX_INTENTOS)
+        parser.add_argument("--una-vez", action="store_true", help="Procesa lo pendiente y termina.")
+
+    def handle(self, *args, **opts):
+        if opts["lote"] < 1 or opts["hilos"] < 1:
+            raise CommandError("--lote y --hilos deben ser >= 1")
+        claves = ["9", "10_11"] if opts["modelo"] == "todos" else [opts["modelo"]]
+        destinos, caches = [], []
+        for clave in claves:
+            (modulo, clase), views, servicio = CONFIG[clave]
+            Modelo = getattr(importlib.import_module(modulo), clase)
+            vistas = importlib.import_module(views)
+            destinos.append((Modelo, vistas._explicar_pendiente, vistas._explicar_pendiente_local))
+            caches.append(importlib.import_module(servicio).CACHE)
+
+        parar = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: parar.set())
+
+        totales = {}
+        with ThreadPoolExecutor(max_workers=opts["hilos"]) as pool:
+            while not parar.is_set():
+                close_old_connections()
+                hechos = 0
+                for Modelo, explicar, respaldo in destinos:
+                    tests = cola.tomar(Modelo, opts["lote"])
+                    futuros = [pool.submit(_en_hilo, cola.procesar_uno, Modelo, t, explicar, opts["max_intentos"],
+                                           respaldo)
+                               for t in tests]
+                    for futuro in futuros:
+                        estado = futuro.result()
+                        totales[estado] = totales.get(estado, 0) + 1
+                    hechos += len(tests)
+                    if tests:
+                        groq, admision = GROQ.estadisticas(), ADMISION.estadisticas()
+                        self.stdout.write(
+                            f"[{Modelo.__name__}] {len(tests)} tomadas; acumulado {totales}; groq p50 "
+                            f"{groq['p50_ms']} ms, p95 {groq['p95_ms']} ms, circuito {groq['circuito']}; "
+                            f"espera por cupo p95 {admision['espera_p95_ms']} ms, sin cupo {admision['sin_cupo']}"
+                        )
+                if not hechos:
+                    if opts["una_vez"]:
+                        break
+                    parar.wait(opts["intervalo"])
+
+        self.stdout.write(self.style.SUCCESS(f"Cola de explicaciones: {totales or 'sin tareas'}"))
+        self.stdout.write(f"Groq: {GROQ.estadisticas()}")
+        self.stdout.write(f"Admisión a Groq: {ADMISION.estadisticas()}")
+        self.stdout.write(f"Explicaciones locales: {METRICAS_LOCAL.estadisticas()}")
+        for cache in caches:
+            self.stdout.write(f"Cache de explicaciones: {cache.estadisticas()}")
+        self.stdout.write(f"Prompts (tokens estimados): {METRICAS_PROMPTS.estadisticas()}")
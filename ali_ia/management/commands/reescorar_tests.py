@@ -0,0 +1,209 @@
+# ali_ia/management/commands/reescorar_tests.py
+"""
+Re-puntúa todos los tests FINALIZADOS con el modelo actual.
+
+- Lee con cursor del lado del servidor (`.iterator(chunk_size=...)`), ordenado por id.
+- Cada chunk se puntúa con `predecir_batch` / `predecir_carrera_batch` en un
+  pool de procesos (el modelo se precarga antes del fork y se comparte).
+- Conserva la explicación ya guardada (no se vuelve a llamar a Groq) mientras el
+  técnico / carrera top-1 no cambie. Si cambia, la explicación vieja ya no sirve:
+  se usa la pregenerada del nuevo perfil si la hay; si no, queda PENDIENTE para el
+  worker de la cola (con ALI_EXPLICACIONES=sincrona no hay worker: explicación local).
+- Escribe `resultado` + `modelo_version` (y el estado de la explicación) con `bulk_update`.
+- `--checkpoint` guarda el último id escrito por modelo para poder reanudar.
+"""
+import importlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date, parse_datetime
+
+from ali_ia import cola_explicaciones as cola
+
+CONFIG = {
+    "9": {
+        "modelo": ("test_grado9.models", "TestGrado9"),
+        "views": "test_grado9.views",
+        "ml": "test_grado9.ml_model.model9",
+        "batch": "predecir_batch",
+        "objetivo": "tecnico_predicho",
+    },
+    "10_11": {
+        "modelo": ("test_grado_10_11.models", "TestGrado10_11"),
+        "views": "test_grado_10_11.views",
+        "ml": "test_grado_10_11.ml_model.model_10y11",
+        "batch": "predecir_carrera_batch",
+        "objetivo": "carrera_predicha",
+    },
+}
+
+
+def _extraer_explicacion(resultado) -> str:
+    explicacion = cola.extraer_explicacion(resultado)
+    return cola.TEXTO_FALLBACK if explicacion is None else explicacion
+
+
+def _primera_linea(resultado) -> str:
+    """'Técnico sugerido por ALI: X' / 'Carrera sugerida por ALI: X' (el top-1 guardado)."""
+    return (resultado or "").split("\n", 1)[0]
+
+
+def _reexplicar(views, test, objetivo, respuestas_norm) -> str:
+    """
+    Explicación para un top-1 que cambió: la pregenerada del perfil (LISTA) o, si no
+    hay, TEXTO_PENDIENTE para el worker; sin cola, la explicación local.
+    """
+    explicacion = views._explicacion_guardada(objetivo, respuestas_norm)
+    if explicacion is None and cola.EN_COLA:
+        test.explicacion_estado = cola.PENDIENTE
+        test.explicacion_intentos = 0
+        test.explicacion_proximo_intento = None
+        return cola.TEXTO_PENDIENTE
+    if explicacion is None:
+        explicacion = views._explicacion_local(objetivo, respuestas_norm)
+    test.explicacion_estado = cola.LISTA
+    return explicacion
+
+
+def _puntuar_chunk(ml, batch, ids, lista_respuestas):
+    """Corre en el proceso hijo: devuelve [(id, pred), ...]."""
+    mod = importlib.import_module(ml)
+    preds = getattr(mod, batch)(lista_respuestas, top_k=3)
+    return list(zip(ids, preds))
+
+
+def _leer_checkpoint(ruta):
+    if not ruta or not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _guardar_checkpoint(ruta, datos):
+    tmp = f"{ruta}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(datos, f)
+    os.replace(tmp, ruta)
+
+
+class Command(BaseCommand):
+    help = "Re-puntúa en lote los tests finalizados (grado 9 y 10/11) con el modelo actual."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modelo", choices=["9", "10_11", "todos"], default="todos")
+        parser.add_argument("--chunk", type=int, default=500, help="Filas por chunk.")
+        parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--since", help="Solo tests finalizados desde esta fecha (YYYY-MM-DD o ISO).")
+        parser.add_argument("--checkpoint", help="Archivo JSON para reanudar (último id por modelo).")
+        parser.add_argument("--dry-run", action="store_true", help="Calcula y reporta, sin escribir.")
+
+    def handle(self, *args, **opts):
+        desde = None
+        if opts["since"]:
+            desde = parse_datetime(opts["since"]) or parse_date(opts["since"])
+            if desde is None:
+                raise CommandError(f"Fecha inválida en --since: {opts['since']}")
+        if opts["chunk"] < 1 or opts["procesos"] < 1:
+            raise CommandError("--chunk y --procesos deben ser >= 1")
+
+        claves = ["9", "10_11"] if opts["modelo"] == "todos" else [opts["modelo"]]
+        checkpoint = _leer_checkpoint(opts["checkpoint"])
+        for clave in claves:
+            self._reescorar(clave, desde, checkpoint, opts)
+
+    def _reescorar(self, clave, desde, checkpoint, opts):
+        cfg = CONFIG[clave]
+        Modelo = getattr(importlib.import_module(cfg["modelo"][0]), cfg["modelo"][1])
+        views = importlib.import_module(cfg["views"])
+        ml = importlib.import_module(cfg["ml"])
+        ml.precargar()  # antes del fork: los hijos heredan el modelo ya cargado
+
+        # Los que esperan explicación los termina el worker de la cola (no pisar su `resultado`)
+        qs = (Modelo.objects.filter(estado=Modelo.ESTADO_FINALIZADO)
+              .exclude(explicacion_estado__in=[cola.PENDIENTE, cola.PROCESANDO]))
+        if desde is not None:
+            qs = qs.filter(fecha_realizacion__gte=desde)
+        ultimo_id = int(checkpoint.get(clave, 0))
+        if ultimo_id:
+            qs = qs.filter(id__gt=ultimo_id)
+        filas = (qs.order_by("id")
+                 .only("id", "respuestas", "resultado", "modelo_version", *cola.CAMPOS)
+                 .iterator(chunk_size=opts["chunk"]))
+
+        procesados = cambiados = invalidos = 0
+        t0 = time.perf_counter()
+        en_vuelo = deque()
+        pendientes = {}  # id -> (instancia, respuestas_norm) (para bulk_update)
+
+        def chunks():
+            nonlocal invalidos
+            ids, lista = [], []
+            for test in filas:
+                norm = views._normalizar_respuestas(test.respuestas or {})
+                if norm is None:
+                    invalidos += 1
+                    continue
+                pendientes[test.id] = (test, norm)
+                ids.append(test.id)
+                lista.append(norm)
+                if len(ids) >= opts["chunk"]:
+                    yield ids, lista
+                    ids, lista = [], []
+            if ids:
+                yield ids, lista
+
+        def consumir(futuro):
+            nonlocal procesados, cambiados
+            resultados = futuro.result()
+            cambiados += self._escribir(Modelo, views, cfg["objetivo"], resultados, pendientes, opts)
+            procesados += len(resultados)
+            ultimo = resultados[-1][0]
+            if opts["checkpoint"] and not opts["dry_run"]:
+                checkpoint[clave] = ultimo
+                _guardar_checkpoint(opts["checkpoint"], checkpoint)
+            dt = time.perf_counter() - t0
+            self.stdout.write(
+                f"[{clave}] {procesados} filas, {cambiados} cambiadas, "
+                f"{procesados / dt if dt else 0.0:.1f} filas/s (último id {ultimo})"
+            )
+
+        with ProcessPoolExecutor(max_workers=opts["procesos"]) as pool:
+            for ids, lista in chunks():
+                en_vuelo.append(pool.submit(_puntuar_chunk, cfg["ml"], cfg["batch"], ids, lista))
+                # Ventana acotada y en orden: el checkpoint siempre avanza de forma monótona
+                while len(en_vuelo) > 2 * opts["procesos"]:
+                    consumir(en_vuelo.popleft())
+            while en_vuelo:
+                consumir(en_vuelo.popleft())
+
+        total = time.perf_counter() - t0
+        modo = " (dry-run)" if opts["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"[{clave}] {procesados} tests re-puntuados{modo}, {cambiados} con resultado distinto, "
+            f"{invalidos} con respuestas inválidas; {procesados / total if total else 0.0:.1f} filas/s"
+        ))
+
+    def _escribir(self, Modelo, views, objetivo, resultados, pendientes, opts):
+        cambiados = []
+        for test_id, pred in resultados:
+            test, respuestas_norm = pendientes.pop(test_id)
+            nuevo = views._componer_resultado(pred, _extraer_explicacion(test.resultado))
+            if _primera_linea(nuevo) != _primera_linea(test.resultado):
+                # Cambió el top-1: la explicación guardada era de otro técnico / carrera
+                explicacion = _reexplicar(views, test, pred[objetivo], respuestas_norm)
+                nuevo = cola.reemplazar_explicacion(nuevo, explicacion)
+            version = pred.get("modelo_version", "")
+            if nuevo != test.resultado or version != test.modelo_version:
+                test.resultado = nuevo
+                test.modelo_version = version
+                cambiados.append(test)
+        if cambiados and not opts["dry_run"]:
+            with transaction.atomic():
+                Modelo.objects.bulk_update(cambiados, ["resultado", "modelo_version"] + cola.CAMPOS,
+                                           batch_size=opts["chunk"])
+        return len(cambiados)
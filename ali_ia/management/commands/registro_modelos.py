@@ -0,0 +1,98 @@
+# ali_ia/management/commands/registro_modelos.py
+"""
+Administra el registro de versiones de los modelos (ali_ia/registro_modelos.py).
+
+    manage.py registro_modelos listar
+    manage.py registro_modelos registrar --modelo 10_11 [--base ruta/sin/extension] [--activar]
+    manage.py registro_modelos activar --modelo 10_11 --version-modelo 4c8ed298e8e8
+    manage.py registro_modelos verificar --modelo 9
+
+Los workers en ejecución toman la versión ACTIVA nueva en ALI_REGISTRO_INTERVALO_S
+segundos, sin reiniciar.
+"""
+import importlib
+import json
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ali_ia.paquete_modelo import PaqueteInvalido, verificar_paquete
+
+
+def _fuente_grado9(mod, base):
+    if not base:
+        return mod._cargar_desde_pickle()
+    return mod._cargar_desde_pickle(f"{base}.joblib", f"{base}_xcols_fixed.csv", f"{base}_tecnicos_orden.csv")
+
+
+def _fuente_grado10_11(mod, base):
+    return mod._cargar_desde_pickle(base) if base else mod._cargar_desde_pickle()
+
+
+MODELOS = {
+    "9": ("test_grado9.ml_model.model9", _fuente_grado9),
+    "10_11": ("test_grado_10_11.ml_model.model_10y11", _fuente_grado10_11),
+}
+
+
+class Command(BaseCommand):
+    help = "Registra, activa y lista versiones de los modelos vocacionales."
+
+    def add_arguments(self, parser):
+        parser.add_argument("accion", choices=["listar", "registrar", "activar", "verificar"])
+        parser.add_argument("--modelo", choices=["9", "10_11", "todos"], default="todos")
+        parser.add_argument("--version-modelo", dest="version_modelo", help="Versión a activar/verificar.")
+        parser.add_argument("--base", help="registrar: ruta base de los artefactos fuente (sin extensión).")
+        parser.add_argument("--activar", action="store_true", help="registrar: activar la versión registrada.")
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **opts):
+        claves = ["9", "10_11"] if opts["modelo"] == "todos" else [opts["modelo"]]
+        if opts["accion"] in ("registrar", "activar") and len(claves) != 1:
+            raise CommandError(f"'{opts['accion']}' requiere --modelo 9 o --modelo 10_11.")
+        if opts["accion"] == "activar" and not opts["version_modelo"]:
+            raise CommandError("'activar' requiere --version-modelo.")
+
+        try:
+            for clave in claves:
+                modulo, fuente = MODELOS[clave]
+                mod = importlib.import_module(modulo)
+                getattr(self, f"_{opts['accion']}")(mod, fuente, opts)
+        except PaqueteInvalido as e:
+            raise CommandError(str(e))
+
+    def _listar(self, mod, fuente, opts):
+        versiones = mod.REGISTRO.versiones()
+        if opts["json"]:
+            self.stdout.write(json.dumps({"modelo": mod.REGISTRO.nombre, "versiones": versiones}, indent=2))
+            return
+        self.stdout.write(f"{mod.REGISTRO.nombre} ({mod.REGISTRO.directorio})")
+        if not versiones:
+            self.stdout.write("  (sin versiones registradas: se usa el pickle del repo)")
+        for v in versiones:
+            marca = "*" if v["activa"] else " "
+            creada = datetime.fromtimestamp(v["creada"]).isoformat(timespec="seconds")
+            self.stdout.write(f"  {marca} {v['version']}  {creada}  {v['n_arboles']} árboles")
+
+    def _registrar(self, mod, fuente, opts):
+        art = fuente(mod, opts["base"])
+        version = mod.REGISTRO.registrar(art)
+        self.stdout.write(self.style.SUCCESS(
+            f"{mod.REGISTRO.nombre}: registrada {version} en {mod.REGISTRO.ruta(version)}"
+        ))
+        if opts["activar"]:
+            self._activar(mod, fuente, opts | {"version_modelo": version})
+
+    def _activar(self, mod, fuente, opts):
+        anterior = mod.REGISTRO.activar(opts["version_modelo"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{mod.REGISTRO.nombre}: activa {opts['version_modelo']} (antes: {anterior or 'pickle del repo'})"
+        ))
+
+    def _verificar(self, mod, fuente, opts):
+        versiones = [opts["version_modelo"]] if opts["version_modelo"] else [
+            v["version"] for v in mod.REGISTRO.versiones()
+        ]
+        for version in versiones:
+            verificar_paquete(mod.REGISTRO.ruta(version))
+            self.stdout.write(f"{mod.REGISTRO.nombre}: {version} OK")
@@ -0,0 +1,85 @@
+# ali_ia/management/commands/reporte_arranque.py
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# (módulo, función de warmup o None)
+OBJETIVOS = [
+    ("numpy", None),
+    ("pandas", None),
+    ("joblib", None),
+    ("sklearn.ensemble", None),
+    ("test_grado9.views", None),
+    ("test_grado_10_11.views", None),
+    ("test_grado9.ml_model.model9", "precargar"),
+    ("test_grado_10_11.ml_model.model_10y11", "precargar"),
+]
+
+PESADOS = ("numpy", "pandas", "joblib", "sklearn", "scipy", "requests")
+
+# Se ejecuta en un intérprete nuevo por objetivo para que nada venga ya importado
+SCRIPT = r"""
+import importlib, json, os, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ali_backend.settings")
+t0 = time.perf_counter()
+import django
+django.setup()
+t_setup = time.perf_counter() - t0
+objetivo, warmup = sys.argv[1], sys.argv[2]
+antes = set(sys.modules)
+t0 = time.perf_counter()
+mod = importlib.import_module(objetivo)
+t_import = time.perf_counter() - t0
+nuevos = [m for m in %r if m in sys.modules and m not in antes]
+t_carga, error = None, None
+if warmup != "-":
+    t0 = time.perf_counter()
+    try:
+        getattr(mod, warmup)()
+        t_carga = time.perf_counter() - t0
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+print(json.dumps({"modulo": objetivo, "django_setup_s": t_setup, "import_s": t_import,
+                  "carga_s": t_carga, "pesados_importados": nuevos, "error": error}))
+""" % (PESADOS,)
+
+
+class Command(BaseCommand):
+    help = "Reporta el costo de importar cada módulo y de cargar cada modelo (intérprete nuevo por módulo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Salida en JSON.")
+        parser.add_argument("--sin-carga", action="store_true", help="No ejecuta el warmup de los modelos.")
+
+    def handle(self, *args, **opts):
+        filas = []
+        for modulo, warmup in OBJETIVOS:
+            warmup = "-" if (warmup is None or opts["sin_carga"]) else warmup
+            proc = subprocess.run(
+                [sys.executable, "-c", SCRIPT, modulo, warmup],
+                cwd=str(settings.BASE_DIR), capture_output=True, text=True,
+            )
+            try:
+                filas.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            except (IndexError, ValueError):
+                error = (proc.stderr.strip().splitlines() or ["sin salida"])[-1]
+                filas.append({"modulo": modulo, "error": error})
+
+        if opts["json"]:
+            self.stdout.write(json.dumps(filas, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"{'módulo':45} {'import ms':>10} {'carga ms':>10}  importa")
+        for f in filas:
+            if "import_s" not in f:
+                self.stdout.write(self.style.ERROR(f"{f['modulo']:45} ERROR: {f['error']}"))
+                continue
+            carga = f"{f['carga_s'] * 1000:10.1f}" if f["carga_s"] is not None else f"{'-':>10}"
+            self.stdout.write(
+                f"{f['modulo']:45} {f['import_s'] * 1000:10.1f} {carga}  {', '.join(f['pesados_importados']) or '-'}"
+            )
+            if f.get("error"):
+                self.stdout.write(self.style.WARNING(f"    carga fallida: {f['error']}"))
@@ -0,0 +1,37 @@
+# ali_ia/management/commands/servidor_inferencia.py
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ali_ia.sidecar import SOCKET_DEFAULT, ServidorInferencia
+
+
+class Command(BaseCommand):
+    help = ("Sidecar de inferencia: carga los modelos de 9° y 10/11 y atiende predicciones por un socket Unix. "
+            "Los workers web lo usan si tienen ALI_SIDECAR_SOCKET apuntando al mismo socket.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=SOCKET_DEFAULT or "/tmp/ali-inferencia.sock",
+                            help="Ruta del socket Unix (default: ALI_SIDECAR_SOCKET o /tmp/ali-inferencia.sock).")
+
+    def handle(self, *args, **opts):
+        try:
+            servidor = ServidorInferencia(opts["socket"])
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir {opts['socket']}: {e}")
+
+        for modulo, segundos in servidor.precargar().items():
+            self.stdout.write(f"{modulo}: cargado en {segundos:.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"Escuchando en {opts['socket']}"))
+
+        def _terminar(signum, frame):
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGTERM, _terminar)
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+            self.stdout.write(f"Sidecar detenido ({servidor.atendidas} filas atendidas).")
@@ -0,0 +1,32 @@
+# ali_ia/metricas.py
+# -*- coding: utf-8 -*-
+"""
+Percentiles para las métricas de estadisticas() y los comandos de benchmark.
+
+Las ventanas de latencias se guardan en segundos (deque acotada); aquí se
+convierten (escala 1000 = ms, 1e6 = µs) y se redondean, con `vacio` cuando
+todavía no hay muestras.
+"""
+
+import numpy as np
+
+
+def percentil(valores, p, escala: float = 1000.0, decimales: int = 1, vacio=None):
+    """Percentil `p` de `valores` por `escala`, redondeado; `vacio` si no hay muestras."""
+    v = np.asarray(valores, dtype=np.float64)
+    if not v.size:
+        return vacio
+    return round(float(np.percentile(v, p)) * escala, decimales)
+
+
+def resumen(valores, percentiles=(50, 95), escala: float = 1000.0, decimales: int = 1, prefijo: str = "",
+            unidad: str = "ms", maximo: bool = False, vacio=None) -> dict:
+    """
+    {"<prefijo>p50_<unidad>": ..., "<prefijo>p95_<unidad>": ...} y, con maximo=True,
+    "<prefijo>max_<unidad>".
+    """
+    v = np.asarray(valores, dtype=np.float64)
+    datos = {f"{prefijo}p{p}_{unidad}": percentil(v, p, escala, decimales, vacio) for p in percentiles}
+    if maximo:
+        datos[f"{prefijo}max_{unidad}"] = round(float(v.max()) * escala, decimales) if v.size else vacio
+    return datos
@@ -0,0 +1,139 @@
+# ali_ia/microlotes.py
+# -*- coding: utf-8 -*-
+"""
+Micro-lotes para predicciones concurrentes.
+
+Cuando todo un salón presiona "finalizar" a la vez, cada petición evalúa el bosque
+sobre una sola fila. El despachador junta las peticiones que llegan dentro de una
+ventana corta (ALI_MICROLOTES_VENTANA_MS, o hasta ALI_MICROLOTES_MAX filas), hace
+una sola evaluación por lotes y devuelve a cada petición sus filas.
+
+Solo ayuda con varios hilos por proceso (gunicorn gthread / ASGI); con workers
+sync cada proceso atiende una petición a la vez y la ventana sería pura espera.
+Por eso está apagado por defecto (ALI_MICROLOTES=1 para activarlo).
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from ali_ia.metricas import resumen
+
+ACTIVO_DEFAULT = os.environ.get("ALI_MICROLOTES", "0").lower() in ("1", "true", "si", "sí")
+VENTANA_MS_DEFAULT = float(os.environ.get("ALI_MICROLOTES_VENTANA_MS", "3"))
+MAX_FILAS_DEFAULT = int(os.environ.get("ALI_MICROLOTES_MAX", "64"))
+
+
+class DespachadorMicrolotes:
+    """
+    fn_lote(A) -> (lista de N vectores de probabilidad, *metadatos), con A uint8 (N, n_preguntas);
+    los metadatos (nombres_clases, versión del modelo) se repiten igual para cada petición.
+    enviar(A) bloquea hasta que el lote que contiene a A se evalúa.
+    """
+
+    def __init__(self, nombre: str, fn_lote, activo: bool = ACTIVO_DEFAULT,
+                 ventana_ms: float = VENTANA_MS_DEFAULT, max_filas: int = MAX_FILAS_DEFAULT):
+        self.nombre = nombre
+        self.fn_lote = fn_lote
+        self.activo = activo
+        self.ventana_s = ventana_ms / 1000.0
+        self.max_filas = int(max_filas)
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # métricas
+        self.lotes = 0
+        self.peticiones = 0
+        self.filas = 0
+        self._esperas = deque(maxlen=2048)
+        self._latencias = deque(maxlen=2048)
+        self._inicio = None  # primer lote evaluado
+
+    def configurar(self, activo=None, ventana_ms=None, max_filas=None):
+        if activo is not None:
+            self.activo = bool(activo)
+        if ventana_ms is not None:
+            self.ventana_s = float(ventana_ms) / 1000.0
+        if max_filas is not None:
+            self.max_filas = int(max_filas)
+
+    def _asegurar_hilo(self):
+        # Tras un fork (gunicorn) el hilo del padre no existe en el hijo: se crea de nuevo
+        if self._hilo is not None and self._pid == os.getpid() and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo is None or self._pid != os.getpid() or not self._hilo.is_alive():
+                self._cola = queue.Queue()
+                self._pid = os.getpid()
+                self._hilo = threading.Thread(target=self._ciclo, name=f"microlotes-{self.nombre}", daemon=True)
+                self._hilo.start()
+
+    def enviar(self, A):
+        if not self.activo:
+            return self.fn_lote(A)
+        self._asegurar_hilo()
+        futuro = Future()
+        t0 = time.perf_counter()
+        self._cola.put((np.asarray(A, dtype=np.uint8), futuro, t0))
+        resultado = futuro.result()
+        self._latencias.append(time.perf_counter() - t0)
+        return resultado
+
+    def _ciclo(self):
+        while True:
+            pendientes = [self._cola.get()]
+            n = len(pendientes[0][0])
+            limite = time.perf_counter() + self.ventana_s
+            while n < self.max_filas:
+                restante = limite - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    item = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                pendientes.append(item)
+                n += len(item[0])
+            self._evaluar(pendientes)
+
+    def _evaluar(self, pendientes):
+        inicio = time.perf_counter()
+        if self._inicio is None:
+            self._inicio = time.monotonic()
+        for _, _, t0 in pendientes:
+            self._esperas.append(inicio - t0)
+        try:
+            probas, *meta = self.fn_lote(np.vstack([A for A, _, _ in pendientes]))
+        except Exception as e:
+            for _, futuro, _ in pendientes:
+                futuro.set_exception(e)
+            return
+        desde = 0
+        for A, futuro, _ in pendientes:
+            futuro.set_result((probas[desde:desde + len(A)], *meta))
+            desde += len(A)
+        self.lotes += 1
+        self.peticiones += len(pendientes)
+        self.filas += desde
+
+    def estadisticas(self) -> dict:
+        segundos = max(1e-9, time.monotonic() - self._inicio) if self._inicio else 1.0
+        return {
+            "nombre": self.nombre,
+            "activo": self.activo,
+            "ventana_ms": self.ventana_s * 1000,
+            "max_filas": self.max_filas,
+            "lotes": self.lotes,
+            "peticiones": self.peticiones,
+            "filas": self.filas,
+            "filas_por_lote": round(self.filas / self.lotes, 2) if self.lotes else 0.0,
+            "filas_por_s": round(self.filas / segundos, 2),
+            **resumen(list(self._esperas), (50, 99), decimales=3, prefijo="espera_", vacio=0.0),
+            **resumen(list(self._latencias), (50, 99), decimales=3, prefijo="latencia_", vacio=0.0),
+        }
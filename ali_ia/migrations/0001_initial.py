@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExplicacionCacheada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True)),
+                ('modelo', models.CharField(max_length=20)),
+                ('objetivo', models.CharField(max_length=120)),
+                ('perfil', models.CharField(max_length=200)),
+                ('texto', models.TextField()),
+                ('creada', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('ultimo_uso', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('usos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Explicación cacheada',
+                'verbose_name_plural': 'Explicaciones cacheadas',
+            },
+        ),
+    ]
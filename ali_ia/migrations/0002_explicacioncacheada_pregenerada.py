@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ali_ia', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='explicacioncacheada',
+            name='pregenerada',
+            field=models.BooleanField(default=False),
+        ),
+    ]
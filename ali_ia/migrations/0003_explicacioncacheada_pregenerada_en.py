@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ali_ia', '0002_explicacioncacheada_pregenerada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='explicacioncacheada',
+            name='pregenerada_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ExplicacionCacheada(models.Model):
+    """
+    Explicación de Groq reutilizable (ver ali_ia/cache_explicaciones.py): misma salida
+    del modelo + mismo perfil de respuestas por bloques => misma explicación.
+    """
+    clave = models.CharField(max_length=64, unique=True)  # sha256 de modelo|contexto|objetivo|perfil
+    modelo = models.CharField(max_length=20)               # grado9 / grado10_11
+    objetivo = models.CharField(max_length=120)            # modalidad / carrera explicada
+    perfil = models.CharField(max_length=200)
+    texto = models.TextField()
+
+    creada = models.DateTimeField(default=timezone.now, db_index=True)   # TTL
+    ultimo_uso = models.DateTimeField(default=timezone.now, db_index=True)  # desalojo por tamaño
+    usos = models.PositiveIntegerField(default=0)
+    # Generada por adelantado (manage.py pregenerar_explicaciones): no se desaloja por tamaño
+    pregenerada = models.BooleanField(default=False)
+    # Desde cuándo está marcada como pregenerada: la cobertura solo cuenta tests posteriores
+    pregenerada_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Explicación cacheada'
+        verbose_name_plural = 'Explicaciones cacheadas'
+
+    def __str__(self):
+        return f"{self.modelo}: {self.objetivo} [{self.perfil}]"
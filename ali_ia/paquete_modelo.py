@@ -0,0 +1,152 @@
+# ali_ia/paquete_modelo.py
+# -*- coding: utf-8 -*-
+"""
+Paquete compacto de un modelo: un directorio con los arreglos del BosquePlano
+en .npy crudos + manifest.json (versión, XCOLS, nombres de clase, sha256).
+
+Los .npy se abren con np.load(mmap_mode="r"): no hay unpickling, cargar es
+casi instantáneo y los workers comparten las mismas páginas vía el page cache
+del sistema operativo (no es posible con .npz, que va comprimido/zip).
+
+Los pickles (.pkl / .joblib) siguen siendo el formato fuente: el paquete se
+genera a partir de ellos con `manage.py exportar_paquete`.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from ali_ia.bosque_plano import BosquePlano
+
+FORMATO = 1
+MANIFIESTO = "manifest.json"
+
+# nombre de archivo -> (atributo del BosquePlano, dtype en disco)
+ARREGLOS = {
+    "izquierda.npy": ("izquierda", np.int32),
+    "derecha.npy": ("derecha", np.int32),
+    "feature.npy": ("feature", np.int32),
+    "umbral.npy": ("umbral", np.float64),      # float64: mismos cortes que sklearn
+    "hoja_proba.npy": ("hoja_proba", np.float64),
+    "raices.npy": ("raices", np.int32),
+    "classes.npy": ("classes_", None),
+}
+
+
+class PaqueteInvalido(Exception):
+    pass
+
+
+def sha256_archivo(ruta) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def exportar_paquete(destino, nombre: str, art) -> str:
+    """
+    Escribe `destino/<nombre>-<version>/` a partir de un ArtefactosModelo ya cargado
+    (con bosque compilado). La escritura es atómica: directorio temporal + rename.
+    Devuelve la ruta del paquete.
+    """
+    bosque = art.bosque
+    if bosque is None:
+        raise PaqueteInvalido(f"{nombre}: el modelo no es un RandomForest compatible con BosquePlano.")
+    if art.plan.columnas_faltantes:
+        # Con columnas en NaN la predicción depende de sklearn; el paquete no la reproduciría
+        raise PaqueteInvalido(f"{nombre}: XCOLS con columnas desconocidas: {art.plan.columnas_faltantes}")
+    if len(bosque.izquierda) >= np.iinfo(np.int32).max:
+        raise PaqueteInvalido(f"{nombre}: demasiados nodos para índices int32.")
+
+    os.makedirs(destino, exist_ok=True)
+    final = os.path.join(destino, f"{nombre}-{art.version}")
+    tmp = tempfile.mkdtemp(prefix=f".{nombre}-", dir=destino)
+    try:
+        archivos = {}
+        for archivo, (atributo, dtype) in ARREGLOS.items():
+            arr = np.asarray(getattr(bosque, atributo))
+            if dtype is not None:
+                arr = arr.astype(dtype)
+            elif arr.dtype == object:
+                arr = arr.astype(str)
+            ruta = os.path.join(tmp, archivo)
+            np.save(ruta, np.ascontiguousarray(arr), allow_pickle=False)
+            archivos[archivo] = sha256_archivo(ruta)
+
+        manifiesto = {
+            "formato": FORMATO,
+            "nombre": nombre,
+            "version": art.version,
+            "xcols": list(art.xcols),
+            "nombres_clases": list(art.nombres_clases),
+            "n_features": bosque.n_features,
+            "n_arboles": bosque.n_arboles,
+            "profundidad": bosque.profundidad,
+            "extra": art.extra,
+            "archivos": archivos,
+        }
+        with open(os.path.join(tmp, MANIFIESTO), "w", encoding="utf-8") as f:
+            json.dump(manifiesto, f, ensure_ascii=False, indent=2)
+
+        os.chmod(tmp, 0o755)  # mkdtemp crea 0700
+        if os.path.isdir(final):
+            shutil.rmtree(final)
+        os.replace(tmp, final)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return final
+
+
+def leer_manifiesto(ruta) -> dict:
+    try:
+        with open(os.path.join(ruta, MANIFIESTO), encoding="utf-8") as f:
+            manifiesto = json.load(f)
+    except (OSError, ValueError) as e:
+        raise PaqueteInvalido(f"{ruta}: manifest ilegible ({e})")
+    if manifiesto.get("formato") != FORMATO:
+        raise PaqueteInvalido(f"{ruta}: formato {manifiesto.get('formato')} no soportado (se espera {FORMATO}).")
+    return manifiesto
+
+
+def verificar_paquete(ruta, manifiesto=None):
+    """Compara el sha256 de cada .npy con el manifest; lanza PaqueteInvalido si no coincide."""
+    manifiesto = manifiesto or leer_manifiesto(ruta)
+    for archivo, esperado in manifiesto["archivos"].items():
+        p = os.path.join(ruta, archivo)
+        if not os.path.exists(p) or sha256_archivo(p) != esperado:
+            raise PaqueteInvalido(f"{ruta}: checksum inválido en {archivo}")
+
+
+def cargar_paquete(ruta, verificar: bool = False):
+    """
+    Abre el paquete en solo lectura (memory-map). Devuelve (BosquePlano, manifest).
+    Con verificar=True recalcula los sha256 (lee todo el contenido).
+    """
+    manifiesto = leer_manifiesto(ruta)
+    if verificar:
+        verificar_paquete(ruta, manifiesto)
+    arr = {}
+    for archivo, (atributo, _) in ARREGLOS.items():
+        try:
+            arr[atributo] = np.load(os.path.join(ruta, archivo), mmap_mode="r", allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise PaqueteInvalido(f"{ruta}: no se pudo abrir {archivo} ({e})")
+    bosque = BosquePlano(
+        izquierda=arr["izquierda"],
+        derecha=arr["derecha"],
+        feature=arr["feature"],
+        umbral=arr["umbral"],
+        hoja_proba=arr["hoja_proba"],
+        raices=arr["raices"],
+        profundidad=manifiesto["profundidad"],
+        n_features=manifiesto["n_features"],
+        classes=arr["classes_"],
+    )
+    return bosque, manifiesto
@@ -0,0 +1,73 @@
+# ali_ia/plan_features.py
+# -*- coding: utf-8 -*-
+"""
+Plan de features compilado para los modelos de 9° y 10/11.
+
+Se construye una sola vez al cargar el modelo a partir de XCOLS y de los bloques
+de preguntas (PREGUNTAS_POR_TECNICO / PREGUNTAS_CLAVE_POR_CARRERA). Después, cada
+hoja de respuestas codificada (uint8, 3/2/1) se convierte en la fila de entrada
+del modelo con un gather (columnas pregunta_i) y un matmul (columnas suma_<bloque>),
+sin construir Series de pandas.
+"""
+
+import numpy as np
+
+
+class PlanFeatures:
+    """
+    - idx_preguntas / pos_preguntas: pregunta (0-based) -> posición en XCOLS
+    - bloques: matriz (total_preguntas, n_sumas) con 1 donde la pregunta suma al bloque
+    - pos_sumas: posición en XCOLS de cada columna suma_<bloque>
+    - pos_faltantes: columnas de XCOLS sin fuente conocida (quedan en NaN,
+      igual que el reindex de pandas)
+    """
+
+    def __init__(self, xcols, total_preguntas, bloques_por_nombre):
+        self.xcols = [str(c) for c in xcols]
+        self.total_preguntas = int(total_preguntas)
+        self.n_features = len(self.xcols)
+
+        preguntas = {f"pregunta_{i}": i - 1 for i in range(1, self.total_preguntas + 1)}
+        sumas = {f"suma_{nombre}": qs for nombre, qs in bloques_por_nombre.items()}
+
+        pos_preg, idx_preg, pos_suma, cols_suma, faltantes = [], [], [], [], []
+        for pos, col in enumerate(self.xcols):
+            if col in preguntas:
+                pos_preg.append(pos)
+                idx_preg.append(preguntas[col])
+            elif col in sumas:
+                pos_suma.append(pos)
+                cols_suma.append(sumas[col])
+            else:
+                faltantes.append(pos)
+
+        self.pos_preguntas = np.asarray(pos_preg, dtype=np.intp)
+        self.idx_preguntas = np.asarray(idx_preg, dtype=np.intp)
+        self.pos_sumas = np.asarray(pos_suma, dtype=np.intp)
+        self.pos_faltantes = np.asarray(faltantes, dtype=np.intp)
+        self.columnas_faltantes = [self.xcols[p] for p in faltantes]
+
+        self.bloques = np.zeros((self.total_preguntas, len(cols_suma)), dtype=np.float32)
+        for j, qs in enumerate(cols_suma):
+            for q in qs:
+                self.bloques[int(q) - 1, j] = 1.0
+
+    def vectorizar(self, codigos):
+        """
+        codigos: array uint8 (total_preguntas,) o (N, total_preguntas) con valores 3/2/1.
+        Devuelve np.ndarray float32 (N, n_features) en el orden exacto de XCOLS.
+        """
+        A = np.asarray(codigos, dtype=np.uint8)
+        if A.ndim == 1:
+            A = A.reshape(1, -1)
+        if A.shape[1] != self.total_preguntas:
+            raise ValueError(f"Se esperaban {self.total_preguntas} respuestas por fila, llegaron {A.shape[1]}.")
+
+        X = np.empty((A.shape[0], self.n_features), dtype=np.float32)
+        X[:, self.pos_preguntas] = A[:, self.idx_preguntas]
+        if self.pos_sumas.size:
+            # Sumas de enteros pequeños: exactas en float32 sin importar el orden de BLAS
+            X[:, self.pos_sumas] = A.astype(np.float32) @ self.bloques
+        if self.pos_faltantes.size:
+            X[:, self.pos_faltantes] = np.nan
+        return X
@@ -0,0 +1,40 @@
+# ali_ia/precarga.py
+# -*- coding: utf-8 -*-
+"""
+Warmup de los modelos de 9° y 10/11.
+
+Con gunicorn --preload se llama en el proceso maestro antes del fork: los workers
+heredan los modelos ya cargados y comparten esas páginas copy-on-write.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MODULOS_MODELO = (
+    "test_grado9.ml_model.model9",
+    "test_grado_10_11.ml_model.model_10y11",
+)
+
+
+def precarga_habilitada() -> bool:
+    # Con sidecar (ALI_SIDECAR_SOCKET) los modelos viven en ese proceso, no en los workers web
+    if os.environ.get("ALI_SIDECAR_SOCKET"):
+        return False
+    return os.environ.get("ALI_PRECARGAR_MODELOS", "1").lower() not in ("0", "false", "no")
+
+
+def precargar_modelos() -> dict:
+    """Carga todos los modelos; un artefacto faltante se registra pero no detiene el arranque."""
+    import importlib
+
+    tiempos = {}
+    for nombre in MODULOS_MODELO:
+        try:
+            tiempos[nombre] = importlib.import_module(nombre).precargar()
+            logger.info("Modelo %s precargado en %.2fs", nombre, tiempos[nombre])
+        except Exception as e:
+            tiempos[nombre] = None
+            logger.warning("No se pudo precargar %s: %s", nombre, e)
+    return tiempos
@@ -0,0 +1,114 @@
+# ali_ia/prompts.py
+# -*- coding: utf-8 -*-
+"""
+Piezas compartidas para armar prompts cortos de Groq.
+
+El tiempo de respuesta del LLM crece con el tamaño del prompt, así que:
+- las respuestas del test se resumen por bloque (promedio 3/2/1 de cada técnico /
+  carrera) en lugar de mandar los 57/60 valores `pregunta_i`,
+- cada prompt se mide (tokens estimados) y queda en METRICAS_PROMPTS, para
+  detectar regresiones de tamaño (`manage.py medir_prompts`, worker de explicaciones).
+
+La estimación de tokens es aproximada (caracteres / CARACTERES_POR_TOKEN más un
+costo fijo por mensaje); sirve para comparar prompts entre sí, no para facturar.
+"""
+
+import json
+import logging
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from ali_ia.metricas import percentil
+
+logger = logging.getLogger(__name__)
+
+CARACTERES_POR_TOKEN = 3.5  # español con tokenizadores tipo Llama 3
+TOKENS_POR_MENSAJE = 4      # plantilla de chat (rol, separadores)
+
+# Nivel de interés de un bloque (promedio 3/2/1); también va en la clave del cache de explicaciones
+NIVELES = ((2.5, "alto"), (2.0, "medio"), (0.0, "bajo"))
+
+
+def medias_por_bloque(respuestas: dict, bloques_por_nombre: dict):
+    """{"pregunta_i": 3/2/1} -> [(bloque, promedio), ...] de mayor a menor. None si no son códigos."""
+    medias = []
+    for orden, (nombre, qs) in enumerate(bloques_por_nombre.items()):
+        try:
+            valores = [int(respuestas[f"pregunta_{q}"]) for q in qs]
+        except (KeyError, TypeError, ValueError):
+            return None
+        medias.append((-sum(valores) / len(valores), orden, nombre))
+    medias.sort()
+    return [(nombre, -media) for media, _, nombre in medias]
+
+
+def nivel(media: float) -> str:
+    return next(etiqueta for umbral, etiqueta in NIVELES if media >= umbral)
+
+
+def resumir_respuestas(respuestas, bloques_por_nombre: dict) -> str:
+    """
+    Una línea por bloque, de mayor a menor interés ("- Robótica: 2.8/3 (alto)").
+    Si las respuestas no vienen como códigos por pregunta, las deja como texto.
+    """
+    medias = medias_por_bloque(respuestas, bloques_por_nombre) if isinstance(respuestas, dict) else None
+    if medias is None:
+        if isinstance(respuestas, str):
+            return respuestas
+        try:
+            return json.dumps(respuestas, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return str(respuestas)
+    return "\n".join(f"- {nombre}: {media:.1f}/3 ({nivel(media)})" for nombre, media in medias)
+
+
+def estimar_tokens(texto: str) -> int:
+    return math.ceil(len(texto) / CARACTERES_POR_TOKEN) if texto else 0
+
+
+def tokens_mensajes(mensajes) -> int:
+    """Tokens estimados de una lista de mensajes de chat [{"role", "content"}, ...]."""
+    return sum(TOKENS_POR_MENSAJE + estimar_tokens(m["content"]) for m in mensajes)
+
+
+class MetricasPrompts:
+    """Tokens estimados de los prompts enviados, por nombre de prompt (ventana acotada)."""
+
+    def __init__(self, ventana: int = 2000):
+        self.ventana = ventana
+        self._tokens = {}
+        self._totales = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, nombre: str, mensajes) -> int:
+        tokens = tokens_mensajes(mensajes)
+        with self._lock:
+            self._tokens.setdefault(nombre, deque(maxlen=self.ventana)).append(tokens)
+            self._totales[nombre] = self._totales.get(nombre, 0) + 1
+        logger.debug("Prompt %s: ~%s tokens", nombre, tokens)
+        return tokens
+
+    def reiniciar(self):
+        with self._lock:
+            self._tokens.clear()
+            self._totales.clear()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            reporte = {}
+            for nombre, tokens in self._tokens.items():
+                t = np.asarray(tokens, dtype=np.float64)
+                reporte[nombre] = {
+                    "prompts": self._totales[nombre],
+                    "tokens_media": round(float(t.mean()), 1),
+                    "tokens_p95": percentil(t, 95, escala=1),
+                    "tokens_max": int(t.max()),
+                }
+            return reporte
+
+
+# Instancia compartida por los groq_service de 9° y 10/11
+METRICAS_PROMPTS = MetricasPrompts()
@@ -0,0 +1,152 @@
+# ali_ia/provisional.py
+# -*- coding: utf-8 -*-
+"""
+Top-3 provisional durante `progreso` (opt-in, nunca se guarda en `resultado`).
+
+Por cada test se mantienen en memoria las respuestas codificadas y las sumas por
+bloque (suma_<tecnico> / suma_<carrera>). Cada PATCH aplica solo las preguntas
+que cambiaron (restar el valor viejo, sumar el nuevo) y el ranking sale de los
+promedios por bloque, sin vectorizar ni evaluar el bosque. Si el PATCH no cambia
+nada se devuelve el resultado ya calculado.
+
+El estado es por proceso y otro worker pudo atender PATCH intermedios (incluso
+cambiando preguntas ya respondidas, sin mover el conteo). Por eso el estado guarda
+la revisión de la fila que dejó su último PATCH (`fecha_ultima_actividad`, auto_now):
+si la fila que leyó este PATCH trae otra revisión, alguien más la guardó entre
+medio y se reconstruye desde el dict completo (57/60 lecturas, sin tocar el bosque).
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Promedio "encogido" hacia 2 (= "Me interesa") para bloques con pocas respuestas
+PESO_PRIOR = 1.0
+VALOR_PRIOR = 2.0
+
+
+class _EstadoTest:
+    __slots__ = ("codigos", "sumas", "conteos", "respondidas", "resultado", "revision")
+
+    def __init__(self, total_preguntas, n_bloques):
+        self.codigos = np.zeros(total_preguntas, dtype=np.uint8)  # 0 = sin responder
+        self.sumas = np.zeros(n_bloques, dtype=np.int32)
+        self.conteos = np.zeros(n_bloques, dtype=np.int32)
+        self.respondidas = 0
+        self.resultado = None
+        self.revision = None  # revisión de la fila tras el último PATCH aplicado aquí
+
+
+class CalculadoraProvisional:
+    """
+    bloques_por_nombre: {nombre_clase: [preguntas 1-based]} (los mismos bloques del modelo).
+    codificar(valor) -> 3/2/1, o 0 si la respuesta no es válida.
+    """
+
+    def __init__(self, nombre, total_preguntas, bloques_por_nombre, codificar, max_tests: int = 4096):
+        self.nombre = nombre
+        self.total_preguntas = int(total_preguntas)
+        self.nombres = list(bloques_por_nombre)
+        self.codificar = codificar
+        self.max_tests = int(max_tests)
+        self.bloque_de = np.full(self.total_preguntas, -1, dtype=np.intp)
+        for j, qs in enumerate(bloques_por_nombre.values()):
+            for q in qs:
+                self.bloque_de[int(q) - 1] = j
+        self._estados = OrderedDict()
+        self._lock = threading.Lock()
+        self.reconstrucciones = 0
+        self.incrementales = 0
+        self.reutilizados = 0
+
+    def _aplicar(self, est, idx, nuevo):
+        viejo = int(est.codigos[idx])
+        if viejo == nuevo:
+            return False
+        j = self.bloque_de[idx]
+        if j >= 0:
+            est.sumas[j] += nuevo - viejo
+            est.conteos[j] += (nuevo > 0) - (viejo > 0)
+        est.respondidas += (nuevo > 0) - (viejo > 0)
+        est.codigos[idx] = nuevo
+        return True
+
+    def _codigos(self, respuestas) -> np.ndarray:
+        """El código 3/2/1/0 de cada pregunta del dict completo."""
+        return np.fromiter((self.codificar(respuestas.get(f"pregunta_{i}"))
+                            for i in range(1, self.total_preguntas + 1)),
+                           dtype=np.uint8, count=self.total_preguntas)
+
+    def _reconstruir(self, codigos):
+        est = _EstadoTest(self.total_preguntas, len(self.nombres))
+        for idx in np.flatnonzero(codigos):
+            self._aplicar(est, idx, int(codigos[idx]))
+        self.reconstrucciones += 1
+        return est
+
+    def _top(self, est, top_k):
+        medias = (est.sumas + PESO_PRIOR * VALOR_PRIOR) / (est.conteos + PESO_PRIOR)
+        pesos = medias - 1.0  # 0..2
+        total = pesos.sum()
+        probs = pesos / total if total > 0 else np.full(len(pesos), 1.0 / len(pesos))
+        orden = np.argsort(-probs, kind="stable")[:top_k]
+        return [(self.nombres[j], round(float(probs[j]), 4)) for j in orden]
+
+    def actualizar(self, test_id, respuestas: dict, cambios: dict, respondidas: int,
+                   revision_previa, revision, top_k: int = 3) -> dict:
+        """
+        respuestas: dict completo ya actualizado; cambios: solo lo que trajo este PATCH.
+        respondidas: conteo oficial del test. revision_previa / revision: revisión de la
+        fila antes y después de guardar este PATCH. El estado se da por desactualizado si
+        no lo dejó la revisión previa o si no coincide el conteo.
+        """
+        with self._lock:
+            est = self._estados.get(test_id)
+            if est is not None and est.revision != revision_previa:
+                est = None  # otro worker (o un PATCH sin provisional) guardó la fila entre medio
+            cambio = False
+            if est is not None:
+                for clave, valor in cambios.items():
+                    try:
+                        idx = int(str(clave).split("_")[1]) - 1
+                    except (IndexError, ValueError):
+                        continue
+                    if 0 <= idx < self.total_preguntas:
+                        cambio |= self._aplicar(est, idx, self.codificar(valor))
+                if est.respondidas != respondidas:
+                    est = None
+                elif cambio:
+                    self.incrementales += 1
+            if est is None:
+                est = self._reconstruir(self._codigos(respuestas))
+                cambio = True
+            est.revision = revision
+            self._estados[test_id] = est
+            self._estados.move_to_end(test_id)
+            while len(self._estados) > self.max_tests:
+                self._estados.popitem(last=False)
+
+            if cambio or est.resultado is None or len(est.resultado["top3"]) != top_k:
+                est.resultado = {
+                    "top3": self._top(est, top_k),
+                    "respondidas": est.respondidas,
+                    "es_provisional": True,
+                }
+            else:
+                self.reutilizados += 1
+            return est.resultado
+
+    def olvidar(self, test_id):
+        with self._lock:
+            self._estados.pop(test_id, None)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "nombre": self.nombre,
+                "tests_en_memoria": len(self._estados),
+                "reconstrucciones": self.reconstrucciones,
+                "incrementales": self.incrementales,
+                "reutilizados": self.reutilizados,
+            }
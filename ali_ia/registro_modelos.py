@@ -0,0 +1,112 @@
+# ali_ia/registro_modelos.py
+# -*- coding: utf-8 -*-
+"""
+Registro de versiones de los modelos.
+
+Estructura (por defecto <repo>/registro_modelos, o ALI_REGISTRO_MODELOS):
+
+    registro_modelos/
+      grado10_11/
+        ACTIVA                        <- texto con la versión activa
+        grado10_11-4c8ed298e8e8/      <- paquete memory-map (ali_ia/paquete_modelo.py)
+        grado10_11-9f0c1a2b3d4e/
+      grado9/
+        ...
+
+Cada versión es un paquete con sha256 por archivo en su manifest. ACTIVA se
+reemplaza con os.replace (atómico): los workers lo revisan cada
+ALI_REGISTRO_INTERVALO_S segundos y cambian de versión en segundo plano
+(ver ModeloPerezoso), sin reiniciar ni bloquear predicciones en curso.
+"""
+
+import os
+import tempfile
+
+from ali_ia.paquete_modelo import (
+    MANIFIESTO, PaqueteInvalido, exportar_paquete, leer_manifiesto, verificar_paquete,
+)
+
+RAIZ_DEFAULT = os.environ.get(
+    "ALI_REGISTRO_MODELOS",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "registro_modelos"),
+)
+PUNTERO = "ACTIVA"
+
+
+class RegistroModelos:
+    def __init__(self, nombre: str, raiz: str = RAIZ_DEFAULT):
+        self.nombre = nombre
+        self.raiz = raiz
+        self.directorio = os.path.join(raiz, nombre)
+        self._puntero = os.path.join(self.directorio, PUNTERO)
+        self._firma = None      # (st_mtime_ns, st_ino, st_size) del puntero leído
+        self._activa = None
+
+    def ruta(self, version: str) -> str:
+        return os.path.join(self.directorio, f"{self.nombre}-{version}")
+
+    # ---------- lectura (caliente: la llaman los workers) ----------
+    def version_activa(self):
+        """Versión apuntada por ACTIVA, o None si no hay registro. Solo relee si el archivo cambió."""
+        try:
+            st = os.stat(self._puntero)
+        except OSError:
+            self._firma = self._activa = None
+            return None
+        firma = (st.st_mtime_ns, st.st_ino, st.st_size)
+        if firma != self._firma:
+            try:
+                with open(self._puntero, encoding="utf-8") as f:
+                    self._activa = f.read().strip() or None
+            except OSError:
+                return self._activa
+            self._firma = firma
+        return self._activa
+
+    def ruta_activa(self):
+        version = self.version_activa()
+        return self.ruta(version) if version else None
+
+    def versiones(self) -> list:
+        """[{version, ruta, activa, creada, n_arboles}, ...] ordenadas de la más nueva a la más vieja."""
+        if not os.path.isdir(self.directorio):
+            return []
+        activa = self.version_activa()
+        prefijo = f"{self.nombre}-"
+        salida = []
+        for entrada in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, entrada)
+            if not entrada.startswith(prefijo) or not os.path.exists(os.path.join(ruta, MANIFIESTO)):
+                continue
+            try:
+                manifiesto = leer_manifiesto(ruta)
+            except PaqueteInvalido:
+                continue
+            salida.append({
+                "version": manifiesto["version"],
+                "ruta": ruta,
+                "activa": manifiesto["version"] == activa,
+                "creada": os.path.getmtime(os.path.join(ruta, MANIFIESTO)),
+                "n_arboles": manifiesto.get("n_arboles"),
+            })
+        return sorted(salida, key=lambda v: v["creada"], reverse=True)
+
+    # ---------- escritura (management command) ----------
+    def registrar(self, art) -> str:
+        """Guarda los artefactos cargados como una versión nueva (no la activa). Devuelve la versión."""
+        exportar_paquete(self.directorio, self.nombre, art)
+        return art.version
+
+    def activar(self, version: str):
+        """Verifica checksums y apunta ACTIVA a `version` de forma atómica. Devuelve la versión anterior."""
+        ruta = self.ruta(version)
+        if not os.path.isdir(ruta):
+            raise PaqueteInvalido(f"{self.nombre}: la versión {version} no está registrada.")
+        verificar_paquete(ruta)
+        anterior = self.version_activa()
+        fd, tmp = tempfile.mkstemp(prefix=".ACTIVA-", dir=self.directorio)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(version + "\n")
+        os.chmod(tmp, 0o644)  # mkstemp crea 0600; los workers pueden correr con otro usuario
+        os.replace(tmp, self._puntero)
+        return anterior
@@ -0,0 +1,253 @@
+# ali_ia/sidecar.py
+# -*- coding: utf-8 -*-
+"""
+Sidecar de inferencia por socket Unix.
+
+Un proceso aparte (manage.py servidor_inferencia) es dueño de los modelos de 9° y
+10/11 y responde predicciones por un socket Unix local. Los workers web solo
+mandan las hojas codificadas (uint8 3/2/1) y reciben las probabilidades, así que
+no necesitan sklearn ni los bosques en memoria. Si el socket no está disponible,
+los módulos de modelo caen a la inferencia en proceso.
+
+Protocolo binario (little-endian), conexiones persistentes:
+  petición : <4sBBHH  magic "ALI3", tipo, modelo, n_filas, n_cols | n_filas*n_cols uint8
+  respuesta: <4sBBHHI magic, estado, formato, n_filas, n_cols, largo | payload
+    tipo    : 1 = PREDECIR (payload: largo de la versión (1 byte) + versión utf-8
+                            [+ n_filas uint8 si formato 3] + float64 n_filas*n_cols),
+              2 = INFO (payload JSON)
+    estado  : 0 = ok, 1 = error (payload = mensaje utf-8)
+    formato : 0 = probabilidades, 3 = probabilidades con marca por fila (1 = la
+              respondió la cascada, ali_ia.cascada.ProbaCascada)
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+
+from ali_ia.cascada import ProbaCascada, marcar
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ALI3"  # ALI2: PREDECIR incluye la versión del modelo; ALI3: marca de la cascada por fila
+PETICION = struct.Struct("<4sBBHH")
+RESPUESTA = struct.Struct("<4sBBHHI")
+
+PREDECIR, INFO = 1, 2
+OK, ERROR = 0, 1
+FORMATO_PROBAS, FORMATO_JSON, FORMATO_TEXTO, FORMATO_PROBAS_CASCADA = 0, 1, 2, 3
+
+GRADO9, GRADO10_11 = 1, 2
+MODULOS = {
+    GRADO9: "test_grado9.ml_model.model9",
+    GRADO10_11: "test_grado_10_11.ml_model.model_10y11",
+}
+
+SOCKET_DEFAULT = os.environ.get("ALI_SIDECAR_SOCKET", "")
+TIMEOUT_DEFAULT = float(os.environ.get("ALI_SIDECAR_TIMEOUT", "2.0"))
+REINTENTO_S = float(os.environ.get("ALI_SIDECAR_REINTENTO", "5.0"))
+
+
+class SidecarNoDisponible(Exception):
+    """El sidecar no respondió (socket ausente, caído o respuesta inválida)."""
+
+
+def _leer_exacto(sock, n: int) -> bytes:
+    partes, faltan = [], n
+    while faltan:
+        trozo = sock.recv(faltan)
+        if not trozo:
+            raise ConnectionError("conexión cerrada")
+        partes.append(trozo)
+        faltan -= len(trozo)
+    return b"".join(partes)
+
+
+# ================== Servidor ==================
+class _Manejador(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                cabecera = _leer_exacto(sock, PETICION.size)
+            except (ConnectionError, OSError):
+                return
+            magic, tipo, modelo, n_filas, n_cols = PETICION.unpack(cabecera)
+            if magic != MAGIC:
+                return
+            try:
+                payload = _leer_exacto(sock, n_filas * n_cols)
+                respuesta = self.server.atender(tipo, modelo, n_filas, n_cols, payload)
+            except (ConnectionError, OSError):
+                return
+            except Exception as e:
+                mensaje = f"{type(e).__name__}: {e}".encode("utf-8")
+                respuesta = RESPUESTA.pack(MAGIC, ERROR, FORMATO_TEXTO, 0, 0, len(mensaje)) + mensaje
+            try:
+                sock.sendall(respuesta)
+            except OSError:
+                return  # el cliente se fue (p. ej. por timeout)
+
+
+class ServidorInferencia(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, ruta_socket: str):
+        if os.path.exists(ruta_socket):
+            os.unlink(ruta_socket)
+        super().__init__(ruta_socket, _Manejador)
+        os.chmod(ruta_socket, 0o660)
+        self.ruta_socket = ruta_socket
+        self.atendidas = 0
+        self._modulos = {}
+
+    def modulo(self, modelo: int):
+        if modelo not in self._modulos:
+            import importlib
+            if modelo not in MODULOS:
+                raise ValueError(f"Modelo desconocido: {modelo}")
+            self._modulos[modelo] = importlib.import_module(MODULOS[modelo])
+        return self._modulos[modelo]
+
+    def precargar(self) -> dict:
+        return {MODULOS[m]: self.modulo(m).precargar() for m in MODULOS}
+
+    def atender(self, tipo, modelo, n_filas, n_cols, payload) -> bytes:
+        mod = self.modulo(modelo)
+        if tipo == INFO:
+            art = mod.MODELO.obtener()
+            cuerpo = json.dumps({
+                "version": art.version,
+                "nombres_clases": art.nombres_clases,
+                "n_preguntas": art.plan.total_preguntas,
+            }, ensure_ascii=False).encode("utf-8")
+            return RESPUESTA.pack(MAGIC, OK, FORMATO_JSON, 0, 0, len(cuerpo)) + cuerpo
+        if tipo == PREDECIR:
+            A = np.frombuffer(payload, dtype=np.uint8).reshape(n_filas, n_cols)
+            probas, _, version = mod._proba_local(A)
+            P = np.ascontiguousarray(np.vstack(probas), dtype="<f8")
+            v = version.encode("utf-8")[:255]
+            marcas = bytes(isinstance(p, ProbaCascada) for p in probas)
+            formato = FORMATO_PROBAS_CASCADA if any(marcas) else FORMATO_PROBAS
+            cuerpo = bytes([len(v)]) + v + (marcas if any(marcas) else b"") + P.tobytes()
+            self.atendidas += n_filas
+            return RESPUESTA.pack(MAGIC, OK, formato, P.shape[0], P.shape[1], len(cuerpo)) + cuerpo
+        raise ValueError(f"Tipo de petición desconocido: {tipo}")
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.ruta_socket)
+        except OSError:
+            pass
+
+
+# ================== Cliente ==================
+class ClienteSidecar:
+    """
+    Cliente con una conexión persistente por hilo. Tras un fallo deja de intentar
+    durante REINTENTO_S segundos para no pagar el timeout en cada predicción.
+    """
+
+    def __init__(self, ruta_socket: str = SOCKET_DEFAULT, timeout: float = TIMEOUT_DEFAULT,
+                 reintento_s: float = REINTENTO_S):
+        self.ruta_socket = ruta_socket
+        self.timeout = timeout
+        self.reintento_s = reintento_s
+        self._local = threading.local()
+        self._info = {}
+        self._caido_hasta = 0.0
+        self.fallos = 0
+
+    @property
+    def configurado(self) -> bool:
+        return bool(self.ruta_socket)
+
+    def disponible(self) -> bool:
+        return self.configurado and time.monotonic() >= self._caido_hasta
+
+    def _conexion(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.ruta_socket)
+            self._local.sock = sock
+        return sock
+
+    def _cerrar(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _llamar(self, tipo, modelo, A=None):
+        if not self.disponible():
+            raise SidecarNoDisponible("sidecar no configurado o marcado como caído")
+        if A is None:
+            n_filas, n_cols, payload = 0, 0, b""
+        else:
+            A = np.ascontiguousarray(A, dtype=np.uint8)
+            n_filas, n_cols = A.shape
+            payload = A.tobytes()
+        try:
+            sock = self._conexion()
+            sock.sendall(PETICION.pack(MAGIC, tipo, modelo, n_filas, n_cols) + payload)
+            magic, estado, formato, r_filas, r_cols, largo = RESPUESTA.unpack(_leer_exacto(sock, RESPUESTA.size))
+            if magic != MAGIC:
+                raise ConnectionError("respuesta inválida")
+            cuerpo = _leer_exacto(sock, largo)
+        except (OSError, ConnectionError, struct.error) as e:
+            self._cerrar()
+            self.fallos += 1
+            self._caido_hasta = time.monotonic() + self.reintento_s
+            raise SidecarNoDisponible(str(e)) from e
+        if estado != OK:
+            # Error del modelo (no del transporte): se propaga como en proceso
+            raise ValueError(cuerpo.decode("utf-8", errors="replace"))
+        if formato == FORMATO_JSON:
+            return json.loads(cuerpo.decode("utf-8"))
+        largo_version = cuerpo[0]
+        version = cuerpo[1:1 + largo_version].decode("utf-8")
+        inicio = 1 + largo_version + (r_filas if formato == FORMATO_PROBAS_CASCADA else 0)
+        P = np.frombuffer(cuerpo, dtype="<f8", offset=inicio).reshape(r_filas, r_cols)
+        if formato == FORMATO_PROBAS_CASCADA:
+            marcas = cuerpo[1 + largo_version:inicio]
+            P = [marcar(p) if m else p for p, m in zip(P, marcas)]
+        return P, version
+
+    def info(self, modelo: int, refrescar: bool = False) -> dict:
+        if refrescar or modelo not in self._info:
+            self._info[modelo] = self._llamar(INFO, modelo)
+        return self._info[modelo]
+
+    def proba(self, modelo: int, A, filas_por_peticion: int = 4096):
+        """
+        Devuelve (lista de vectores de probabilidad, nombres_clases, versión del modelo).
+        Si el sidecar cambió de versión (registro de modelos), se refrescan los nombres;
+        si cambió a mitad de una petición partida en trozos, se repite una vez.
+        """
+        for _ in range(2):
+            probas, versiones = [], set()
+            for i in range(0, len(A), filas_por_peticion):
+                P, version = self._llamar(PREDECIR, modelo, A[i:i + filas_por_peticion])
+                probas.extend(P)
+                versiones.add(version)
+            if len(versiones) > 1:
+                continue
+            info = self.info(modelo)
+            version = versiones.pop() if versiones else info["version"]
+            if info["version"] != version:
+                info = self.info(modelo, refrescar=True)
+            if info["version"] == version:
+                return probas, info["nombres_clases"], version
+        raise SidecarNoDisponible("el sidecar cambió de versión durante la petición")
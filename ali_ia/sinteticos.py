@@ -0,0 +1,53 @@
+# ali_ia/sinteticos.py
+# -*- coding: utf-8 -*-
+"""
+Hojas de respuestas sintéticas (sin red ni BD) para benchmarks y pruebas.
+
+No son uniformes: cada estudiante sintético tiene afinidad alta por 1–2 bloques
+(técnicos / carreras) y baja por el resto, que es como se ven las hojas reales
+(bloques con muchos "Me encanta" y el resto mayormente "No me gusta"/"Me interesa").
+"""
+
+import numpy as np
+
+TEXTO_POR_CODIGO = {3: "Me encanta", 2: "Me interesa", 1: "No me gusta"}
+LETRA_POR_CODIGO = {3: "A", 2: "B", 1: "C"}
+
+# P(3), P(2), P(1) según la afinidad del estudiante con el bloque
+PROBS_AFIN = (0.65, 0.28, 0.07)
+PROBS_NEUTRO = (0.15, 0.40, 0.45)
+
+
+def generar_codigos(n: int, total_preguntas: int, bloques_por_nombre: dict, seed: int = 0) -> np.ndarray:
+    """Matriz uint8 (n, total_preguntas) con valores 3/2/1."""
+    rng = np.random.default_rng(seed)
+    bloques = list(bloques_por_nombre.values())
+    A = np.empty((n, total_preguntas), dtype=np.uint8)
+    # Preguntas fuera de todo bloque (si las hay) se responden como neutras
+    A[:] = rng.choice([3, 2, 1], size=(n, total_preguntas), p=PROBS_NEUTRO)
+    n_favoritos = rng.integers(1, 3, size=n)
+    for i in range(n):
+        favoritos = set(rng.choice(len(bloques), size=n_favoritos[i], replace=False).tolist())
+        for j, qs in enumerate(bloques):
+            probs = PROBS_AFIN if j in favoritos else PROBS_NEUTRO
+            idx = np.asarray(qs) - 1
+            A[i, idx] = rng.choice([3, 2, 1], size=len(idx), p=probs)
+    return A
+
+
+def codigos_a_texto(A, prop_letras: float = 0.0, seed: int = 0):
+    """
+    Convierte códigos a listas de texto; `prop_letras` de las hojas usa A/B/C
+    (front viejo) para ejercitar también esa normalización.
+    """
+    rng = np.random.default_rng(seed)
+    hojas = []
+    for fila in np.asarray(A):
+        mapa = LETRA_POR_CODIGO if rng.random() < prop_letras else TEXTO_POR_CODIGO
+        hojas.append([mapa[int(c)] for c in fila])
+    return hojas
+
+
+def como_dict(respuestas_texto) -> dict:
+    """Lista de respuestas -> {'pregunta_1': ..., ...} como llega a las vistas."""
+    return {f"pregunta_{i}": r for i, r in enumerate(respuestas_texto, start=1)}
@@ -0,0 +1,166 @@
+# ali_ia/sse.py
+# -*- coding: utf-8 -*-
+"""
+Explicación en stream (Server-Sent Events) para tests finalizados.
+
+GET /api/.../<id>/explicacion/stream/ responde `text/event-stream` con:
+
+    event: inicio      data: {"id": ...}                      (empieza a generar)
+    event: token       data: {"texto": "fragmento"}           (uno por fragmento de Groq)
+    event: explicacion data: {"texto": "..."}                 (ya estaba lista: texto completo)
+    event: fin         data: {"explicacion_estado": "LISTA", "explicacion": "..."}
+    event: error       data: {"explicacion_estado": ..., "detail": "..."}
+
+Si la explicación está PENDIENTE el request la toma de la cola (tomar_uno) y la
+genera con `stream=true`, así el estudiante ve el primer token en vez de esperar
+la explicación completa; al terminar se guarda en `resultado` (cola.completar).
+Si la tiene un worker, espera hasta ESPERA_MAX_S a que termine (con comentarios
+keep-alive). Si el cliente se desconecta a mitad, la tarea vuelve a la cola y la
+termina el worker. Al agotar los intentos se guarda `respaldo(test)` (la
+explicación local) y el evento `error` la incluye.
+
+aeventos_explicacion() es la misma secuencia como generador asíncrono (vistas
+ASGI): mientras espera a Groq no ocupa un hilo.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from ali_ia import cola_explicaciones as cola
+from ali_ia.admision_groq import es_saturacion
+from ali_ia.groq_client import GROQ, CircuitoAbierto
+
+logger = logging.getLogger(__name__)
+
+ESPERA_MAX_S = 20     # por debajo del timeout de gunicorn (30 s en modo cola)
+INTERVALO_S = 1.0     # sondeo de la fila mientras la tiene un worker
+TERMINADOS = ("", cola.LISTA, cola.ERROR)
+
+
+def evento(nombre: str, datos) -> str:
+    return f"event: {nombre}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+
+class RenderizadorSSE(BaseRenderer):
+    """Negociación de `Accept: text/event-stream`; los errores previos al stream (401, 404) salen como evento."""
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return evento("error", data).encode("utf-8")
+
+
+def respuesta_sse(eventos) -> StreamingHttpResponse:
+    respuesta = StreamingHttpResponse(eventos, content_type="text/event-stream; charset=utf-8")
+    respuesta["Cache-Control"] = "no-cache"
+    respuesta["X-Accel-Buffering"] = "no"  # nginx / proxies: no acumular el stream
+    return respuesta
+
+
+def _ya_lista(test) -> str:
+    texto = cola.extraer_explicacion(test.resultado) or ""
+    return (evento("explicacion", {"texto": texto})
+            + evento("fin", {"explicacion_estado": test.explicacion_estado, "explicacion": texto}))
+
+
+def _fallido(Modelo, pk, estado: str) -> dict:
+    datos = {"explicacion_estado": estado, "detail": "No fue posible generar la explicación."}
+    if estado == cola.ERROR:
+        datos["explicacion"] = cola.extraer_explicacion(Modelo.objects.only("resultado").get(pk=pk).resultado)
+    return datos
+
+
+def eventos_explicacion(Modelo, pk, explicar_stream, espera_max_s: float = ESPERA_MAX_S,
+                        intervalo_s: float = INTERVALO_S, respaldo=None):
+    """Generador de eventos SSE; `explicar_stream(test)` entrega los fragmentos de texto."""
+    limite = time.monotonic() + espera_max_s
+    while True:
+        test = cola.tomar_uno(Modelo, pk)
+        if test is not None:
+            break
+        actual = Modelo.objects.only("resultado", *cola.CAMPOS).get(pk=pk)
+        if actual.explicacion_estado in TERMINADOS:
+            yield _ya_lista(actual)
+            return
+        if time.monotonic() >= limite:
+            yield evento("fin", {"explicacion_estado": actual.explicacion_estado, "explicacion": None})
+            return
+        yield ": esperando\n\n"
+        time.sleep(intervalo_s)
+
+    yield evento("inicio", {"id": pk})
+    partes = []
+    try:
+        for fragmento in explicar_stream(test):
+            partes.append(fragmento)
+            yield evento("token", {"texto": fragmento})
+    except GeneratorExit:
+        # el cliente cerró la conexión: sin gastar el intento, la termina el worker
+        cola.devolver(Modelo, pk, 0)
+        raise
+    except Exception as e:
+        if isinstance(e, CircuitoAbierto) or es_saturacion(e):
+            estado = cola.devolver(Modelo, pk, GROQ.enfriamiento_s)
+            yield evento("error", {"explicacion_estado": estado, "detail": "Groq no disponible por ahora."})
+            return
+        logger.warning("%s %s: fallo en la explicación en stream: %s", Modelo.__name__, pk, e)
+        estado = cola.reintentar_o_fallar(Modelo, pk, respaldo=respaldo)
+        yield evento("error", _fallido(Modelo, pk, estado))
+        return
+
+    texto = "".join(partes).strip()
+    if not cola.completar(Modelo, pk, texto):
+        # se venció el plazo y la tomó un worker: el estudiante igual ya vio este texto
+        logger.info("%s %s: explicación en stream descartada (plazo vencido)", Modelo.__name__, pk)
+    yield evento("fin", {"explicacion_estado": cola.LISTA, "explicacion": texto})
+
+
+async def aeventos_explicacion(Modelo, pk, aexplicar_stream, espera_max_s: float = ESPERA_MAX_S,
+                               intervalo_s: float = INTERVALO_S, respaldo=None):
+    """Versión asíncrona de eventos_explicacion; `aexplicar_stream(test)` es un generador asíncrono."""
+    leer = sync_to_async(lambda: Modelo.objects.only("resultado", *cola.CAMPOS).get(pk=pk))
+    limite = time.monotonic() + espera_max_s
+    while True:
+        test = await sync_to_async(cola.tomar_uno)(Modelo, pk)
+        if test is not None:
+            break
+        actual = await leer()
+        if actual.explicacion_estado in TERMINADOS:
+            yield _ya_lista(actual)
+            return
+        if time.monotonic() >= limite:
+            yield evento("fin", {"explicacion_estado": actual.explicacion_estado, "explicacion": None})
+            return
+        yield ": esperando\n\n"
+        await asyncio.sleep(intervalo_s)
+
+    yield evento("inicio", {"id": pk})
+    partes = []
+    try:
+        async for fragmento in aexplicar_stream(test):
+            partes.append(fragmento)
+            yield evento("token", {"texto": fragmento})
+    except (GeneratorExit, asyncio.CancelledError):
+        await sync_to_async(cola.devolver)(Modelo, pk, 0)
+        raise
+    except Exception as e:
+        if isinstance(e, CircuitoAbierto) or es_saturacion(e):
+            estado = await sync_to_async(cola.devolver)(Modelo, pk, GROQ.enfriamiento_s)
+            yield evento("error", {"explicacion_estado": estado, "detail": "Groq no disponible por ahora."})
+            return
+        logger.warning("%s %s: fallo en la explicación en stream: %s", Modelo.__name__, pk, e)
+        estado = await sync_to_async(cola.reintentar_o_fallar)(Modelo, pk, respaldo=respaldo)
+        yield evento("error", await sync_to_async(_fallido)(Modelo, pk, estado))
+        return
+
+    texto = "".join(partes).strip()
+    if not await sync_to_async(cola.completar)(Modelo, pk, texto):
+        logger.info("%s %s: explicación en stream descartada (plazo vencido)", Modelo.__name__, pk)
+    yield evento("fin", {"explicacion_estado": cola.LISTA, "explicacion": texto})
@@ -0,0 +1,974 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ali_ia.admision_groq import ControlAdmision, CubetaTokens, SinCupo, es_saturacion
+from ali_ia.artefactos import ArtefactosModelo, ModeloPerezoso, leer_columna_csv, leer_mapa_csv
+from ali_ia.bosque_plano import BosquePlano
+from ali_ia.cache_predicciones import CachePredicciones, empaquetar_respuestas
+from ali_ia.cache_explicaciones import CacheExplicaciones, perfil_por_bloques
+from ali_ia.cascada import Cascada
+from ali_ia.cola_explicaciones import espera_reintento, extraer_explicacion, reemplazar_explicacion
+from ali_ia.destilado import destilar, evaluar, fidelidad, rasgos_bloques
+from ali_ia.explicacion_local import RESPALDO, MetricasLocal, redactar
+from ali_ia.groq_client import CircuitoAbierto, ClienteGroq, GroqError
+from ali_ia.groq_stub import ServidorGroqStub
+from ali_ia.management.commands.pregenerar_explicaciones import contar_cobertura, perfiles_frecuentes
+from ali_ia.microlotes import DespachadorMicrolotes
+from ali_ia.paquete_modelo import PaqueteInvalido, cargar_paquete, exportar_paquete
+from ali_ia.plan_features import PlanFeatures
+from ali_ia.prompts import MetricasPrompts, estimar_tokens, medias_por_bloque, resumir_respuestas, tokens_mensajes
+from ali_ia.provisional import CalculadoraProvisional
+from ali_ia.registro_modelos import RegistroModelos
+from ali_ia.sinteticos import codigos_a_texto, como_dict, generar_codigos
+
+
+class BosquePlanoTests(SimpleTestCase):
+    """BosquePlano debe reproducir predict_proba de sklearn (n_jobs=1) bit a bit."""
+
+    def setUp(self):
+        from sklearn.ensemble import RandomForestClassifier
+
+        rng = np.random.default_rng(0)
+        self.X = rng.integers(1, 4, size=(400, 12)).astype(np.float32)
+        y = (self.X[:, :4].sum(axis=1) > self.X[:, 4:8].sum(axis=1)).astype(int) + (self.X[:, 8] == 3)
+        self.modelo = RandomForestClassifier(n_estimators=25, random_state=0, n_jobs=1).fit(self.X, y)
+        self.bosque = BosquePlano.desde_sklearn(self.modelo)
+
+    def test_predict_proba_igual_a_sklearn(self):
+        esperado = self.modelo.predict_proba(self.X)
+        self.assertTrue(np.array_equal(self.bosque.predict_proba(self.X), esperado))
+        for i in range(20):
+            fila = self.X[i:i + 1]
+            self.assertTrue(np.array_equal(self.bosque.predict_proba(fila), esperado[i:i + 1]))
+
+    def test_apply_igual_a_sklearn(self):
+        hojas = self.bosque.apply(self.X[:50]) - self.bosque.raices
+        self.assertTrue(np.array_equal(hojas, self.modelo.apply(self.X[:50])))
+
+    def test_rechaza_columnas_incorrectas(self):
+        with self.assertRaises(ValueError):
+            self.bosque.predict_proba(np.zeros((1, 5), dtype=np.float32))
+
+
+class PlanFeaturesGenericoTests(SimpleTestCase):
+
+    def test_columnas_desconocidas_quedan_en_nan(self):
+        plan = PlanFeatures(["pregunta_2", "suma_x", "otra", "pregunta_1"], 2, {"x": [1, 2]})
+        X = plan.vectorizar(np.array([3, 1], dtype=np.uint8))
+        self.assertEqual(X.shape, (1, 4))
+        self.assertEqual(X[0, 0], 1.0)
+        self.assertEqual(X[0, 1], 4.0)
+        self.assertTrue(np.isnan(X[0, 2]))
+        self.assertEqual(X[0, 3], 3.0)
+        self.assertEqual(plan.columnas_faltantes, ["otra"])
+
+
+class CachePrediccionesTests(SimpleTestCase):
+
+    def test_empaquetado_2_bits(self):
+        a = np.array([3, 2, 1, 3, 1], dtype=np.uint8)
+        self.assertEqual(empaquetar_respuestas(a), bytes([0b11011011, 0b01]))
+        self.assertEqual(len(empaquetar_respuestas(np.full(60, 3, dtype=np.uint8))), 15)
+        self.assertNotEqual(empaquetar_respuestas([3, 2, 1]), empaquetar_respuestas([1, 2, 3]))
+
+    def test_hits_misses_y_evictions(self):
+        cache = CachePredicciones("prueba", max_items=2, alias_compartido="")
+        hojas = [np.full(57, v, dtype=np.uint8) for v in (1, 2, 3)]
+        self.assertIsNone(cache.obtener("v1", hojas[0]))
+        for i, hoja in enumerate(hojas):
+            cache.guardar("v1", hoja, [i, 1.0 - i])
+        self.assertIsNone(cache.obtener("v1", hojas[0]))  # desalojada (LRU de 2)
+        self.assertEqual(cache.obtener("v1", hojas[2]).tolist(), [2.0, -1.0])
+
+        stats = cache.estadisticas()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (1, 2, 1))
+        self.assertEqual(stats["tamano"], 2)
+
+    def test_cambio_de_version_invalida(self):
+        cache = CachePredicciones("prueba", max_items=10, alias_compartido="")
+        hoja = np.full(60, 3, dtype=np.uint8)
+        cache.guardar("v1", hoja, [1.0])
+        self.assertIsNone(cache.obtener("v2", hoja))
+        self.assertEqual(cache.estadisticas()["tamano"], 0)
+        self.assertEqual(cache.estadisticas()["invalidaciones"], 1)
+
+    def test_capa_compartida(self):
+        from django.core.cache import caches
+
+        with self.settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                                   "compartida": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                                  "LOCATION": "pruebas-prediccion"}}):
+            hoja = np.full(60, 2, dtype=np.uint8)
+            worker_a = CachePredicciones("prueba", max_items=10, alias_compartido="compartida")
+            worker_b = CachePredicciones("prueba", max_items=10, alias_compartido="compartida")
+            worker_a.guardar("v1", hoja, [0.25, 0.75])
+            self.assertEqual(worker_b.obtener("v1", hoja).tolist(), [0.25, 0.75])
+            self.assertEqual(worker_b.estadisticas()["hits_compartido"], 1)
+            caches["compartida"].clear()
+
+
+class ArtefactosTests(SimpleTestCase):
+
+    def test_csv_sin_pandas(self):
+        with tempfile.TemporaryDirectory() as d:
+            ruta = os.path.join(d, "mapa.csv")
+            with open(ruta, "w", encoding="utf-8") as f:
+                f.write(",0\n1,Medicina\n2,Diseño Gráfico\n\nx,Nada\n")
+            self.assertEqual(leer_mapa_csv(ruta), {1: "Medicina", 2: "Diseño Gráfico"})
+            self.assertEqual(leer_columna_csv(ruta, 1), ["0", "Medicina", "Diseño Gráfico", "Nada"])
+
+    def test_modelo_perezoso_carga_una_vez(self):
+        llamadas = []
+
+        def cargador():
+            llamadas.append(1)
+            return object()
+
+        modelo = ModeloPerezoso("prueba", cargador)
+        self.assertFalse(modelo.cargado)
+        hilos = [threading.Thread(target=modelo.obtener) for _ in range(8)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        self.assertTrue(modelo.cargado)
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(modelo.precargar(), 0.0)
+
+    @staticmethod
+    def _esperar(condicion, limite=5.0):
+        fin = time.monotonic() + limite
+        while not condicion() and time.monotonic() < fin:
+            time.sleep(0.01)
+
+    def test_cambio_de_version_sin_bloquear(self):
+        estado = {"deseada": "v1"}
+        listo = threading.Event()
+
+        def cargador():
+            version = estado["deseada"]
+            if version == "v2":
+                listo.wait(5)  # carga lenta: mientras tanto se sigue sirviendo v1
+            return SimpleNamespace(version=version)
+
+        modelo = ModeloPerezoso("prueba", cargador, version_deseada=lambda: estado["deseada"], intervalo_s=0)
+        self.assertEqual(modelo.obtener().version, "v1")
+        estado["deseada"] = "v2"
+        self.assertEqual(modelo.obtener().version, "v1")  # dispara la recarga en segundo plano
+        self.assertEqual(modelo.obtener().version, "v1")
+        listo.set()
+        self._esperar(lambda: modelo.recargas == 1)
+        self.assertEqual(modelo.obtener().version, "v2")
+
+    def test_recarga_fallida_conserva_version(self):
+        estado = {"deseada": "v1"}
+
+        def cargador():
+            if estado["deseada"] == "rota":
+                raise ValueError("paquete roto")
+            return SimpleNamespace(version=estado["deseada"])
+
+        modelo = ModeloPerezoso("prueba", cargador, version_deseada=lambda: estado["deseada"], intervalo_s=0)
+        modelo.obtener()
+        estado["deseada"] = "rota"
+        with self.assertLogs("ali_ia.artefactos", level="ERROR"):
+            modelo.obtener()
+            self._esperar(lambda: modelo.fallos_recarga == 1)
+        self.assertEqual(modelo.obtener().version, "v1")
+
+
+class RegistroModelosTests(SimpleTestCase):
+
+    def setUp(self):
+        from sklearn.ensemble import RandomForestClassifier
+
+        self.raiz = tempfile.mkdtemp()
+        plan = PlanFeatures(["pregunta_1", "pregunta_2"], 2, {})
+        X = np.array([[1, 1], [3, 3], [1, 3], [3, 1]], dtype=np.float32)
+        modelo = RandomForestClassifier(n_estimators=3, random_state=0).fit(X, [0, 1, 0, 1])
+        self.art = lambda version: ArtefactosModelo(
+            modelo=modelo, xcols=plan.xcols, nombres_clases=["a", "b"], plan=plan,
+            bosque=BosquePlano.desde_sklearn(modelo), version=version,
+        )
+
+    def test_registrar_activar_y_listar(self):
+        registro = RegistroModelos("prueba", raiz=self.raiz)
+        self.assertIsNone(registro.version_activa())
+        registro.registrar(self.art("v1"))
+        registro.registrar(self.art("v2"))
+        self.assertIsNone(registro.activar("v1"))
+        self.assertEqual(registro.version_activa(), "v1")
+        self.assertEqual(registro.activar("v2"), "v1")
+        self.assertEqual(registro.ruta_activa(), registro.ruta("v2"))
+        versiones = {v["version"]: v["activa"] for v in registro.versiones()}
+        self.assertEqual(versiones, {"v1": False, "v2": True})
+        # Otro proceso (otra instancia) ve el mismo puntero
+        self.assertEqual(RegistroModelos("prueba", raiz=self.raiz).version_activa(), "v2")
+
+    def test_no_activa_versiones_inexistentes_o_corruptas(self):
+        registro = RegistroModelos("prueba", raiz=self.raiz)
+        with self.assertRaises(PaqueteInvalido):
+            registro.activar("nada")
+        ruta = registro.ruta(registro.registrar(self.art("v1")))
+        with open(os.path.join(ruta, "raices.npy"), "ab") as f:
+            f.write(b"x")
+        with self.assertRaises(PaqueteInvalido):
+            registro.activar("v1")
+        self.assertIsNone(registro.version_activa())
+
+
+class MicrolotesTests(SimpleTestCase):
+
+    @staticmethod
+    def _fn_lote(llamadas):
+        def fn(A):
+            llamadas.append(len(A))
+            return [fila.astype(np.float64) * 2 for fila in A], ["x"]
+        return fn
+
+    def test_peticiones_concurrentes_se_agrupan(self):
+        llamadas = []
+        despachador = DespachadorMicrolotes("prueba", self._fn_lote(llamadas), activo=True,
+                                            ventana_ms=50, max_filas=64)
+        resultados = {}
+
+        def pedir(i):
+            A = np.full((1, 4), i % 3 + 1, dtype=np.uint8)
+            resultados[i] = despachador.enviar(A)
+
+        hilos = [threading.Thread(target=pedir, args=(i,)) for i in range(16)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        for i, (probas, nombres) in resultados.items():
+            self.assertEqual(len(probas), 1)
+            self.assertEqual(probas[0].tolist(), [2.0 * (i % 3 + 1)] * 4)
+            self.assertEqual(nombres, ["x"])
+        stats = despachador.estadisticas()
+        self.assertEqual(stats["peticiones"], 16)
+        self.assertLess(stats["lotes"], 16)
+        self.assertEqual(sum(llamadas), 16)
+
+    def test_apagado_llama_directo(self):
+        llamadas = []
+        despachador = DespachadorMicrolotes("prueba", self._fn_lote(llamadas), activo=False)
+        probas, _ = despachador.enviar(np.ones((3, 4), dtype=np.uint8))
+        self.assertEqual(len(probas), 3)
+        self.assertEqual(llamadas, [3])
+        self.assertEqual(despachador.estadisticas()["lotes"], 0)
+
+    def test_error_se_propaga_a_cada_peticion(self):
+        def falla(A):
+            raise ValueError("modelo roto")
+
+        despachador = DespachadorMicrolotes("prueba", falla, activo=True, ventana_ms=1)
+        with self.assertRaises(ValueError):
+            despachador.enviar(np.ones((1, 4), dtype=np.uint8))
+
+
+class ProvisionalTests(SimpleTestCase):
+    """El estado incremental debe coincidir con reconstruir desde cero."""
+
+    BLOQUES = {"A": [1, 2], "B": [3, 4], "C": [5, 6]}
+
+    def setUp(self):
+        codigos = {"Me encanta": 3, "Me interesa": 2, "No me gusta": 1}
+        self.calc = CalculadoraProvisional("prueba", 6, self.BLOQUES, lambda r: codigos.get(r, 0))
+
+    def test_incremental_igual_a_reconstruccion(self):
+        respuestas = {}
+        for rev, (n, r) in enumerate([(1, "No me gusta"), (3, "Me encanta"), (4, "Me encanta"), (1, "Me interesa")]):
+            respuestas[f"pregunta_{n}"] = r
+            respondidas = sum(1 for v in respuestas.values() if v)
+            parcial = self.calc.actualizar(7, respuestas, {f"pregunta_{n}": r}, respondidas, rev, rev + 1)
+        self.assertEqual(self.calc.reconstrucciones, 1)
+        self.assertGreaterEqual(self.calc.incrementales, 3)
+        self.calc.olvidar(7)
+        desde_cero = self.calc.actualizar(7, respuestas, {}, 3, 4, 5)
+        self.assertEqual(parcial, desde_cero)
+        self.assertEqual(desde_cero["top3"][0][0], "B")
+        self.assertTrue(desde_cero["es_provisional"])
+
+    def test_incremental_no_recodifica_el_dict(self):
+        llamadas = []
+        codigos = {"Me encanta": 3, "Me interesa": 2, "No me gusta": 1}
+        calc = CalculadoraProvisional("prueba", 6, self.BLOQUES,
+                                      lambda r: llamadas.append(r) or codigos.get(r, 0))
+        calc.actualizar(1, {"pregunta_1": "Me encanta"}, {"pregunta_1": "Me encanta"}, 1, 0, 1)
+        del llamadas[:]
+        respuestas = {"pregunta_1": "Me encanta", "pregunta_2": "No me gusta"}
+        calc.actualizar(1, respuestas, {"pregunta_2": "No me gusta"}, 2, 1, 2)
+        self.assertEqual(llamadas, ["No me gusta"])  # solo lo que trajo el PATCH
+
+    def test_patch_sin_cambios_reutiliza(self):
+        respuestas = {"pregunta_5": "Me encanta"}
+        primero = self.calc.actualizar(1, respuestas, respuestas, 1, 0, 1)
+        segundo = self.calc.actualizar(1, respuestas, respuestas, 1, 1, 2)
+        self.assertIs(primero, segundo)
+        self.assertEqual(self.calc.estadisticas()["reutilizados"], 1)
+
+    def test_estado_desfasado_se_reconstruye(self):
+        self.calc.actualizar(1, {"pregunta_1": "Me encanta"}, {"pregunta_1": "Me encanta"}, 1, 0, 1)
+        # Otro worker atendió un PATCH intermedio (revisión 1 -> 2): este PATCH lee la 2
+        respuestas = {"pregunta_1": "Me encanta", "pregunta_2": "Me encanta", "pregunta_6": "Me encanta"}
+        res = self.calc.actualizar(1, respuestas, {"pregunta_6": "Me encanta"}, 3, 2, 3)
+        self.assertEqual(res["respondidas"], 3)
+        self.assertEqual(self.calc.reconstrucciones, 2)
+
+    def test_cambio_de_otro_worker_con_mismo_conteo_se_reconstruye(self):
+        self.calc.actualizar(1, {"pregunta_1": "Me encanta", "pregunta_3": "No me gusta"},
+                             {"pregunta_1": "Me encanta", "pregunta_3": "No me gusta"}, 2, 0, 1)
+        # Otro worker cambió la pregunta 3 (ya respondida): el conteo sigue en 3 tras este PATCH
+        respuestas = {"pregunta_1": "Me encanta", "pregunta_3": "Me encanta", "pregunta_5": "No me gusta"}
+        res = self.calc.actualizar(1, respuestas, {"pregunta_5": "No me gusta"}, 3, 2, 3)
+        self.assertEqual(self.calc.reconstrucciones, 2)
+        self.calc.olvidar(1)
+        self.assertEqual(res, self.calc.actualizar(1, respuestas, {}, 3, 3, 4))
+
+
+class MetricasTests(SimpleTestCase):
+
+    def test_resumen(self):
+        from ali_ia.metricas import percentil, resumen
+
+        segundos = [0.001, 0.002, 0.003, 0.004]
+        self.assertEqual(resumen(segundos, (50, 99), prefijo="espera_", maximo=True),
+                         {"espera_p50_ms": 2.5, "espera_p99_ms": 4.0, "espera_max_ms": 4.0})
+        self.assertEqual(resumen([], escala=1e6, unidad="us", maximo=True, vacio=0.0),
+                         {"p50_us": 0.0, "p95_us": 0.0, "max_us": 0.0})
+        self.assertEqual(percentil([10, 20], 50, escala=1), 15.0)
+        self.assertIsNone(percentil([], 95))
+
+
+class SinteticosTests(SimpleTestCase):
+    BLOQUES = {"A": [1, 2, 3], "B": [4, 5, 6], "C": [7, 8, 9]}
+
+    def test_reproducible_y_valido(self):
+        A = generar_codigos(50, 9, self.BLOQUES, seed=1)
+        self.assertEqual(A.shape, (50, 9))
+        self.assertEqual(A.dtype, np.uint8)
+        self.assertTrue(set(np.unique(A).tolist()) <= {1, 2, 3})
+        self.assertTrue(np.array_equal(A, generar_codigos(50, 9, self.BLOQUES, seed=1)))
+
+    def test_hojas_con_bloques_favoritos(self):
+        A = generar_codigos(200, 9, self.BLOQUES, seed=2).astype(float)
+        sumas = np.stack([A[:, [q - 1 for q in qs]].sum(axis=1) for qs in self.BLOQUES.values()], axis=1)
+        # El mejor bloque de cada hoja destaca claramente sobre el peor
+        self.assertGreater((sumas.max(axis=1) - sumas.min(axis=1)).mean(), 2.0)
+
+    def test_texto_y_letras(self):
+        A = generar_codigos(20, 9, self.BLOQUES, seed=3)
+        hojas = codigos_a_texto(A, prop_letras=1.0)
+        self.assertTrue(all(r in {"A", "B", "C"} for h in hojas for r in h))
+        self.assertEqual(como_dict(hojas[0])["pregunta_9"], hojas[0][8])
+
+
+class PaqueteModeloTests(SimpleTestCase):
+    """El paquete memory-map debe predecir igual que el bosque compilado desde el pickle."""
+
+    def setUp(self):
+        from sklearn.ensemble import RandomForestClassifier
+
+        rng = np.random.default_rng(1)
+        A = rng.integers(1, 4, size=(300, 6)).astype(np.uint8)
+        xcols = [f"pregunta_{i}" for i in range(1, 7)] + ["suma_x", "suma_y"]
+        self.plan = PlanFeatures(xcols, 6, {"x": [1, 2, 3], "y": [4, 5, 6]})
+        self.X = self.plan.vectorizar(A)
+        y = (self.X[:, 6] > self.X[:, 7]).astype(int)
+        modelo = RandomForestClassifier(n_estimators=10, random_state=0, n_jobs=1).fit(self.X, y)
+        self.art = ArtefactosModelo(
+            modelo=modelo, xcols=xcols, nombres_clases=["X", "Y"], plan=self.plan,
+            bosque=BosquePlano.desde_sklearn(modelo), version="abc123", extra={"orden": ["X", "Y"]},
+        )
+        self.dir = tempfile.mkdtemp()
+
+    def test_exportar_y_cargar(self):
+        ruta = exportar_paquete(self.dir, "prueba", self.art)
+        self.assertEqual(os.path.basename(ruta), "prueba-abc123")
+        bosque, manifiesto = cargar_paquete(ruta, verificar=True)
+        self.assertIsInstance(bosque.umbral, np.memmap)
+        self.assertFalse(bosque.umbral.flags.writeable)
+        self.assertEqual(manifiesto["xcols"], self.art.xcols)
+        self.assertEqual(manifiesto["nombres_clases"], ["X", "Y"])
+        self.assertTrue(np.array_equal(bosque.predict_proba(self.X), self.art.bosque.predict_proba(self.X)))
+
+    def test_checksum_detecta_cambios(self):
+        ruta = exportar_paquete(self.dir, "prueba", self.art)
+        with open(os.path.join(ruta, "umbral.npy"), "r+b") as f:
+            f.seek(-8, os.SEEK_END)
+            f.write(b"\x00" * 8)
+        with self.assertRaises(PaqueteInvalido):
+            cargar_paquete(ruta, verificar=True)
+
+    def test_rechaza_columnas_desconocidas(self):
+        self.art.plan = PlanFeatures(self.art.xcols[:-1] + ["otra"], 6, {"x": [1, 2, 3]})
+        with self.assertRaises(PaqueteInvalido):
+            exportar_paquete(self.dir, "prueba", self.art)
+
+
+class CascadaTests(SimpleTestCase):
+    BLOQUES = {"A": [1, 2], "B": [3, 4], "C": [5, 6]}
+
+    def setUp(self):
+        self.art = SimpleNamespace(version="v1", nombres_clases=["C", "A", "B"])
+        self.A = np.array([
+            [3, 3, 1, 1, 1, 1],   # A claro (margen 2)
+            [2, 2, 2, 2, 1, 1],   # empate A/B -> bosque
+            [1, 1, 1, 2, 3, 3],   # C (margen 1.5)
+        ], dtype=np.uint8)
+
+    def test_resuelve_por_margen(self):
+        cascada = Cascada("prueba", 6, self.BLOQUES, activo=True, margen=1.0, sombra=0.0)
+        resueltas, probas, sombra = cascada.separar(self.art, self.A)
+        self.assertEqual(resueltas.tolist(), [0, 2])
+        self.assertEqual(len(sombra), 0)
+        # columnas según nombres_clases del modelo, no según el orden de los bloques
+        self.assertEqual(int(np.argmax(probas[0])), 1)
+        self.assertEqual(int(np.argmax(probas[1])), 0)
+        self.assertAlmostEqual(float(probas[0].sum()), 1.0)
+        est = cascada.estadisticas()
+        self.assertEqual((est["filas"], est["resueltas"]), (3, 2))
+
+    def test_apagada_o_clases_distintas_no_resuelve(self):
+        apagada = Cascada("prueba", 6, self.BLOQUES, activo=False)
+        self.assertEqual(len(apagada.separar(self.art, self.A)[0]), 0)
+        otra = SimpleNamespace(version="v2", nombres_clases=["X", "Y", "Z"])
+        activa = Cascada("prueba", 6, self.BLOQUES, activo=True, margen=0.0)
+        self.assertEqual(len(activa.separar(otra, self.A)[0]), 0)
+
+    def test_sombra_mide_concordancia(self):
+        cascada = Cascada("prueba", 6, self.BLOQUES, activo=True, margen=1.0, sombra=1.0, seed=0)
+        resueltas, probas, sombra = cascada.separar(self.art, self.A)
+        self.assertEqual(sombra.tolist(), resueltas.tolist())
+        cascada.registrar_sombra(probas[0], [0.1, 0.8, 0.1])
+        cascada.registrar_sombra(probas[1], [0.1, 0.8, 0.1])
+        cascada.registrar_bosque(10, 0.01)
+        est = cascada.estadisticas()
+        self.assertEqual(est["concordancia"], 0.5)
+        self.assertEqual(est["ms_ahorrados_est"], 2.0)
+
+
+class DestiladoTests(SimpleTestCase):
+    BLOQUES = {"A": [1, 2, 3], "B": [4, 5, 6], "C": [7, 8, 9]}
+
+    def setUp(self):
+        self.A = generar_codigos(3000, 9, self.BLOQUES, seed=0)
+        # "bosque" de juguete: softmax de los promedios por bloque
+        F = rasgos_bloques(self.A, list(self.BLOQUES.values()))
+        z = np.exp(3 * (F - F.max(axis=1, keepdims=True)))
+        self.P = z / z.sum(axis=1, keepdims=True)
+
+    def test_rasgos_ignoran_sin_responder(self):
+        A = np.array([[3, 0, 1, 0, 0, 0, 2, 2, 2]], dtype=np.uint8)
+        F = rasgos_bloques(A, list(self.BLOQUES.values()))
+        self.assertEqual(F.tolist(), [[2.0, 2.0, 2.0]])
+        A[0, 1] = 3
+        self.assertAlmostEqual(rasgos_bloques(A, list(self.BLOQUES.values()))[0, 0], 7 / 3)
+
+    def test_lineal_json_y_fidelidad(self):
+        modelo = destilar("prueba", "v1", list(self.BLOQUES), self.BLOQUES, 9, self.A, self.P)
+        modelo = json.loads(json.dumps(modelo))  # lo que recibe el cliente
+        Q = evaluar(modelo, self.A)
+        self.assertTrue(np.allclose(Q.sum(axis=1), 1.0))
+        reporte = fidelidad(modelo, self.A, self.P, np.where(self.A % 2 == 0, 0, self.A))
+        # los empates entre bloques hacen que el top-1 no sea siempre el mismo
+        self.assertGreater(reporte["completas"]["concordancia_top1"], 0.85)
+        self.assertLess(reporte["completas"]["error_abs_medio"], 0.02)
+        self.assertIn("parciales", reporte)
+
+    def test_arbol_evalua_igual_que_sklearn(self):
+        from sklearn.tree import DecisionTreeRegressor
+
+        modelo = destilar("prueba", "v1", list(self.BLOQUES), self.BLOQUES, 9, self.A, self.P,
+                          tipo="arbol", profundidad=3)
+        F = rasgos_bloques(self.A, list(self.BLOQUES.values()))
+        esperado = DecisionTreeRegressor(max_depth=3, min_samples_leaf=20, random_state=0).fit(F, self.P).predict(F)
+        self.assertTrue(np.allclose(evaluar(modelo, self.A), esperado, atol=1e-5))
+
+
+class ColaExplicacionesTests(SimpleTestCase):
+
+    def test_reemplaza_solo_la_explicacion(self):
+        resultado = "Carrera sugerida por ALI: Derecho\nTop-3: Derecho (0.50)\n\nExplicación: pendiente"
+        nuevo = reemplazar_explicacion(resultado, "Te gusta argumentar.")
+        self.assertEqual(nuevo, resultado.replace("pendiente", "Te gusta argumentar."))
+        self.assertEqual(extraer_explicacion(nuevo), "Te gusta argumentar.")
+        self.assertEqual(reemplazar_explicacion("", "x"), "Explicación: x")
+        self.assertIsNone(extraer_explicacion("Sin explicación"))
+
+    def test_espera_exponencial(self):
+        self.assertEqual([espera_reintento(i) for i in (1, 2, 3)], [15, 30, 60])
+
+
+class _StubGroq(BaseHTTPRequestHandler):
+    """Servidor local que imita /chat/completions; responde según `self.server.guion`."""
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        self.server.peticiones.append(self.client_address)
+        status = self.server.guion.pop(0) if self.server.guion else self.server.por_defecto
+        time.sleep(getattr(self.server, "retraso", 0))
+        if status == 200 and payload.get("stream"):
+            self._stream(["ho", "la ", "ñandú"])
+            return
+        cuerpo = (json.dumps({"choices": [{"message": {"content": " hola "}}]}) if status == 200
+                  else json.dumps({"error": status})).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _stream(self, fragmentos):
+        cuerpo = "".join(
+            f"data: {json.dumps({'choices': [{'delta': {'content': f}}]}, ensure_ascii=False)}\n\n"
+            for f in fragmentos
+        ) + ": keep-alive\n\ndata: [DONE]\n\n"
+        cuerpo = cuerpo.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")  # sin charset, como Groq
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ClienteGroqTests(SimpleTestCase):
+
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _StubGroq)
+        self.servidor.peticiones, self.servidor.guion, self.servidor.por_defecto = [], [], 200
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{self.servidor.server_address[1]}/openai/v1/chat/completions"
+        self.cliente = ClienteGroq(url=url, api_key="x", timeout=2, reintentos=2, espera_base=0.001,
+                                   espera_max=0.01, umbral_fallos=2, enfriamiento_s=0.2)
+
+    def tearDown(self):
+        self.cliente.cerrar()
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+    def _completar(self):
+        return self.cliente.completar([{"role": "user", "content": "hola"}], modelo="m")
+
+    def test_reutiliza_la_conexion(self):
+        self.assertEqual(self._completar(), "hola")
+        self.assertEqual(self._completar(), "hola")
+        # mismo puerto de origen: una sola conexión TCP (keep-alive)
+        self.assertEqual(len(set(self.servidor.peticiones)), 1)
+        est = self.cliente.estadisticas()
+        self.assertEqual((est["llamadas"], est["exitos"]), (2, 2))
+        self.assertIsNotNone(est["p50_ms"])
+
+    def test_reintenta_429_y_5xx(self):
+        self.servidor.guion = [429, 503]
+        self.assertEqual(self._completar(), "hola")
+        est = self.cliente.estadisticas()
+        self.assertEqual(est["reintentos"], 2)
+        self.assertEqual(est["por_status"], {429: 1, 503: 1, 200: 1})
+
+    def test_4xx_no_reintenta_ni_abre_el_circuito(self):
+        self.servidor.guion = [400, 400, 400]
+        for _ in range(3):
+            with self.assertRaises(GroqError) as ctx:
+                self._completar()
+            self.assertEqual(ctx.exception.status, 400)
+        self.assertEqual(len(self.servidor.peticiones), 3)
+        self.assertEqual(self.cliente.estado_circuito(), "cerrado")
+
+    def test_circuito_abre_y_se_recupera(self):
+        self.servidor.por_defecto = 500
+        with self.assertLogs("ali_ia.groq_client", "WARNING"):
+            for _ in range(2):
+                with self.assertRaises(GroqError):
+                    self._completar()
+        self.assertEqual(len(self.servidor.peticiones), 6)  # 2 llamadas x 3 intentos
+        with self.assertRaises(CircuitoAbierto):
+            self._completar()
+        self.assertEqual(len(self.servidor.peticiones), 6)  # falla sin tocar la red
+        self.assertEqual(self.cliente.estadisticas()["rechazadas_circuito"], 1)
+
+        time.sleep(0.25)
+        self.servidor.por_defecto = 200
+        self.assertEqual(self._completar(), "hola")
+        self.assertEqual(self.cliente.estado_circuito(), "cerrado")
+
+    def test_limite_acota_intentos_y_esperas(self):
+        from ali_ia.groq_client import plazo_a_limite
+
+        self.servidor.por_defecto, self.servidor.retraso = 500, 0.2
+        t0 = time.monotonic()
+        with self.assertLogs("ali_ia.groq_client", "WARNING"), self.assertRaises(GroqError):
+            self.cliente.completar([{"role": "user", "content": "hola"}], modelo="m", limite=plazo_a_limite(0.3))
+        # sin plazo serían 3 intentos de 0.2 s; con plazo, el segundo se corta al vencer
+        self.assertLess(time.monotonic() - t0, 0.5)
+        self.assertEqual(len(self.servidor.peticiones), 2)
+
+    def test_stream_entrega_fragmentos(self):
+        self.servidor.guion = [503]  # antes del primer byte sí reintenta
+        fragmentos = list(self.cliente.completar_stream([{"role": "user", "content": "hola"}], modelo="m"))
+        self.assertEqual(fragmentos, ["ho", "la ", "ñandú"])
+        est = self.cliente.estadisticas()
+        self.assertEqual((est["exitos"], est["reintentos"]), (1, 1))
+        self.assertIsNotNone(est["ttft_p50_ms"])
+        # la conexión vuelve al pool y sirve para la siguiente llamada
+        self.assertEqual(self._completar(), "hola")
+        self.assertEqual(len(set(self.servidor.peticiones)), 1)
+
+    def test_async_completar_y_stream(self):
+        mensajes = [{"role": "user", "content": "hola"}]
+
+        async def llamadas():
+            try:
+                textos = await asyncio.gather(*(self.cliente.acompletar(mensajes, modelo="m") for _ in range(3)))
+                fragmentos = [f async for f in self.cliente.acompletar_stream(mensajes, modelo="m")]
+                return textos, fragmentos
+            finally:
+                await self.cliente.acerrar()
+
+        self.servidor.guion = [429]
+        textos, fragmentos = asyncio.run(llamadas())
+        self.assertEqual(textos, ["hola"] * 3)
+        self.assertEqual(fragmentos, ["ho", "la ", "ñandú"])
+        est = self.cliente.estadisticas()  # mismas métricas que las llamadas síncronas
+        self.assertEqual((est["llamadas"], est["exitos"], est["reintentos"]), (4, 4, 1))
+        self.assertIsNotNone(est["ttft_p50_ms"])
+
+    def test_async_circuito_compartido(self):
+        self.servidor.por_defecto = 500
+
+        async def llamar():
+            try:
+                return await self.cliente.acompletar([{"role": "user", "content": "hola"}], modelo="m")
+            finally:
+                await self.cliente.acerrar()
+
+        with self.assertLogs("ali_ia.groq_client", "WARNING"):
+            for _ in range(2):
+                with self.assertRaises(GroqError):
+                    asyncio.run(llamar())
+        with self.assertRaises(CircuitoAbierto):
+            self._completar()  # lo abrieron las llamadas asíncronas
+
+
+class GroqStubTests(SimpleTestCase):
+    MENSAJES = [{"role": "user", "content": "hola"}]
+
+    def _cliente(self, servidor, **kwargs):
+        cliente = ClienteGroq(url=servidor.url, api_key="x", timeout=2, espera_base=0.001, espera_max=0.01, **kwargs)
+        self.addCleanup(cliente.cerrar)
+        return cliente
+
+    def _servidor(self, **kwargs):
+        servidor = ServidorGroqStub(latencia_s=0, ms_por_token=0, seed=0, **kwargs).iniciar()
+        self.addCleanup(servidor.detener)
+        return servidor
+
+    def test_completion_y_stream(self):
+        servidor = self._servidor(texto="Por qué te lo sugerimos: sí.")
+        cliente = self._cliente(servidor)
+        self.assertEqual(cliente.completar(self.MENSAJES, modelo="m"), "Por qué te lo sugerimos: sí.")
+        self.assertEqual("".join(cliente.completar_stream(self.MENSAJES, modelo="m")), "Por qué te lo sugerimos: sí.")
+        datos = cliente.chat({"model": "m", "messages": self.MENSAJES})
+        self.assertGreater(datos["usage"]["prompt_tokens"], 0)
+        with self.assertRaises(GroqError) as ctx:
+            cliente.chat({"messages": self.MENSAJES})  # sin model: 400 como la API
+        self.assertEqual(ctx.exception.status, 400)
+
+    def test_errores_y_rafagas_429(self):
+        servidor = self._servidor(tasa_error=1.0)
+        cliente = self._cliente(servidor, reintentos=1)
+        with self.assertLogs("ali_ia.groq_client", "WARNING"), self.assertRaises(GroqError):
+            cliente.completar(self.MENSAJES, modelo="m")
+        self.assertEqual(servidor.estadisticas()["por_status"], {500: 2})
+
+        rafaga = self._servidor(rafaga_429_cada_s=0.3, rafaga_429_dura_s=0.15)
+        cliente = self._cliente(rafaga, reintentos=0)
+        self.assertEqual(cliente.completar(self.MENSAJES, modelo="m")[:3], "Por")  # el período empieza sano
+        time.sleep(0.2)
+        with self.assertLogs("ali_ia.groq_client", "WARNING"), self.assertRaises(GroqError) as ctx:
+            cliente.completar(self.MENSAJES, modelo="m")
+        self.assertEqual(ctx.exception.status, 429)
+
+
+class AdmisionGroqTests(SimpleTestCase):
+
+    def test_cubeta_tokens(self):
+        cubeta = CubetaTokens(600)  # 10 tokens/s
+        self.assertEqual(cubeta.tomar(600), 0.0)
+        self.assertAlmostEqual(cubeta.tomar(5), 0.5, delta=0.05)
+        cubeta.devolver(5)
+        self.assertEqual(cubeta.tomar(5), 0.0)
+        self.assertGreater(cubeta.tomar(10_000), 0)  # más que el minuto: espera a la cubeta llena
+
+    def test_espera_cupo_de_tokens_y_luego_falla(self):
+        control = ControlAdmision(rpm=0, tpm=600, max_concurrentes=0, espera_max_s=2)
+        with control.admitir(600):
+            pass
+        t0 = time.monotonic()
+        with control.admitir(3):  # en cola ~0.3 s hasta que se repone la cubeta
+            pass
+        self.assertGreater(time.monotonic() - t0, 0.2)
+
+        control.espera_max_s = 0.1
+        with self.assertLogs("ali_ia.admision_groq", "WARNING"), self.assertRaises(SinCupo):
+            with control.admitir(600):
+                pass
+        est = control.estadisticas()
+        self.assertEqual((est["admitidas"], est["sin_cupo"], est["en_cola"], est["en_curso"]), (2, 1, 0, 0))
+        self.assertGreater(est["espera_p95_ms"], 200)
+
+    def test_limite_recorta_la_espera(self):
+        from ali_ia.groq_client import plazo_a_limite
+
+        control = ControlAdmision(rpm=1, tpm=0, max_concurrentes=0, espera_max_s=5, alias_compartido="")
+        with control.admitir(10):
+            pass
+        t0 = time.monotonic()
+        with self.assertLogs("ali_ia.admision_groq", "WARNING"), self.assertRaises(SinCupo):
+            with control.admitir(10, limite=plazo_a_limite(0.1)):
+                pass
+        self.assertLess(time.monotonic() - t0, 1)
+
+    def test_concurrencia_por_worker(self):
+        control = ControlAdmision(rpm=0, tpm=0, max_concurrentes=1, espera_max_s=0.1)
+        with control.admitir(1):
+            with self.assertLogs("ali_ia.admision_groq", "WARNING"), self.assertRaises(SinCupo):
+                with control.admitir(1):
+                    pass
+            self.assertEqual(control.estadisticas()["en_curso"], 1)
+        with control.admitir(1):  # liberado al salir
+            pass
+
+        async def llamada(en_vuelo, maximo):
+            async with control.aadmitir(1):
+                en_vuelo.append(1)
+                maximo.append(len(en_vuelo))
+                await asyncio.sleep(0.01)
+                en_vuelo.pop()
+
+        async def varias():
+            en_vuelo, maximo = [], []
+            await asyncio.gather(*(llamada(en_vuelo, maximo) for _ in range(4)))
+            return max(maximo)
+
+        control.espera_max_s = 2
+        self.assertEqual(asyncio.run(varias()), 1)
+
+    def test_cupo_compartido_entre_workers(self):
+        from django.core.cache import caches
+
+        caches["default"].clear()
+        self.addCleanup(caches["default"].clear)
+        # dos procesos con el mismo cache: el presupuesto es de la cuenta, no de cada uno
+        uno, otro = (ControlAdmision(rpm=2, tpm=0, max_concurrentes=0, espera_max_s=0.1, alias_compartido="default")
+                     for _ in range(2))
+        for control in (uno, otro):
+            with control.admitir(100):
+                pass
+        with self.assertLogs("ali_ia.admision_groq", "WARNING"), self.assertRaises(SinCupo):
+            with otro.admitir(100):  # su cubeta local tiene cupo, la cuenta no
+                pass
+        self.assertGreaterEqual(otro.estadisticas()["rechazos_compartido"], 1)
+
+    def test_alias_compartido_por_defecto(self):
+        from django.test import override_settings
+
+        locmem = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        with override_settings(CACHES={"default": locmem, "compartida": locmem}):
+            self.assertEqual(ControlAdmision(alias_compartido=None).estadisticas()["compartido"], "compartida")
+        with override_settings(CACHES={"default": locmem}), self.assertLogs("ali_ia.admision_groq", "WARNING"):
+            self.assertIsNone(ControlAdmision(alias_compartido=None).estadisticas()["compartido"])
+        self.assertIsNone(ControlAdmision(alias_compartido="").estadisticas()["compartido"])
+
+    def test_es_saturacion(self):
+        self.assertTrue(es_saturacion(SinCupo("x")))
+        self.assertTrue(es_saturacion(GroqError("x", 429)))
+        self.assertFalse(es_saturacion(GroqError("x", 500)))
+        self.assertFalse(es_saturacion(ValueError("x")))
+
+
+class CacheExplicacionesTests(SimpleTestCase):
+    BLOQUES = {"A": [1, 2], "B": [3, 4], "C": [5, 6]}
+
+    def test_perfil_por_bloques(self):
+        resp = {"pregunta_1": 1, "pregunta_2": 1, "pregunta_3": 3, "pregunta_4": 3, "pregunta_5": 2, "pregunta_6": 3}
+        self.assertEqual(perfil_por_bloques(resp, self.BLOQUES), "B>C|alto")
+        resp.update(pregunta_3=2, pregunta_4=2, pregunta_6=2)
+        self.assertEqual(perfil_por_bloques(resp, self.BLOQUES), "B>C|medio")  # empate: orden de bloques
+        self.assertIsNone(perfil_por_bloques({"pregunta_1": "Me encanta"}, self.BLOQUES))
+
+    def test_memoria_lru_y_ttl(self):
+        cache = CacheExplicaciones("prueba", ttl_s=60, max_memoria=2, persistente=False)
+        cache.guardar("ctx", "Medicina", "A>B|alto", "uno")
+        cache.guardar("ctx", "Derecho", "A>B|alto", "dos")
+        self.assertEqual(cache.obtener("ctx", "Medicina", "A>B|alto"), "uno")
+        cache.guardar("ctx", "Artes", "A>B|alto", "tres")  # desaloja Derecho (menos reciente)
+        self.assertIsNone(cache.obtener("ctx", "Derecho", "A>B|alto"))
+        self.assertIsNone(cache.obtener("otro prompt", "Medicina", "A>B|alto"))
+
+        vencido = CacheExplicaciones("prueba", ttl_s=0, persistente=False)
+        vencido.guardar("ctx", "Medicina", "A>B|alto", "uno")
+        self.assertIsNone(vencido.obtener("ctx", "Medicina", "A>B|alto"))
+        est = cache.estadisticas()
+        self.assertEqual((est["hits_memoria"], est["misses"], est["desalojos_memoria"]), (1, 2, 1))
+
+    def test_obtener_o_generar(self):
+        cache = CacheExplicaciones("prueba", persistente=False)
+        llamadas = []
+
+        def generar():
+            llamadas.append(1)
+            return "texto"
+
+        for _ in range(3):
+            self.assertEqual(cache.obtener_o_generar("ctx", "Medicina", "A>B|alto", generar), "texto")
+        self.assertEqual(len(llamadas), 1)
+        cache.obtener_o_generar("ctx", "Medicina", None, generar)  # sin perfil: no cachea
+        self.assertEqual(len(llamadas), 2)
+
+        def falla():
+            raise GroqError("caído")
+
+        with self.assertRaises(GroqError):
+            cache.obtener_o_generar("ctx", "Derecho", "A>B|alto", falla)
+        self.assertIsNone(cache.obtener("ctx", "Derecho", "A>B|alto"))
+
+    def test_obtener_o_transmitir(self):
+        cache = CacheExplicaciones("prueba", persistente=False)
+        llamadas = []
+
+        def transmitir():
+            llamadas.append(1)
+            yield from [" Por qué ", "te lo sugerimos "]
+
+        primera = list(cache.obtener_o_transmitir("ctx", "Medicina", "A>B|alto", transmitir))
+        self.assertEqual(primera, [" Por qué ", "te lo sugerimos "])
+        # la segunda sale del cache en un solo fragmento, sin volver a llamar
+        self.assertEqual(list(cache.obtener_o_transmitir("ctx", "Medicina", "A>B|alto", transmitir)),
+                         ["Por qué te lo sugerimos"])
+        self.assertEqual(len(llamadas), 1)
+
+        def cortado():
+            yield "Por"
+            raise GroqError("stream interrumpido")
+
+        with self.assertRaises(GroqError):
+            list(cache.obtener_o_transmitir("ctx", "Derecho", "A>B|alto", cortado))
+        self.assertIsNone(cache.obtener("ctx", "Derecho", "A>B|alto"))
+
+    def test_versiones_asincronas(self):
+        cache = CacheExplicaciones("prueba", persistente=False)
+        llamadas = []
+
+        async def agenerar():
+            llamadas.append(1)
+            return "texto"
+
+        async def atransmitir():
+            llamadas.append(1)
+            for fragmento in ["Por qué ", "sí "]:
+                yield fragmento
+
+        async def usar():
+            textos = [await cache.aobtener_o_generar("ctx", "Medicina", "A>B|alto", agenerar) for _ in range(2)]
+            primera = [f async for f in cache.aobtener_o_transmitir("ctx", "Derecho", "A>B|alto", atransmitir)]
+            segunda = [f async for f in cache.aobtener_o_transmitir("ctx", "Derecho", "A>B|alto", atransmitir)]
+            return textos, primera, segunda
+
+        textos, primera, segunda = asyncio.run(usar())
+        self.assertEqual(textos, ["texto", "texto"])
+        self.assertEqual((primera, segunda), (["Por qué ", "sí "], ["Por qué sí"]))
+        self.assertEqual(len(llamadas), 2)
+
+
+class PromptsTests(SimpleTestCase):
+    BLOQUES = {"A": [1, 2], "B": [3, 4], "C": [5, 6]}
+
+    def test_resumen_por_bloque(self):
+        resp = {"pregunta_1": 1, "pregunta_2": 1, "pregunta_3": 3, "pregunta_4": 3, "pregunta_5": 2, "pregunta_6": 3}
+        self.assertEqual(medias_por_bloque(resp, self.BLOQUES), [("B", 3.0), ("C", 2.5), ("A", 1.0)])
+        self.assertEqual(resumir_respuestas(resp, self.BLOQUES),
+                         "- B: 3.0/3 (alto)\n- C: 2.5/3 (alto)\n- A: 1.0/3 (bajo)")
+        # Sin códigos por pregunta: se manda tal cual (texto o JSON)
+        self.assertEqual(resumir_respuestas("crudo", self.BLOQUES), "crudo")
+        self.assertEqual(resumir_respuestas({"pregunta_1": "A"}, self.BLOQUES), '{"pregunta_1": "A"}')
+
+    def test_tokens_y_metricas(self):
+        self.assertEqual(estimar_tokens(""), 0)
+        self.assertEqual(estimar_tokens("a" * 35), 10)
+        mensajes = [{"role": "system", "content": "a" * 35}, {"role": "user", "content": "a" * 70}]
+        self.assertEqual(tokens_mensajes(mensajes), 38)
+
+        metricas = MetricasPrompts(ventana=2)
+        for contenido in ("a" * 35, "a" * 70, "a" * 7):
+            metricas.registrar("grado9", [{"role": "user", "content": contenido}])
+        est = metricas.estadisticas()["grado9"]
+        self.assertEqual((est["prompts"], est["tokens_max"], est["tokens_media"]), (3, 24, 15.0))
+
+
+class ExplicacionLocalTests(SimpleTestCase):
+    BLOQUES = {"Robótica": [1, 2], "Diseño Gráfico": [3, 4], "Agroindustria": [5, 6]}
+
+    def test_redactar(self):
+        respuestas = {"pregunta_1": 2, "pregunta_2": 2, "pregunta_3": 3, "pregunta_4": 3,
+                      "pregunta_5": 1, "pregunta_6": 1}
+        texto = redactar("Robótica", respuestas, self.BLOQUES, "electrónica y programación.", "visita el taller.")
+        self.assertEqual(texto, (
+            "Por qué te lo sugerimos: mostraste un interés medio por Robótica, y también destacan Diseño Gráfico, "
+            "áreas que se conectan con lo que harías allí.\n"
+            "Qué aprenderás: electrónica y programación.\n"
+            "Siguientes pasos: visita el taller. Si también te llama Diseño Gráfico, compárala con Robótica "
+            "antes de decidir."
+        ))
+        # Sin códigos por pregunta: no menciona áreas
+        texto = redactar("Robótica", {"pregunta_1": "A"}, self.BLOQUES, "x.", "y.")
+        self.assertTrue(texto.startswith("Por qué te lo sugerimos: tus respuestas se parecen"))
+        self.assertTrue(texto.endswith("Siguientes pasos: y."))
+
+    def test_metricas(self):
+        metricas = MetricasLocal(ventana=2)
+        for segundos in (0.001, 0.002, 0.003):
+            metricas.registrar(RESPALDO, segundos)
+        est = metricas.estadisticas()
+        self.assertEqual(est["usos"], {RESPALDO: 3})
+        self.assertEqual(est["max_us"], 3000.0)
+        metricas.reiniciar()
+        self.assertIsNone(metricas.estadisticas()["p50_us"])
+
+
+class PregenerarExplicacionesTests(SimpleTestCase):
+    def test_perfiles_frecuentes(self):
+        # Del test más reciente al más antiguo: el ejemplo de cada perfil es el más reciente
+        perfiles = [("b", 1), ("a", 2), ("b", 3), ("c", 4), ("b", 5), ("a", 6)]
+        self.assertEqual(perfiles_frecuentes(perfiles, top=5), [("b", 3, 1), ("a", 2, 2), ("c", 1, 4)])
+        self.assertEqual(perfiles_frecuentes(perfiles, top=1), [("b", 3, 1)])
+        self.assertEqual(perfiles_frecuentes(perfiles, top=5, min_tests=2), [("b", 3, 1), ("a", 2, 2)])
+
+    def test_cobertura_solo_despues_de_pregenerar(self):
+        from datetime import datetime, timedelta
+
+        desde = datetime(2026, 10, 1, 12, 0)
+        pregeneradas = {"a": ("Texto A", desde), "b": ("Texto B", None)}
+        recientes = [
+            ("a", "Texto A", desde + timedelta(hours=1)),     # servida del cache pregenerado
+            ("a", "Texto A", desde - timedelta(hours=1)),     # esperó a Groq y creó la fila
+            ("a", "Otro texto", desde + timedelta(hours=2)),  # regenerada después con --forzar
+            ("b", "Texto B", desde),                          # fila sin fecha de pregeneración
+            ("c", "Texto C", desde),                          # perfil sin pregenerar
+        ]
+        self.assertEqual(contar_cobertura(recientes, pregeneradas), (1, 4))
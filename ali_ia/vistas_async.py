@@ -0,0 +1,69 @@
+# ali_ia/vistas_async.py
+# -*- coding: utf-8 -*-
+"""
+Soporte para las vistas asíncronas del modo ASGI.
+
+Con ALI_ASGI=1 (lo fija ali_backend/asgi.py) las urls de cada app registran, antes
+del router de DRF, vistas `async def` para los endpoints que esperan a Groq:
+`progreso` (y `finalizar` en 9°) y `explicacion/stream`. Mismos contratos JSON que
+las acciones del ViewSet, pero la llamada a Groq se espera en el event loop: un
+proceso uvicorn mantiene muchas llamadas en vuelo sin ocupar un worker/hilo por cada una.
+Lo demás (ORM, predicción) corre en hilos con sync_to_async.
+
+En WSGI (gunicorn sync/gthread) no se registran: siguen las vistas DRF de siempre.
+"""
+
+import json
+import os
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
+
+ASGI = os.environ.get("ALI_ASGI", "0") == "1"
+
+
+def _autenticar(request):
+    """Mismas clases de autenticación que DRF (JWT). Devuelve (usuario, error)."""
+    for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            resultado = clase().authenticate(request)
+        except AuthenticationFailed as e:
+            return None, e.detail
+        if resultado is not None:
+            return resultado[0], None
+    return None, "Las credenciales de autenticación no se proveyeron."
+
+
+def vista_jwt(*metodos):
+    """
+    Decorador de vistas async: responde 405 a otros métodos, 401 sin JWT válido y
+    deja el usuario en request.user. Exenta de CSRF como las vistas DRF.
+    """
+    def decorador(vista):
+        @csrf_exempt
+        @wraps(vista)
+        async def envoltura(request, *args, **kwargs):
+            if request.method not in metodos:
+                return JsonResponse({"detail": f'Método "{request.method}" no permitido.'}, status=405)
+            usuario, error = await sync_to_async(_autenticar)(request)
+            if usuario is None:
+                return JsonResponse({"detail": error}, status=401)
+            request.user = usuario
+            return await vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def leer_json(request):
+    """Cuerpo JSON como dict ({} si viene vacío); None si no es JSON válido."""
+    if not request.body:
+        return {}
+    try:
+        datos = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return datos if isinstance(datos, dict) else None
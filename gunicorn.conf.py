@@ -0,0 +1,58 @@
+# gunicorn.conf.py
+# Configuración de producción: gunicorn ali_backend.wsgi:application -c gunicorn.conf.py
+#
+# - preload_app: Django y los modelos se cargan una vez en el maestro; los workers
+#   los heredan por fork y comparten las páginas copy-on-write (ver medir_memoria_workers).
+# - ALI_GUNICORN_MODO=sync (default, 2 workers como antes) o gthread (workers = CPUs,
+#   GUNICORN_THREADS hilos por worker).
+# - ALI_GUNICORN_MODO=asgi: workers uvicorn sobre la app ASGI; progreso/finalizar y el
+#   stream de la explicación son vistas async (ali_ia/vistas_async.py) y un solo proceso
+#   mantiene muchas llamadas a Groq en vuelo. Se arranca con la app ASGI:
+#       ALI_GUNICORN_MODO=asgi gunicorn ali_backend.asgi:application -c gunicorn.conf.py
+#   Con ALI_EXPLICACIONES=sincrona la explicación se genera en el request (sin proceso
+#   worker); con la cola, el stream SSE es el que espera a Groq. Sin gunicorn:
+#       uvicorn ali_backend.asgi:application --host 0.0.0.0 --port $PORT --workers 2
+#   (uvicorn no hace preload: cada worker carga sus modelos).
+# - max_requests + jitter reciclan workers; el reemplazo se vuelve a forkear del maestro,
+#   así que no recarga los modelos.
+# - Las explicaciones (Groq) las genera el proceso `worker` (procesar_explicaciones), no
+#   el request: el timeout por defecto baja a 30 s. Con ALI_EXPLICACIONES=sincrona sigue en 120 s.
+import gc
+import multiprocessing
+import os
+
+CPUS = multiprocessing.cpu_count()
+MODO = os.environ.get("ALI_GUNICORN_MODO", "sync")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+EXPLICACIONES_SINCRONAS = os.environ.get("ALI_EXPLICACIONES", "cola") == "sincrona"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120" if EXPLICACIONES_SINCRONAS else "30"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+preload_app = True
+
+if MODO == "asgi":
+    # El timeout de gunicorn no corta requests en workers async (solo detecta workers colgados)
+    worker_class = "uvicorn.workers.UvicornWorker"
+    workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+elif MODO == "gthread":
+    worker_class = "gthread"
+    workers = int(os.environ.get("WEB_CONCURRENCY", CPUS))
+    threads = int(os.environ.get("GUNICORN_THREADS", 4))
+else:
+    worker_class = "sync"
+    workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+
+def when_ready(server):
+    # Con preload_app la app ya está importada en el maestro: cargar modelos antes del fork
+    from ali_ia.precarga import precarga_habilitada, precargar_modelos
+
+    if precarga_habilitada():
+        tiempos = precargar_modelos()
+        server.log.info("Modelos precargados en el maestro: %s", tiempos)
+    # Lo que ya existe pasa a la generación permanente: el GC de los workers no lo
+    # recorre y no ensucia (copia) esas páginas compartidas.
+    gc.freeze()
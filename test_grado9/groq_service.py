@@ -1,141 +1,233 @@
-import json
-import requests
-from django.conf import settings
+from ali_ia import explicacion_local
+from ali_ia.admision_groq import ADMISION
+from ali_ia.cache_explicaciones import CacheExplicaciones, huella, perfil_por_bloques
+from ali_ia.groq_client import GROQ, plazo_a_limite
+from ali_ia.prompts import METRICAS_PROMPTS, resumir_respuestas
+from .ml_model.model9 import PREGUNTAS_POR_TECNICO
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_MODEL = "llama-3.1-8b-instant"  # Alternativa de más calidad: "llama-3.3-70b-versatile"
 
-def generar_explicacion_modalidad(modalidad, respuestas):
-    # Asegura que 'respuestas' sea texto legible (por si es dict/list)
-    if not isinstance(respuestas, str):
-        try:
-            respuestas = json.dumps(respuestas, ensure_ascii=False)
-        except Exception:
-            respuestas = str(respuestas)
-
-    # === SOLO CAMBIA ESTE BLOQUE: system_msg y user_prompt ===
-    system_msg = (
-        "Eres un orientador vocacional empático y claro. Responde SIEMPRE en español de Colombia, "
-        "con tono juvenil, respetuoso y motivador. Extensión objetivo: 90–130 palabras. "
-        "Estructura obligatoria en 3 partes con títulos: "
-        "1) Por qué encaja, 2) Qué aprenderá/hará allí, 3) Siguientes pasos. "
-        "No uses tecnicismos innecesarios; evita promesas de empleo garantizado o salarios. "
-        "Sé específico y conecta con intereses del/la estudiante según sus respuestas. "
-        "Si algo no aplica, omítelo sin inventar. Cierra con una invitación breve a explorar más."
-    )
-
+# Súbela si cambias el prompt: invalida las explicaciones cacheadas
+VERSION_PROMPT = 2
+MAX_TOKENS = 300
+CACHE = CacheExplicaciones("grado9")
+
+# Perfil de egresado por técnico (sección del PEI). Solo se manda el del técnico sugerido.
+PERFILES_EGRESADO = {
+    "Científico/Humanista": (
+        "Académico",
+        "• Observación rigurosa, formulación de hipótesis, diseño de experimentos y amor por la verdad y el conocimiento.\n"
+        "• Argumentación ética, pensamiento crítico y creatividad científica en favor de un desarrollo sostenible.",
+    ),
+    "Agroindustria": (
+        "Agropecuaria (procesamiento de alimentos)",
+        "• Alistamiento, limpieza y desinfección; empaque y apoyo a control de procesos en plantas de alimentos y bebidas.\n"
+        "• Perfil operativo/asistencial en panadería, lácteos y fruver; enfoque en calidad y normativas básicas.",
+    ),
+    "Emprendimiento y Fomento Empresarial": (
+        "Comercio — Emprendimiento y Fomento Empresarial",
+        "• Crear microempresas, apoyar administración de negocios, asesoría de ventas.\n"
+        "• Planear, organizar y comunicar propuestas de valor y acciones comerciales.",
+    ),
+    "Diseño Gráfico": (
+        "Comercio — Diseño Gráfico",
+        "• Apoyo a departamentos de publicidad: diseño de piezas, originales de impresión, criterios de color y tipografía.\n"
+        "• Producción gráfica con claridad y precisión para medios impresos y digitales.",
+    ),
+    "Contabilidad y Finanzas": (
+        "Comercio — Contabilidad y Finanzas",
+        "• Apoyo contable y financiero: registrar, procesar, interpretar y conservar información (manual y sistematizada).\n"
+        "• Roles típicos: auxiliar contable/financiero/facturación/nómina/tesorería.",
+    ),
+    "Mantenimiento de Hardware y Software": (
+        "Industrial — Mantenimiento de Hardware y Software",
+        "• Soporte a infraestructura TI: instalación/configuración, diagnóstico básico, responsabilidad y buenas prácticas.\n"
+        "• Aporte a continuidad operativa en organizaciones públicas/privadas.",
+    ),
+    "Electricidad y Electrónica": (
+        "Industrial — Electricidad y Electrónica",
+        "• Análisis de circuitos, instalación de redes internas, mantenimiento e instalación eléctrica/electrónica.\n"
+        "• Posibles roles: técnico/auxiliar en mantenimiento, diseño de redes, domicilia, electrodomésticos, seguridad.",
+    ),
+    "Robótica": (
+        "Industrial — Robótica",
+        "• Electrónica + programación para automatización; diagnóstico de circuitos; configuración de cómputo; registro técnico.\n"
+        "• Apoyo a digitalización/automatización y programación de operaciones; roles de auxiliar/analista programador.",
+    ),
+    "Primera Infancia": (
+        "Promoción Social — Primera Infancia",
+        "• Acompañamiento pedagógico a desarrollo integral en educación inicial/preescolar.\n"
+        "• Base para continuar cadena de formación en atención y cuidado de la primera infancia.",
+    ),
+    "Seguridad y Salud en el Trabajo": (
+        "Promoción Social — Seguridad y Salud en el Trabajo",
+        "• Apoyo al SG-SST según normatividad laboral; identificación de riesgos, cultura de autocuidado.\n"
+        "• Roles: auxiliar de prevención, seguridad industrial/laboral, técnico de seguridad.",
+    ),
+    "Promoción de la Salud": (
+        "Promoción Social — Promoción de la Salud",
+        "• Apoyo comunitario para promoción y mantenimiento de la salud; competencias laborales sociales/comunitarias.\n"
+        "• Base para continuar estudios en áreas de la salud y lo social.",
+    ),
+}
+
+SYSTEM_MSG = (
+    "Eres un orientador vocacional empático y claro. Responde SIEMPRE en español de Colombia, "
+    "con tono juvenil, respetuoso y motivador. Extensión objetivo: 90–130 palabras. "
+    "Estructura obligatoria en 3 partes con títulos: "
+    "1) Por qué encaja, 2) Qué aprenderá/hará allí, 3) Siguientes pasos. "
+    "No uses tecnicismos innecesarios; evita promesas de empleo garantizado o salarios. "
+    "Sé específico y conecta con intereses del/la estudiante según sus respuestas. "
+    "Si algo no aplica, omítelo sin inventar. Cierra con una invitación breve a explorar más."
+)
+
+
+def perfiles_para(modalidad, tecnico=None) -> str:
+    """Sección(es) del perfil de egresado que aplican: la del técnico o, sin técnico, las de la modalidad."""
+    if tecnico in PERFILES_EGRESADO:
+        secciones = [PERFILES_EGRESADO[tecnico]]
+    else:
+        secciones = [(t, texto) for t, texto in PERFILES_EGRESADO.values()
+                     if t == modalidad or t.startswith(f"{modalidad} ")]
+    return "\n\n".join(f"— {titulo}\n{texto}" for titulo, texto in secciones) or "(sin perfil registrado)"
+
+
+def construir_mensajes(modalidad, respuestas, tecnico=None) -> list:
+    """Mensajes de chat para Groq: solo el perfil que aplica y las respuestas resumidas por bloque."""
+    sugerida = f"{modalidad} — {tecnico}" if tecnico else modalidad
     user_prompt = f'''
-Contexto del proyecto:
-Estudiantes de grado 9 del INEM responden un test (escala 1–4: 1=No me interesa, 4=Me gusta). 
-El sistema sugiere una modalidad técnica llamada: "{modalidad}". 
-Debes justificarla usando ÚNICAMENTE el perfil de egresado de esa modalidad/especialidad y las respuestas del test.
-
-Instrucciones de interpretación de respuestas:
-- Identifica patrones (p. ej., puntajes 3–4 en preguntas ligadas a creatividad, lógica, ayuda social, sistemas, organización, etc.).
-- No enumeres todas las respuestas; resume tendencias (intereses altos/medios/bajos).
-- Relaciona esas tendencias con tareas/ambientes reales de la modalidad elegida.
-
-Perfiles de egresado (elige SOLO la sección que coincida exactamente con la modalidad; si es sub-especialidad, usa la sub-especialidad):
-
-— Académico
-• Observación rigurosa, formulación de hipótesis, diseño de experimentos y amor por la verdad y el conocimiento.
-• Argumentación ética, pensamiento crítico y creatividad científica en favor de un desarrollo sostenible.
-
-— Agropecuaria (procesamiento de alimentos)
-• Alistamiento, limpieza y desinfección; empaque y apoyo a control de procesos en plantas de alimentos y bebidas.
-• Perfil operativo/asistencial en panadería, lácteos y fruver; enfoque en calidad y normativas básicas.
-
-— Comercio — Emprendimiento y Fomento Empresarial
-• Crear microempresas, apoyar administración de negocios, asesoría de ventas.
-• Planear, organizar y comunicar propuestas de valor y acciones comerciales.
-
-— Comercio — Diseño Gráfico
-• Apoyo a departamentos de publicidad: diseño de piezas, originales de impresión, criterios de color y tipografía.
-• Producción gráfica con claridad y precisión para medios impresos y digitales.
-
-— Comercio — Contabilidad y Finanzas
-• Apoyo contable y financiero: registrar, procesar, interpretar y conservar información (manual y sistematizada).
-• Roles típicos: auxiliar contable/financiero/facturación/nómina/tesorería.
-
-— Industrial — Mantenimiento de Hardware y Software
-• Soporte a infraestructura TI: instalación/configuración, diagnóstico básico, responsabilidad y buenas prácticas.
-• Aporte a continuidad operativa en organizaciones públicas/privadas.
+Estudiante de grado 9 del INEM. Modalidad técnica sugerida: "{sugerida}".
+Justifícala usando ÚNICAMENTE este perfil de egresado y sus intereses.
 
-— Industrial — Electricidad y Electrónica
-• Análisis de circuitos, instalación de redes internas, mantenimiento e instalación eléctrica/electrónica.
-• Posibles roles: técnico/auxiliar en mantenimiento, diseño de redes, domicilia, electrodomésticos, seguridad.
+Perfil de egresado:
+{perfiles_para(modalidad, tecnico)}
 
-— Industrial — Robótica
-• Electrónica + programación para automatización; diagnóstico de circuitos; configuración de cómputo; registro técnico.
-• Apoyo a digitalización/automatización y programación de operaciones; roles de auxiliar/analista programador.
-
-— Promoción Social — Primera Infancia
-• Acompañamiento pedagógico a desarrollo integral en educación inicial/preescolar.
-• Base para continuar cadena de formación en atención y cuidado de la primera infancia.
-
-— Promoción Social — Seguridad y Salud en el Trabajo
-• Apoyo al SG-SST según normatividad laboral; identificación de riesgos, cultura de autocuidado.
-• Roles: auxiliar de prevención, seguridad industrial/laboral, técnico de seguridad.
-
-— Promoción Social — Promoción de la Salud
-• Apoyo comunitario para promoción y mantenimiento de la salud; competencias laborales sociales/comunitarias.
-• Base para continuar estudios en áreas de la salud y lo social.
-
-Respuestas del test (1=No me interesa, 4=Me gusta):
-{respuestas}
-
-Tu tarea:
-1) Usa SOLO el perfil que coincida con "{modalidad}" (si trae guion o categoría, p. ej. "Comercio — Contabilidad y Finanzas", usa esa sub-sección).
-2) Relaciona tendencias de las respuestas con tareas/entornos de la modalidad (ej.: si hay gusto por creatividad → Diseño Gráfico; si hay gusto por organizar y manejar números → Contabilidad, etc.).
-3) Formatea exactamente así (sin emojis en los títulos):
+Interés promedio por área del test (3=Me encanta, 2=Me interesa, 1=No me gusta):
+{resumir_respuestas(respuestas, PREGUNTAS_POR_TECNICO)}
 
+Relaciona las áreas de interés alto con tareas/entornos de la modalidad; no enumeres puntajes.
+Formato exacto (sin emojis en los títulos), 90–130 palabras:
 Por qué te lo sugerimos: …
 Qué aprenderás: …
 Siguientes pasos: …
-
-4) Mantén 90–130 palabras, lenguaje juvenil y concreto.
 '''.strip()
-    # === FIN DEL BLOQUE EDITADO ===
-
-    headers = {
-        "Authorization": f"Bearer {settings.GROQ_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    data = {
-        "model": GROQ_MODEL,
-        "messages": [
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_prompt},
-        ],
-        # Opcional: ajusta a tu gusto
-        "temperature": 0.7,
-        "max_tokens": 300,
-    }
-
-    try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=data, timeout=30)
-
-        # Logs útiles para depuración
-        print("🟡 Groq status:", response.status_code)
-        try:
-            print("🟡 Groq response body:", response.text[:2000])
-        except Exception:
-            pass
-
-        if response.status_code == 200:
-            payload = response.json()
-            return payload["choices"][0]["message"]["content"].strip()
-
-        # Devuelve el mensaje de error de Groq para saber exactamente qué pasó
-        try:
-            err = response.json()
-        except Exception:
-            err = {"raw": response.text}
-        return f"No se pudo generar la explicación (status {response.status_code}): {err}"
-
-    except requests.Timeout:
-        return "Error: tiempo de espera agotado al conectar con Groq."
-    except Exception as e:
-        print("🔴 Error al conectar con Groq:", str(e))
-        return f"Error al conectar con Groq: {str(e)}"
+    return [
+        {"role": "system", "content": SYSTEM_MSG},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def explicacion_local_modalidad(modalidad, respuestas, tecnico=None, motivo=explicacion_local.PRINCIPAL) -> str:
+    """Explicación sin Groq (plantilla con el perfil de egresado del técnico); ver ali_ia.explicacion_local."""
+    titulo, perfil = PERFILES_EGRESADO.get(tecnico, (modalidad, ""))
+    rasgos = " ".join(linea.lstrip("•").strip() for linea in perfil.splitlines())
+    que_aprenderas = (f"como egresado/a de {titulo}: {rasgos}" if rasgos
+                      else f"las bases de la modalidad {modalidad} con prácticas guiadas y proyectos.")
+    pasos = (f"conversa con tu orientador/a sobre la modalidad {modalidad}, visita sus talleres o aulas "
+             f"y pregunta a estudiantes de 10° cómo es un día allí.")
+    return explicacion_local.redactar(tecnico or modalidad, respuestas, PREGUNTAS_POR_TECNICO,
+                                      que_aprenderas, pasos, motivo)
+
+
+def _preparar(modalidad, respuestas, tecnico=None, plazo_s=None):
+    """
+    (contexto, objetivo, perfil, mensajes, limite) de una explicación: la clave de CACHE
+    (perfil por bloques dominantes; None si no vienen códigos 3/2/1), el prompt y el
+    plazo total (cupo + intentos + esperas). Lo comparten todas las variantes.
+    """
+    perfil = perfil_por_bloques(respuestas, PREGUNTAS_POR_TECNICO) if isinstance(respuestas, dict) else None
+    return (huella(GROQ_MODEL, VERSION_PROMPT, SYSTEM_MSG), tecnico or modalidad, perfil,
+            construir_mensajes(modalidad, respuestas, tecnico), plazo_a_limite(plazo_s))
+
+
+def _cupo(mensajes) -> int:
+    """Tokens que se piden a ADMISION: los del prompt (quedan en METRICAS_PROMPTS) más la respuesta."""
+    return METRICAS_PROMPTS.registrar("grado9", mensajes) + MAX_TOKENS
+
+
+def generar_explicacion_modalidad(modalidad, respuestas, tecnico=None, plazo_s=None):
+    if explicacion_local.LOCAL:  # motor local: sin red
+        return explicacion_local_modalidad(modalidad, respuestas, tecnico)
+    contexto, objetivo, perfil, mensajes, limite = _preparar(modalidad, respuestas, tecnico, plazo_s)
+
+    # Cliente compartido (sesión persistente, reintentos, circuit breaker): lanza GroqError si falla
+    # Solo si no está en cache: pide cupo (RPM/TPM/concurrencia) antes de ir a Groq
+    def _generar():
+        with ADMISION.admitir(_cupo(mensajes), limite=limite):
+            return GROQ.completar(
+                mensajes,
+                modelo=GROQ_MODEL,
+                temperature=0.7,
+                max_tokens=MAX_TOKENS,
+                limite=limite,
+            )
+
+    return CACHE.obtener_o_generar(contexto, objetivo, perfil, _generar)
+
+
+def generar_explicacion_modalidad_stream(modalidad, respuestas, tecnico=None, plazo_s=None):
+    """Igual que generar_explicacion_modalidad pero entrega la explicación en fragmentos (endpoint SSE)."""
+    if explicacion_local.LOCAL:
+        yield explicacion_local_modalidad(modalidad, respuestas, tecnico)
+        return
+    contexto, objetivo, perfil, mensajes, limite = _preparar(modalidad, respuestas, tecnico, plazo_s)
+
+    def _transmitir():
+        with ADMISION.admitir(_cupo(mensajes), limite=limite):  # el cupo de concurrencia dura todo el stream
+            yield from GROQ.completar_stream(mensajes, modelo=GROQ_MODEL, temperature=0.7,
+                                             max_tokens=MAX_TOKENS, limite=limite)
+
+    yield from CACHE.obtener_o_transmitir(contexto, objetivo, perfil, _transmitir)
+
+
+# ========= Modo ASGI: mismas explicaciones sin bloquear el event loop =========
+async def agenerar_explicacion_modalidad(modalidad, respuestas, tecnico=None, plazo_s=None):
+    if explicacion_local.LOCAL:
+        return explicacion_local_modalidad(modalidad, respuestas, tecnico)
+    contexto, objetivo, perfil, mensajes, limite = _preparar(modalidad, respuestas, tecnico, plazo_s)
+
+    async def _agenerar():
+        async with ADMISION.aadmitir(_cupo(mensajes), limite=limite):
+            return await GROQ.acompletar(mensajes, modelo=GROQ_MODEL, temperature=0.7, max_tokens=MAX_TOKENS,
+                                         limite=limite)
+
+    return await CACHE.aobtener_o_generar(contexto, objetivo, perfil, _agenerar)
+
+
+async def agenerar_explicacion_modalidad_stream(modalidad, respuestas, tecnico=None, plazo_s=None):
+    if explicacion_local.LOCAL:
+        yield explicacion_local_modalidad(modalidad, respuestas, tecnico)
+        return
+    contexto, objetivo, perfil, mensajes, limite = _preparar(modalidad, respuestas, tecnico, plazo_s)
+
+    async def _atransmitir():
+        async with ADMISION.aadmitir(_cupo(mensajes), limite=limite):
+            async for fragmento in GROQ.acompletar_stream(mensajes, modelo=GROQ_MODEL, temperature=0.7,
+                                                          max_tokens=MAX_TOKENS, limite=limite):
+                yield fragmento
+
+    async for fragmento in CACHE.aobtener_o_transmitir(contexto, objetivo, perfil, _atransmitir):
+        yield fragmento
+
+
+# ========= Explicaciones pregeneradas (manage.py pregenerar_explicaciones) =========
+def clave_cache(modalidad, respuestas, tecnico=None):
+    """(contexto, objetivo, perfil) con que CACHE guarda la explicación; perfil None si no vienen códigos 3/2/1."""
+    return _preparar(modalidad, respuestas, tecnico)[:3]
+
+
+def explicacion_guardada_modalidad(modalidad, respuestas, tecnico=None):
+    """Explicación ya guardada para este técnico y perfil (pregenerada o de Groq) sin ir a Groq; None si no hay."""
+    contexto, objetivo, perfil = clave_cache(modalidad, respuestas, tecnico)
+    return CACHE.obtener(contexto, objetivo, perfil) if perfil is not None else None
+
+
+def pregenerar_explicacion_modalidad(modalidad, respuestas, tecnico=None) -> str:
+    """Genera con Groq (pidiendo cupo) y guarda como pregenerada, aunque ya hubiera una en cache."""
+    contexto, objetivo, perfil, mensajes, _ = _preparar(modalidad, respuestas, tecnico)
+    if perfil is None:
+        raise ValueError("Las respuestas deben venir como códigos 3/2/1 por pregunta.")
+    with ADMISION.admitir(_cupo(mensajes)):
+        texto = GROQ.completar(mensajes, modelo=GROQ_MODEL, temperature=0.7, max_tokens=MAX_TOKENS)
+    CACHE.guardar(contexto, objetivo, perfil, texto, pregenerada=True)
+    return texto
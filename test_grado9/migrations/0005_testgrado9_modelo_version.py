@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_grado9', '0004_testgrado9top3'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testgrado9',
+            name='modelo_version',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
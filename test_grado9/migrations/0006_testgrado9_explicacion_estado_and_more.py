@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_grado9', '0005_testgrado9_modelo_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testgrado9',
+            name='explicacion_estado',
+            field=models.CharField(blank=True, choices=[('PENDIENTE', 'Pendiente'), ('PROCESANDO', 'Procesando'), ('LISTA', 'Lista'), ('ERROR', 'Error')], db_index=True, default='', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='testgrado9',
+            name='explicacion_intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testgrado9',
+            name='explicacion_proximo_intento',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -9,10 +9,20 @@ Requiere los artefactos entrenados:
 """
 
 import os
-import json
-import joblib
+import time
+
 import numpy as np
-import pandas as pd
+
+from ali_ia.artefactos import (
+    ArtefactosModelo, ModeloPerezoso, compilar_bosque, leer_columna_csv,
+)
+from ali_ia.cascada import Cascada, version_fila
+from ali_ia.cache_predicciones import CachePredicciones, huella_artefactos
+from ali_ia.microlotes import DespachadorMicrolotes
+from ali_ia.paquete_modelo import cargar_paquete
+from ali_ia.plan_features import PlanFeatures
+from ali_ia.registro_modelos import RegistroModelos
+from ali_ia.sidecar import GRADO9, ClienteSidecar, SidecarNoDisponible
 
 # ========= Rutas =========
 BASE_DIR = os.path.dirname(__file__)
@@ -21,6 +31,8 @@ XCOLS_PATH = os.path.join(BASE_DIR, "modelo_tecnico_mejor_57_xcols_fixed.csv")
 TECS_PATH  = os.path.join(BASE_DIR, "modelo_tecnico_mejor_57_tecnicos_orden.csv")
 # (opcional) por si guardaste bloques/metadata
 BLOQUES_JSON = os.path.join(BASE_DIR, "modelo_tecnico_mejor_57_bloques.json")
+# (opcional) paquete memory-map generado con `manage.py exportar_paquete`
+PAQUETE_DIR = os.environ.get("ALI_PAQUETE_GRADO9", "")
 
 # ========= Definiciones del test =========
 TOTAL_PREGUNTAS = 57
@@ -52,19 +64,101 @@ MAP_ABCB = {"A": "Me encanta", "B": "Me interesa", "C": "No me gusta"}
 SCORE = {"Me encanta": 3, "Me interesa": 2, "No me gusta": 1}
 VALIDS = set(SCORE.keys())
 
-# ========= Carga de artefactos =========
-MODEL = joblib.load(MODEL_PATH)
-XCOLS = pd.read_csv(XCOLS_PATH, header=None).iloc[:, 0].astype(str).tolist()
-try:
-    TECNICOS_ORDEN = pd.read_csv(TECS_PATH, header=None).iloc[:, 0].astype(str).tolist()
-except Exception:
-    # Fallback: si no existe, intenta usar las clases del modelo si ya vienen legibles
+# ========= Carga de artefactos (perezosa) =========
+def _cargar_desde_pickle(model_path=MODEL_PATH, xcols_path=XCOLS_PATH, tecs_path=TECS_PATH) -> ArtefactosModelo:
+    """
+    Formato fuente: pickle/joblib + CSVs (también es el origen de `exportar_paquete`
+    y de `registro_modelos registrar`, que puede pasar otras rutas).
+    """
+    import joblib  # solo al cargar: importar el módulo no trae joblib/sklearn
+
+    modelo = joblib.load(model_path)
+    xcols = leer_columna_csv(xcols_path)
     try:
-        TECNICOS_ORDEN = list(MODEL.classes_)
-        # Asegura strings
-        TECNICOS_ORDEN = [str(x) for x in TECNICOS_ORDEN]
+        tecnicos_orden = leer_columna_csv(tecs_path)
     except Exception:
-        TECNICOS_ORDEN = []
+        # Fallback: si no existe, intenta usar las clases del modelo si ya vienen legibles
+        try:
+            tecnicos_orden = [str(x) for x in modelo.classes_]
+        except Exception:
+            tecnicos_orden = []
+
+    n_clases = len(getattr(modelo, "classes_", tecnicos_orden))
+    if tecnicos_orden and len(tecnicos_orden) == n_clases:
+        nombres = list(tecnicos_orden)
+    else:
+        # fallback sin CSV de clases
+        nombres = [f"Clase_{i}" for i in range(n_clases)]
+
+    return ArtefactosModelo(
+        modelo=modelo,
+        xcols=xcols,
+        nombres_clases=nombres,
+        # Columnas de XCOLS que no son pregunta_i ni suma_<tecnico> quedan en NaN,
+        # igual que hacía el reindex de pandas.
+        plan=PlanFeatures(xcols, TOTAL_PREGUNTAS, PREGUNTAS_POR_TECNICO),
+        bosque=compilar_bosque(modelo),
+        # La huella de los artefactos forma parte de la clave del cache
+        version=huella_artefactos(model_path, xcols_path, tecs_path),
+        extra={"tecnicos_orden": tecnicos_orden},
+    )
+
+
+def _cargar_desde_paquete(ruta) -> ArtefactosModelo:
+    """Paquete de `manage.py exportar_paquete`: arreglos en memory-map, sin sklearn ni unpickling."""
+    bosque, man = cargar_paquete(ruta)
+    return ArtefactosModelo(
+        modelo=None,
+        xcols=man["xcols"],
+        nombres_clases=man["nombres_clases"],
+        plan=PlanFeatures(man["xcols"], TOTAL_PREGUNTAS, PREGUNTAS_POR_TECNICO),
+        bosque=bosque,
+        version=man["version"],
+        extra={"tecnicos_orden": man["extra"].get("tecnicos_orden", [])},
+    )
+
+
+# ========= Registro de versiones (manage.py registro_modelos) =========
+REGISTRO = RegistroModelos("grado9")
+
+
+def _cargar_artefactos() -> ArtefactosModelo:
+    """Orden: ALI_PAQUETE_GRADO9 fijo > versión ACTIVA del registro > pickle del repo."""
+    if PAQUETE_DIR:
+        return _cargar_desde_paquete(PAQUETE_DIR)
+    ruta = REGISTRO.ruta_activa()
+    if ruta:
+        return _cargar_desde_paquete(ruta)
+    return _cargar_desde_pickle()
+
+
+# Con registro, los workers cambian a la versión ACTIVA nueva sin reiniciar
+MODELO = ModeloPerezoso("grado9", _cargar_artefactos,
+                        version_deseada=None if PAQUETE_DIR else REGISTRO.version_activa)
+
+
+def precargar() -> float:
+    """Carga el modelo ahora (warmup). Devuelve los segundos que tomó."""
+    return MODELO.precargar()
+
+
+# Compatibilidad: MODEL, XCOLS, TECNICOS_ORDEN, PLAN, BOSQUE y MODEL_VERSION
+# siguen disponibles como atributos del módulo, pero se cargan al primer acceso.
+_ATRIBUTOS_PEREZOSOS = {
+    "MODEL": lambda art: art.modelo,
+    "XCOLS": lambda art: art.xcols,
+    "TECNICOS_ORDEN": lambda art: art.extra["tecnicos_orden"],
+    "PLAN": lambda art: art.plan,
+    "BOSQUE": lambda art: art.bosque,
+    "MODEL_VERSION": lambda art: art.version,
+}
+
+
+def __getattr__(nombre):
+    if nombre in _ATRIBUTOS_PEREZOSOS:
+        return _ATRIBUTOS_PEREZOSOS[nombre](MODELO.obtener())
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
 
 # ========= Utilidades =========
 def _normalizar_respuestas(resps):
@@ -87,25 +181,128 @@ def _normalizar_respuestas(resps):
     return out
 
 
+def _codificar(respuestas_texto):
+    """Respuestas (texto o A/B/C) -> np.ndarray uint8 (57,) con valores 3/2/1."""
+    return np.fromiter((SCORE[r] for r in _normalizar_respuestas(respuestas_texto)),
+                       dtype=np.uint8, count=TOTAL_PREGUNTAS)
+
+
+# ========= Motor de inferencia =========
+# "plano": BosquePlano (árboles aplanados en NumPy, sin sklearn en el ciclo)
+# "sklearn": MODEL.predict_proba
+MOTORES = ("plano", "sklearn")
+MOTOR_INFERENCIA = os.environ.get("ALI_MOTOR_GRADO9", "plano")
+
+
+def usar_motor(nombre: str):
+    """Cambia el motor de inferencia de este modelo ('plano' o 'sklearn')."""
+    global MOTOR_INFERENCIA
+    if nombre not in MOTORES:
+        raise ValueError(f"Motor desconocido: {nombre}. Opciones: {MOTORES}")
+    MOTOR_INFERENCIA = nombre
+
+
+def _predict_proba(X, art=None):
+    """predict_proba con el motor configurado (NaN/inf siempre van por sklearn)."""
+    art = art or MODELO.obtener()
+    if art.modelo is None:  # cargado desde paquete: solo existe el BosquePlano
+        return art.bosque.predict_proba(X)
+    if MOTOR_INFERENCIA == "plano" and art.bosque is not None and np.isfinite(X).all():
+        return art.bosque.predict_proba(X)
+    return art.modelo.predict_proba(X)
+
+
+# ========= Cache de predicciones =========
+CACHE = CachePredicciones("grado9")
+
+
+# ========= Cascada por bloques (opcional, ALI_CASCADA) =========
+CASCADA = Cascada("grado9", TOTAL_PREGUNTAS, PREGUNTAS_POR_TECNICO)
+
+
+# ========= Sidecar de inferencia (opcional, ALI_SIDECAR_SOCKET) =========
+SIDECAR = ClienteSidecar()
+
+
+def _proba_codigos(A):
+    """
+    A: uint8 (N, n_preguntas) con valores 3/2/1.
+    Devuelve (lista de N vectores de probabilidad, nombres de clase, versión del modelo).
+    Con ALI_MICROLOTES=1 las peticiones concurrentes se evalúan juntas.
+    """
+    return MICROLOTES.enviar(A)
+
+
+def _proba_directo(A):
+    """Sin micro-lotes: si hay sidecar configurado se le pide a él; si no responde, en proceso."""
+    if SIDECAR.disponible():
+        try:
+            return SIDECAR.proba(GRADO9, A)
+        except SidecarNoDisponible:
+            pass
+    return _proba_local(A)
+
+
+def _proba_local(A):
+    """
+    Inferencia en este proceso: solo evalúa el bosque (en un único lote) para las hojas
+    que no estén en CACHE ni las resuelva la CASCADA.
+    """
+    art = MODELO.obtener()
+    probas = [CACHE.obtener(art.version, fila) for fila in A]
+    faltan = [i for i, p in enumerate(probas) if p is None]
+    if faltan:
+        # Cascada (ALI_CASCADA=1): las hojas no ambiguas se responden sin el bosque
+        resueltas, rapidas, sombra = CASCADA.separar(art, A[faltan])
+        for j, p in zip(resueltas, rapidas):
+            probas[faltan[j]] = p
+        al_bosque = [i for i in faltan if probas[i] is None]
+        en_sombra = [faltan[j] for j in sombra]
+        if al_bosque or en_sombra:
+            t0 = time.perf_counter()
+            calculadas = _predict_proba(art.plan.vectorizar(A[al_bosque + en_sombra]), art)
+            CASCADA.registrar_bosque(len(calculadas), time.perf_counter() - t0)
+            for i, p in zip(al_bosque, calculadas):
+                CACHE.guardar(art.version, A[i], p)
+                probas[i] = p
+            for i, p in zip(en_sombra, calculadas[len(al_bosque):]):
+                CASCADA.registrar_sombra(probas[i], p)
+    return probas, art.nombres_clases, art.version
+
+
+# ========= Micro-lotes (opcional, ALI_MICROLOTES) =========
+MICROLOTES = DespachadorMicrolotes("grado9", _proba_directo)
+
+
 def _vectorizar(respuestas_texto):
     """
     Construye el vector de entrada exactamente con el orden de XCOLS:
       - 'pregunta_1'..'pregunta_57'
       - meta-features 'suma_<tecnico>' que estén presentes en XCOLS
     """
-    resps = _normalizar_respuestas(respuestas_texto)
-    base_vals = [SCORE[r] for r in resps]
-    s = pd.Series(base_vals, index=[f"pregunta_{i}" for i in range(1, TOTAL_PREGUNTAS + 1)])
+    return MODELO.obtener().plan.vectorizar(_codificar(respuestas_texto))
 
-    # Meta-features si el modelo las espera
-    for tecnico, qs in PREGUNTAS_POR_TECNICO.items():
-        col = f"suma_{tecnico}"
-        if col in XCOLS:
-            s[col] = s[[f"pregunta_{q}" for q in qs]].sum()
 
-    # Orden EXACTO como XCOLS (usa el CSV *_xcols_fixed.csv)
-    s = s.reindex(XCOLS)
-    return s.to_numpy(dtype=np.float32).reshape(1, -1)
+def _vectorizar_lote(lista_respuestas):
+    """Versión vectorizada de _vectorizar: matriz (N, n_features) en el orden de XCOLS."""
+    A = np.stack([_codificar(resp) for resp in lista_respuestas])
+    return MODELO.obtener().plan.vectorizar(A)
+
+
+def _resultado_desde_proba(proba, nombres, top_k: int = 3, version: str = ""):
+    """Arma el dict de salida de predecir a partir de un vector de probabilidades."""
+    idx = np.argsort(proba)[::-1]
+
+    # Mapear índices a nombres de técnico (según orden de entrenamiento;
+    # "Clase_<i>" si no hay CSV de clases). Vienen del modelo cargado o del sidecar.
+    tecs = [nombres[i] for i in idx]
+
+    top_k = max(1, min(top_k, len(tecs)))
+    return {
+        "tecnico_predicho": tecs[0],
+        "topk": list(zip(tecs[:top_k], proba[idx[:top_k]].round(4).tolist())),
+        "modelo_version": version_fila(version, proba),  # "+cascada" si no pasó por el bosque
+    }
 
 
 def predecir(respuestas_texto, top_k: int = 3):
@@ -114,25 +311,28 @@ def predecir(respuestas_texto, top_k: int = 3):
     Retorno:
     {
       "tecnico_predicho": <str>,
-      "topk": [(tecnico, prob), ...]   # probs en [0,1]
+      "topk": [(tecnico, prob), ...],  # probs en [0,1]
+      "modelo_version": <str>          # versión que produjo la predicción ("+cascada": sin el bosque)
     }
     """
-    X = _vectorizar(respuestas_texto)
-    proba = MODEL.predict_proba(X)[0]
-    idx = np.argsort(proba)[::-1]
+    A = _codificar(respuestas_texto).reshape(1, -1)
+    probas, nombres, version = _proba_codigos(A)
+    return _resultado_desde_proba(probas[0], nombres, top_k, version)
 
-    # Mapear índices a nombres de técnico (según orden de entrenamiento)
-    if TECNICOS_ORDEN and len(TECNICOS_ORDEN) == len(proba):
-        tecs = [TECNICOS_ORDEN[i] for i in idx]
-    else:
-        # fallback sin CSV de clases
-        tecs = [f"Clase_{i}" for i in idx]
 
-    top_k = max(1, min(top_k, len(tecs)))
-    return {
-        "tecnico_predicho": tecs[0],
-        "topk": list(zip(tecs[:top_k], proba[idx[:top_k]].round(4).tolist()))
-    }
+def predecir_batch(lista_respuestas, top_k: int = 3):
+    """
+    Igual que predecir pero para N hojas de respuestas: una sola matriz
+    (N, n_features) y una sola evaluación del bosque (para las hojas
+    que no estén en CACHE).
+    Retorna una lista de dicts con la misma estructura de predecir, en el mismo orden.
+    """
+    lista_respuestas = list(lista_respuestas)
+    if not lista_respuestas:
+        return []
+    A = np.stack([_codificar(resp) for resp in lista_respuestas])
+    probas, nombres, version = _proba_codigos(A)
+    return [_resultado_desde_proba(p, nombres, top_k, version) for p in probas]
 
 
 # ========= Script rápido de prueba =========
@@ -141,3 +341,16 @@ if __name__ == "__main__":
     fav = set(PREGUNTAS_POR_TECNICO["Robótica"])
     demo = ["Me encanta" if i in fav else "No me gusta" for i in range(1, TOTAL_PREGUNTAS + 1)]
     print(predecir(demo, top_k=3))
+
+    # Fila a fila vs. lote
+    rng = np.random.default_rng(0)
+    opciones = sorted(VALIDS)
+    hojas = [[opciones[j] for j in rng.integers(0, 3, size=TOTAL_PREGUNTAS)] for _ in range(500)]
+    t0 = time.perf_counter()
+    por_fila = [predecir(h) for h in hojas]
+    CACHE.limpiar()  # mide el lote sin aprovechar lo cacheado fila a fila
+    t1 = time.perf_counter()
+    por_lote = predecir_batch(hojas)
+    t2 = time.perf_counter()
+    assert por_fila == por_lote
+    print(f"fila a fila: {(t1 - t0) * 1000:.1f} ms | lote: {(t2 - t1) * 1000:.1f} ms ({len(hojas)} hojas)")
@@ -5,6 +5,8 @@ import json
 # 👇 NUEVO: para ArrayField (PostgreSQL)
 from django.contrib.postgres.fields import ArrayField
 
+from ali_ia.cola_explicaciones import ESTADOS as ESTADOS_EXPLICACION
+
 # Campo JSON tolerante: si ya viene dict/list desde Postgres, no lo vuelve a cargar.
 class PassthroughJSONField(models.JSONField):
     def from_db_value(self, value, expression, connection):
@@ -48,6 +50,15 @@ class TestGrado9(models.Model):
     ultima_pregunta = models.PositiveSmallIntegerField(default=0)  # 0..40
     respondidas = models.PositiveSmallIntegerField(default=0)       # 0..40
 
+    # Versión del modelo (registro de modelos) que produjo `resultado`
+    modelo_version = models.CharField(max_length=64, blank=True, default="")
+
+    # Explicación (Groq) en segundo plano: ver ali_ia/cola_explicaciones.py
+    explicacion_estado = models.CharField(max_length=12, choices=ESTADOS_EXPLICACION, blank=True,
+                                          default="", db_index=True)
+    explicacion_intentos = models.PositiveSmallIntegerField(default=0)
+    explicacion_proximo_intento = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         fin = self.fecha_realizacion.isoformat() if self.fecha_realizacion else "en_progreso"
         return f"Test de {getattr(self.usuario, 'email', self.usuario_id)} - {fin}"
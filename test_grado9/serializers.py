@@ -26,6 +26,8 @@ class TestGrado9Serializer(serializers.ModelSerializer):
             "progreso_pct",
             "fecha_inicio",
             "fecha_ultima_actividad",
+            "modelo_version",
+            "explicacion_estado",
         ]
         read_only_fields = [
             "usuario",             # ← Protege la propiedad del test
@@ -35,6 +37,8 @@ class TestGrado9Serializer(serializers.ModelSerializer):
             "fecha_inicio",
             "fecha_ultima_actividad",
             "respondidas",
+            "modelo_version",
+            "explicacion_estado",
         ]
 
     def get_progreso_pct(self, obj: TestGrado9):
@@ -1,9 +1,18 @@
+import os
+import random
+from unittest import skipUnless
+
+import numpy as np
+
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.urls import reverse
 from rest_framework.test import APITestCase
+from django.test import SimpleTestCase
 from Usuario.models import Usuario
 from test_grado9.models import TestGrado9
 
+MODEL9_PATH = os.path.join(os.path.dirname(__file__), "ml_model", "modelo_tecnico_mejor_57.joblib")
+
 class TestGrado9Tests(APITestCase):
 
     def setUp(self):
@@ -51,3 +60,105 @@ class TestGrado9Tests(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data['id'], self.test_grado9.id)
         self.assertEqual(response.data['resultado'], "Industrial")  # El resultado que asignaste
+
+
+@skipUnless(os.path.exists(MODEL9_PATH), "Falta el artefacto modelo_tecnico_mejor_57.joblib")
+class PrediccionBatchTests(SimpleTestCase):
+    """predecir_batch debe devolver lo mismo que predecir fila a fila."""
+
+    def test_batch_igual_a_fila_a_fila(self):
+        from test_grado9.ml_model.model9 import CACHE, predecir, predecir_batch
+
+        rng = random.Random(9)
+        opciones = ["Me encanta", "Me interesa", "No me gusta", "A", "B", "C"]
+        hojas = [[rng.choice(opciones) for _ in range(57)] for _ in range(20)]
+
+        # Cache de predicciones vacío en ambos casos: si no, uno leería lo que guardó el otro
+        CACHE.limpiar()
+        fila_a_fila = [predecir(h) for h in hojas]
+        CACHE.limpiar()
+        self.assertEqual(predecir_batch(hojas), fila_a_fila)
+
+
+@skipUnless(os.path.exists(MODEL9_PATH), "Falta el artefacto modelo_tecnico_mejor_57.joblib")
+class PlanFeaturesTests(SimpleTestCase):
+    """El plan compilado debe dar vectores bit a bit iguales a la construcción con pandas."""
+
+    @staticmethod
+    def _vectorizar_pandas(m, respuestas_texto):
+        # Implementación original de _vectorizar (Series + reindex)
+        import pandas as pd
+
+        base = [m.SCORE[r] for r in m._normalizar_respuestas(respuestas_texto)]
+        s = pd.Series(base, index=[f"pregunta_{i}" for i in range(1, m.TOTAL_PREGUNTAS + 1)])
+        for tecnico, qs in m.PREGUNTAS_POR_TECNICO.items():
+            col = f"suma_{tecnico}"
+            if col in m.XCOLS:
+                s[col] = s[[f"pregunta_{q}" for q in qs]].sum()
+        return s.reindex(m.XCOLS).to_numpy(dtype=np.float32).reshape(1, -1)
+
+    def test_plan_bit_a_bit_igual_a_pandas(self):
+        from test_grado9.ml_model import model9 as m
+
+        rng = random.Random(9)
+        opciones = ["Me encanta", "Me interesa", "No me gusta", "A", "B", "C"]
+        hojas = [[rng.choice(opciones) for _ in range(57)] for _ in range(500)]
+
+        lote = m._vectorizar_lote(hojas)
+        for i, hoja in enumerate(hojas):
+            esperado = self._vectorizar_pandas(m, hoja)
+            obtenido = m._vectorizar(hoja)
+            self.assertEqual(obtenido.shape, esperado.shape)
+            self.assertEqual(obtenido.tobytes(), esperado.tobytes())
+            self.assertEqual(lote[i:i + 1].tobytes(), esperado.tobytes())
+
+
+class PromptExplicacionTests(SimpleTestCase):
+    """El prompt de Groq solo lleva el perfil del técnico sugerido y las respuestas resumidas."""
+
+    def test_solo_el_perfil_que_aplica(self):
+        from test_grado9.groq_service import construir_mensajes
+
+        respuestas = {f"pregunta_{i}": 3 if 26 <= i <= 30 else 1 for i in range(1, 58)}
+        texto = construir_mensajes("Industrial", respuestas, tecnico="Robótica")[1]["content"]
+        self.assertIn("— Industrial — Robótica", texto)
+        self.assertNotIn("Electricidad y Electrónica\n•", texto)
+        self.assertNotIn("Contabilidad y Finanzas\n•", texto)
+        self.assertNotIn("pregunta_", texto)
+        self.assertIn("- Robótica: 3.0/3 (alto)", texto)
+
+        # Sin técnico: las sub-especialidades de la modalidad
+        texto = construir_mensajes("Comercio", respuestas)[1]["content"]
+        self.assertEqual(texto.count("— Comercio — "), 3)
+        self.assertNotIn("— Industrial", texto)
+
+
+class ExplicacionLocalTests(SimpleTestCase):
+    """Plantillas sin red con el perfil de egresado del técnico (motor local y respaldo de Groq)."""
+
+    def test_formato_y_perfil_de_cada_tecnico(self):
+        from test_grado9.groq_service import PERFILES_EGRESADO, explicacion_local_modalidad
+        from test_grado9.views import MODALIDAD_POR_TECNICO
+
+        respuestas = {f"pregunta_{i}": 3 if 26 <= i <= 30 else 1 for i in range(1, 58)}
+        for tecnico, (titulo, perfil) in PERFILES_EGRESADO.items():
+            texto = explicacion_local_modalidad(MODALIDAD_POR_TECNICO[tecnico], respuestas, tecnico=tecnico)
+            secciones = [linea.split(":", 1)[0] for linea in texto.splitlines()]
+            self.assertEqual(secciones, ["Por qué te lo sugerimos", "Qué aprenderás", "Siguientes pasos"])
+            self.assertIn(titulo, texto)
+            self.assertIn(perfil.splitlines()[0].lstrip("• "), texto)
+        texto = explicacion_local_modalidad("Industrial", respuestas, tecnico="Robótica")
+        self.assertIn("Robótica es el área del test que más te atrae", texto)
+
+    def test_menos_de_5_ms(self):
+        import time
+        from test_grado9.groq_service import PERFILES_EGRESADO, explicacion_local_modalidad
+
+        rng = random.Random(9)
+        tiempos = []
+        for tecnico in list(PERFILES_EGRESADO) * 20:
+            respuestas = {f"pregunta_{i}": rng.choice([1, 2, 3]) for i in range(1, 58)}
+            t0 = time.perf_counter()
+            explicacion_local_modalidad("Industrial", respuestas, tecnico=tecnico)
+            tiempos.append(time.perf_counter() - t0)
+        self.assertLess(float(np.percentile(tiempos, 95)), 0.005)
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from ali_ia.vistas_async import ASGI
 from .views import (
     TestGrado9ViewSet,
     ResultadoTest9PorIDView,
@@ -23,3 +24,13 @@ urlpatterns = [
 
     path('', include(router.urls)),
 ]
+
+# Modo ASGI: estas rutas van antes del router y atienden con vistas async (ver ali_ia/vistas_async.py)
+if ASGI:
+    from . import views_async
+
+    urlpatterns = [
+        path('<int:pk>/progreso/', views_async.progreso, name='test_grado9_progreso_async'),
+        path('<int:pk>/finalizar/', views_async.finalizar, name='test_grado9_finalizar_async'),
+        path('<int:pk>/explicacion/stream/', views_async.explicacion_stream, name='test_grado9_explicacion_stream_async'),
+    ] + urlpatterns
@@ -1,5 +1,6 @@
 # test_grado9/views.py
 import os
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.db import transaction
@@ -9,13 +10,21 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied  # ← ADD
+from rest_framework.renderers import JSONRenderer
 
 from .models import TestGrado9, TestGrado9Top3
 from .serializers import TestGrado9Serializer, TestGrado9Top3Serializer
-from .groq_service import generar_explicacion_modalidad
+from .groq_service import (generar_explicacion_modalidad, generar_explicacion_modalidad_stream,
+                           agenerar_explicacion_modalidad, agenerar_explicacion_modalidad_stream,
+                           explicacion_local_modalidad, clave_cache, explicacion_guardada_modalidad,
+                           pregenerar_explicacion_modalidad)
 
 # ⬇️ Modelo nuevo (57 preguntas + metas)
-from .ml_model.model9 import predecir as predecir_tecnico
+from .ml_model.model9 import predecir as predecir_tecnico, PREGUNTAS_POR_TECNICO
+from ali_ia import cola_explicaciones as cola
+from ali_ia import explicacion_local
+from ali_ia.provisional import CalculadoraProvisional
+from ali_ia.sse import RenderizadorSSE, eventos_explicacion, respuesta_sse
 
 # ----------------- 🔧 Constantes / utilidades -----------------
 TOTAL_PREGUNTAS = 57
@@ -38,6 +47,27 @@ MODALIDAD_POR_TECNICO = {
     "Científico/Humanista": "Académico",
 }
 
+CODIGO_RESPUESTA = {"Me encanta": 3, "Me interesa": 2, "No me gusta": 1}
+
+
+def _codigo_respuesta(r) -> int:
+    """3/2/1 para respuestas válidas (texto o A/B/C), 0 si falta o es inválida."""
+    if r is None:
+        return 0
+    r = str(r).strip()
+    return CODIGO_RESPUESTA.get(MAP_A_B_C.get(r, r) or "", 0)
+
+
+def _quiere_provisional(data, params) -> bool:
+    """`provisional` en el cuerpo o en la query string (request.data / request.query_params o request.GET)."""
+    valor = data.get("provisional", params.get("provisional"))
+    return str(valor).strip().lower() in ("1", "true", "si", "sí")
+
+
+# Top-3 provisional en memoria (por proceso); nunca se guarda en `resultado`
+PROVISIONAL = CalculadoraProvisional("grado9", TOTAL_PREGUNTAS, PREGUNTAS_POR_TECNICO, _codigo_respuesta)
+
+
 def _contar_respondidas(respuestas: dict) -> int:
     if not isinstance(respuestas, dict):
         return 0
@@ -84,48 +114,178 @@ def _normalizar_respuestas(respuestas_dict: dict):
         out.append(r)
     return out
 
-def _finalizar_y_predecir(test_instance: TestGrado9):
-    """
-    Finaliza el test y predice con el nuevo modelo (57 preguntas, 3 opciones).
-    - Salida principal: técnico_predicho
-    - Además derivamos modalidad (para Groq).
-    """
-    respuestas = test_instance.respuestas or {}
+PREFIJO_TECNICO = "Técnico sugerido por ALI: "
 
-    respuestas_norm = _normalizar_respuestas(respuestas)
-    if respuestas_norm is None:
-        return  # aún no finaliza (faltan o inválidas)
 
-    # Predicción con el modelo nuevo (top_k=3)
-    pred = predecir_tecnico(respuestas_norm, top_k=3)
+def _componer_resultado(pred: dict, explicacion: str) -> str:
+    """Texto que se guarda en `resultado` (también lo usa `reescorar_tests`)."""
     tecnico = pred.get("tecnico_predicho")
     # soportar 'top3' o 'topk' según implementación
     top3 = pred.get("top3") or pred.get("topk") or []
     modalidad = MODALIDAD_POR_TECNICO.get(tecnico, "Desconocido")
-
-    # Si tu prompt de Groq espera valores 3/2/1:
-    mapeo_321 = {"Me encanta": 3, "Me interesa": 2, "No me gusta": 1}
-    respuestas_codificadas = {f"pregunta_{i}": mapeo_321[r] for i, r in enumerate(respuestas_norm, start=1)}
-
-    # Explicación con fallback
-    try:
-        explicacion = generar_explicacion_modalidad(modalidad, respuestas_codificadas)
-    except Exception:
-        explicacion = "No fue posible generar la explicación automática en este momento."
-
     detalle_top3 = ", ".join([f"{nombre} ({float(prob):.2f})" for nombre, prob in top3])
-    resultado_completo = (
-        f"Técnico sugerido por ALI: {tecnico}\n"
+    return (
+        f"{PREFIJO_TECNICO}{tecnico}\n"
         f"Modalidad asociada: {modalidad}\n"
         f"Top-3: {detalle_top3}\n\n"
         f"Explicación: {explicacion}"
     )
 
-    # Marcar finalizado
-    test_instance.resultado = resultado_completo
+
+def _codificar(respuestas_norm) -> dict:
+    # Si tu prompt de Groq espera valores 3/2/1:
+    return {f"pregunta_{i}": CODIGO_RESPUESTA[r] for i, r in enumerate(respuestas_norm, start=1)}
+
+
+def _explicacion(tecnico: str, respuestas_norm, stream: bool = False, asincrono: bool = False, plazo_s=None):
+    modalidad = MODALIDAD_POR_TECNICO.get(tecnico, "Desconocido")
+    if asincrono:  # modo ASGI: corrutina / generador asíncrono
+        generar = agenerar_explicacion_modalidad_stream if stream else agenerar_explicacion_modalidad
+    else:
+        generar = generar_explicacion_modalidad_stream if stream else generar_explicacion_modalidad
+    return generar(modalidad, _codificar(respuestas_norm), tecnico=tecnico, plazo_s=plazo_s)
+
+
+def _explicacion_local(tecnico: str, respuestas_norm) -> str:
+    """Respaldo sin red (plantillas con el perfil de egresado) cuando Groq falla o tarda demasiado."""
+    modalidad = MODALIDAD_POR_TECNICO.get(tecnico, "Desconocido")
+    return explicacion_local_modalidad(modalidad, _codificar(respuestas_norm), tecnico=tecnico,
+                                       motivo=explicacion_local.RESPALDO)
+
+
+def _clave_explicacion(tecnico: str, respuestas_norm):
+    """(contexto, objetivo, perfil) de la explicación en el cache (pregenerar_explicaciones)."""
+    return clave_cache(MODALIDAD_POR_TECNICO.get(tecnico, "Desconocido"), _codificar(respuestas_norm), tecnico=tecnico)
+
+
+def _explicacion_guardada(tecnico: str, respuestas_norm):
+    """Pregenerada (o ya generada) para este técnico y perfil: se sirve sin esperar a Groq. None si no hay."""
+    modalidad = MODALIDAD_POR_TECNICO.get(tecnico, "Desconocido")
+    return explicacion_guardada_modalidad(modalidad, _codificar(respuestas_norm), tecnico=tecnico)
+
+
+def _pregenerar(tecnico: str, respuestas_norm) -> str:
+    modalidad = MODALIDAD_POR_TECNICO.get(tecnico, "Desconocido")
+    return pregenerar_explicacion_modalidad(modalidad, _codificar(respuestas_norm), tecnico=tecnico)
+
+
+def _datos_pendiente(test_instance: TestGrado9):
+    """(técnico, respuestas_norm) de un test finalizado: técnico tomado del `resultado` guardado."""
+    respuestas_norm = _normalizar_respuestas(test_instance.respuestas or {})
+    primera = (test_instance.resultado or "").split("\n", 1)[0]
+    if respuestas_norm is None or not primera.startswith(PREFIJO_TECNICO):
+        raise ValueError("El test no tiene respuestas completas o un técnico predicho.")
+    return primera[len(PREFIJO_TECNICO):], respuestas_norm
+
+
+def _explicar_pendiente(test_instance: TestGrado9, stream: bool = False, asincrono: bool = False):
+    """
+    La usan el worker de la cola (procesar_explicaciones) y el endpoint SSE
+    (stream=True: generador de fragmentos).
+    """
+    tecnico, respuestas_norm = _datos_pendiente(test_instance)
+    return _explicacion(tecnico, respuestas_norm, stream=stream, asincrono=asincrono)
+
+
+def _explicar_pendiente_local(test_instance: TestGrado9) -> str:
+    """Lo que guardan el worker y el SSE cuando se agotan los intentos con Groq."""
+    return _explicacion_local(*_datos_pendiente(test_instance))
+
+
+def _explicar_pendiente_stream(test_instance: TestGrado9):
+    return _explicar_pendiente(test_instance, stream=True)
+
+
+def _aexplicar_pendiente_stream(test_instance: TestGrado9):
+    return _explicar_pendiente(test_instance, stream=True, asincrono=True)
+
+
+def _preparar_finalizacion(test_instance: TestGrado9):
+    """Predicción de un test completo: (pred, respuestas_norm), o None si faltan o hay inválidas."""
+    respuestas_norm = _normalizar_respuestas(test_instance.respuestas or {})
+    if respuestas_norm is None:
+        return None
+    # Predicción con el modelo nuevo (top_k=3)
+    return predecir_tecnico(respuestas_norm, top_k=3), respuestas_norm
+
+
+def _guardar_finalizacion(test_instance: TestGrado9, pred: dict, explicacion=None):
+    """Marca finalizado y guarda el resultado; explicacion=None la deja en la cola para el worker."""
+    if explicacion is None:
+        explicacion = cola.TEXTO_PENDIENTE
+        test_instance.explicacion_estado = cola.PENDIENTE
+        test_instance.explicacion_intentos = 0
+        test_instance.explicacion_proximo_intento = None
+    else:
+        test_instance.explicacion_estado = cola.LISTA
+
+    test_instance.resultado = _componer_resultado(pred, explicacion)
+    test_instance.modelo_version = pred.get("modelo_version", "")
     test_instance.estado = TestGrado9.ESTADO_FINALIZADO
     test_instance.fecha_realizacion = timezone.now()
-    test_instance.save(update_fields=['resultado', 'estado', 'fecha_realizacion', 'fecha_ultima_actividad'])
+    test_instance.save(update_fields=['resultado', 'modelo_version', 'estado', 'fecha_realizacion',
+                                      'fecha_ultima_actividad'] + cola.CAMPOS)
+
+
+def _finalizar_y_predecir(test_instance: TestGrado9):
+    """
+    Finaliza el test y predice con el nuevo modelo (57 preguntas, 3 opciones).
+    - Salida principal: técnico_predicho
+    - Además derivamos modalidad (para Groq).
+    - La explicación se encola y la completa el worker, salvo que ya haya una
+      pregenerada para el técnico y el perfil
+      (ALI_EXPLICACIONES=sincrona: se genera aquí, como antes;
+      ALI_EXPLICACIONES_MOTOR=local: se genera aquí con plantillas, sin red).
+    """
+    preparado = _preparar_finalizacion(test_instance)
+    if preparado is None:
+        return  # aún no finaliza (faltan o inválidas)
+    pred, respuestas_norm = preparado
+
+    tecnico = pred.get("tecnico_predicho")
+    if explicacion_local.LOCAL or not cola.EN_COLA:
+        # Explicación con fallback
+        try:
+            explicacion = _explicacion(tecnico, respuestas_norm, plazo_s=explicacion_local.PLAZO_S)
+        except Exception:
+            # Falló, tardó o no hubo cupo (429 / admisión): aquí no hay worker que la retome
+            explicacion = _explicacion_local(tecnico, respuestas_norm)
+    else:
+        # Modo cola: si el perfil ya tiene explicación guardada queda LISTA; si no, al worker
+        explicacion = _explicacion_guardada(tecnico, respuestas_norm)
+    _guardar_finalizacion(test_instance, pred, explicacion)
+
+
+async def _afinalizar_y_predecir(test_instance: TestGrado9):
+    """Igual que _finalizar_y_predecir para las vistas ASGI: la llamada a Groq no bloquea el proceso."""
+    preparado = await sync_to_async(_preparar_finalizacion)(test_instance)
+    if preparado is None:
+        return
+    pred, respuestas_norm = preparado
+
+    tecnico = pred.get("tecnico_predicho")
+    if explicacion_local.LOCAL or not cola.EN_COLA:
+        try:
+            explicacion = await _explicacion(tecnico, respuestas_norm, asincrono=True,
+                                             plazo_s=explicacion_local.PLAZO_S)
+        except Exception:
+            # Falló, tardó o no hubo cupo (429 / admisión): aquí no hay worker que la retome
+            explicacion = _explicacion_local(tecnico, respuestas_norm)
+    else:
+        explicacion = await sync_to_async(_explicacion_guardada)(tecnico, respuestas_norm)
+    await sync_to_async(_guardar_finalizacion)(test_instance, pred, explicacion)
+
+
+def _estado_explicacion(test: TestGrado9) -> dict:
+    """Respuesta del endpoint de polling de la explicación."""
+    lista = test.explicacion_estado in ("", cola.LISTA, cola.ERROR)
+    return {
+        "id": test.id,
+        "estado": test.estado,
+        "explicacion_estado": test.explicacion_estado,
+        "explicacion": cola.extraer_explicacion(test.resultado) if lista else None,
+        "resultado": test.resultado,
+    }
 
 # ✅ NUEVO: helper para reportar faltantes/invalidas
 def _faltantes_o_invalidas(respuestas_dict: dict):
@@ -154,6 +314,131 @@ def _faltantes_o_invalidas(respuestas_dict: dict):
 
     return faltantes, invalidas
 
+def _guardar_progreso(user, pk, data):
+    """
+    Valida y guarda las respuestas de un PATCH de progreso (vista DRF y vista ASGI).
+    Devuelve ((test, respuestas, updates, revision_previa), None) o (None, (error, status)).
+    """
+    try:
+        test = TestGrado9.objects.get(pk=pk)
+    except TestGrado9.DoesNotExist:
+        return None, ({"error": "Test no existe."}, status.HTTP_404_NOT_FOUND)
+
+    if not (user.is_staff or user.is_superuser or test.usuario_id == user.id):
+        return None, ({"error": "No tienes permiso para modificar este test."}, status.HTTP_403_FORBIDDEN)
+
+    if test.estado == TestGrado9.ESTADO_FINALIZADO:
+        return None, ({"error": "El test ya está finalizado."}, status.HTTP_400_BAD_REQUEST)
+
+    respuestas = dict(test.respuestas or {})
+    updates = {}
+
+    # Carga simple
+    if 'pregunta' in data and 'respuesta' in data:
+        try:
+            n = int(data['pregunta'])
+        except Exception:
+            return None, ({"error": "Índice de pregunta inválido."}, 400)
+        r = str(data['respuesta']).strip()
+        if not (1 <= n <= TOTAL_PREGUNTAS):
+            return None, ({"error": f"Índice de pregunta fuera de 1..{TOTAL_PREGUNTAS}."}, 400)
+        # aceptar A/B/C además de texto
+        if r not in RESP_VALIDAS and not (r in MAP_A_B_C and MAP_A_B_C[r] in RESP_VALIDAS):
+            return None, (
+                {"error": "Respuesta inválida (Me encanta / Me interesa / No me gusta o A/B/C)."},
+                400
+            )
+        updates[f"pregunta_{n}"] = r
+
+    # Carga múltiple
+    if 'respuestas' in data and isinstance(data['respuestas'], dict):
+        for k, v in data['respuestas'].items():
+            if not k.startswith('pregunta_'):
+                continue
+            try:
+                idx = int(k.split('_')[1])
+            except Exception:
+                continue
+            r = str(v).strip()
+            if not (1 <= idx <= TOTAL_PREGUNTAS):
+                return None, ({"error": f"Índice de pregunta fuera de 1..{TOTAL_PREGUNTAS}."}, 400)
+            if r in RESP_VALIDAS or (r in MAP_A_B_C and MAP_A_B_C[r] in RESP_VALIDAS):
+                updates[f"pregunta_{idx}"] = r
+            else:
+                return None, (
+                    {"error": f"Inválida {k} (Me encanta / Me interesa / No me gusta o A/B/C)."},
+                    400
+                )
+
+    if not updates:
+        return None, ({"error": "No hay respuestas válidas para actualizar."}, 400)
+
+    with transaction.atomic():
+        respuestas.update(updates)
+        test.respuestas = respuestas
+        test.respondidas = _contar_respondidas(respuestas)
+
+        up_exp = data.get('ultima_pregunta')
+        if isinstance(up_exp, int) and 1 <= up_exp <= TOTAL_PREGUNTAS:
+            test.ultima_pregunta = up_exp
+        else:
+            test.ultima_pregunta = _ultima_pregunta(respuestas)
+
+        # ✅ Validar completitud/validez ANTES de marcar estado
+        respuestas_norm = _normalizar_respuestas(respuestas)
+        if respuestas_norm is not None and test.respondidas >= TOTAL_PREGUNTAS:
+            test.estado = TestGrado9.ESTADO_FINALIZADO
+        else:
+            test.estado = TestGrado9.ESTADO_EN_PROGRESO
+
+        previa = test.fecha_ultima_actividad  # revisión leída; save() pone la nueva (auto_now)
+        test.save()
+
+    return (test, respuestas, updates, previa), None
+
+
+def _payload_progreso(test: TestGrado9, respuestas: dict, updates: dict, previa, provisional: bool) -> dict:
+    payload = {
+        "id": test.id,
+        "estado": test.estado,
+        "respondidas": test.respondidas,
+        "total": TOTAL_PREGUNTAS,
+        "progreso_pct": round((test.respondidas / TOTAL_PREGUNTAS) * 100, 2),
+        "ultima_pregunta": test.ultima_pregunta,
+        "fecha_ultima_actividad": test.fecha_ultima_actividad,
+        "explicacion_estado": test.explicacion_estado,
+    }
+    # Opt-in: ranking provisional por bloques (solo en la respuesta)
+    if test.estado != TestGrado9.ESTADO_FINALIZADO and provisional:
+        payload["provisional"] = PROVISIONAL.actualizar(test.id, respuestas, updates, test.respondidas,
+                                                        previa, test.fecha_ultima_actividad)
+    return payload
+
+
+def _validar_finalizacion(user, pk):
+    """Chequeos del POST finalizar: (test, None) o (None, (error, status))."""
+    try:
+        test = TestGrado9.objects.get(pk=pk)
+    except TestGrado9.DoesNotExist:
+        return None, ({"error": "Test no existe."}, status.HTTP_404_NOT_FOUND)
+
+    if not (user.is_staff or user.is_superuser or test.usuario_id == user.id):
+        return None, ({"error": "No tienes permiso para finalizar este test."}, status.HTTP_403_FORBIDDEN)
+
+    if test.estado == TestGrado9.ESTADO_FINALIZADO:
+        return None, ({"error": "El test ya está finalizado."}, status.HTTP_400_BAD_REQUEST)
+
+    faltantes, invalidas = _faltantes_o_invalidas(test.respuestas or {})
+    if faltantes or invalidas:
+        partes = []
+        if faltantes:
+            partes.append(f"faltan {len(faltantes)} pregunta(s): {faltantes}")
+        if invalidas:
+            partes.append(f"hay respuestas inválidas en: {invalidas} (usa Me encanta / Me interesa / No me gusta o A/B/C)")
+        return None, ({"error": "No puedes finalizar: " + " y ".join(partes)}, status.HTTP_400_BAD_REQUEST)
+    return test, None
+
+
 # ================== ViewSet principal ==================
 class TestGrado9ViewSet(viewsets.ModelViewSet):
     serializer_class = TestGrado9Serializer
@@ -241,100 +526,22 @@ class TestGrado9ViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['patch'], url_path='progreso')
     def progreso(self, request, pk=None):
-        user = request.user
-        try:
-            test = TestGrado9.objects.get(pk=pk)
-        except TestGrado9.DoesNotExist:
-            return Response({"error": "Test no existe."}, status=status.HTTP_404_NOT_FOUND)
-
-        if not (user.is_staff or user.is_superuser or test.usuario_id == user.id):
-            return Response({"error": "No tienes permiso para modificar este test."},
-                            status=status.HTTP_403_FORBIDDEN)
-
-        if test.estado == TestGrado9.ESTADO_FINALIZADO:
-            return Response({"error": "El test ya está finalizado."}, status=status.HTTP_400_BAD_REQUEST)
-
-        data = request.data
-        respuestas = dict(test.respuestas or {})
-        updates = {}
-
-        # Carga simple
-        if 'pregunta' in data and 'respuesta' in data:
-            try:
-                n = int(data['pregunta'])
-            except Exception:
-                return Response({"error": "Índice de pregunta inválido."}, status=400)
-            r = str(data['respuesta']).strip()
-            if not (1 <= n <= TOTAL_PREGUNTAS):
-                return Response({"error": f"Índice de pregunta fuera de 1..{TOTAL_PREGUNTAS}."}, status=400)
-            # aceptar A/B/C además de texto
-            if r not in RESP_VALIDAS and not (r in MAP_A_B_C and MAP_A_B_C[r] in RESP_VALIDAS):
-                return Response(
-                    {"error": "Respuesta inválida (Me encanta / Me interesa / No me gusta o A/B/C)."},
-                    status=400
-                )
-            updates[f"pregunta_{n}"] = r
-
-        # Carga múltiple
-        if 'respuestas' in data and isinstance(data['respuestas'], dict):
-            for k, v in data['respuestas'].items():
-                if not k.startswith('pregunta_'):
-                    continue
-                try:
-                    idx = int(k.split('_')[1])
-                except Exception:
-                    continue
-                r = str(v).strip()
-                if not (1 <= idx <= TOTAL_PREGUNTAS):
-                    return Response({"error": f"Índice de pregunta fuera de 1..{TOTAL_PREGUNTAS}."}, status=400)
-                if r in RESP_VALIDAS or (r in MAP_A_B_C and MAP_A_B_C[r] in RESP_VALIDAS):
-                    updates[f"pregunta_{idx}"] = r
-                else:
-                    return Response(
-                        {"error": f"Inválida {k} (Me encanta / Me interesa / No me gusta o A/B/C)."},
-                        status=400
-                    )
-
-        if not updates:
-            return Response({"error": "No hay respuestas válidas para actualizar."}, status=400)
-
-        with transaction.atomic():
-            respuestas.update(updates)
-            test.respuestas = respuestas
-            test.respondidas = _contar_respondidas(respuestas)
-
-            up_exp = data.get('ultima_pregunta')
-            if isinstance(up_exp, int) and 1 <= up_exp <= TOTAL_PREGUNTAS:
-                test.ultima_pregunta = up_exp
-            else:
-                test.ultima_pregunta = _ultima_pregunta(respuestas)
-
-            # ✅ Validar completitud/validez ANTES de marcar estado
-            respuestas_norm = _normalizar_respuestas(respuestas)
-            if respuestas_norm is not None and test.respondidas >= TOTAL_PREGUNTAS:
-                test.estado = TestGrado9.ESTADO_FINALIZADO
-            else:
-                test.estado = TestGrado9.ESTADO_EN_PROGRESO
-
-            test.save()
+        hecho, error = _guardar_progreso(request.user, pk, request.data)
+        if error:
+            return Response(*error)
+        test, respuestas, updates, previa = hecho
 
         # Si se completó aquí, finaliza y predice
         if test.estado == TestGrado9.ESTADO_FINALIZADO:
+            PROVISIONAL.olvidar(test.id)
             try:
                 _finalizar_y_predecir(test)
             except Exception as e:
                 test.resultado = f"Error interno: {str(e)}"
                 test.save(update_fields=['resultado'])
 
-        return Response({
-            "id": test.id,
-            "estado": test.estado,
-            "respondidas": test.respondidas,
-            "total": TOTAL_PREGUNTAS,
-            "progreso_pct": round((test.respondidas / TOTAL_PREGUNTAS) * 100, 2),
-            "ultima_pregunta": test.ultima_pregunta,
-            "fecha_ultima_actividad": test.fecha_ultima_actividad,
-        }, status=200)
+        provisional = _quiere_provisional(request.data, request.query_params)
+        return Response(_payload_progreso(test, respuestas, updates, previa, provisional), status=200)
 
     # ✅ NUEVO: endpoint explícito para finalizar
     @action(detail=True, methods=['post'], url_path='finalizar')
@@ -344,28 +551,9 @@ class TestGrado9ViewSet(viewsets.ModelViewSet):
         - Si faltan/son inválidas respuestas → 400 con detalle.
         - Si todo ok → finaliza, predice y devuelve 200 con el test.
         """
-        user = request.user
-        try:
-            test = TestGrado9.objects.get(pk=pk)
-        except TestGrado9.DoesNotExist:
-            return Response({"error": "Test no existe."}, status=status.HTTP_404_NOT_FOUND)
-
-        if not (user.is_staff or user.is_superuser or test.usuario_id == user.id):
-            return Response({"error": "No tienes permiso para finalizar este test."},
-                            status=status.HTTP_403_FORBIDDEN)
-
-        if test.estado == TestGrado9.ESTADO_FINALIZADO:
-            return Response({"error": "El test ya está finalizado."}, status=status.HTTP_400_BAD_REQUEST)
-
-        faltantes, invalidas = _faltantes_o_invalidas(test.respuestas or {})
-        if faltantes or invalidas:
-            partes = []
-            if faltantes:
-                partes.append(f"faltan {len(faltantes)} pregunta(s): {faltantes}")
-            if invalidas:
-                partes.append(f"hay respuestas inválidas en: {invalidas} (usa Me encanta / Me interesa / No me gusta o A/B/C)")
-            return Response({"error": "No puedes finalizar: " + " y ".join(partes)},
-                            status=status.HTTP_400_BAD_REQUEST)
+        test, error = _validar_finalizacion(request.user, pk)
+        if error:
+            return Response(*error)
 
         # Si todo está completo y válido, finalizamos y predecimos
         try:
@@ -377,6 +565,21 @@ class TestGrado9ViewSet(viewsets.ModelViewSet):
 
         return Response(TestGrado9Serializer(test).data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'], url_path='explicacion')
+    def explicacion(self, request, pk=None):
+        """Estado de la explicación en segundo plano (el cliente hace polling tras finalizar)."""
+        return Response(_estado_explicacion(self.get_object()), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='explicacion/stream',
+            renderer_classes=[RenderizadorSSE, JSONRenderer])
+    def explicacion_stream(self, request, pk=None):
+        """Explicación en Server-Sent Events: los tokens de Groq llegan según se generan."""
+        test = self.get_object()
+        if test.estado != TestGrado9.ESTADO_FINALIZADO:
+            return Response({"detail": "El test aún no está finalizado."}, status=status.HTTP_409_CONFLICT)
+        return respuesta_sse(eventos_explicacion(TestGrado9, test.pk, _explicar_pendiente_stream,
+                                                 respaldo=_explicar_pendiente_local))
+
 # ----------------- APIViews existentes -----------------
 class ResultadoTest9PorIDView(APIView):
     permission_classes = [IsAuthenticated]
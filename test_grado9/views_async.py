@@ -0,0 +1,71 @@
+# test_grado9/views_async.py
+"""
+Vistas del modo ASGI (ALI_ASGI=1, ver ali_ia/vistas_async.py): `progreso`,
+`finalizar` y `explicacion/stream` con los mismos contratos que el ViewSet,
+esperando a Groq en el event loop en lugar de bloquear un worker.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+from ali_ia.sse import aeventos_explicacion, respuesta_sse
+from ali_ia.vistas_async import leer_json, vista_jwt
+from .models import TestGrado9
+from .serializers import TestGrado9Serializer
+from .views import (PROVISIONAL, _aexplicar_pendiente_stream, _afinalizar_y_predecir,
+                    _explicar_pendiente_local, _guardar_progreso, _payload_progreso, _quiere_provisional,
+                    _validar_finalizacion)
+
+
+def _test_visible(user, pk):
+    """Como get_object() del ViewSet: staff ve todos, el estudiante solo los suyos."""
+    qs = TestGrado9.objects.all() if (user.is_staff or user.is_superuser) else TestGrado9.objects.filter(usuario=user)
+    return qs.filter(pk=pk).first()
+
+
+@vista_jwt("PATCH")
+async def progreso(request, pk):
+    data = leer_json(request)
+    if data is None:
+        return JsonResponse({"error": "El cuerpo debe ser un objeto JSON."}, status=400)
+    hecho, error = await sync_to_async(_guardar_progreso)(request.user, pk, data)
+    if error:
+        return JsonResponse(error[0], status=error[1])
+    test, respuestas, updates, previa = hecho
+
+    # Si se completó aquí, finaliza y predice
+    if test.estado == TestGrado9.ESTADO_FINALIZADO:
+        PROVISIONAL.olvidar(test.id)
+        try:
+            await _afinalizar_y_predecir(test)
+        except Exception as e:
+            test.resultado = f"Error interno: {str(e)}"
+            await sync_to_async(test.save)(update_fields=['resultado'])
+
+    provisional = _quiere_provisional(data, request.GET)
+    payload = await sync_to_async(_payload_progreso)(test, respuestas, updates, previa, provisional)
+    return JsonResponse(payload, status=200)
+
+
+@vista_jwt("POST")
+async def finalizar(request, pk):
+    test, error = await sync_to_async(_validar_finalizacion)(request.user, pk)
+    if error:
+        return JsonResponse(error[0], status=error[1])
+    try:
+        await _afinalizar_y_predecir(test)
+    except Exception as e:
+        test.resultado = f"Error interno: {str(e)}"
+        await sync_to_async(test.save)(update_fields=['resultado'])
+        return JsonResponse({"error": test.resultado}, status=500)
+    return JsonResponse(await sync_to_async(lambda: TestGrado9Serializer(test).data)(), status=200)
+
+
+@vista_jwt("GET")
+async def explicacion_stream(request, pk):
+    test = await sync_to_async(_test_visible)(request.user, pk)
+    if test is None:
+        return JsonResponse({"detail": "No encontrado."}, status=404)
+    if test.estado != TestGrado9.ESTADO_FINALIZADO:
+        return JsonResponse({"detail": "El test aún no está finalizado."}, status=409)
+    return respuesta_sse(aeventos_explicacion(TestGrado9, test.pk, _aexplicar_pendiente_stream,
+                                              respaldo=_explicar_pendiente_local))
@@ -1,71 +1,175 @@
 # test_grado_10_11/groq_service.py
-import json
-import requests
-from django.conf import settings
+from ali_ia import explicacion_local
+from ali_ia.admision_groq import ADMISION
+from ali_ia.cache_explicaciones import CacheExplicaciones, huella, perfil_por_bloques
+from ali_ia.groq_client import GROQ, plazo_a_limite
+from ali_ia.prompts import METRICAS_PROMPTS, resumir_respuestas
+from .ml_model.model_10y11 import PREGUNTAS_CLAVE_POR_CARRERA
 
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
 GROQ_MODEL = "llama-3.1-8b-instant"  # igual que 9; si quieres: "llama-3.3-70b-versatile"
 
-def generar_explicacion_carrera(carrera, respuestas):
-    # Asegura que 'respuestas' sea texto legible (por si es dict/list)
-    if not isinstance(respuestas, str):
-        try:
-            respuestas = json.dumps(respuestas, ensure_ascii=False)
-        except Exception:
-            respuestas = str(respuestas)
+# Súbela si cambias el prompt: invalida las explicaciones cacheadas
+VERSION_PROMPT = 2
+MAX_TOKENS = 300
+CACHE = CacheExplicaciones("grado10_11")
 
-    system_msg = (
-        "Eres un orientador vocacional empático. Responde en español, "
-        "con tono juvenil, claro y motivador. Sé breve (80–120 palabras) "
-        "y evita tecnicismos innecesarios."
-    )
+SYSTEM_MSG = (
+    "Eres un orientador vocacional empático. Responde en español, "
+    "con tono juvenil, claro y motivador. Sé breve (80–120 palabras) "
+    "y evita tecnicismos innecesarios."
+)
 
+
+def construir_mensajes(carrera, respuestas) -> list:
+    """Mensajes de chat para Groq con las respuestas resumidas por bloque de carrera."""
     user_prompt = f"""
-Eres un orientador vocacional para estudiantes de colegio (grados 10 y 11). 
-El modelo ha sugerido la carrera universitaria "{carrera}".
+Estudiante de grado 10/11. El modelo sugiere la carrera universitaria "{carrera}".
 
-Las respuestas del test (1=No me interesa, 4=Me gusta) fueron:
-{respuestas}
+Interés promedio por área del test (3=Me encanta, 2=Me interesa, 1=No me gusta):
+{resumir_respuestas(respuestas, PREGUNTAS_CLAVE_POR_CARRERA)}
 
-Redacta una explicación clara, educativa, breve y motivadora sobre por qué se recomienda esta carrera. 
-Usa un lenguaje juvenil y positivo y cierra con un siguiente paso práctico (materias, clubes o proyectos).
+Explica de forma clara, educativa y motivadora por qué se recomienda esta carrera,
+conectándola con sus áreas de interés alto (sin enumerar puntajes).
+Cierra con un siguiente paso práctico (materias, clubes o proyectos).
 """.strip()
+    return [
+        {"role": "system", "content": SYSTEM_MSG},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+# Qué se estudia en cada carrera del modelo (explicación local, sin Groq)
+ENFOQUE_CARRERA = {
+    "Medicina": "ciencias básicas como biología y química, el cuerpo humano y, con el tiempo, el cuidado "
+                "directo de pacientes en prácticas clínicas.",
+    "Ingeniería": "matemáticas, física y diseño para resolver problemas reales: construir, medir, "
+                  "optimizar procesos y trabajar en proyectos en equipo.",
+    "Administración": "cómo planear, organizar y dirigir empresas y proyectos: finanzas, mercadeo, "
+                      "talento humano y toma de decisiones.",
+    "Psicología": "cómo piensan, sienten y se comportan las personas, y herramientas para acompañarlas "
+                  "en contextos clínicos, educativos y sociales.",
+    "Derecho": "las normas que organizan la sociedad, a argumentar con claridad y a defender los "
+               "derechos de personas y organizaciones.",
+    "Educación": "cómo aprenden niños, jóvenes y adultos, y a diseñar clases y experiencias que "
+                 "despierten la curiosidad.",
+    "Sistemas/Software": "programación, bases de datos, redes y diseño de aplicaciones, con proyectos "
+                         "prácticos desde los primeros semestres.",
+    "Contaduría": "registro, análisis e interpretación de la información financiera, impuestos y "
+                  "control de recursos de las organizaciones.",
+    "Diseño Gráfico": "composición, color, tipografía e ilustración para comunicar ideas en medios "
+                      "impresos y digitales.",
+    "Ciencias Naturales": "biología, química, física y ciencias de la tierra a partir de la observación, "
+                          "el laboratorio y el trabajo de campo.",
+}
+
+
+def explicacion_local_carrera(carrera, respuestas, motivo=explicacion_local.PRINCIPAL) -> str:
+    """Explicación sin Groq (plantilla con el enfoque de la carrera); ver ali_ia.explicacion_local."""
+    enfoque = ENFOQUE_CARRERA.get(carrera, "los fundamentos de la carrera con proyectos y prácticas guiadas.")
+    pasos = (f"busca el plan de estudios de {carrera} en dos universidades, habla con alguien que la "
+             f"estudie y refuerza en el colegio las materias relacionadas.")
+    return explicacion_local.redactar(carrera, respuestas, PREGUNTAS_CLAVE_POR_CARRERA, enfoque, pasos, motivo)
+
+
+def _preparar(carrera, respuestas, plazo_s=None):
+    """
+    (contexto, objetivo, perfil, mensajes, limite) de una explicación: la clave de CACHE
+    (perfil por bloques dominantes; None si no vienen códigos 3/2/1), el prompt y el
+    plazo total (cupo + intentos + esperas). Lo comparten todas las variantes.
+    """
+    perfil = perfil_por_bloques(respuestas, PREGUNTAS_CLAVE_POR_CARRERA) if isinstance(respuestas, dict) else None
+    return (huella(GROQ_MODEL, VERSION_PROMPT, SYSTEM_MSG), carrera, perfil,
+            construir_mensajes(carrera, respuestas), plazo_a_limite(plazo_s))
+
+
+def _cupo(mensajes) -> int:
+    """Tokens que se piden a ADMISION: los del prompt (quedan en METRICAS_PROMPTS) más la respuesta."""
+    return METRICAS_PROMPTS.registrar("grado10_11", mensajes) + MAX_TOKENS
+
+
+def generar_explicacion_carrera(carrera, respuestas, plazo_s=None):
+    if explicacion_local.LOCAL:  # motor local: sin red
+        return explicacion_local_carrera(carrera, respuestas)
+    contexto, objetivo, perfil, mensajes, limite = _preparar(carrera, respuestas, plazo_s)
+
+    # Cliente compartido (sesión persistente, reintentos, circuit breaker): lanza GroqError si falla
+    # Solo si no está en cache: pide cupo (RPM/TPM/concurrencia) antes de ir a Groq
+    def _generar():
+        with ADMISION.admitir(_cupo(mensajes), limite=limite):
+            return GROQ.completar(
+                mensajes,
+                modelo=GROQ_MODEL,
+                temperature=0.7,
+                max_tokens=MAX_TOKENS,
+                limite=limite,
+            )
+
+    return CACHE.obtener_o_generar(contexto, objetivo, perfil, _generar)
+
+
+def generar_explicacion_carrera_stream(carrera, respuestas, plazo_s=None):
+    """Igual que generar_explicacion_carrera pero entrega la explicación en fragmentos (endpoint SSE)."""
+    if explicacion_local.LOCAL:
+        yield explicacion_local_carrera(carrera, respuestas)
+        return
+    contexto, objetivo, perfil, mensajes, limite = _preparar(carrera, respuestas, plazo_s)
+
+    def _transmitir():
+        with ADMISION.admitir(_cupo(mensajes), limite=limite):  # el cupo de concurrencia dura todo el stream
+            yield from GROQ.completar_stream(mensajes, modelo=GROQ_MODEL, temperature=0.7,
+                                             max_tokens=MAX_TOKENS, limite=limite)
+
+    yield from CACHE.obtener_o_transmitir(contexto, objetivo, perfil, _transmitir)
+
+
+# ========= Modo ASGI: mismas explicaciones sin bloquear el event loop =========
+async def agenerar_explicacion_carrera(carrera, respuestas, plazo_s=None):
+    if explicacion_local.LOCAL:
+        return explicacion_local_carrera(carrera, respuestas)
+    contexto, objetivo, perfil, mensajes, limite = _preparar(carrera, respuestas, plazo_s)
+
+    async def _agenerar():
+        async with ADMISION.aadmitir(_cupo(mensajes), limite=limite):
+            return await GROQ.acompletar(mensajes, modelo=GROQ_MODEL, temperature=0.7, max_tokens=MAX_TOKENS,
+                                         limite=limite)
+
+    return await CACHE.aobtener_o_generar(contexto, objetivo, perfil, _agenerar)
+
+
+async def agenerar_explicacion_carrera_stream(carrera, respuestas, plazo_s=None):
+    if explicacion_local.LOCAL:
+        yield explicacion_local_carrera(carrera, respuestas)
+        return
+    contexto, objetivo, perfil, mensajes, limite = _preparar(carrera, respuestas, plazo_s)
+
+    async def _atransmitir():
+        async with ADMISION.aadmitir(_cupo(mensajes), limite=limite):
+            async for fragmento in GROQ.acompletar_stream(mensajes, modelo=GROQ_MODEL, temperature=0.7,
+                                                          max_tokens=MAX_TOKENS, limite=limite):
+                yield fragmento
+
+    async for fragmento in CACHE.aobtener_o_transmitir(contexto, objetivo, perfil, _atransmitir):
+        yield fragmento
+
+
+# ========= Explicaciones pregeneradas (manage.py pregenerar_explicaciones) =========
+def clave_cache(carrera, respuestas):
+    """(contexto, objetivo, perfil) con que CACHE guarda la explicación; perfil None si no vienen códigos 3/2/1."""
+    return _preparar(carrera, respuestas)[:3]
+
+
+def explicacion_guardada_carrera(carrera, respuestas):
+    """Explicación ya guardada para esta carrera y perfil (pregenerada o de Groq) sin ir a Groq; None si no hay."""
+    contexto, objetivo, perfil = clave_cache(carrera, respuestas)
+    return CACHE.obtener(contexto, objetivo, perfil) if perfil is not None else None
+
 
-    headers = {
-        "Authorization": f"Bearer {settings.GROQ_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    data = {
-        "model": GROQ_MODEL,
-        "messages": [
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_prompt},
-        ],
-        "temperature": 0.7,
-        "max_tokens": 300,
-    }
-
-    try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=data, timeout=30)
-        print("🟡 Groq status:", response.status_code)
-        try:
-            print("🟡 Groq response body:", response.text[:2000])
-        except Exception:
-            pass
-
-        if response.status_code == 200:
-            payload = response.json()
-            return payload["choices"][0]["message"]["content"].strip()
-
-        try:
-            err = response.json()
-        except Exception:
-            err = {"raw": response.text}
-        return f"No se pudo generar la explicación (status {response.status_code}): {err}"
-
-    except requests.Timeout:
-        return "Error: tiempo de espera agotado al conectar con Groq."
-    except Exception as e:
-        print("🔴 Error al conectar con Groq:", str(e))
-        return f"Error al conectar con Groq: {str(e)}"
+def pregenerar_explicacion_carrera(carrera, respuestas) -> str:
+    """Genera con Groq (pidiendo cupo) y guarda como pregenerada, aunque ya hubiera una en cache."""
+    contexto, objetivo, perfil, mensajes, _ = _preparar(carrera, respuestas)
+    if perfil is None:
+        raise ValueError("Las respuestas deben venir como códigos 3/2/1 por pregunta.")
+    with ADMISION.admitir(_cupo(mensajes)):
+        texto = GROQ.completar(mensajes, modelo=GROQ_MODEL, temperature=0.7, max_tokens=MAX_TOKENS)
+    CACHE.guardar(contexto, objetivo, perfil, texto, pregenerada=True)
+    return texto
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('test_grado_10_11', '0003_alter_testgrado10_11_respuestas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testgrado10_11',
+            name='modelo_version',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
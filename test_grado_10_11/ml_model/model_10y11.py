@@ -1,31 +1,26 @@
 # test_grado_10_11/ml_model/model_10y11.py
 # -*- coding: utf-8 -*-
 import os
-import joblib
+import time
+
 import numpy as np
-import pandas as pd
+
+from ali_ia.artefactos import (
+    ArtefactosModelo, ModeloPerezoso, compilar_bosque, leer_columna_csv, leer_mapa_csv,
+)
+from ali_ia.cascada import Cascada, version_fila
+from ali_ia.cache_predicciones import CachePredicciones, huella_artefactos
+from ali_ia.microlotes import DespachadorMicrolotes
+from ali_ia.paquete_modelo import cargar_paquete
+from ali_ia.plan_features import PlanFeatures
+from ali_ia.registro_modelos import RegistroModelos
+from ali_ia.sidecar import GRADO10_11, ClienteSidecar, SidecarNoDisponible
 
 
 # ========= Rutas base (sin extensión) =========
 BASE = os.path.join(os.path.dirname(__file__), "modelo_10y11_rf_60preguntas")
-
-
-# ========= Cargar modelo =========
-MODEL = joblib.load(f"{BASE}.pkl")  # RandomForestClassifier puro
-
-
-# ========= Cargar y LIMPIAR XCOLS =========
-_raw_xcols = pd.read_csv(f"{BASE}_xcols.csv", header=None).iloc[:, 0].tolist()
-
-
-XCOLS = []
-for c in _raw_xcols:
-    if pd.isna(c):
-        continue
-    c = str(c).strip()
-    if c == "" or c.lower().startswith("unnamed") or c == "0":
-        continue
-    XCOLS.append(c)
+# (opcional) paquete memory-map generado con `manage.py exportar_paquete`
+PAQUETE_DIR = os.environ.get("ALI_PAQUETE_GRADO10_11", "")
 
 
 # Solo permitimos preguntas 1..60 y sumas conocidas
@@ -34,33 +29,6 @@ VALID_COLS += [f"suma_{k}" for k in [
     "Medicina", "Ingeniería", "Administración", "Psicología", "Derecho",
     "Educación", "Sistemas/Software", "Contaduría", "Diseño Gráfico", "Ciencias Naturales"
 ]]
-XCOLS = [c for c in XCOLS if c in VALID_COLS]
-
-
-# Asegurar tamaño que el modelo espera
-if hasattr(MODEL, "n_features_in_"):
-    n_exp = int(MODEL.n_features_in_)
-    if len(XCOLS) > n_exp:
-        # recortar manteniendo el orden del CSV ya limpio
-        XCOLS = XCOLS[:n_exp]
-    elif len(XCOLS) < n_exp:
-        raise ValueError(
-            f"XCOLS ({len(XCOLS)}) es menor que las features esperadas por el modelo ({n_exp}). "
-            f"Revisa el CSV {BASE}_xcols.csv."
-        )
-
-
-# ========= Cargar mapping id -> nombre (limpieza robusta) =========
-_id_to_nombre_series = pd.read_csv(f"{BASE}_id_to_nombre.csv", index_col=0, header=None).iloc[:, 0]
-# filtrar claves NaN / inválidas, castear a int
-ID_TO_NOMBRE = {}
-for k, v in _id_to_nombre_series.items():
-    if pd.isna(k) or pd.isna(v):
-        continue
-    try:
-        ID_TO_NOMBRE[int(k)] = str(v)
-    except Exception:
-        continue
 
 
 # ========= Bloques de preguntas (para meta-features) =========
@@ -103,84 +71,303 @@ def _normalizar_lista(respuestas_texto):
     return out
 
 
-def _vectorizar(respuestas_texto):
+def _codificar(respuestas_texto):
+    """Respuestas (texto o A/B/C) -> np.ndarray uint8 (60,) con valores 3/2/1."""
+    return np.fromiter((MAP_321[r] for r in _normalizar_lista(respuestas_texto)),
+                       dtype=np.uint8, count=60)
+
+
+# ========= Carga de artefactos (perezosa) =========
+def _limpiar_xcols(raw_xcols, modelo):
+    """Quita encabezados/índices del CSV, deja solo VALID_COLS y ajusta al tamaño del modelo."""
+    xcols = []
+    for c in raw_xcols:
+        c = str(c).strip()
+        if c == "" or c.lower().startswith("unnamed") or c == "0":
+            continue
+        xcols.append(c)
+    xcols = [c for c in xcols if c in VALID_COLS]
+
+    # Asegurar tamaño que el modelo espera
+    if hasattr(modelo, "n_features_in_"):
+        n_exp = int(modelo.n_features_in_)
+        if len(xcols) > n_exp:
+            # recortar manteniendo el orden del CSV ya limpio
+            xcols = xcols[:n_exp]
+        elif len(xcols) < n_exp:
+            raise ValueError(
+                f"XCOLS ({len(xcols)}) es menor que las features esperadas por el modelo ({n_exp}). "
+                f"Revisa el CSV {BASE}_xcols.csv."
+            )
+    return xcols
+
+
+def _cargar_desde_pickle(base=BASE) -> ArtefactosModelo:
     """
-    Convierte respuestas -> vector np.ndarray shape (1, n_features)
-    siguiendo EXACTAMENTE XCOLS del entrenamiento.
+    Formato fuente: pickle/joblib + CSVs (también es el origen de `exportar_paquete`
+    y de `registro_modelos registrar`, que puede pasar otra ruta base).
+    """
+    import joblib  # solo al cargar: importar el módulo no trae joblib/sklearn
+
+    modelo = joblib.load(f"{base}.pkl")  # RandomForestClassifier puro
+    xcols = _limpiar_xcols(leer_columna_csv(f"{base}_xcols.csv"), modelo)
+    # mapping id -> nombre (filas sin id numérico se ignoran)
+    id_to_nombre = leer_mapa_csv(f"{base}_id_to_nombre.csv")
+
+    plan = PlanFeatures(xcols, 60, PREGUNTAS_CLAVE_POR_CARRERA)
+    if plan.columnas_faltantes:
+        raise ValueError(f"Valores NaN al construir el vector. Columnas: {plan.columnas_faltantes}")
+
+    # Mapear classes_ del modelo a nombres
+    if hasattr(modelo, "classes_"):
+        class_ids = list(modelo.classes_)  # p.ej. [1,2,3,...,10]
+    else:
+        # fallback (siempre debería existir en RF)
+        class_ids = list(range(1, int(getattr(modelo, "n_classes_", len(id_to_nombre))) + 1))
+
+    return ArtefactosModelo(
+        modelo=modelo,
+        xcols=xcols,
+        nombres_clases=_ids_a_nombres(class_ids, id_to_nombre),
+        plan=plan,
+        bosque=compilar_bosque(modelo),
+        # La huella de los artefactos forma parte de la clave del cache
+        version=huella_artefactos(f"{base}.pkl", f"{base}_xcols.csv", f"{base}_id_to_nombre.csv"),
+        extra={"id_to_nombre": id_to_nombre},
+    )
+
+
+def _cargar_desde_paquete(ruta) -> ArtefactosModelo:
+    """Paquete de `manage.py exportar_paquete`: arreglos en memory-map, sin sklearn ni unpickling."""
+    bosque, man = cargar_paquete(ruta)
+    return ArtefactosModelo(
+        modelo=None,
+        xcols=man["xcols"],
+        nombres_clases=man["nombres_clases"],
+        plan=PlanFeatures(man["xcols"], 60, PREGUNTAS_CLAVE_POR_CARRERA),
+        bosque=bosque,
+        version=man["version"],
+        extra={"id_to_nombre": {int(k): v for k, v in man["extra"].get("id_to_nombre", {}).items()}},
+    )
+
+
+# ========= Registro de versiones (manage.py registro_modelos) =========
+REGISTRO = RegistroModelos("grado10_11")
+
+
+def _cargar_artefactos() -> ArtefactosModelo:
+    """Orden: ALI_PAQUETE_GRADO10_11 fijo > versión ACTIVA del registro > pickle del repo."""
+    if PAQUETE_DIR:
+        return _cargar_desde_paquete(PAQUETE_DIR)
+    ruta = REGISTRO.ruta_activa()
+    if ruta:
+        return _cargar_desde_paquete(ruta)
+    return _cargar_desde_pickle()
+
+
+# Con registro, los workers cambian a la versión ACTIVA nueva sin reiniciar
+MODELO = ModeloPerezoso("grado10_11", _cargar_artefactos,
+                        version_deseada=None if PAQUETE_DIR else REGISTRO.version_activa)
+
+
+def precargar() -> float:
+    """Carga el modelo ahora (warmup). Devuelve los segundos que tomó."""
+    return MODELO.precargar()
+
+
+# Compatibilidad: MODEL, XCOLS, ID_TO_NOMBRE, PLAN, BOSQUE y MODEL_VERSION
+# siguen disponibles como atributos del módulo, pero se cargan al primer acceso.
+_ATRIBUTOS_PEREZOSOS = {
+    "MODEL": lambda art: art.modelo,
+    "XCOLS": lambda art: art.xcols,
+    "ID_TO_NOMBRE": lambda art: art.extra["id_to_nombre"],
+    "PLAN": lambda art: art.plan,
+    "BOSQUE": lambda art: art.bosque,
+    "MODEL_VERSION": lambda art: art.version,
+}
+
+
+def __getattr__(nombre):
+    if nombre in _ATRIBUTOS_PEREZOSOS:
+        return _ATRIBUTOS_PEREZOSOS[nombre](MODELO.obtener())
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+# ========= Motor de inferencia =========
+# "plano": BosquePlano (árboles aplanados en NumPy, sin sklearn en el ciclo)
+# "sklearn": MODEL.predict_proba
+MOTORES = ("plano", "sklearn")
+MOTOR_INFERENCIA = os.environ.get("ALI_MOTOR_GRADO10_11", "plano")
+
+
+def usar_motor(nombre: str):
+    """Cambia el motor de inferencia de este modelo ('plano' o 'sklearn')."""
+    global MOTOR_INFERENCIA
+    if nombre not in MOTORES:
+        raise ValueError(f"Motor desconocido: {nombre}. Opciones: {MOTORES}")
+    MOTOR_INFERENCIA = nombre
+
+
+def _predict_proba(X, art=None):
+    """predict_proba con el motor configurado (NaN/inf siempre van por sklearn)."""
+    art = art or MODELO.obtener()
+    if art.modelo is None:  # cargado desde paquete: solo existe el BosquePlano
+        return art.bosque.predict_proba(X)
+    if MOTOR_INFERENCIA == "plano" and art.bosque is not None and np.isfinite(X).all():
+        return art.bosque.predict_proba(X)
+    return art.modelo.predict_proba(X)
+
+
+# ========= Cache de predicciones =========
+CACHE = CachePredicciones("grado10_11")
+
+
+# ========= Cascada por bloques (opcional, ALI_CASCADA) =========
+CASCADA = Cascada("grado10_11", 60, PREGUNTAS_CLAVE_POR_CARRERA)
+
+
+# ========= Sidecar de inferencia (opcional, ALI_SIDECAR_SOCKET) =========
+SIDECAR = ClienteSidecar()
+
+
+def _proba_codigos(A):
+    """
+    A: uint8 (N, n_preguntas) con valores 3/2/1.
+    Devuelve (lista de N vectores de probabilidad, nombres de clase, versión del modelo).
+    Con ALI_MICROLOTES=1 las peticiones concurrentes se evalúan juntas.
+    """
+    return MICROLOTES.enviar(A)
+
+
+def _proba_directo(A):
+    """Sin micro-lotes: si hay sidecar configurado se le pide a él; si no responde, en proceso."""
+    if SIDECAR.disponible():
+        try:
+            return SIDECAR.proba(GRADO10_11, A)
+        except SidecarNoDisponible:
+            pass
+    return _proba_local(A)
+
+
+def _proba_local(A):
     """
-    resp = _normalizar_lista(respuestas_texto)
-    base = [MAP_321[r] for r in resp]
-    # ✅ Cambio range(1,41) -> range(1,61)
-    s = pd.Series(base, index=[f"pregunta_{i}" for i in range(1, 61)])
+    Inferencia en este proceso: solo evalúa el bosque (en un único lote) para las hojas
+    que no estén en CACHE ni las resuelva la CASCADA.
+    """
+    art = MODELO.obtener()
+    probas = [CACHE.obtener(art.version, fila) for fila in A]
+    faltan = [i for i, p in enumerate(probas) if p is None]
+    if faltan:
+        # Cascada (ALI_CASCADA=1): las hojas no ambiguas se responden sin el bosque
+        resueltas, rapidas, sombra = CASCADA.separar(art, A[faltan])
+        for j, p in zip(resueltas, rapidas):
+            probas[faltan[j]] = p
+        al_bosque = [i for i in faltan if probas[i] is None]
+        en_sombra = [faltan[j] for j in sombra]
+        if al_bosque or en_sombra:
+            t0 = time.perf_counter()
+            calculadas = _predict_proba(art.plan.vectorizar(A[al_bosque + en_sombra]), art)
+            CASCADA.registrar_bosque(len(calculadas), time.perf_counter() - t0)
+            for i, p in zip(al_bosque, calculadas):
+                CACHE.guardar(art.version, A[i], p)
+                probas[i] = p
+            for i, p in zip(en_sombra, calculadas[len(al_bosque):]):
+                CASCADA.registrar_sombra(probas[i], p)
+    return probas, art.nombres_clases, art.version
+
+
+# ========= Micro-lotes (opcional, ALI_MICROLOTES) =========
+MICROLOTES = DespachadorMicrolotes("grado10_11", _proba_directo)
 
 
-    # Agregar meta-features si el modelo las usa (solo si están en XCOLS)
-    for carrera, qs in PREGUNTAS_CLAVE_POR_CARRERA.items():
-        col = f"suma_{carrera}"
-        if col in XCOLS:
-            s[col] = s[[f"pregunta_{i}" for i in qs]].sum()
+def _vectorizar(respuestas_texto):
+    """
+    Convierte respuestas -> vector np.ndarray shape (1, n_features)
+    siguiendo EXACTAMENTE XCOLS del entrenamiento (gather + matmul del PLAN).
+    """
+    return MODELO.obtener().plan.vectorizar(_codificar(respuestas_texto))
 
 
-    # Reordenar exactamente como XCOLS
-    s = s.reindex(XCOLS)
-    # Validación defensiva
-    if s.isna().any():
-        faltantes = [c for c, v in s.items() if pd.isna(v)]
-        raise ValueError(f"Valores NaN al construir el vector. Columnas: {faltantes}")
-    arr = s.to_numpy(dtype=np.float32).reshape(1, -1)
-    # Asegurar tamaño correcto
-    if hasattr(MODEL, "n_features_in_") and arr.shape[1] != int(MODEL.n_features_in_):
-        raise ValueError(
-            f"Vector con {arr.shape[1]} features, pero el modelo espera {int(MODEL.n_features_in_)}. "
-            f"Revisa XCOLS y las meta-features."
-        )
-    return arr
+def _vectorizar_lote(lista_respuestas):
+    """Versión vectorizada de _vectorizar: matriz (N, n_features)."""
+    A = np.stack([_codificar(resp) for resp in lista_respuestas])
+    return MODELO.obtener().plan.vectorizar(A)
 
 
-def _ids_a_nombres(ids):
+def _ids_a_nombres(ids, id_to_nombre):
     """
-    Convierte ids de clase -> nombres de carrera usando ID_TO_NOMBRE.
+    Convierte ids de clase -> nombres de carrera usando el mapping id -> nombre.
     Si el modelo trae classes_ no 1..N, usamos ese arreglo.
     """
     nombres = []
     for cid in ids:
         # cid puede venir ya como id (p.ej. 1..N), castear a int por seguridad
         try:
-            nombres.append(ID_TO_NOMBRE[int(cid)])
+            nombres.append(id_to_nombre[int(cid)])
         except Exception:
             # fallback por si el mapeo no está: devolver el id como str
             nombres.append(str(cid))
     return nombres
 
 
-def predecir_carrera(respuestas_texto, top_k: int = 3):
-    """
-    Retorna:
-    {
-        "carrera_predicha": <str>,
-        "top3": [(nombre, prob), ...]  # prob en [0,1] redondeada a 4
-    }
-    """
-    X = _vectorizar(respuestas_texto)
-    proba = MODEL.predict_proba(X)[0]  # arreglo de probabilidades
+def _resultado_desde_proba(proba, nombres, top_k: int = 3, version: str = ""):
+    """Arma el dict de salida de predecir_carrera a partir de un vector de probabilidades."""
     # Índices ordenados por prob. descendente (en el espacio de MODEL.classes_)
     idx_sorted = np.argsort(proba)[::-1]
 
-
-    # Mapear classes_ del modelo a nombres
-    if hasattr(MODEL, "classes_"):
-        class_ids = list(MODEL.classes_)  # p.ej. [1,2,3,...,10]
-    else:
-        # fallback (siempre debería existir en RF)
-        class_ids = list(range(1, len(proba) + 1))
-
-
-    ids_ordenados = [class_ids[i] for i in idx_sorted]
-    nombres_ordenados = _ids_a_nombres(ids_ordenados)
+    # nombres: nombre de cada columna de proba (ya mapeado desde classes_ al cargar)
+    nombres_ordenados = [nombres[i] for i in idx_sorted]
 
 
     top_k = max(1, min(top_k, len(nombres_ordenados)))
     return {
         "carrera_predicha": nombres_ordenados[0],
         "top3": list(zip(nombres_ordenados[:top_k], proba[idx_sorted[:top_k]].round(4).tolist())),
+        "modelo_version": version_fila(version, proba),  # "+cascada" si no pasó por el bosque
+    }
+
+
+def predecir_carrera(respuestas_texto, top_k: int = 3):
+    """
+    Retorna:
+    {
+        "carrera_predicha": <str>,
+        "top3": [(nombre, prob), ...],  # prob en [0,1] redondeada a 4
+        "modelo_version": <str>         # versión que produjo la predicción ("+cascada": sin el bosque)
     }
+    """
+    A = _codificar(respuestas_texto).reshape(1, -1)
+    probas, nombres, version = _proba_codigos(A)
+    return _resultado_desde_proba(probas[0], nombres, top_k, version)
+
+
+def predecir_carrera_batch(lista_respuestas, top_k: int = 3):
+    """
+    Igual que predecir_carrera pero para N hojas de respuestas a la vez:
+    arma una sola matriz (N, n_features) y evalúa el bosque una sola vez
+    (solo para las hojas que no estén en CACHE).
+    Retorna una lista con la misma estructura de predecir_carrera, en el mismo orden.
+    """
+    lista_respuestas = list(lista_respuestas)
+    if not lista_respuestas:
+        return []
+    A = np.stack([_codificar(resp) for resp in lista_respuestas])
+    probas, nombres, version = _proba_codigos(A)
+    return [_resultado_desde_proba(p, nombres, top_k, version) for p in probas]
+
+
+# ========= Script rápido de prueba (fila a fila vs. lote) =========
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    opciones = sorted(VALIDAS)
+    hojas = [[opciones[j] for j in rng.integers(0, 3, size=60)] for _ in range(500)]
+
+    t0 = time.perf_counter()
+    por_fila = [predecir_carrera(h) for h in hojas]
+    CACHE.limpiar()  # mide el lote sin aprovechar lo cacheado fila a fila
+    t1 = time.perf_counter()
+    por_lote = predecir_carrera_batch(hojas)
+    t2 = time.perf_counter()
+
+    assert por_fila == por_lote
+    print(f"fila a fila: {(t1 - t0) * 1000:.1f} ms | lote: {(t2 - t1) * 1000:.1f} ms ({len(hojas)} hojas)")
@@ -4,6 +4,8 @@ from django.conf import settings
 from django.utils import timezone
 import json
 
+from ali_ia.cola_explicaciones import ESTADOS as ESTADOS_EXPLICACION
+
 # Evita el doble json.loads cuando Postgres ya devuelve dict/list
 class PassthroughJSONField(models.JSONField):
     def from_db_value(self, value, expression, connection):
@@ -44,6 +46,15 @@ class TestGrado10_11(models.Model):
     ultima_pregunta = models.PositiveSmallIntegerField(default=0)
     respondidas = models.PositiveSmallIntegerField(default=0)
 
+    # Versión del modelo (registro de modelos) que produjo `resultado`
+    modelo_version = models.CharField(max_length=64, blank=True, default="")
+
+    # Explicación (Groq) en segundo plano: ver ali_ia/cola_explicaciones.py
+    explicacion_estado = models.CharField(max_length=12, choices=ESTADOS_EXPLICACION, blank=True,
+                                          default="", db_index=True)
+    explicacion_intentos = models.PositiveSmallIntegerField(default=0)
+    explicacion_proximo_intento = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
         fin = self.fecha_realizacion.isoformat() if self.fecha_realizacion else "en_progreso"
         return f"Test 10/11 de {getattr(self.usuario, 'email', self.usuario_id)} - {fin}"
@@ -13,11 +13,13 @@ class TestGrado10_11Serializer(serializers.ModelSerializer):
 
             # ✅ Nuevos campos de progreso/seguimiento (solo lectura)
             'estado', 'ultima_pregunta', 'respondidas', 'progreso_pct',
-            'fecha_inicio', 'fecha_ultima_actividad',
+            'fecha_inicio', 'fecha_ultima_actividad', 'modelo_version',
+            'explicacion_estado',
         ]
         read_only_fields = [
             'id', 'usuario_email', 'fecha_realizacion', 'resultado',
-            'respondidas', 'progreso_pct', 'fecha_inicio', 'fecha_ultima_actividad', 'estado', 'ultima_pregunta'
+            'respondidas', 'progreso_pct', 'fecha_inicio', 'fecha_ultima_actividad', 'estado', 'ultima_pregunta',
+            'modelo_version', 'explicacion_estado',
         ]
 
     def get_progreso_pct(self, obj: TestGrado10_11) -> float:
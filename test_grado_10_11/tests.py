@@ -1,6 +1,12 @@
+import random
+from unittest import mock
+
+import numpy as np
+
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.urls import reverse
 from rest_framework.test import APITestCase
+from django.test import SimpleTestCase
 from Usuario.models import Usuario
 from test_grado_10_11.models import TestGrado10_11
 
@@ -64,3 +70,397 @@ class TestGrado10_11Tests(APITestCase):
         response = self.client.post(self.url, data, format='json')
         self.assertEqual(response.status_code, 201)
         self.assertEqual(response.data['resultado'], "Error: Las respuestas deben ser solo A, B, C o D")
+
+
+class PrediccionBatchTests(SimpleTestCase):
+    """predecir_carrera_batch debe devolver lo mismo que predecir_carrera fila a fila."""
+
+    def test_batch_igual_a_fila_a_fila(self):
+        from test_grado_10_11.ml_model.model_10y11 import CACHE, predecir_carrera, predecir_carrera_batch
+
+        rng = random.Random(10)
+        opciones = ["Me encanta", "Me interesa", "No me gusta", "A", "B", "C"]
+        hojas = [[rng.choice(opciones) for _ in range(60)] for _ in range(20)]
+
+        # Cache de predicciones vacío en ambos casos: si no, uno leería lo que guardó el otro
+        CACHE.limpiar()
+        fila_a_fila = [predecir_carrera(h) for h in hojas]
+        CACHE.limpiar()
+        self.assertEqual(predecir_carrera_batch(hojas), fila_a_fila)
+
+    def test_batch_vacio(self):
+        from test_grado_10_11.ml_model.model_10y11 import predecir_carrera_batch
+
+        self.assertEqual(predecir_carrera_batch([]), [])
+
+
+class PlanFeaturesTests(SimpleTestCase):
+    """El plan compilado debe dar vectores bit a bit iguales a la construcción con pandas."""
+
+    @staticmethod
+    def _vectorizar_pandas(m, respuestas_texto):
+        # Implementación original de _vectorizar (Series + reindex)
+        import pandas as pd
+
+        base = [m.MAP_321[r] for r in m._normalizar_lista(respuestas_texto)]
+        s = pd.Series(base, index=[f"pregunta_{i}" for i in range(1, 61)])
+        for carrera, qs in m.PREGUNTAS_CLAVE_POR_CARRERA.items():
+            col = f"suma_{carrera}"
+            if col in m.XCOLS:
+                s[col] = s[[f"pregunta_{i}" for i in qs]].sum()
+        return s.reindex(m.XCOLS).to_numpy(dtype=np.float32).reshape(1, -1)
+
+    def test_plan_bit_a_bit_igual_a_pandas(self):
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        rng = random.Random(11)
+        opciones = ["Me encanta", "Me interesa", "No me gusta", "A", "B", "C"]
+        hojas = [[rng.choice(opciones) for _ in range(60)] for _ in range(500)]
+
+        lote = m._vectorizar_lote(hojas)
+        for i, hoja in enumerate(hojas):
+            esperado = self._vectorizar_pandas(m, hoja)
+            obtenido = m._vectorizar(hoja)
+            self.assertEqual(obtenido.dtype, esperado.dtype)
+            self.assertEqual(obtenido.shape, esperado.shape)
+            self.assertEqual(obtenido.tobytes(), esperado.tobytes())
+            self.assertEqual(lote[i:i + 1].tobytes(), esperado.tobytes())
+
+
+class BosquePlanoModeloTests(SimpleTestCase):
+    """El motor 'plano' debe coincidir con MODEL.predict_proba del modelo real."""
+
+    def test_equivalente_a_sklearn(self):
+        import copy
+
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        self.assertIsNotNone(m.BOSQUE)
+        rng = np.random.default_rng(1011)
+        X = m.PLAN.vectorizar(rng.integers(1, 4, size=(300, 60)).astype(np.uint8))
+
+        secuencial = copy.copy(m.MODEL)
+        secuencial.n_jobs = 1
+        self.assertTrue(np.array_equal(m.BOSQUE.predict_proba(X), secuencial.predict_proba(X)))
+        # Con n_jobs=-1 sklearn acumula en orden no determinista: solo se exige cercanía
+        self.assertTrue(np.allclose(m.BOSQUE.predict_proba(X), m.MODEL.predict_proba(X), rtol=0, atol=1e-12))
+
+    def test_predecir_carrera_igual_en_ambos_motores(self):
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        rng = random.Random(3)
+        hojas = [[rng.choice(["A", "B", "C"]) for _ in range(60)] for _ in range(10)]
+        # n_jobs=1: orden de suma determinista (ver test anterior); el motor se restaura al salir
+        with mock.patch.object(m.MODEL, "n_jobs", 1), mock.patch.object(m, "MOTOR_INFERENCIA", m.MOTOR_INFERENCIA):
+            # Cache vacío en cada pasada: la clave no incluye el motor y el plano leería lo del sklearn
+            m.usar_motor("sklearn")
+            m.CACHE.limpiar()
+            con_sklearn = m.predecir_carrera_batch(hojas)
+            m.usar_motor("plano")
+            m.CACHE.limpiar()
+            antes = m.CACHE.estadisticas()["misses"]
+            con_plano = m.predecir_carrera_batch(hojas)
+            self.assertEqual(m.CACHE.estadisticas()["misses"] - antes, len(hojas))  # el plano sí evaluó
+        self.assertEqual(con_plano, con_sklearn)
+
+
+class CachePrediccionesModeloTests(SimpleTestCase):
+
+    def test_hoja_repetida_no_reevalua_el_bosque(self):
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        hoja = ["Me encanta"] * 60
+        m.CACHE.limpiar()
+        antes = m.CACHE.estadisticas()
+        primera = m.predecir_carrera(hoja)
+        segunda = m.predecir_carrera(hoja)
+        despues = m.CACHE.estadisticas()
+
+        self.assertEqual(primera, segunda)
+        self.assertEqual(despues["hits"] - antes["hits"], 1)
+        self.assertEqual(despues["misses"] - antes["misses"], 1)
+
+
+class CascadaModeloTests(SimpleTestCase):
+
+    def test_hoja_clara_se_resuelve_sin_bosque(self):
+        from ali_ia.cascada import Cascada
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        art = m.MODELO.obtener()
+        hoja = ["No me gusta"] * 60
+        for q in m.PREGUNTAS_CLAVE_POR_CARRERA["Medicina"]:
+            hoja[q - 1] = "Me encanta"
+        cascada = Cascada("grado10_11", 60, m.PREGUNTAS_CLAVE_POR_CARRERA,
+                          activo=True, margen=1.0, sombra=1.0, seed=0)
+        with mock.patch.object(m, "CASCADA", cascada):
+            m.CACHE.limpiar()
+            pred = m.predecir_carrera(hoja)
+            est = cascada.estadisticas()
+        self.assertEqual(pred["carrera_predicha"], "Medicina")
+        self.assertEqual(pred["modelo_version"], art.version + "+cascada")
+        self.assertEqual((est["resueltas"], est["sombra_filas"]), (1, 1))
+
+    def test_marca_de_cascada_por_el_sidecar(self):
+        import os
+        import tempfile
+        import threading
+
+        from ali_ia.cascada import Cascada, version_fila
+        from ali_ia.sidecar import GRADO10_11, ClienteSidecar, ServidorInferencia
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        A = np.full((2, 60), 1, dtype=np.uint8)
+        A[0, [q - 1 for q in m.PREGUNTAS_CLAVE_POR_CARRERA["Medicina"]]] = 3  # clara: cascada
+        A[1] = np.random.default_rng(1).integers(1, 4, size=60)             # ambigua: bosque
+        ruta = os.path.join(tempfile.mkdtemp(), "ali-test.sock")
+        servidor = ServidorInferencia(ruta)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        cascada = Cascada("grado10_11", 60, m.PREGUNTAS_CLAVE_POR_CARRERA, activo=True, margen=1.5, sombra=0.0)
+        try:
+            with mock.patch.object(m, "CASCADA", cascada):
+                m.CACHE.limpiar()
+                probas, _, version = ClienteSidecar(ruta).proba(GRADO10_11, A)
+                locales, _, _ = m._proba_local(A)
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+        self.assertEqual([version_fila(version, p) for p in probas],
+                         [version_fila(version, p) for p in locales])
+        self.assertEqual(version_fila(version, probas[0]), version + "+cascada")
+        self.assertTrue(np.array_equal(probas[0], locales[0]))
+
+
+class CargaPerezosaTests(SimpleTestCase):
+
+    def test_artefactos_sin_pandas(self):
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        art = m.MODELO.obtener()
+        self.assertEqual(len(art.xcols), int(art.modelo.n_features_in_))
+        self.assertEqual(art.xcols[0], "pregunta_1")
+        self.assertEqual(art.xcols[-1], "suma_Ciencias Naturales")
+        self.assertEqual(art.nombres_clases[0], "Medicina")
+        self.assertEqual(len(art.nombres_clases), 10)
+
+
+class SidecarInferenciaTests(SimpleTestCase):
+
+    def test_sidecar_igual_a_en_proceso(self):
+        import os
+        import tempfile
+        import threading
+
+        from ali_ia.sidecar import GRADO10_11, ClienteSidecar, ServidorInferencia
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        ruta = os.path.join(tempfile.mkdtemp(), "ali-test.sock")
+        servidor = ServidorInferencia(ruta)
+        servidor.precargar()
+        hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+        hilo.start()
+        try:
+            A = np.random.default_rng(7).integers(1, 4, size=(5, 60)).astype(np.uint8)
+            probas, nombres, version = ClienteSidecar(ruta).proba(GRADO10_11, A)
+            locales, nombres_locales, version_local = m._proba_local(A)
+            self.assertEqual(version, version_local)
+            self.assertEqual(nombres, nombres_locales)
+            for p, q in zip(probas, locales):
+                self.assertTrue(np.array_equal(p, q))
+        finally:
+            servidor.shutdown()
+            servidor.server_close()
+
+    def test_sin_socket_cae_a_en_proceso(self):
+        from ali_ia.sidecar import ClienteSidecar
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        with mock.patch.object(m, "SIDECAR", ClienteSidecar("/tmp/no-existe-ali.sock")):
+            resultado = m.predecir_carrera(["B"] * 60)
+            self.assertEqual(m.SIDECAR.fallos, 1)
+            self.assertFalse(m.SIDECAR.disponible())
+        self.assertEqual(resultado, m.predecir_carrera(["B"] * 60))
+
+
+class ReescorarTests(SimpleTestCase):
+    """`reescorar_tests` recalcula la predicción; la explicación se conserva solo si no cambia el top-1."""
+
+    def test_chunk_igual_a_prediccion_individual(self):
+        from ali_ia.management.commands.reescorar_tests import _puntuar_chunk
+        from test_grado_10_11.ml_model import model_10y11 as m
+
+        rng = random.Random(3)
+        lista = [[rng.choice(["A", "B", "C"]) for _ in range(60)] for _ in range(5)]
+        resultados = _puntuar_chunk(m.__name__, "predecir_carrera_batch", [10, 11, 12, 13, 14], lista)
+        self.assertEqual([i for i, _ in resultados], [10, 11, 12, 13, 14])
+        for (_, pred), resp in zip(resultados, lista):
+            self.assertEqual(pred["carrera_predicha"], m.predecir_carrera(resp)["carrera_predicha"])
+
+    def _reescorar(self, resultado, pred, guardada=None):
+        from ali_ia import cola_explicaciones as cola
+        from ali_ia.management.commands.reescorar_tests import Command
+        from test_grado_10_11 import views
+
+        respuestas = {f"pregunta_{i}": "A" for i in range(1, 61)}
+        test = TestGrado10_11(respuestas=respuestas, resultado=resultado, explicacion_estado=cola.LISTA,
+                              explicacion_intentos=2)
+        pendientes = {1: (test, views._normalizar_respuestas(respuestas))}
+        with mock.patch.object(cola, "EN_COLA", True), \
+                mock.patch.object(views, "_explicacion_guardada", return_value=guardada):
+            Command()._escribir(TestGrado10_11, views, "carrera_predicha", [(1, pred)], pendientes,
+                                {"dry_run": True, "chunk": 10})
+        return test
+
+    def test_conserva_explicacion_si_no_cambia_el_top1(self):
+        from ali_ia import cola_explicaciones as cola
+
+        viejo = "Carrera sugerida por ALI: Derecho\nTop-3: Derecho (0.50)\n\nExplicación: Te gusta argumentar."
+        test = self._reescorar(viejo, {"carrera_predicha": "Derecho", "top3": [("Derecho", 0.6), ("Medicina", 0.3)]})
+        self.assertTrue(test.resultado.startswith("Carrera sugerida por ALI: Derecho\nTop-3: Derecho (0.60)"))
+        self.assertTrue(test.resultado.endswith("Explicación: Te gusta argumentar."))
+        self.assertEqual(test.explicacion_estado, cola.LISTA)
+
+    def test_top1_distinto_vuelve_a_la_cola(self):
+        from ali_ia import cola_explicaciones as cola
+
+        viejo = "Carrera sugerida por ALI: Derecho\nTop-3: Derecho (0.50)\n\nExplicación: Te gusta argumentar."
+        pred = {"carrera_predicha": "Medicina", "top3": [("Medicina", 0.6), ("Derecho", 0.3)]}
+        test = self._reescorar(viejo, pred)
+        self.assertTrue(test.resultado.startswith("Carrera sugerida por ALI: Medicina\n"))
+        self.assertEqual(cola.extraer_explicacion(test.resultado), cola.TEXTO_PENDIENTE)
+        self.assertEqual((test.explicacion_estado, test.explicacion_intentos), (cola.PENDIENTE, 0))
+
+        test = self._reescorar(viejo, pred, guardada="Medicina te queda bien.")  # pregenerada del perfil
+        self.assertEqual(cola.extraer_explicacion(test.resultado), "Medicina te queda bien.")
+        self.assertEqual(test.explicacion_estado, cola.LISTA)
+
+
+class ExplicacionPendienteTests(SimpleTestCase):
+    """El worker de la cola explica la carrera guardada en `resultado`, sin volver a predecir."""
+
+    def test_usa_la_carrera_del_resultado(self):
+        from test_grado_10_11 import views
+        from test_grado_10_11.models import TestGrado10_11
+
+        respuestas = {f"pregunta_{i}": "A" for i in range(1, 61)}
+        test = TestGrado10_11(respuestas=respuestas, resultado=views._componer_resultado(
+            {"carrera_predicha": "Derecho", "top3": [("Derecho", 0.5)]}, "pendiente"))
+        llamadas = []
+        with mock.patch.object(views, "generar_explicacion_carrera",
+                               lambda carrera, resp, **kw: llamadas.append((carrera, resp)) or "ok"):
+            self.assertEqual(views._explicar_pendiente(test), "ok")
+            test.resultado = "Error interno: x"
+            with self.assertRaises(ValueError):
+                views._explicar_pendiente(test)
+        self.assertEqual(llamadas[0][0], "Derecho")
+        self.assertEqual(llamadas[0][1]["pregunta_1"], 3)
+
+    def test_sincrona_sin_cupo_guarda_explicacion_local(self):
+        """Modo sincrona (sin worker): ni un 429, ni SinCupo, ni otro error dejan la explicación PENDIENTE."""
+        from ali_ia.admision_groq import SinCupo
+        from ali_ia.groq_client import GroqError
+        from test_grado_10_11 import views
+
+        guardadas = []
+        with mock.patch.object(views, "_preparar_finalizacion",
+                               lambda test: ({"carrera_predicha": "Derecho"}, ["Me encanta"] * 60)), \
+                mock.patch.object(views, "_guardar_finalizacion",
+                                  lambda test, pred, explicacion=None: guardadas.append(explicacion)), \
+                mock.patch.object(views.cola, "EN_COLA", False):
+            for error in (GroqError("Groq respondió con error", 429), SinCupo("sin cupo"),
+                          GroqError("Groq respondió con error", 500)):
+                with mock.patch.object(views, "generar_explicacion_carrera", side_effect=error):
+                    views._finalizar_y_predecir(object())
+        self.assertEqual(len(guardadas), 3)
+        for explicacion in guardadas:
+            self.assertTrue(explicacion.startswith("Por qué te lo sugerimos:"))
+            self.assertIn("Derecho", explicacion)
+
+
+class ExplicacionLocalTests(SimpleTestCase):
+    """Plantillas sin red: mismo formato que Groq, en microsegundos."""
+
+    def setUp(self):
+        from test_grado_10_11.ml_model.model_10y11 import PREGUNTAS_CLAVE_POR_CARRERA
+        self.bloques = PREGUNTAS_CLAVE_POR_CARRERA
+        # Interés alto en Derecho y medio en Psicología, bajo en lo demás
+        self.respuestas = {f"pregunta_{i}": 1 for i in range(1, 61)}
+        for i in self.bloques["Derecho"]:
+            self.respuestas[f"pregunta_{i}"] = 3
+        for i in self.bloques["Psicología"]:
+            self.respuestas[f"pregunta_{i}"] = 2
+
+    def test_formato_y_contenido(self):
+        from test_grado_10_11.groq_service import ENFOQUE_CARRERA, explicacion_local_carrera
+
+        self.assertEqual(set(ENFOQUE_CARRERA), set(self.bloques))
+        texto = explicacion_local_carrera("Derecho", self.respuestas)
+        secciones = [linea.split(":", 1)[0] for linea in texto.splitlines()]
+        self.assertEqual(secciones, ["Por qué te lo sugerimos", "Qué aprenderás", "Siguientes pasos"])
+        self.assertIn("Derecho es el área del test que más te atrae", texto)
+        self.assertIn("Psicología", texto)
+        self.assertIn(ENFOQUE_CARRERA["Derecho"], texto)
+        self.assertEqual(texto, explicacion_local_carrera("Derecho", self.respuestas))  # determinista
+
+    def test_menos_de_5_ms(self):
+        import time
+        from test_grado_10_11.groq_service import explicacion_local_carrera
+
+        tiempos = []
+        for carrera in list(self.bloques) * 20:
+            t0 = time.perf_counter()
+            explicacion_local_carrera(carrera, self.respuestas)
+            tiempos.append(time.perf_counter() - t0)
+        self.assertLess(float(np.percentile(tiempos, 95)), 0.005)
+
+    def test_motor_local_no_llama_a_groq(self):
+        from ali_ia import explicacion_local
+        from test_grado_10_11 import groq_service
+
+        def sin_red(*args, **kwargs):
+            raise AssertionError("no debe llamar a Groq")
+
+        with mock.patch.object(explicacion_local, "LOCAL", True), \
+                mock.patch.object(groq_service.GROQ, "completar", sin_red), \
+                mock.patch.object(groq_service.GROQ, "completar_stream", sin_red):
+            texto = groq_service.generar_explicacion_carrera("Derecho", self.respuestas)
+            fragmentos = list(groq_service.generar_explicacion_carrera_stream("Derecho", self.respuestas))
+        self.assertTrue(texto.startswith("Por qué te lo sugerimos:"))
+        self.assertEqual(fragmentos, [texto])
+
+    def test_respaldo_del_worker_usa_la_carrera_guardada(self):
+        from test_grado_10_11 import views
+        from test_grado_10_11.models import TestGrado10_11
+
+        test = TestGrado10_11(respuestas={f"pregunta_{i}": "A" for i in range(1, 61)},
+                              resultado=views._componer_resultado(
+                                  {"carrera_predicha": "Medicina", "top3": [("Medicina", 0.6)]}, "pendiente"))
+        texto = views._explicar_pendiente_local(test)
+        self.assertIn("Medicina", texto)
+        self.assertEqual(views.cola.texto_respaldo(test, views._explicar_pendiente_local), texto)
+        test.resultado = "Error interno: x"
+        self.assertEqual(views.cola.texto_respaldo(test, views._explicar_pendiente_local), views.cola.TEXTO_FALLBACK)
+
+
+class PregeneracionTests(SimpleTestCase):
+    """Modo cola: si el perfil ya tiene explicación pregenerada, la finalización la sirve sin pasar por el worker."""
+
+    def test_finalizacion_sirve_la_pregenerada(self):
+        from ali_ia.cache_explicaciones import CacheExplicaciones
+        from test_grado_10_11 import groq_service, views
+
+        respuestas_norm = ["Me encanta"] * 30 + ["No me gusta"] * 30
+        guardadas, llamadas = [], []
+        with mock.patch.object(views, "_guardar_finalizacion",
+                               lambda test, pred, explicacion=None: guardadas.append(explicacion)), \
+                mock.patch.object(views.cola, "EN_COLA", True), \
+                mock.patch.object(groq_service, "CACHE", CacheExplicaciones("grado10_11", persistente=False)), \
+                mock.patch.object(groq_service.GROQ, "completar",
+                                  lambda mensajes, **kw: llamadas.append(mensajes) or "Texto pregenerado"):
+            views._pregenerar("Derecho", respuestas_norm)
+            for carrera in ("Derecho", "Medicina"):
+                with mock.patch.object(views, "_preparar_finalizacion",
+                                       lambda test, c=carrera: ({"carrera_predicha": c}, respuestas_norm)):
+                    views._finalizar_y_predecir(object())
+        self.assertEqual(len(llamadas), 1)  # solo la pregeneración llama a Groq
+        self.assertEqual(guardadas, ["Texto pregenerado", None])  # otra carrera: a la cola
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from ali_ia.vistas_async import ASGI
 from .views import TestGrado10_11ViewSet,ResultadoTest10_11PorIDView,TestsGrado10_11DeUsuarioView, FiltroPorCarreraView
 
 router = DefaultRouter()
@@ -13,3 +14,11 @@ urlpatterns = [
     path('', include(router.urls)),
 ]
 
+# Modo ASGI: estas rutas van antes del router y atienden con vistas async (ver ali_ia/vistas_async.py)
+if ASGI:
+    from . import views_async
+
+    urlpatterns = [
+        path('<int:pk>/progreso/', views_async.progreso, name='test_grado10_11_progreso_async'),
+        path('<int:pk>/explicacion/stream/', views_async.explicacion_stream, name='test_grado10_11_explicacion_stream_async'),
+    ] + urlpatterns
@@ -1,5 +1,6 @@
 # test_grado_10_11/views.py
 import numpy as np
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 from django.db import transaction
 from django.contrib.auth import get_user_model
@@ -7,13 +8,21 @@ from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
 
 
 from .models import TestGrado10_11
 from .serializers import TestGrado10_11Serializer
-from .groq_service import generar_explicacion_carrera
-from .ml_model.model_10y11 import predecir_carrera  # 👈 usa el loader nuevo
+from .groq_service import (generar_explicacion_carrera, generar_explicacion_carrera_stream,
+                           agenerar_explicacion_carrera, agenerar_explicacion_carrera_stream,
+                           explicacion_local_carrera, clave_cache, explicacion_guardada_carrera,
+                           pregenerar_explicacion_carrera)
+from .ml_model.model_10y11 import predecir_carrera, PREGUNTAS_CLAVE_POR_CARRERA  # 👈 usa el loader nuevo
+from ali_ia import cola_explicaciones as cola
+from ali_ia import explicacion_local
+from ali_ia.provisional import CalculadoraProvisional
+from ali_ia.sse import RenderizadorSSE, eventos_explicacion, respuesta_sse
 
 
 # ----------------- Config / utilidades -----------------
@@ -31,6 +40,22 @@ def _is_valida(r):
     return (r in VALID_TEXT) or (r in MAP_A_B_C and MAP_A_B_C[r] in VALID_TEXT)
 
 
+def _codigo_respuesta(r) -> int:
+    """3/2/1 para respuestas válidas (texto o A/B/C), 0 si falta o es inválida."""
+    r = str(r if r is not None else "").strip()
+    return MAP_321.get(MAP_A_B_C.get(r, r), 0)
+
+
+def _quiere_provisional(data, params) -> bool:
+    """`provisional` en el cuerpo o en la query string (request.data / request.query_params o request.GET)."""
+    valor = data.get("provisional", params.get("provisional"))
+    return str(valor).strip().lower() in ("1", "true", "si", "sí")
+
+
+# Top-3 provisional en memoria (por proceso); nunca se guarda en `resultado`
+PROVISIONAL = CalculadoraProvisional("grado10_11", TOTAL_PREGUNTAS, PREGUNTAS_CLAVE_POR_CARRERA, _codigo_respuesta)
+
+
 def _normalizar_respuestas(respuestas_dict):
     """Devuelve lista de 60 en formato texto ('Me encanta'/'Me interesa'/'No me gusta')
        o None si faltan/son inválidas."""  # ✅ Actualizado comentario
@@ -62,39 +87,266 @@ def _ultima_pregunta(respuestas: dict) -> int:
     return last
 
 
-def _finalizar_y_predecir(test_instance: TestGrado10_11):
-    """Predice carrera con el nuevo modelo y genera explicación."""
-    respuestas = test_instance.respuestas or {}
-    respuestas_norm = _normalizar_respuestas(respuestas)
-    if respuestas_norm is None:
-        return  # aún no está completo/válido
+PREFIJO_CARRERA = "Carrera sugerida por ALI: "
 
 
-    # Predicción (ahora con 60 respuestas)
-    pred = predecir_carrera(respuestas_norm, top_k=3)
-    carrera = pred["carrera_predicha"]
-    top3 = pred["top3"]  # [(nombre, prob), ...]
+def _componer_resultado(pred: dict, explicacion: str) -> str:
+    """Texto que se guarda en `resultado` (también lo usa `reescorar_tests`)."""
+    detalle_top3 = ", ".join([f"{n} ({p:.2f})" for n, p in pred["top3"]])  # [(nombre, prob), ...]
+    return (
+        f"{PREFIJO_CARRERA}{pred['carrera_predicha']}\n"
+        f"Top-3: {detalle_top3}\n\n"
+        f"Explicación: {explicacion}"
+    )
 
 
+def _codificar(respuestas_norm) -> dict:
     # Codificado 3/2/1 para tu prompt de Groq
-    respuestas_codificadas = {f"pregunta_{i}": MAP_321[r]
-                              for i, r in enumerate(respuestas_norm, start=1)}
-    explicacion = generar_explicacion_carrera(carrera, respuestas_codificadas)
+    return {f"pregunta_{i}": MAP_321[r] for i, r in enumerate(respuestas_norm, start=1)}
 
 
-    detalle_top3 = ", ".join([f"{n} ({p:.2f})" for n, p in top3])
-    resultado = (
-        f"Carrera sugerida por ALI: {carrera}\n"
-        f"Top-3: {detalle_top3}\n\n"
-        f"Explicación: {explicacion}"
-    )
+def _explicacion(carrera: str, respuestas_norm, stream: bool = False, asincrono: bool = False, plazo_s=None):
+    if asincrono:  # modo ASGI: corrutina / generador asíncrono
+        generar = agenerar_explicacion_carrera_stream if stream else agenerar_explicacion_carrera
+    else:
+        generar = generar_explicacion_carrera_stream if stream else generar_explicacion_carrera
+    return generar(carrera, _codificar(respuestas_norm), plazo_s=plazo_s)
+
+
+def _explicacion_local(carrera: str, respuestas_norm) -> str:
+    """Respaldo sin red (plantillas) cuando Groq falla o tarda demasiado."""
+    return explicacion_local_carrera(carrera, _codificar(respuestas_norm), motivo=explicacion_local.RESPALDO)
+
+
+def _clave_explicacion(carrera: str, respuestas_norm):
+    """(contexto, objetivo, perfil) de la explicación en el cache (pregenerar_explicaciones)."""
+    return clave_cache(carrera, _codificar(respuestas_norm))
+
+
+def _explicacion_guardada(carrera: str, respuestas_norm):
+    """Pregenerada (o ya generada) para esta carrera y perfil: se sirve sin esperar a Groq. None si no hay."""
+    return explicacion_guardada_carrera(carrera, _codificar(respuestas_norm))
+
+
+def _pregenerar(carrera: str, respuestas_norm) -> str:
+    return pregenerar_explicacion_carrera(carrera, _codificar(respuestas_norm))
+
+
+def _datos_pendiente(test_instance: TestGrado10_11):
+    """(carrera, respuestas_norm) de un test finalizado: carrera tomada del `resultado` guardado."""
+    respuestas_norm = _normalizar_respuestas(test_instance.respuestas or {})
+    primera = (test_instance.resultado or "").split("\n", 1)[0]
+    if respuestas_norm is None or not primera.startswith(PREFIJO_CARRERA):
+        raise ValueError("El test no tiene respuestas completas o una carrera predicha.")
+    return primera[len(PREFIJO_CARRERA):], respuestas_norm
 
 
-    test_instance.resultado = resultado
+def _explicar_pendiente(test_instance: TestGrado10_11, stream: bool = False, asincrono: bool = False):
+    """
+    La usan el worker de la cola (procesar_explicaciones) y el endpoint SSE
+    (stream=True: generador de fragmentos).
+    """
+    carrera, respuestas_norm = _datos_pendiente(test_instance)
+    return _explicacion(carrera, respuestas_norm, stream=stream, asincrono=asincrono)
+
+
+def _explicar_pendiente_local(test_instance: TestGrado10_11) -> str:
+    """Lo que guardan el worker y el SSE cuando se agotan los intentos con Groq."""
+    return _explicacion_local(*_datos_pendiente(test_instance))
+
+
+def _explicar_pendiente_stream(test_instance: TestGrado10_11):
+    return _explicar_pendiente(test_instance, stream=True)
+
+
+def _aexplicar_pendiente_stream(test_instance: TestGrado10_11):
+    return _explicar_pendiente(test_instance, stream=True, asincrono=True)
+
+
+def _preparar_finalizacion(test_instance: TestGrado10_11):
+    """Predicción de un test completo: (pred, respuestas_norm), o None si aún no está completo/válido."""
+    respuestas_norm = _normalizar_respuestas(test_instance.respuestas or {})
+    if respuestas_norm is None:
+        return None
+    # Predicción (ahora con 60 respuestas)
+    return predecir_carrera(respuestas_norm, top_k=3), respuestas_norm
+
+
+def _guardar_finalizacion(test_instance: TestGrado10_11, pred: dict, explicacion=None):
+    """Guarda el resultado; explicacion=None la deja en la cola para el worker."""
+    if explicacion is None:
+        explicacion = cola.TEXTO_PENDIENTE
+        test_instance.explicacion_estado = cola.PENDIENTE
+        test_instance.explicacion_intentos = 0
+        test_instance.explicacion_proximo_intento = None
+    else:
+        test_instance.explicacion_estado = cola.LISTA
+
+    test_instance.resultado = _componer_resultado(pred, explicacion)
+    test_instance.modelo_version = pred.get("modelo_version", "")
     test_instance.estado = TestGrado10_11.ESTADO_FINALIZADO
     if not test_instance.fecha_realizacion:
         test_instance.fecha_realizacion = timezone.now()
-    test_instance.save(update_fields=['resultado', 'estado', 'fecha_realizacion', 'fecha_ultima_actividad'])
+    test_instance.save(update_fields=['resultado', 'modelo_version', 'estado', 'fecha_realizacion',
+                                      'fecha_ultima_actividad'] + cola.CAMPOS)
+
+
+def _finalizar_y_predecir(test_instance: TestGrado10_11):
+    """
+    Predice carrera con el nuevo modelo. La explicación (Groq) se encola y la
+    completa el worker, salvo que ya haya una pregenerada para la carrera y el
+    perfil (ALI_EXPLICACIONES=sincrona: se genera aquí, como antes;
+    ALI_EXPLICACIONES_MOTOR=local: se genera aquí con plantillas, sin red).
+    """
+    preparado = _preparar_finalizacion(test_instance)
+    if preparado is None:
+        return  # aún no está completo/válido
+    pred, respuestas_norm = preparado
+
+    carrera = pred["carrera_predicha"]
+    if explicacion_local.LOCAL or not cola.EN_COLA:
+        try:
+            explicacion = _explicacion(carrera, respuestas_norm, plazo_s=explicacion_local.PLAZO_S)
+        except Exception:
+            # Falló, tardó o no hubo cupo (429 / admisión): aquí no hay worker que la retome
+            explicacion = _explicacion_local(carrera, respuestas_norm)
+    else:
+        # Modo cola: si el perfil ya tiene explicación guardada queda LISTA; si no, al worker
+        explicacion = _explicacion_guardada(carrera, respuestas_norm)
+    _guardar_finalizacion(test_instance, pred, explicacion)
+
+
+async def _afinalizar_y_predecir(test_instance: TestGrado10_11):
+    """Igual que _finalizar_y_predecir para las vistas ASGI: la llamada a Groq no bloquea el proceso."""
+    preparado = await sync_to_async(_preparar_finalizacion)(test_instance)
+    if preparado is None:
+        return
+    pred, respuestas_norm = preparado
+
+    carrera = pred["carrera_predicha"]
+    if explicacion_local.LOCAL or not cola.EN_COLA:
+        try:
+            explicacion = await _explicacion(carrera, respuestas_norm, asincrono=True,
+                                             plazo_s=explicacion_local.PLAZO_S)
+        except Exception:
+            # Falló, tardó o no hubo cupo (429 / admisión): aquí no hay worker que la retome
+            explicacion = _explicacion_local(carrera, respuestas_norm)
+    else:
+        explicacion = await sync_to_async(_explicacion_guardada)(carrera, respuestas_norm)
+    await sync_to_async(_guardar_finalizacion)(test_instance, pred, explicacion)
+
+
+def _estado_explicacion(test: TestGrado10_11) -> dict:
+    """Respuesta del endpoint de polling de la explicación."""
+    lista = test.explicacion_estado in ("", cola.LISTA, cola.ERROR)
+    return {
+        "id": test.id,
+        "estado": test.estado,
+        "explicacion_estado": test.explicacion_estado,
+        "explicacion": cola.extraer_explicacion(test.resultado) if lista else None,
+        "resultado": test.resultado,
+    }
+
+
+def _guardar_progreso(user, pk, data):
+    """
+    Valida y guarda las respuestas de un PATCH de progreso (vista DRF y vista ASGI).
+    Devuelve ((test, respuestas, updates, revision_previa), None) o (None, (error, status)).
+    """
+    try:
+        test = TestGrado10_11.objects.get(pk=pk)
+    except TestGrado10_11.DoesNotExist:
+        return None, ({"error": "Test no existe."}, status.HTTP_404_NOT_FOUND)
+
+
+    if not (user.is_staff or user.is_superuser or test.usuario_id == user.id):
+        return None, ({"error": "No tienes permiso para modificar este test."}, status.HTTP_403_FORBIDDEN)
+
+
+    if test.estado == TestGrado10_11.ESTADO_FINALIZADO:
+        return None, ({"error": "El test ya está finalizado."}, status.HTTP_400_BAD_REQUEST)
+
+
+    respuestas = dict(test.respuestas or {})
+    updates = {}
+
+
+    # Un único item
+    if 'pregunta' in data and 'respuesta' in data:
+        try:
+            n = int(data['pregunta'])
+        except Exception:
+            return None, ({"error": "Índice de pregunta inválido."}, 400)
+        r = str(data['respuesta']).strip()
+        if not (1 <= n <= TOTAL_PREGUNTAS):
+            return None, ({"error": f"Índice de pregunta fuera de 1..{TOTAL_PREGUNTAS}."}, 400)
+        if not _is_valida(r):
+            return None, ({"error": "Respuesta inválida (Me encanta / Me interesa / No me gusta o A/B/C)."}, 400)
+        updates[f"pregunta_{n}"] = r
+
+
+    # Varios items
+    if 'respuestas' in data and isinstance(data['respuestas'], dict):
+        for k, v in data['respuestas'].items():
+            if not k.startswith('pregunta_'):
+                continue
+            try:
+                idx = int(k.split('_')[1])
+            except Exception:
+                continue
+            r = str(v).strip()
+            if not (1 <= idx <= TOTAL_PREGUNTAS):
+                return None, ({"error": f"Índice de pregunta fuera de 1..{TOTAL_PREGUNTAS}."}, 400)
+            if not _is_valida(r):
+                return None, ({"error": f"Inválida {k} (Me encanta / Me interesa / No me gusta o A/B/C)."}, 400)
+            updates[f"pregunta_{idx}"] = r
+
+
+    if not updates:
+        return None, ({"error": "No hay respuestas válidas para actualizar."}, 400)
+
+
+    with transaction.atomic():  # ✅ Mejora el rendimiento de múltiples .save()
+        respuestas.update(updates)
+        test.respuestas = respuestas
+        test.respondidas = _contar_respondidas(respuestas)
+        up_exp = data.get('ultima_pregunta')
+        if isinstance(up_exp, int) and 1 <= up_exp <= TOTAL_PREGUNTAS:
+            test.ultima_pregunta = up_exp
+        else:
+            test.ultima_pregunta = _ultima_pregunta(respuestas)
+
+
+        if test.respondidas >= TOTAL_PREGUNTAS:
+            test.estado = TestGrado10_11.ESTADO_FINALIZADO
+            if not test.fecha_realizacion:
+                test.fecha_realizacion = timezone.now()
+        else:
+            test.estado = TestGrado10_11.ESTADO_EN_PROGRESO
+
+
+        previa = test.fecha_ultima_actividad  # revisión leída; save() pone la nueva (auto_now)
+        test.save()
+
+    return (test, respuestas, updates, previa), None
+
+
+def _payload_progreso(test: TestGrado10_11, respuestas: dict, updates: dict, previa, provisional: bool) -> dict:
+    payload = {
+        "id": test.id,
+        "estado": test.estado,
+        "respondidas": test.respondidas,
+        "total": TOTAL_PREGUNTAS,
+        "progreso_pct": round((test.respondidas / TOTAL_PREGUNTAS) * 100, 2),
+        "ultima_pregunta": test.ultima_pregunta,
+        "fecha_ultima_actividad": test.fecha_ultima_actividad,
+        "explicacion_estado": test.explicacion_estado,
+    }
+    # Opt-in: ranking provisional por bloques (solo en la respuesta)
+    if test.estado != TestGrado10_11.ESTADO_FINALIZADO and provisional:
+        payload["provisional"] = PROVISIONAL.actualizar(test.id, respuestas, updates, test.respondidas,
+                                                        previa, test.fecha_ultima_actividad)
+    return payload
 
 
 # ================== ViewSet principal ==================
@@ -172,101 +424,37 @@ class TestGrado10_11ViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['patch'], url_path='progreso')
     def progreso(self, request, pk=None):
         """Actualiza respuestas de un test en progreso y calcula predicción si está completo."""  # ✅ Docstring
-        user = request.user
-        try:
-            test = TestGrado10_11.objects.get(pk=pk)
-        except TestGrado10_11.DoesNotExist:
-            return Response({"error": "Test no existe."}, status=status.HTTP_404_NOT_FOUND)
-
-
-        if not (user.is_staff or user.is_superuser or test.usuario_id == user.id):
-            return Response({"error": "No tienes permiso para modificar este test."},
-                            status=status.HTTP_403_FORBIDDEN)
-
-
-        if test.estado == TestGrado10_11.ESTADO_FINALIZADO:
-            return Response({"error": "El test ya está finalizado."}, status=status.HTTP_400_BAD_REQUEST)
-
-
-        data = request.data
-        respuestas = dict(test.respuestas or {})
-        updates = {}
-
-
-        # Un único item
-        if 'pregunta' in data and 'respuesta' in data:
-            try:
-                n = int(data['pregunta'])
-            except Exception:
-                return Response({"error": "Índice de pregunta inválido."}, status=400)
-            r = str(data['respuesta']).strip()
-            if not (1 <= n <= TOTAL_PREGUNTAS):
-                return Response({"error": f"Índice de pregunta fuera de 1..{TOTAL_PREGUNTAS}."}, status=400)
-            if not _is_valida(r):
-                return Response({"error": "Respuesta inválida (Me encanta / Me interesa / No me gusta o A/B/C)."}, status=400)
-            updates[f"pregunta_{n}"] = r
-
-
-        # Varios items
-        if 'respuestas' in data and isinstance(data['respuestas'], dict):
-            for k, v in data['respuestas'].items():
-                if not k.startswith('pregunta_'):
-                    continue
-                try:
-                    idx = int(k.split('_')[1])
-                except Exception:
-                    continue
-                r = str(v).strip()
-                if not (1 <= idx <= TOTAL_PREGUNTAS):
-                    return Response({"error": f"Índice de pregunta fuera de 1..{TOTAL_PREGUNTAS}."}, status=400)
-                if not _is_valida(r):
-                    return Response({"error": f"Inválida {k} (Me encanta / Me interesa / No me gusta o A/B/C)."}, status=400)
-                updates[f"pregunta_{idx}"] = r
-
-
-        if not updates:
-            return Response({"error": "No hay respuestas válidas para actualizar."}, status=400)
-
-
-        with transaction.atomic():  # ✅ Mejora el rendimiento de múltiples .save()
-            respuestas.update(updates)
-            test.respuestas = respuestas
-            test.respondidas = _contar_respondidas(respuestas)
-            up_exp = data.get('ultima_pregunta')
-            if isinstance(up_exp, int) and 1 <= up_exp <= TOTAL_PREGUNTAS:
-                test.ultima_pregunta = up_exp
-            else:
-                test.ultima_pregunta = _ultima_pregunta(respuestas)
-
-
-            if test.respondidas >= TOTAL_PREGUNTAS:
-                test.estado = TestGrado10_11.ESTADO_FINALIZADO
-                if not test.fecha_realizacion:
-                    test.fecha_realizacion = timezone.now()
-            else:
-                test.estado = TestGrado10_11.ESTADO_EN_PROGRESO
-
-
-            test.save()
-
+        hecho, error = _guardar_progreso(request.user, pk, request.data)
+        if error:
+            return Response(*error)
+        test, respuestas, updates, previa = hecho
 
         if test.estado == TestGrado10_11.ESTADO_FINALIZADO:
+            PROVISIONAL.olvidar(test.id)
             try:
                 _finalizar_y_predecir(test)
             except Exception as e:
                 test.resultado = f"Error interno: {str(e)}"
                 test.save(update_fields=['resultado'])
 
+        provisional = _quiere_provisional(request.data, request.query_params)
+        return Response(_payload_progreso(test, respuestas, updates, previa, provisional), status=200)
+
+
+    @action(detail=True, methods=['get'], url_path='explicacion')
+    def explicacion(self, request, pk=None):
+        """Estado de la explicación en segundo plano (el cliente hace polling tras finalizar)."""
+        return Response(_estado_explicacion(self.get_object()), status=200)
 
-        return Response({
-            "id": test.id,
-            "estado": test.estado,
-            "respondidas": test.respondidas,
-            "total": TOTAL_PREGUNTAS,
-            "progreso_pct": round((test.respondidas / TOTAL_PREGUNTAS) * 100, 2),
-            "ultima_pregunta": test.ultima_pregunta,
-            "fecha_ultima_actividad": test.fecha_ultima_actividad,
-        }, status=200)
+    @action(detail=True, methods=['get'], url_path='explicacion/stream',
+            renderer_classes=[RenderizadorSSE, JSONRenderer])
+    def explicacion_stream(self, request, pk=None):
+        """Explicación en Server-Sent Events: los tokens de Groq llegan según se generan."""
+        test = self.get_object()
+        if test.estado != TestGrado10_11.ESTADO_FINALIZADO:
+            return Response({"detail": "El test aún no está finalizado."}, status=409)
+        return respuesta_sse(eventos_explicacion(TestGrado10_11, test.pk, _explicar_pendiente_stream,
+                                                        respaldo=_explicar_pendiente_local))
 
 
 # ----------------- APIViews existentes -----------------